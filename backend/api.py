@@ -1,32 +1,64 @@
-from fastapi import FastAPI, Depends, HTTPException, UploadFile, File, Query
+from fastapi import FastAPI, Depends, HTTPException, UploadFile, File, Query, Header, Request
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import StreamingResponse
-from sqlalchemy.orm import Session, selectinload
+from fastapi.responses import StreamingResponse, Response, JSONResponse
+from sqlalchemy.orm import Session, selectinload, sessionmaker
 from sqlalchemy import func
+from sqlalchemy.exc import OperationalError
 from typing import List, Optional
 from datetime import datetime
 from contextlib import asynccontextmanager
+import asyncio
 import json
 import csv
 import io
+import os
+import threading
 
-from database import get_db, init_db, Event, Property, EventProperty, Changelog
-from sqlalchemy import text
+from database import get_db, init_db, unit_of_work, SessionLocal, Event, Property, EventProperty, Changelog
+from sqlalchemy import text, exists
 from models import (
     EventCreate, EventResponse, EventUpdate,
+    EventPatch, SetEventFields, AddEventProperty, RemoveEventProperty,
     PropertyCreate, PropertyResponse,
     EventPropertyCreate,
-    ChangelogResponse
+    ChangelogResponse,
+    ValidationBatch, ValidationReport,
+    SyncResponse, SuggestionBatch, PropertyUsage, PropertyMerge, PropertyRename
 )
-from utils import find_similar_properties
+from changelog import property_entry, diff_fields, reconstruct, merge_entry, EVENT_FIELDS, PATCH_ACTION
+from profiler import SamplingProfiler, RequestProfilerMiddleware, is_admin, render
+from validation import get_validator, taxonomy_version
+from history import CheckpointWriter, parse_as_of, version_at, events_at, event_at, event_response, property_descriptions
+from taxonomy_diff import diff_taxonomies, load_states
+from changefeed import change_stream
+from archive import latest_changelog, search_changelog
+from rollups import DIMENSIONS, changelog_stats
+from duplicates import get_duplicate_index, event_names
+from property_dedupe import DEFAULT_THRESHOLD, get_dedupe_report
+from suggestions import get_name_index
+from semantic import get_search_index
+from cooccurrence import DEFAULT_TOP_K, recommend
+from usage import get_usage_index
+from property_merge import merge_properties, rename_property
+from sync import add_tombstone, touch, changes_since
+from replication import Follower, LEADER_URL_ENV, FEED_BATCH, feed, http_fetch
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Startup
     init_db()
+    with SessionLocal() as db:
+        get_usage_index(db)  # Build the property usage index before the first request
+    leader_url = os.environ.get(LEADER_URL_ENV)
+    app.state.follower = Follower(SessionLocal, http_fetch(leader_url), leader=leader_url).start() if leader_url else None
+    checkpoints = CheckpointWriter(SessionLocal).start()
     yield
-    # Shutdown (if needed)
+    # Shutdown
+    checkpoints.stop()
+    if app.state.follower is not None:
+        app.state.follower.stop()
 
 
 app = FastAPI(title="Event Taxonomy Tracker", lifespan=lifespan)
@@ -40,12 +72,38 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Per-request profiling with ?profile=1 (admin token required)
+app.add_middleware(RequestProfilerMiddleware)
+
+
+@app.exception_handler(OperationalError)
+async def database_locked(request: Request, exc: OperationalError):
+    """Answer SQLite lock timeouts with a retryable 503 instead of a generic server error."""
+    if "database is locked" not in str(exc.orig) and "database table is locked" not in str(exc.orig):
+        raise exc
+    return JSONResponse(status_code=503, content={"detail": "database is locked"}, headers={"Retry-After": "1"})
+
+
+# Requests that do not modify the taxonomy despite their method
+READ_ONLY_POSTS = {"/api/validate", "/api/properties/suggest/batch"}
+
+
+@app.middleware("http")
+async def reject_writes_on_follower(request: Request, call_next):
+    """A replication follower serves reads only; its data comes from the leader's changelog."""
+    if (getattr(request.app.state, "follower", None) is not None
+            and request.method not in ("GET", "HEAD", "OPTIONS")
+            and request.url.path not in READ_ONLY_POSTS):
+        return JSONResponse(status_code=403, content={"detail": "Read-only replica: send writes to the leader"})
+    return await call_next(request)
+
 
 def log_change(db: Session, entity_type: str, entity_id: int, action: str,
                old_value: dict = None, new_value: dict = None, changed_by: str = None):
     """Helper function to log changes to changelog.
-    
-    Note: This does NOT commit - the caller is responsible for transaction management.
+
+    Note: This does NOT commit - call it inside the same unit_of_work as the data
+    change so both land in one transaction.
     """
     changelog = Changelog(
         entity_type=entity_type,
@@ -69,6 +127,7 @@ def list_events(
     date_to: Optional[str] = None,
     skip: int = Query(default=0, ge=0, description="Number of events to skip"),
     limit: int = Query(default=100, ge=1, le=500, description="Maximum number of events to return"),
+    as_of: Optional[str] = Query(default=None, description="ISO timestamp; list the events as they were then"),
     db: Session = Depends(get_db)
 ):
     """List all events with optional search, filters, and pagination.
@@ -76,7 +135,12 @@ def list_events(
     Search includes: event name, category, description, property names with relevance ranking.
     Filters: category, created_by, date range.
     Pagination: skip and limit parameters.
+    Point in time: as_of reconstructs the taxonomy from the changelog.
     """
+    if as_of:
+        result = _list_events_as_of(db, as_of, category, created_by, date_from, date_to, skip, limit)
+        return _rank_events(result, q) if q else result
+
     # Start with base query with eager loading to avoid N+1 queries
     base_query = db.query(Event).options(
         selectinload(Event.event_properties).joinedload(EventProperty.property)
@@ -136,142 +200,223 @@ def list_events(
 
     # Apply search with relevance ranking if query provided
     if q:
-        search_term = q.lower()
-        scored_results = []
-
-        for event_dict in result:
-            score = 0
-
-            # Event name (highest priority - score: 100)
-            if search_term in event_dict["name"].lower():
-                score += 100
-                # Boost for exact match
-                if event_dict["name"].lower() == search_term:
-                    score += 50
-
-            # Category/Feature (score: 75)
-            if event_dict["category"] and search_term in event_dict["category"].lower():
-                score += 75
-                if event_dict["category"].lower() == search_term:
-                    score += 25
-
-            # Event description (score: 50)
-            if event_dict["description"] and search_term in event_dict["description"].lower():
+        result = _rank_events(result, q)
+
+    return result
+
+
+def _rank_events(result: list, q: str) -> list:
+    """Score formatted events against a search query; keep matches ordered by relevance."""
+    search_term = q.lower()
+    scored_results = []
+
+    for event_dict in result:
+        score = 0
+
+        # Event name (highest priority - score: 100)
+        if search_term in event_dict["name"].lower():
+            score += 100
+            # Boost for exact match
+            if event_dict["name"].lower() == search_term:
                 score += 50
 
-            # Property names (score: 30 per match)
-            for prop in event_dict["properties"]:
-                if search_term in prop["property_name"].lower():
-                    score += 30
-                    if prop["property_name"].lower() == search_term:
-                        score += 10
-
-            # Property descriptions (score: 20 per match)
-            for prop in event_dict["properties"]:
-                if prop["description"] and search_term in prop["description"].lower():
-                    score += 20
-
-            # Property data types (score: 10)
-            for prop in event_dict["properties"]:
-                if search_term in prop["data_type"].lower():
+        # Category/Feature (score: 75)
+        if event_dict["category"] and search_term in event_dict["category"].lower():
+            score += 75
+            if event_dict["category"].lower() == search_term:
+                score += 25
+
+        # Event description (score: 50)
+        if event_dict["description"] and search_term in event_dict["description"].lower():
+            score += 50
+
+        # Property names (score: 30 per match)
+        for prop in event_dict["properties"]:
+            if search_term in prop["property_name"].lower():
+                score += 30
+                if prop["property_name"].lower() == search_term:
                     score += 10
 
-            # Creator (score: 15)
-            if event_dict["created_by"] and search_term in event_dict["created_by"].lower():
-                score += 15
+        # Property descriptions (score: 20 per match)
+        for prop in event_dict["properties"]:
+            if prop["description"] and search_term in prop["description"].lower():
+                score += 20
 
-            # Only include events with matches
-            if score > 0:
-                scored_results.append((score, event_dict))
+        # Property data types (score: 10)
+        for prop in event_dict["properties"]:
+            if search_term in prop["data_type"].lower():
+                score += 10
 
-        # Sort by score (descending), then by name
-        scored_results.sort(key=lambda x: (-x[0], x[1]["name"].lower()))
-        result = [event_dict for score, event_dict in scored_results]
+        # Creator (score: 15)
+        if event_dict["created_by"] and search_term in event_dict["created_by"].lower():
+            score += 15
 
-    return result
+        # Only include events with matches
+        if score > 0:
+            scored_results.append((score, event_dict))
+
+    # Sort by score (descending), then by name
+    scored_results.sort(key=lambda x: (-x[0], x[1]["name"].lower()))
+    return [event_dict for score, event_dict in scored_results]
+
+
+def _parse_iso(value: str, param: str) -> datetime:
+    try:
+        return parse_as_of(value)
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Invalid {param} format: {value}. Use ISO format.")
+
+
+def _list_events_as_of(db: Session, as_of: str, category, created_by, date_from, date_to, skip, limit) -> list:
+    """Events as they were at as_of, filtered and paginated like the live listing."""
+    states = events_at(db, version_at(db, _parse_iso(as_of, "as_of")))
+    date_from = _parse_iso(date_from, "date_from").isoformat() if date_from else None
+    date_to = _parse_iso(date_to, "date_to").isoformat() if date_to else None
+
+    selected = []
+    for event_id in sorted(states):
+        state = states[event_id]
+        if category and state.get("category") != category:
+            continue
+        if created_by and created_by.lower() not in (state.get("created_by") or "").lower():
+            continue
+        if date_from and (state.get("created_at") or "") < date_from:
+            continue
+        if date_to and (state.get("created_at") or "") > date_to:
+            continue
+        selected.append((event_id, state))
+
+    page = selected[skip:skip + limit]
+    descriptions = property_descriptions(db, [state for _, state in page])
+    return [event_response(db, event_id, state, descriptions) for event_id, state in page]
 
 
 @app.post("/api/events", response_model=EventResponse)
 def create_event(event: EventCreate, db: Session = Depends(get_db)):
     """Create a new event with properties."""
-    # Create event
-    db_event = Event(
-        name=event.name,
-        description=event.description,
-        category=event.category,
-        created_by=event.created_by
-    )
-    db.add(db_event)
-    db.flush()
+    with unit_of_work(db):
+        # Create event
+        db_event = Event(
+            name=event.name,
+            description=event.description,
+            category=event.category,
+            created_by=event.created_by
+        )
+        db.add(db_event)
+        db.flush()
 
-    # Collect properties for changelog
-    properties_data = []
+        # Collect associations for the changelog entry
+        event_properties = []
 
-    # Add properties
-    for prop_create in event.properties:
-        # Check if property exists
-        property_obj = db.query(Property).filter(Property.name == prop_create.property_name).first()
+        # Add properties
+        for prop_create in event.properties:
+            # Check if property exists
+            property_obj = db.query(Property).filter(Property.name == prop_create.property_name).first()
 
-        if property_obj:
-            # Verify data type matches
-            if property_obj.data_type != prop_create.data_type:
-                raise HTTPException(
-                    status_code=400,
-                    detail=f"Property '{prop_create.property_name}' already exists with data type '{property_obj.data_type}'. Cannot redefine as '{prop_create.data_type}'."
+            if property_obj:
+                # Verify data type matches
+                if property_obj.data_type != prop_create.data_type:
+                    raise HTTPException(
+                        status_code=400,
+                        detail=f"Property '{prop_create.property_name}' already exists with data type '{property_obj.data_type}'. Cannot redefine as '{prop_create.data_type}'."
+                    )
+            else:
+                # Create new property (no logging here - it's logged as part of event creation)
+                property_obj = Property(
+                    name=prop_create.property_name,
+                    data_type=prop_create.data_type,
+                    description=prop_create.description,
+                    created_by=event.created_by
                 )
-        else:
-            # Create new property (no logging here - it's logged as part of event creation)
-            property_obj = Property(
-                name=prop_create.property_name,
-                data_type=prop_create.data_type,
-                description=prop_create.description,
-                created_by=event.created_by
-            )
-            db.add(property_obj)
-            db.flush()
+                db.add(property_obj)
+                db.flush()
 
-        # Create event-property association
-        event_property = EventProperty(
-            event_id=db_event.id,
-            property_id=property_obj.id,
-            property_type=prop_create.property_type,
-            is_required=prop_create.is_required,
-            example_value=prop_create.example_value
+            # Create event-property association
+            event_property = EventProperty(
+                event_id=db_event.id,
+                property_id=property_obj.id,
+                property_type=prop_create.property_type,
+                is_required=prop_create.is_required,
+                example_value=prop_create.example_value
+            )
+            db.add(event_property)
+            event_properties.append((event_property, property_obj))
+
+        db.flush()  # Assign association ids for the changelog entry
+
+        # Log single event creation with all properties
+        log_change(
+            db, "event", db_event.id, "create",
+            new_value={
+                "name": db_event.name,
+                "description": db_event.description,
+                "category": db_event.category,
+                "properties": [property_entry(ep, prop) for ep, prop in event_properties]
+            },
+            changed_by=event.created_by
         )
-        db.add(event_property)
 
-        # Add to changelog data
-        properties_data.append({
-            "name": prop_create.property_name,
-            "type": prop_create.property_type,
-            "data_type": prop_create.data_type,
-            "required": prop_create.is_required,
-            "example": prop_create.example_value
-        })
+    # Return the created event directly
+    return get_event(db_event.id, as_of=None, db=db)
 
-    db.commit()
-    db.refresh(db_event)
-
-    # Log single event creation with all properties
-    log_change(
-        db, "event", db_event.id, "create",
-        new_value={
-            "name": db_event.name,
-            "description": db_event.description,
-            "category": db_event.category,
-            "properties": properties_data
-        },
-        changed_by=event.created_by
-    )
-    db.commit()  # Commit the changelog entry
 
-    # Return the created event directly
-    return get_event(db_event.id, db)
+# Declared before /api/events/{event_id}, which would otherwise match it
+@app.get("/api/events/duplicates")
+def get_duplicate_events(
+    threshold: float = Query(default=0.8, ge=0.5, le=1.0, description="Minimum estimated Jaccard similarity"),
+    limit: int = Query(default=50, ge=1, le=500, description="Maximum number of clusters to return"),
+    db: Session = Depends(get_db)
+):
+    """Clusters of events with near-identical property sets (MinHash / LSH estimates).
+
+    Each event's jaccard is estimated against the first (oldest) event of its cluster.
+    """
+    index = get_duplicate_index(db)
+    with index.lock:  # The version the clusters were computed at
+        version, clusters = index.version, index.clusters(threshold)[:limit]
+    names = event_names(db, (event_id for cluster in clusters for event_id, _ in cluster))
+    return {
+        "version": version,
+        "threshold": threshold,
+        "clusters": [
+            {
+                "size": len(cluster),
+                "events": [{"id": event_id, "name": names.get(event_id), "jaccard": score}
+                           for event_id, score in cluster]
+            }
+            for cluster in clusters
+        ]
+    }
+
+
+@app.get("/api/events/{event_id}/similar")
+def get_similar_events(
+    event_id: int,
+    threshold: float = Query(default=0.8, ge=0.5, le=1.0, description="Minimum estimated Jaccard similarity"),
+    limit: int = Query(default=10, ge=1, le=100),
+    db: Session = Depends(get_db)
+):
+    """Events whose property sets resemble this event's, most similar first."""
+    if db.get(Event, event_id) is None:
+        raise HTTPException(status_code=404, detail="Event not found")
+    similar = get_duplicate_index(db).similar(event_id, threshold)[:limit]
+    names = event_names(db, (other for other, _ in similar))
+    return [{"id": other, "name": names.get(other), "jaccard": score} for other, score in similar]
 
 
 @app.get("/api/events/{event_id}", response_model=EventResponse)
-def get_event(event_id: int, db: Session = Depends(get_db)):
-    """Get a single event with its properties."""
+def get_event(
+    event_id: int,
+    as_of: Optional[str] = Query(default=None, description="ISO timestamp; return the event as it was then"),
+    db: Session = Depends(get_db)
+):
+    """Get a single event with its properties (optionally as of a point in time)."""
+    if as_of:
+        state = event_at(db, event_id, version_at(db, _parse_iso(as_of, "as_of")))
+        if state is None:
+            raise HTTPException(status_code=404, detail="Event not found at that time")
+        return event_response(db, event_id, state)
+
     db_event = db.query(Event).options(
         selectinload(Event.event_properties).joinedload(EventProperty.property)
     ).filter(Event.id == event_id).first()
@@ -306,6 +451,16 @@ def get_event(event_id: int, db: Session = Depends(get_db)):
     return event_dict
 
 
+def _set_event_fields(db_event: Event, event_update: EventUpdate):
+    """Apply the fields given in an update; empty strings and None count as the same value."""
+    if event_update.name is not None and event_update.name != db_event.name:
+        db_event.name = event_update.name
+    for field in ("description", "category"):
+        value = getattr(event_update, field)
+        if value is not None and (value or "") != (getattr(db_event, field) or ""):
+            setattr(db_event, field, value)
+
+
 @app.put("/api/events/{event_id}", response_model=EventResponse)
 def update_event(
     event_id: int,
@@ -314,112 +469,163 @@ def update_event(
     db: Session = Depends(get_db)
 ):
     """Update an event."""
-    db_event = db.query(Event).filter(Event.id == event_id).first()
+    with unit_of_work(db):
+        db_event = db.query(Event).filter(Event.id == event_id).first()
 
-    if not db_event:
-        raise HTTPException(status_code=404, detail="Event not found")
+        if not db_event:
+            raise HTTPException(status_code=404, detail="Event not found")
 
-    # Store old values
-    old_value = {
-        "name": db_event.name,
-        "description": db_event.description,
-        "category": db_event.category
-    }
+        # Store old values
+        old_value = {field: getattr(db_event, field) for field in EVENT_FIELDS}
+        _set_event_fields(db_event, event_update)
 
-    # Update fields and track if anything actually changed
-    has_changes = False
-
-    if event_update.name is not None:
-        if event_update.name != db_event.name:
-            db_event.name = event_update.name
-            has_changes = True
-
-    if event_update.description is not None:
-        # Treat empty string and None as equivalent
-        old_desc = db_event.description if db_event.description else ""
-        new_desc = event_update.description if event_update.description else ""
-        if new_desc != old_desc:
-            db_event.description = event_update.description
-            has_changes = True
-
-    if event_update.category is not None:
-        # Treat empty string and None as equivalent
-        old_cat = db_event.category if db_event.category else ""
-        new_cat = event_update.category if event_update.category else ""
-        if new_cat != old_cat:
-            db_event.category = event_update.category
-            has_changes = True
-
-    db.commit()
-    db.refresh(db_event)
-
-    # Only log if there were actual changes to event metadata
-    if has_changes:
-        new_value = {
-            "name": db_event.name,
-            "description": db_event.description,
-            "category": db_event.category
-        }
-        log_change(db, "event", event_id, "update", old_value=old_value, new_value=new_value, changed_by=changed_by)
-        db.commit()  # Commit the changelog entry
+        # Only log if there were actual changes to event metadata; the name is always kept for display
+        old_delta, new_delta = diff_fields(old_value, {field: getattr(db_event, field) for field in EVENT_FIELDS})
+        if new_delta:
+            new_delta["name"] = db_event.name
+            log_change(db, "event", event_id, "update", old_value=old_delta, new_value=new_delta, changed_by=changed_by)
 
-    return get_event(event_id, db)
+    return get_event(event_id, as_of=None, db=db)
+
+
+@app.patch("/api/events/{event_id}", response_model=EventResponse)
+def patch_event(
+    event_id: int,
+    patch: EventPatch,
+    changed_by: Optional[str] = None,
+    db: Session = Depends(get_db)
+):
+    """Apply a batch of edits to an event in one transaction.
+
+    Operations run in order: "set" changes fields like PUT, "add_property" and
+    "remove_property" work like the property endpoints, and "update_property"
+    changes is_required / example_value of a link. If any operation fails,
+    nothing is applied. The whole batch is logged as one changelog entry.
+    """
+    with unit_of_work(db):
+        db_event = db.query(Event).options(
+            selectinload(Event.event_properties).joinedload(EventProperty.property)
+        ).filter(Event.id == event_id).first()
+        if not db_event:
+            raise HTTPException(status_code=404, detail="Event not found")
+
+        # Resolve the properties of every added link with one query
+        names = {op.property_name for op in patch.operations if isinstance(op, AddEventProperty)}
+        registry = {prop.name: prop for prop in db.query(Property).filter(Property.name.in_(names))} if names else {}
+
+        old_fields = {field: getattr(db_event, field) for field in EVENT_FIELDS}
+        links = {link.id: link for link in db_event.event_properties}
+        taken = {(link.property.name, link.property_type) for link in links.values()}
+        before = {}  # Link id -> changelog entry before the patch, for removed and modified links
+        removed, pending = [], []  # Links to delete; (operation, property) of links to add
+
+        for op in patch.operations:
+            if isinstance(op, SetEventFields):
+                _set_event_fields(db_event, op)
+            elif isinstance(op, AddEventProperty):
+                property_obj = registry.get(op.property_name)
+                if property_obj is None:
+                    # New property (no separate logging - logged as part of the event change)
+                    property_obj = registry[op.property_name] = Property(
+                        name=op.property_name, data_type=op.data_type, description=op.description)
+                    db.add(property_obj)
+                elif property_obj.data_type != op.data_type:
+                    raise HTTPException(
+                        status_code=400,
+                        detail=f"Property '{op.property_name}' already exists with data type '{property_obj.data_type}'. Cannot redefine as '{op.data_type}'."
+                    )
+                if (op.property_name, op.property_type) in taken:
+                    raise HTTPException(status_code=400, detail=f"Property '{op.property_name}' already added to this event")
+                taken.add((op.property_name, op.property_type))
+                pending.append((op, property_obj))
+            else:
+                link = links.get(op.event_property_id)
+                if link is None:
+                    raise HTTPException(status_code=404, detail=f"Event property association {op.event_property_id} not found")
+                before.setdefault(link.id, property_entry(link, link.property))
+                if isinstance(op, RemoveEventProperty):
+                    del links[link.id]
+                    taken.discard((link.property.name, link.property_type))
+                    removed.append(link)
+                else:
+                    if op.is_required is not None:
+                        link.is_required = op.is_required
+                    if "example_value" in op.model_fields_set:
+                        link.example_value = op.example_value
+
+        for link in removed:
+            db.delete(link)
+        db.flush()  # Free the (property, type) slots of removed links and assign new property ids
+        added = [(EventProperty(
+            event_id=event_id,
+            property_id=property_obj.id,
+            property_type=op.property_type,
+            is_required=op.is_required,
+            example_value=op.example_value
+        ), property_obj) for op, property_obj in pending]
+        db.add_all(link for link, _ in added)
+        db.flush()  # Assign association ids for the changelog entry
+
+        old_properties, new_properties = [], []
+        for link_id, entry in sorted(before.items()):
+            after = property_entry(links[link_id], links[link_id].property) if link_id in links else None
+            if after != entry:
+                old_properties.append(entry)
+                if after is not None:
+                    new_properties.append(after)
+        new_properties.extend(property_entry(link, property_obj) for link, property_obj in added)
+
+        old_delta, new_delta = diff_fields(old_fields, {field: getattr(db_event, field) for field in EVENT_FIELDS})
+        new_delta["name"] = db_event.name  # Always kept for display
+        if old_properties or new_properties:
+            touch(db_event)
+            log_change(
+                db, "event", event_id, "update",
+                old_value={**old_delta, "properties": old_properties},
+                new_value={"action": PATCH_ACTION, **new_delta, "properties": new_properties},
+                changed_by=changed_by
+            )
+        elif old_delta:
+            log_change(db, "event", event_id, "update", old_value=old_delta, new_value=new_delta, changed_by=changed_by)
+
+    return get_event(event_id, as_of=None, db=db)
 
 
 @app.delete("/api/events/{event_id}")
 def delete_event(event_id: int, changed_by: Optional[str] = None, db: Session = Depends(get_db)):
     """Delete an event and clean up orphaned properties."""
-    db_event = db.query(Event).filter(Event.id == event_id).first()
-
-    if not db_event:
-        raise HTTPException(status_code=404, detail="Event not found")
-
-    # Collect event data with properties for changelog
-    properties_data = []
-    for ep in db_event.event_properties:
-        properties_data.append({
-            "name": ep.property.name,
-            "type": ep.property_type,
-            "data_type": ep.property.data_type,
-            "required": ep.is_required,
-            "example": ep.example_value
-        })
+    with unit_of_work(db):
+        db_event = db.query(Event).filter(Event.id == event_id).first()
 
-    old_value = {
-        "name": db_event.name,
-        "description": db_event.description,
-        "category": db_event.category,
-        "properties": properties_data
-    }
+        if not db_event:
+            raise HTTPException(status_code=404, detail="Event not found")
 
-    # Get property IDs associated with this event before deletion
-    property_ids = [ep.property_id for ep in db_event.event_properties]
+        # The full snapshot is reconstructible from the event's history, so only the name is stored
+        old_value = {"name": db_event.name}
 
-    # Delete the event (cascade will delete event_properties)
-    db.delete(db_event)
-    db.commit()
+        # Get property IDs associated with this event before deletion
+        property_ids = [ep.property_id for ep in db_event.event_properties]
 
-    # Clean up orphaned properties (properties not linked to any event)
-    # Note: We don't log these separately - they're part of the event deletion
-    orphaned_count = 0
-    for prop_id in property_ids:
-        # Check if this property is still linked to any event
-        is_linked = db.query(EventProperty).filter(EventProperty.property_id == prop_id).first()
-        if not is_linked:
-            # Property is orphaned, delete it
-            orphaned_prop = db.query(Property).filter(Property.id == prop_id).first()
-            if orphaned_prop:
-                db.delete(orphaned_prop)
-                orphaned_count += 1
+        # Delete the event (cascade will delete event_properties)
+        db.delete(db_event)
+        db.flush()
 
-    db.commit()
+        # Clean up orphaned properties (properties not linked to any event) in one query
+        # Note: We don't log these separately - they're part of the event deletion
+        orphaned = db.query(Property).filter(
+            Property.id.in_(property_ids),
+            ~exists().where(EventProperty.property_id == Property.id)
+        ).all() if property_ids else []
+        for orphaned_prop in orphaned:
+            db.delete(orphaned_prop)
+            add_tombstone(db, "property", orphaned_prop.id, orphaned_prop.name)
 
-    log_change(db, "event", event_id, "delete", old_value=old_value, changed_by=changed_by)
-    db.commit()  # Commit the changelog entry
+        add_tombstone(db, "event", event_id, db_event.name)
+        log_change(db, "event", event_id, "delete", old_value=old_value, changed_by=changed_by)
 
     return {
         "message": "Event deleted successfully",
-        "orphaned_properties_cleaned": orphaned_count
+        "orphaned_properties_cleaned": len(orphaned)
     }
 
 
@@ -433,68 +639,63 @@ def add_property_to_event(
     db: Session = Depends(get_db)
 ):
     """Add a property to an event."""
-    db_event = db.query(Event).filter(Event.id == event_id).first()
-    if not db_event:
-        raise HTTPException(status_code=404, detail="Event not found")
+    with unit_of_work(db):
+        db_event = db.query(Event).filter(Event.id == event_id).first()
+        if not db_event:
+            raise HTTPException(status_code=404, detail="Event not found")
 
-    # Check if property exists
-    property_obj = db.query(Property).filter(Property.name == prop.property_name).first()
+        # Check if property exists
+        property_obj = db.query(Property).filter(Property.name == prop.property_name).first()
 
-    if property_obj:
-        # Verify data type matches
-        if property_obj.data_type != prop.data_type:
-            raise HTTPException(
-                status_code=400,
-                detail=f"Property '{prop.property_name}' already exists with data type '{property_obj.data_type}'. Cannot redefine as '{prop.data_type}'."
+        if property_obj:
+            # Verify data type matches
+            if property_obj.data_type != prop.data_type:
+                raise HTTPException(
+                    status_code=400,
+                    detail=f"Property '{prop.property_name}' already exists with data type '{property_obj.data_type}'. Cannot redefine as '{prop.data_type}'."
+                )
+        else:
+            # Create new property (no separate logging - logged as part of event change)
+            property_obj = Property(
+                name=prop.property_name,
+                data_type=prop.data_type,
+                description=prop.description
             )
-    else:
-        # Create new property (no separate logging - logged as part of event change)
-        property_obj = Property(
-            name=prop.property_name,
-            data_type=prop.data_type,
-            description=prop.description
-        )
-        db.add(property_obj)
-        db.flush()
+            db.add(property_obj)
+            db.flush()
 
-    # Check if association already exists
-    existing = db.query(EventProperty).filter(
-        EventProperty.event_id == event_id,
-        EventProperty.property_id == property_obj.id,
-        EventProperty.property_type == prop.property_type
-    ).first()
+        # Check if association already exists
+        existing = db.query(EventProperty).filter(
+            EventProperty.event_id == event_id,
+            EventProperty.property_id == property_obj.id,
+            EventProperty.property_type == prop.property_type
+        ).first()
 
-    if existing:
-        raise HTTPException(status_code=400, detail="Property already added to this event")
+        if existing:
+            raise HTTPException(status_code=400, detail="Property already added to this event")
 
-    # Create association
-    event_property = EventProperty(
-        event_id=event_id,
-        property_id=property_obj.id,
-        property_type=prop.property_type,
-        is_required=prop.is_required,
-        example_value=prop.example_value
-    )
-    db.add(event_property)
-    db.commit()
-
-    # Log as event update - property added (include event name for display)
-    log_change(
-        db, "event", event_id, "update",
-        new_value={
-            "action": "property_added",
-            "name": db_event.name,
-            "property": {
-                "name": prop.property_name,
-                "type": prop.property_type,
-                "data_type": prop.data_type,
-                "required": prop.is_required,
-                "example": prop.example_value
-            }
-        },
-        changed_by=changed_by
-    )
-    db.commit()  # Commit the changelog entry
+        # Create association
+        event_property = EventProperty(
+            event_id=event_id,
+            property_id=property_obj.id,
+            property_type=prop.property_type,
+            is_required=prop.is_required,
+            example_value=prop.example_value
+        )
+        db.add(event_property)
+        touch(db_event)
+        db.flush()  # Assign the association id for the changelog entry
+
+        # Log as event update - property added (include event name for display)
+        log_change(
+            db, "event", event_id, "update",
+            new_value={
+                "action": "property_added",
+                "name": db_event.name,
+                "property": property_entry(event_property, property_obj)
+            },
+            changed_by=changed_by
+        )
 
     return {"message": "Property added successfully", "property_id": property_obj.id}
 
@@ -507,38 +708,32 @@ def remove_property_from_event(
     db: Session = Depends(get_db)
 ):
     """Remove a property from an event."""
-    event_property = db.query(EventProperty).filter(
-        EventProperty.id == event_property_id,
-        EventProperty.event_id == event_id
-    ).first()
-
-    if not event_property:
-        raise HTTPException(status_code=404, detail="Event property association not found")
-
-    # Capture property and event info for changelog
-    event_name = event_property.event.name
-    property_info = {
-        "name": event_property.property.name,
-        "type": event_property.property_type,
-        "data_type": event_property.property.data_type,
-        "required": event_property.is_required,
-        "example": event_property.example_value
-    }
-
-    db.delete(event_property)
-    db.commit()
-
-    # Log as event update - property removed (include event name for display)
-    log_change(
-        db, "event", event_id, "update",
-        old_value={
-            "action": "property_removed",
-            "name": event_name,
-            "property": property_info
-        },
-        changed_by=changed_by
-    )
-    db.commit()  # Commit the changelog entry
+    with unit_of_work(db):
+        event_property = db.query(EventProperty).filter(
+            EventProperty.id == event_property_id,
+            EventProperty.event_id == event_id
+        ).first()
+
+        if not event_property:
+            raise HTTPException(status_code=404, detail="Event property association not found")
+
+        # Capture property and event info for changelog
+        event_name = event_property.event.name
+        property_info = property_entry(event_property, event_property.property)
+
+        db.delete(event_property)
+        touch(event_property.event)
+
+        # Log as event update - property removed (include event name for display)
+        log_change(
+            db, "event", event_id, "update",
+            old_value={
+                "action": "property_removed",
+                "name": event_name,
+                "property": property_info
+            },
+            changed_by=changed_by
+        )
 
     return {"message": "Property removed successfully"}
 
@@ -547,73 +742,384 @@ def remove_property_from_event(
 
 @app.get("/api/properties", response_model=List[PropertyResponse])
 def list_properties(db: Session = Depends(get_db)):
-    """List all properties in the registry."""
-    return db.query(Property).all()
+    """List all properties in the registry, with usage counts and value statistics where collected."""
+    usage = get_usage_index(db)
+    return [
+        PropertyResponse.model_validate(prop).model_copy(update={"usage": PropertyUsage(**usage.summary(prop.id))})
+        for prop in db.query(Property).options(selectinload(Property.sketch)).all()
+    ]
 
 
 @app.post("/api/properties", response_model=PropertyResponse)
 def create_property(prop: PropertyCreate, db: Session = Depends(get_db)):
     """Create a new property in the registry."""
-    # Check if property already exists
-    existing = db.query(Property).filter(Property.name == prop.name).first()
-    if existing:
-        raise HTTPException(
-            status_code=400,
-            detail=f"Property '{prop.name}' already exists with data type '{existing.data_type}'"
+    with unit_of_work(db):
+        # Check if property already exists
+        existing = db.query(Property).filter(Property.name == prop.name).first()
+        if existing:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Property '{prop.name}' already exists with data type '{existing.data_type}'"
+            )
+
+        db_property = Property(**prop.model_dump())
+        db.add(db_property)
+        db.flush()
+
+        log_change(
+            db, "property", db_property.id, "create",
+            new_value={"name": db_property.name, "data_type": db_property.data_type},
+            changed_by=prop.created_by
         )
 
-    db_property = Property(**prop.model_dump())
-    db.add(db_property)
-    db.commit()
     db.refresh(db_property)
+    return db_property
 
-    log_change(
-        db, "property", db_property.id, "create",
-        new_value={"name": db_property.name, "data_type": db_property.data_type},
-        changed_by=prop.created_by
-    )
-    db.commit()  # Commit the changelog entry
 
-    return db_property
+@app.post("/api/properties/merge")
+def merge_registry_properties(merge: PropertyMerge, changed_by: Optional[str] = None, db: Session = Depends(get_db)):
+    """Fold duplicate properties into one: repoint their event links to the target and delete them."""
+    sources = list(dict.fromkeys(merge.sources))
+    if merge.target in sources:
+        raise HTTPException(status_code=400, detail="A property cannot be merged into itself")
+
+    with unit_of_work(db):
+        found = {prop.name: prop for prop in db.query(Property).filter(Property.name.in_(sources + [merge.target]))}
+        missing = [name for name in [merge.target] + sources if name not in found]
+        if missing:
+            raise HTTPException(status_code=404, detail=f"Properties not found: {', '.join(missing)}")
+
+        target, merged = found[merge.target], [found[name] for name in sources]
+        mismatched = [prop.name for prop in merged if prop.data_type != target.data_type]
+        if mismatched and not merge.force:
+            raise HTTPException(status_code=400, detail=(
+                f"Data type differs from {target.name} ({target.data_type}): {', '.join(mismatched)}; "
+                "set force to merge anyway"))
+
+        new_value = merge_entry(target, merged)  # Before the sources are deleted
+        summary = merge_properties(db, target, merged)
+        new_value.update(summary)
+        log_change(db, "property", target.id, "update", new_value=new_value, changed_by=changed_by)
+
+    return {"target": merge.target, "merged": sources, **summary}
+
+
+@app.post("/api/properties/{property_id}/rename", response_model=PropertyResponse)
+def rename_registry_property(
+    property_id: int,
+    rename: PropertyRename,
+    changed_by: Optional[str] = None,
+    db: Session = Depends(get_db)
+):
+    """Rename a property; events keep their links and show the new name."""
+    with unit_of_work(db):
+        prop = db.get(Property, property_id)
+        if prop is None:
+            raise HTTPException(status_code=404, detail="Property not found")
+
+        old_name = prop.name
+        if rename.name != old_name:
+            if db.query(Property).filter(Property.name == rename.name).first():
+                raise HTTPException(
+                    status_code=400,
+                    detail=f"Property '{rename.name}' already exists; use POST /api/properties/merge to combine them"
+                )
+            rename_property(db, prop, rename.name)
+            log_change(db, "property", property_id, "update",
+                       old_value={"name": old_name}, new_value={"name": rename.name}, changed_by=changed_by)
+
+    db.refresh(prop)
+    return prop
 
 
 @app.get("/api/properties/suggest")
-def suggest_properties(q: str, db: Session = Depends(get_db)):
+def suggest_properties(
+    q: str,
+    mode: str = Query(default="exact", pattern="^(exact|ngram)$",
+                      description="exact: SequenceMatcher ratios; ngram: bigram similarity"),
+    db: Session = Depends(get_db)
+):
     """Get fuzzy-matched property suggestions."""
-    all_properties = db.query(Property.name, Property.data_type).all()
-    existing = [(p.name, p.data_type) for p in all_properties]
-
-    suggestions = find_similar_properties(q, existing, threshold=0.6)
+    suggestions = get_name_index(db).suggest(q, threshold=0.6, mode=mode)
 
     return {"query": q, "suggestions": suggestions}
 
 
+@app.post("/api/properties/suggest/batch")
+def suggest_properties_batch(batch: SuggestionBatch, db: Session = Depends(get_db)):
+    """Suggestions for many names in one call, e.g. one per row of an import file."""
+    results = get_name_index(db).suggest_many(batch.queries, batch.threshold, batch.top_k, batch.mode)
+    return {"results": [{"query": query, "suggestions": suggestions}
+                        for query, suggestions in zip(batch.queries, results)]}
+
+
+@app.get("/api/properties/recommend")
+def recommend_properties(
+    with_: str = Query(..., alias="with", description="Comma-separated names of the properties already on the event"),
+    top_k: int = Query(default=DEFAULT_TOP_K, ge=1, le=100),
+    db: Session = Depends(get_db)
+):
+    """Properties that usually appear on events together with the given ones."""
+    names = [name.strip() for name in with_.split(",") if name.strip()]
+    return recommend(db, names, top_k)
+
+
+@app.get("/api/properties/{property_id}/usage")
+def get_property_usage(
+    property_id: int,
+    property_type: Optional[str] = Query(default=None, description="Only links of this property type"),
+    required: Optional[bool] = Query(default=None, description="Only events that do / do not require it"),
+    offset: int = Query(default=0, ge=0),
+    limit: int = Query(default=50, ge=1, le=500),
+    db: Session = Depends(get_db)
+):
+    """Events using a property, as which property types and whether they require it."""
+    prop = db.get(Property, property_id)
+    if prop is None:
+        raise HTTPException(status_code=404, detail="Property not found")
+
+    usage = get_usage_index(db)
+    with usage.lock:  # The page and the totals from the same version
+        total, page = usage.events(property_id, property_type, required, offset, limit)
+        summary = usage.summary(property_id)
+    names = event_names(db, (event_id for event_id, _ in page))
+    return {
+        "property_id": property_id,
+        "name": prop.name,
+        "usage": summary,
+        "total": total,
+        "offset": offset,
+        "limit": limit,
+        "events": [
+            {"event_id": event_id, "name": names.get(event_id), "property_types": sorted(types),
+             "is_required": any(types.values())}
+            for event_id, types in page
+        ]
+    }
+
+
+@app.get("/api/properties/duplicates")
+def get_duplicate_properties(
+    threshold: float = Query(default=DEFAULT_THRESHOLD, ge=0.5, le=1.0, description="Minimum name similarity"),
+    db: Session = Depends(get_db)
+):
+    """Registry-wide report of near-duplicate property names, conflicting data types first.
+
+    Cached until the taxonomy version changes.
+    """
+    return get_dedupe_report(db, threshold)
+
+
 # ========== CHANGELOG ENDPOINTS ==========
 
 @app.get("/api/changelog", response_model=List[ChangelogResponse])
 def get_changelog(
     entity_type: Optional[str] = None,
     entity_id: Optional[int] = None,
+    property_name: Optional[str] = Query(default=None, description="Entries that mention this property"),
+    event_name: Optional[str] = Query(default=None, description="Entries that mention this event name"),
+    changed_by: Optional[str] = None,
+    action: Optional[str] = Query(
+        default=None, description="create, update, delete or a subtype such as property_added"
+    ),
+    since: Optional[str] = Query(default=None, description="ISO timestamp; entries at or after"),
+    until: Optional[str] = Query(default=None, description="ISO timestamp; entries at or before"),
     limit: int = Query(default=50, ge=1, le=500, description="Maximum number of entries to return"),
+    reconstruct_snapshots: bool = Query(
+        default=False, alias="reconstruct",
+        description="Return full before/after snapshots instead of the stored deltas"
+    ),
+    db: Session = Depends(get_db)
+):
+    """Get changelog with optional filters.
+
+    Entries store field-level deltas; pass reconstruct=true to get full snapshots
+    rebuilt from each entity's history. Name, user and action filters are answered
+    from the changelog_terms index.
+    """
+    since_dt = _parse_iso(since, "since") if since else None
+    until_dt = _parse_iso(until, "until") if until else None
+    terms = {"property": property_name, "event": event_name, "user": changed_by, "action": action}
+    if any(terms.values()):
+        entries = search_changelog(db, terms, entity_type, entity_id, since_dt, until_dt, limit)
+    else:
+        entries = latest_changelog(db, entity_type, entity_id, limit, since_dt, until_dt)
+    if not reconstruct_snapshots:
+        return entries
+
+    snapshots = reconstruct(db, entries)
+    result = []
+    for entry in entries:
+        old_value, new_value = snapshots.get(entry.id, (entry.old_value, entry.new_value))
+        result.append({
+            "id": entry.id,
+            "entity_type": entry.entity_type,
+            "entity_id": entry.entity_id,
+            "action": entry.action,
+            "old_value": old_value,
+            "new_value": new_value,
+            "changed_by": entry.changed_by,
+            "changed_at": entry.changed_at
+        })
+    return result
+
+
+@app.get("/api/changelog/stats")
+def get_changelog_stats(
+    granularity: str = Query(default="day", pattern="^(hour|day)$"),
+    since: Optional[str] = Query(default=None, description="ISO timestamp; buckets containing or after it"),
+    until: Optional[str] = Query(default=None, description="ISO timestamp; buckets starting at or before it"),
+    group_by: str = Query(default=",".join(DIMENSIONS), description="Comma-separated: changed_by, entity_type, action"),
+    changed_by: Optional[str] = None,
+    entity_type: Optional[str] = None,
+    action: Optional[str] = None,
+    db: Session = Depends(get_db)
+):
+    """Changelog activity per hour or day, read from the incrementally maintained rollups."""
+    dimensions = [name.strip() for name in group_by.split(",") if name.strip()]
+    invalid = [name for name in dimensions if name not in DIMENSIONS]
+    if invalid:
+        raise HTTPException(status_code=400, detail=f"Invalid group_by: {', '.join(invalid)}")
+    filters = {name: value for name, value in
+               {"changed_by": changed_by, "entity_type": entity_type, "action": action}.items() if value is not None}
+    return changelog_stats(
+        db, granularity,
+        since=_parse_iso(since, "since") if since else None,
+        until=_parse_iso(until, "until") if until else None,
+        group_by=dimensions,
+        filters=filters,
+    )
+
+
+# ========== SYNC ENDPOINT ==========
+
+@app.get("/api/sync", response_model=SyncResponse)
+def sync_taxonomy(
+    since: int = Query(default=0, ge=0, description="Version returned by the previous sync; 0 for everything"),
+    db: Session = Depends(get_db)
+):
+    """Events and properties changed since a sync version, plus tombstones for deletions.
+
+    Returns a full snapshot (full=true) when since is 0 or older than the last tombstone
+    dropped by retention; pass the returned version as since on the next call.
+    """
+    return changes_since(db, since)
+
+
+# ========== REPLICATION ENDPOINTS ==========
+
+@app.get("/api/replication/feed")
+def replication_feed(
+    after: int = Query(default=0, ge=0, description="Last changelog id the follower has applied"),
+    limit: int = Query(default=FEED_BATCH, ge=1, le=5000, description="Maximum number of entries to return"),
+    db: Session = Depends(get_db)
+):
+    """Ordered changelog entries after a position, with the properties they reference."""
+    return feed(db, after, limit)
+
+
+@app.get("/api/replication/status")
+def replication_status(request: Request, db: Session = Depends(get_db)):
+    """Role of this instance; followers also report how far they are behind the leader."""
+    follower = getattr(request.app.state, "follower", None)
+    if follower is None:
+        return {"role": "leader", "version": taxonomy_version(db)}
+    return follower.status()
+
+
+# ========== CHANGE FEED ENDPOINT ==========
+
+@app.get("/api/changes/stream")
+async def stream_changes(
+    request: Request,
+    entity_type: Optional[str] = None,
+    last_event_id: Optional[int] = Query(default=None, description="Resume after this changelog id"),
+    last_event_id_header: Optional[str] = Header(default=None, alias="Last-Event-ID"),
     db: Session = Depends(get_db)
 ):
-    """Get changelog with optional filters."""
-    query = db.query(Changelog).order_by(Changelog.changed_at.desc())
+    """Server-Sent Events stream of changelog entries as they are committed.
 
-    if entity_type:
-        query = query.filter(Changelog.entity_type == entity_type)
+    Reconnecting clients send Last-Event-ID (browsers do this automatically) and
+    receive every entry they missed before live entries resume. Without a cursor
+    the stream starts at the current end of the changelog.
+    """
+    cursor = last_event_id
+    if cursor is None and last_event_id_header:
+        try:
+            cursor = int(last_event_id_header)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Last-Event-ID must be a changelog id")
+    if cursor is None:
+        cursor = await run_in_threadpool(taxonomy_version, db)
 
-    if entity_id:
-        query = query.filter(Changelog.entity_id == entity_id)
+    # The stream outlives this request's session, so it opens a short-lived one per read
+    sessions = sessionmaker(bind=db.get_bind())
+    return StreamingResponse(
+        change_stream(sessions, cursor, request.is_disconnected, entity_type=entity_type, run_sync=run_in_threadpool),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
-    return query.limit(limit).all()
+
+# ========== DIFF ENDPOINT ==========
+
+@app.get("/api/diff")
+def diff_taxonomy(
+    from_as_of: str = Query(..., alias="from", description="ISO timestamp of the base taxonomy"),
+    to_as_of: Optional[str] = Query(default=None, alias="to", description="ISO timestamp to compare (default: now)"),
+    db: Session = Depends(get_db)
+):
+    """Diff the taxonomy between two points in time.
+
+    Returns added, removed and changed events (keyed by id) and properties.
+    """
+    base = events_at(db, version_at(db, _parse_iso(from_as_of, "from")))
+    target_version = version_at(db, _parse_iso(to_as_of, "to")) if to_as_of else taxonomy_version(db)
+    target = events_at(db, target_version)
+    return diff_taxonomies(load_states(base), load_states(target))
+
+
+# ========== VALIDATION ENDPOINT ==========
+
+@app.post("/api/validate", response_model=ValidationReport, response_model_exclude_none=True)
+def validate_payloads(batch: ValidationBatch, db: Session = Depends(get_db)):
+    """Validate a batch of tracked-event payloads against the taxonomy.
+
+    Each payload is {"event": name, "properties": {...}}. Only invalid payloads
+    are listed in results, with their index in the batch.
+    """
+    validator = get_validator(db)
+    invalid = validator.validate_batch(batch.payloads)
+    payloads = batch.payloads
+    return {
+        "taxonomy_version": validator.version,
+        "total": len(payloads),
+        "valid": len(payloads) - len(invalid),
+        "invalid": len(invalid),
+        "results": [
+            {
+                "index": index,
+                "event": payloads[index].get("event"),
+                "violations": violations
+            }
+            for index, violations in invalid
+        ]
+    }
 
 
 # ========== SEARCH ENDPOINT ==========
 
 @app.get("/api/search")
-def search(q: str, db: Session = Depends(get_db)):
+def search(
+    q: str,
+    mode: str = Query(default="keyword", pattern="^(keyword|semantic)$",
+                      description="keyword: FTS5 phrase match; semantic: TF-IDF ranking over names, descriptions and properties"),
+    db: Session = Depends(get_db)
+):
     """Global search across events and properties using FTS5 for events."""
+    if mode == "semantic":
+        return _semantic_search(q, db)
+
     # Escape FTS5 special characters to prevent injection
     # FTS5 has special syntax: * " () - : AND OR NOT
     # Wrap the query in double quotes for phrase matching and escape internal quotes
@@ -649,6 +1155,24 @@ def search(q: str, db: Session = Depends(get_db)):
     }
 
 
+def _semantic_search(q: str, db: Session) -> dict:
+    """Rank events and properties by TF-IDF cosine similarity to the query."""
+    ranked = get_search_index(db).search(q, limit=50)
+    # Orphaned properties go without a changelog entry, so the index can still list them
+    names = event_names(db, (key for key, _ in ranked["events"]))
+    property_names = dict(db.query(Property.id, Property.name).filter(
+        Property.id.in_([key for key, _ in ranked["properties"]])
+    ).all())
+    return {
+        "query": q,
+        "mode": "semantic",
+        "events": [{"id": key, "name": names[key], "type": "event", "score": score}
+                   for key, score in ranked["events"] if key in names],
+        "properties": [{"id": key, "name": property_names[key], "type": "property", "score": score}
+                       for key, score in ranked["properties"] if key in property_names]
+    }
+
+
 @app.get("/api/features")
 def get_features(db: Session = Depends(get_db)):
     """Get all unique features with 3 most recently used at the top, rest alphabetically sorted."""
@@ -715,6 +1239,66 @@ def root():
 
 # ========== BULK IMPORT/EXPORT ENDPOINTS ==========
 
+def _import_event(db: Session, event_create: EventCreate, errors: List[str]):
+    """Create one imported event, its properties and its changelog entry in one transaction.
+
+    Properties whose data type conflicts with the registry are skipped and reported in errors.
+    """
+    with unit_of_work(db):
+        db_event = Event(
+            name=event_create.name,
+            description=event_create.description,
+            category=event_create.category,
+            created_by=event_create.created_by or "bulk_import"
+        )
+        db.add(db_event)
+        db.flush()
+
+        event_properties = []
+        for prop_create in event_create.properties:
+            property_obj = db.query(Property).filter(
+                Property.name == prop_create.property_name
+            ).first()
+
+            if property_obj:
+                # Check for data type conflict
+                if property_obj.data_type != prop_create.data_type:
+                    errors.append(f"Event '{event_create.name}': Property '{prop_create.property_name}' type conflict")
+                    continue
+            else:
+                property_obj = Property(
+                    name=prop_create.property_name,
+                    data_type=prop_create.data_type,
+                    description=prop_create.description,
+                    created_by="bulk_import"
+                )
+                db.add(property_obj)
+                db.flush()
+
+            event_property = EventProperty(
+                event_id=db_event.id,
+                property_id=property_obj.id,
+                property_type=prop_create.property_type,
+                is_required=prop_create.is_required,
+                example_value=prop_create.example_value
+            )
+            db.add(event_property)
+            event_properties.append((event_property, property_obj))
+
+        db.flush()
+
+        log_change(
+            db, "event", db_event.id, "create",
+            new_value={
+                "name": db_event.name,
+                "description": db_event.description,
+                "category": db_event.category,
+                "properties": [property_entry(ep, prop) for ep, prop in event_properties]
+            },
+            changed_by=db_event.created_by
+        )
+
+
 @app.get("/api/export/template/json")
 def download_json_template():
     """Download a JSON template for bulk import."""
@@ -791,50 +1375,13 @@ async def import_json(file: UploadFile = File(...), db: Session = Depends(get_db
         for idx, event_data in enumerate(events_data):
             try:
                 event_create = EventCreate(**event_data)
-                # Use the existing create_event logic
-                db_event = Event(
-                    name=event_create.name,
-                    description=event_create.description,
-                    category=event_create.category,
-                    created_by=event_create.created_by or "bulk_import"
-                )
-                db.add(db_event)
-                db.flush()
-
-                for prop_create in event_create.properties:
-                    property_obj = db.query(Property).filter(
-                        Property.name == prop_create.property_name
-                    ).first()
-
-                    if property_obj:
-                        if property_obj.data_type != prop_create.data_type:
-                            errors.append(f"Event '{event_create.name}': Property '{prop_create.property_name}' type conflict")
-                            continue
-                    else:
-                        property_obj = Property(
-                            name=prop_create.property_name,
-                            data_type=prop_create.data_type,
-                            description=prop_create.description,
-                            created_by="bulk_import"
-                        )
-                        db.add(property_obj)
-                        db.flush()
-
-                    event_property = EventProperty(
-                        event_id=db_event.id,
-                        property_id=property_obj.id,
-                        property_type=prop_create.property_type,
-                        is_required=prop_create.is_required,
-                        example_value=prop_create.example_value
-                    )
-                    db.add(event_property)
-
-                db.commit()
+                _import_event(db, event_create, errors)
                 imported_count += 1
 
+            except OperationalError:
+                raise  # A database failure, not a bad row: fail the request
             except Exception as e:
                 errors.append(f"Row {idx + 1}: {str(e)}")
-                db.rollback()
 
         return {
             "imported": imported_count,
@@ -844,6 +1391,8 @@ async def import_json(file: UploadFile = File(...), db: Session = Depends(get_db
 
     except json.JSONDecodeError:
         raise HTTPException(status_code=400, detail="Invalid JSON file")
+    except OperationalError:
+        raise
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
@@ -901,50 +1450,13 @@ async def import_csv(file: UploadFile = File(...), db: Session = Depends(get_db)
                     properties=[EventPropertyCreate(**p) for p in event_data['properties']]
                 )
 
-                db_event = Event(
-                    name=event_create.name,
-                    description=event_create.description,
-                    category=event_create.category,
-                    created_by="bulk_import"
-                )
-                db.add(db_event)
-                db.flush()
-
-                for prop_create in event_create.properties:
-                    property_obj = db.query(Property).filter(
-                        Property.name == prop_create.property_name
-                    ).first()
-
-                    if property_obj:
-                        # Check for data type conflict
-                        if property_obj.data_type != prop_create.data_type:
-                            errors.append(f"Event '{event_data['name']}': Property '{prop_create.property_name}' type conflict")
-                            continue
-                    else:
-                        property_obj = Property(
-                            name=prop_create.property_name,
-                            data_type=prop_create.data_type,
-                            description=prop_create.description,
-                            created_by="bulk_import"
-                        )
-                        db.add(property_obj)
-                        db.flush()
-
-                    event_property = EventProperty(
-                        event_id=db_event.id,
-                        property_id=property_obj.id,
-                        property_type=prop_create.property_type,
-                        is_required=prop_create.is_required,
-                        example_value=prop_create.example_value
-                    )
-                    db.add(event_property)
-
-                db.commit()
+                _import_event(db, event_create, errors)
                 imported_count += 1
 
+            except OperationalError:
+                raise
             except Exception as e:
                 errors.append(f"Event '{event_data['name']}': {str(e)}")
-                db.rollback()
 
         return {
             "imported": imported_count,
@@ -952,5 +1464,44 @@ async def import_csv(file: UploadFile = File(...), db: Session = Depends(get_db)
             "errors": errors
         }
 
+    except OperationalError:
+        raise
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
+
+
+# ========== ADMIN ENDPOINTS ==========
+
+def require_admin(x_admin_token: Optional[str] = Header(default=None)):
+    """Reject the request unless it carries the TAXONOMY_ADMIN_TOKEN value."""
+    if not is_admin(x_admin_token):
+        raise HTTPException(status_code=403, detail="Admin token required")
+
+
+_profile_lock = threading.Lock()
+
+
+@app.get("/api/admin/profile", dependencies=[Depends(require_admin)])
+async def profile_workers(
+    seconds: float = Query(default=5.0, gt=0, le=60, description="How long to sample"),
+    interval_ms: float = Query(default=5.0, ge=0.5, le=1000, description="Sampling interval"),
+    format: str = Query(default="collapsed", pattern="^(collapsed|speedscope)$"),
+    all_threads: bool = Query(default=False, description="Sample every thread, not just request workers"),
+):
+    """Sample the request worker threads for N seconds and return the profile.
+
+    Output is collapsed stacks (flamegraph.pl / speedscope import) or speedscope JSON.
+    """
+    if not _profile_lock.acquire(blocking=False):
+        raise HTTPException(status_code=409, detail="A profile is already running")
+    try:
+        profiler = SamplingProfiler(interval=interval_ms / 1000, workers_only=not all_threads).start()
+        try:
+            await asyncio.sleep(seconds)
+        finally:
+            profiler.stop()
+    finally:
+        _profile_lock.release()
+
+    body, media_type = render(profiler, format)
+    return Response(content=body, media_type=media_type)
@@ -0,0 +1,409 @@
+"""
+Archival of old changelog rows into compressed, immutable segment files.
+
+Rows older than a cutoff are moved out of the changelog table into segment
+files on local disk. A segment holds a contiguous id range as a sequence of
+independently zlib-compressed blocks (BLOCK_ROWS rows each, JSON), so a reader
+decompresses only the blocks it needs. Next to it, a small index file lists
+every block's offset, id range and changed_at range and, per entity_type and
+entity_id, the blocks holding that entity's rows. Segments are registered in
+the changelog_segments table in the same transaction that deletes the rows, and
+the files are written (and fsynced) before that, so a crash never loses rows.
+
+Archival always keeps the newest changelog row in the table: the taxonomy
+version is max(changelog.id), and SQLite would otherwise reuse archived ids.
+
+Readers get rows from both places through the functions below, which return
+rows with the changelog's column attributes (id, entity_type, entity_id,
+action, old_value, new_value, changed_by, changed_at) in id order. Archived
+rows are always older than live ones, so a reader that only needs recent rows
+never opens a segment. Filters on names, users and kinds of change go through
+the changelog_terms index (kept for archived rows too) and read only the
+matching rows.
+
+Usage:
+    python archive.py --db event_taxonomy.db --older-than-days 180
+"""
+import argparse
+import json
+import os
+import zlib
+from bisect import bisect_right
+from collections import namedtuple
+from datetime import datetime, timedelta, UTC
+from functools import lru_cache
+from pathlib import Path
+
+from sqlalchemy import create_engine, exists, func, or_, text
+from sqlalchemy.orm import Session, aliased
+
+from database import Changelog, ChangelogSegment, ChangelogTerm, DB_PATH, init_db, unit_of_work
+
+ARCHIVE_DIR_ENV = "TAXONOMY_ARCHIVE_DIR"
+SEGMENT_ROWS = 50_000
+BLOCK_ROWS = 256
+
+COLUMNS = ("id", "entity_type", "entity_id", "action", "old_value", "new_value", "changed_by", "changed_at")
+CHANGELOG_COLUMNS = tuple(getattr(Changelog, column) for column in COLUMNS)
+ArchivedRow = namedtuple("ArchivedRow", COLUMNS)
+
+
+def archive_dir() -> Path:
+    """Directory for new segments (TAXONOMY_ARCHIVE_DIR, default next to the database)."""
+    return Path(os.environ.get(ARCHIVE_DIR_ENV) or DB_PATH.parent / "changelog_archive")
+
+
+# ---------- Writing ----------
+
+def _write_file(path: Path, data: bytes):
+    tmp = path.with_name(path.name + ".tmp")
+    with open(tmp, "wb") as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+def _encode_row(row) -> list:
+    return [row.id, row.entity_type, row.entity_id, row.action, row.old_value, row.new_value,
+            row.changed_by, row.changed_at.isoformat() if row.changed_at else None]
+
+
+def write_segment(directory: Path, rows) -> dict:
+    """Write rows (id order) as one segment file plus its index; returns the segment's metadata."""
+    blocks, index_blocks, entities = [], [], {}
+    offset = 0
+    for start in range(0, len(rows), BLOCK_ROWS):
+        chunk = rows[start:start + BLOCK_ROWS]
+        data = zlib.compress(json.dumps([_encode_row(row) for row in chunk], separators=(",", ":")).encode())
+        number = len(blocks)
+        blocks.append(data)
+        times = [row.changed_at for row in chunk if row.changed_at is not None]
+        index_blocks.append([
+            offset, len(data), chunk[0].id, chunk[-1].id,
+            min(times).isoformat() if times else None, max(times).isoformat() if times else None,
+        ])
+        offset += len(data)
+        for row in chunk:
+            numbers = entities.setdefault(row.entity_type, {}).setdefault(str(row.entity_id), [])
+            if not numbers or numbers[-1] != number:
+                numbers.append(number)
+
+    # Stored absolute, so readers do not depend on the working directory of the writer
+    directory = Path(directory).resolve()
+    directory.mkdir(parents=True, exist_ok=True)
+    path = directory / f"changelog-{rows[0].id:010d}-{rows[-1].id:010d}.seg"
+    _write_file(path, b"".join(blocks))
+    _write_file(_index_path(path), zlib.compress(json.dumps(
+        {"blocks": index_blocks, "entities": entities}, separators=(",", ":")).encode()))
+
+    times = [row.changed_at for row in rows if row.changed_at is not None]
+    return {
+        "path": str(path),
+        "first_id": rows[0].id,
+        "last_id": rows[-1].id,
+        "first_changed_at": min(times) if times else None,
+        "last_changed_at": max(times) if times else None,
+        "row_count": len(rows),
+        "size_bytes": offset,
+    }
+
+
+def archive_changelog(db: Session, cutoff: datetime, directory: Path = None, segment_rows: int = SEGMENT_ROWS) -> list:
+    """Move the changelog rows older than cutoff into segment files.
+
+    Only a prefix of the id sequence is archived (everything before the first row
+    at or after cutoff), and never the newest row.
+
+    Returns:
+        The ChangelogSegment rows created
+    """
+    directory = Path(directory) if directory is not None else archive_dir()
+    newest = db.query(func.max(Changelog.id)).scalar()
+    if newest is None:
+        return []
+    first_kept = db.query(func.min(Changelog.id)).filter(Changelog.changed_at >= cutoff).scalar()
+    last_archived = min(newest, first_kept or newest) - 1
+
+    created = []
+    while True:
+        rows = db.query(*CHANGELOG_COLUMNS).filter(Changelog.id <= last_archived).order_by(
+            Changelog.id).limit(segment_rows).all()
+        if not rows:
+            return created
+        metadata = write_segment(directory, rows)
+        with unit_of_work(db):
+            segment = ChangelogSegment(**metadata)
+            db.add(segment)
+            db.query(Changelog).filter(
+                Changelog.id >= metadata["first_id"], Changelog.id <= metadata["last_id"]
+            ).delete(synchronize_session=False)
+        created.append(segment)
+
+
+# ---------- Reading ----------
+
+def _index_path(path) -> Path:
+    return Path(path).with_suffix(".idx")
+
+
+@lru_cache(maxsize=64)
+def _load_index(path: str) -> dict:
+    # Segments are immutable, so their indexes can be cached by path
+    return json.loads(zlib.decompress(_index_path(path).read_bytes()))
+
+
+@lru_cache(maxsize=256)
+def _load_block(path: str, offset: int, length: int) -> tuple:
+    with open(path, "rb") as f:
+        f.seek(offset)
+        data = f.read(length)
+    rows = []
+    for values in json.loads(zlib.decompress(data)):
+        values[7] = datetime.fromisoformat(values[7]) if values[7] else None
+        rows.append(ArchivedRow(*values))
+    return tuple(rows)
+
+
+def _segments(db: Session, after_id: int = 0, up_to_id: int = None) -> list:
+    query = db.query(ChangelogSegment).filter(ChangelogSegment.last_id > after_id)
+    if up_to_id is not None:
+        query = query.filter(ChangelogSegment.first_id <= up_to_id)
+    return query.order_by(ChangelogSegment.first_id).all()
+
+
+def _block_numbers(index: dict, entities=None):
+    if entities is None:
+        return range(len(index["blocks"]))
+    numbers = set()
+    for kind, entity_id in entities:
+        for ids in (index["entities"].values() if kind is None else [index["entities"].get(kind, {})]):
+            numbers.update(ids.get(str(entity_id), ()))
+    return sorted(numbers)
+
+
+def _outside(first_at, last_at, since, until) -> bool:
+    if first_at is None:
+        return since is not None or until is not None
+    return ((since is not None and datetime.fromisoformat(last_at) < since)
+            or (until is not None and datetime.fromisoformat(first_at) > until))
+
+
+def _outside_row(row, since, until) -> bool:
+    return (row.changed_at is None or (since is not None and row.changed_at < since)
+            or (until is not None and row.changed_at > until))
+
+
+def read_archived(db: Session, after_id: int = 0, up_to_id: int = None, entity_type: str = None,
+                  entities=None, newest_first: bool = False, since: datetime = None, until: datetime = None):
+    """Archived rows with after_id < id <= up_to_id, optionally of one type or of given (type, id) pairs.
+
+    A pair (None, id) matches that id in any entity type.
+
+    since / until limit changed_at; blocks entirely outside that range are not read.
+    """
+    wanted = set(entities) if entities is not None else None
+    segments = _segments(db, after_id, up_to_id)
+    for segment in (reversed(segments) if newest_first else segments):
+        index = _load_index(segment.path)
+        numbers = list(_block_numbers(index, wanted))
+        for number in (reversed(numbers) if newest_first else numbers):
+            offset, length, first_id, last_id, first_at, last_at = index["blocks"][number]
+            if last_id <= after_id or (up_to_id is not None and first_id > up_to_id):
+                continue
+            if _outside(first_at, last_at, since, until):
+                continue
+            rows = _load_block(segment.path, offset, length)
+            for row in (reversed(rows) if newest_first else rows):
+                if row.id <= after_id or (up_to_id is not None and row.id > up_to_id):
+                    continue
+                if entity_type is not None and row.entity_type != entity_type:
+                    continue
+                if (wanted is not None and (row.entity_type, row.entity_id) not in wanted
+                        and (None, row.entity_id) not in wanted):
+                    continue
+                if (since is not None or until is not None) and _outside_row(row, since, until):
+                    continue
+                yield row
+
+
+def rows_by_ids(db: Session, ids) -> dict:
+    """{id: row} for the given changelog ids, from the table or the segments."""
+    ids = set(ids)
+    found = {row.id: row for row in db.query(*CHANGELOG_COLUMNS).filter(Changelog.id.in_(ids)).all()} if ids else {}
+    missing = sorted(ids - found.keys())
+    if not missing:
+        return found
+    for segment in _segments(db, missing[0] - 1, missing[-1]):
+        blocks = _load_index(segment.path)["blocks"]
+        first_ids = [block[2] for block in blocks]
+        for number in sorted({bisect_right(first_ids, entry_id) - 1 for entry_id in missing
+                              if segment.first_id <= entry_id <= segment.last_id}):
+            offset, length = blocks[number][:2]
+            for row in _load_block(segment.path, offset, length):
+                if row.id in ids:
+                    found[row.id] = row
+    return found
+
+
+def changelog_rows(db: Session, after_id: int = 0, up_to_id: int = None, entity_type: str = None,
+                   entity_id: int = None, entities=None, limit: int = None) -> list:
+    """Changelog rows from segments and the live table, oldest first.
+
+    Args:
+        after_id: Only rows with a larger id
+        up_to_id: Only rows up to this id
+        entity_type: Only rows of this entity type
+        entity_id: With entity_type, only rows of this entity
+        entities: Only rows of these (entity_type, entity_id) pairs
+        limit: Maximum number of rows
+    """
+    if entity_id is not None:
+        entities = [(entity_type, entity_id)]
+    query = db.query(*CHANGELOG_COLUMNS).filter(Changelog.id > after_id)
+    if up_to_id is not None:
+        query = query.filter(Changelog.id <= up_to_id)
+    if entity_type is not None:
+        query = query.filter(Changelog.entity_type == entity_type)
+    if entities is not None:
+        by_type = {}
+        for kind, key in entities:
+            by_type.setdefault(kind, set()).add(key)
+        if not by_type:
+            return []
+        query = query.filter(or_(*(
+            (Changelog.entity_type == kind) & Changelog.entity_id.in_(ids) for kind, ids in by_type.items()
+        )))
+    query = query.order_by(Changelog.id)
+    # The live table is read first: rows archived meanwhile then show up in the
+    # segments, and anything in both is taken from the live read
+    live = query.limit(limit).all() if limit is not None else query.all()
+    live_from = live[0].id if live else None
+
+    archived = []
+    for row in read_archived(db, after_id, up_to_id, entity_type, entities):
+        if (live_from is not None and row.id >= live_from) or (limit is not None and len(archived) >= limit):
+            break
+        archived.append(row)
+    rows = archived + live
+    return rows[:limit] if limit is not None else rows
+
+
+def latest_changelog(db: Session, entity_type: str = None, entity_id: int = None, limit: int = 50,
+                     since: datetime = None, until: datetime = None) -> list:
+    """The newest changelog rows, newest first, continuing into segments when the table has too few."""
+    query = db.query(*CHANGELOG_COLUMNS).order_by(Changelog.changed_at.desc())
+    if entity_type:
+        query = query.filter(Changelog.entity_type == entity_type)
+    if entity_id:
+        query = query.filter(Changelog.entity_id == entity_id)
+    if since is not None:
+        query = query.filter(Changelog.changed_at >= since)
+    if until is not None:
+        query = query.filter(Changelog.changed_at <= until)
+    rows = query.limit(limit).all()
+    if len(rows) >= limit:
+        return rows
+
+    oldest_live = min((row.id for row in rows), default=None)
+    # Without an entity_type the id is looked up under every type, still only in the indexed blocks
+    entities = [(entity_type or None, entity_id)] if entity_id else None
+    for row in read_archived(db, entity_type=entity_type or None, entities=entities, newest_first=True,
+                             since=since, until=until):
+        if oldest_live is not None and row.id >= oldest_live:
+            continue
+        rows.append(row)
+        if len(rows) >= limit:
+            break
+    return rows
+
+
+# Most selective term kinds first: the first filter given drives the index lookup
+TERM_KINDS = ("property", "event", "action", "user")
+
+
+def search_changelog(db: Session, terms: dict, entity_type: str = None, entity_id: int = None,
+                     since: datetime = None, until: datetime = None, limit: int = 50) -> list:
+    """Newest changelog rows matching every {kind: value} term (see ChangelogTerm), newest first.
+
+    Matching ids come from the changelog_terms index (which also covers archived
+    rows); only the matched rows are then read from the table or the segments.
+    """
+    kinds = [kind for kind in TERM_KINDS if terms.get(kind)]
+    driver = kinds[0]
+    query = db.query(ChangelogTerm.changelog_id).filter(
+        ChangelogTerm.kind == driver, ChangelogTerm.value == terms[driver])
+    if since is not None:
+        query = query.filter(ChangelogTerm.changed_at >= since)
+    if until is not None:
+        query = query.filter(ChangelogTerm.changed_at <= until)
+    for kind in kinds[1:]:
+        other = aliased(ChangelogTerm)
+        query = query.filter(exists().where(
+            other.changelog_id == ChangelogTerm.changelog_id, other.kind == kind, other.value == terms[kind]))
+    query = query.order_by(ChangelogTerm.changed_at.desc())
+
+    rows = []
+    page = max(limit, 100)
+    offset = 0
+    while len(rows) < limit:
+        ids = [entry_id for entry_id, in query.offset(offset).limit(page).all()]
+        found = rows_by_ids(db, ids)
+        for entry_id in ids:
+            row = found.get(entry_id)
+            if row is None or (entity_type and row.entity_type != entity_type) or (entity_id and row.entity_id != entity_id):
+                continue
+            rows.append(row)
+            if len(rows) >= limit:
+                break
+        if len(ids) < page:
+            break
+        offset += page
+    return rows
+
+
+def last_id_at(db: Session, moment: datetime) -> int:
+    """Id of the last changelog row at or before moment, in the table or the segments (0 if none)."""
+    live = db.query(func.max(Changelog.id)).filter(Changelog.changed_at <= moment).scalar()
+    if live is not None:
+        return live
+    for segment in reversed(_segments(db)):
+        if segment.first_changed_at is not None and segment.first_changed_at > moment:
+            continue
+        blocks = _load_index(segment.path)["blocks"]
+        for offset, length, first_id, last_id, first_at, last_at in reversed(blocks):
+            if first_at is None or datetime.fromisoformat(first_at) > moment:
+                continue
+            # Later blocks start after moment, so the answer is in this block
+            return max(row.id for row in _load_block(segment.path, offset, length)
+                       if row.changed_at is not None and row.changed_at <= moment)
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Archive old changelog rows into compressed segment files")
+    parser.add_argument("--db", required=True, help="SQLite database file")
+    parser.add_argument("--older-than-days", type=float, default=180, help="Archive rows older than this")
+    parser.add_argument("--dir", help="Segment directory (default: changelog_archive next to the database)")
+    parser.add_argument("--vacuum", action="store_true", help="VACUUM the database afterwards to reclaim space")
+    args = parser.parse_args()
+
+    db_path = Path(args.db)
+    engine = create_engine(f"sqlite:///{db_path}")
+    init_db(engine)
+    cutoff = datetime.now(UTC).replace(tzinfo=None) - timedelta(days=args.older_than_days)
+    directory = Path(args.dir) if args.dir else db_path.parent / "changelog_archive"
+    with Session(engine) as db:
+        segments = archive_changelog(db, cutoff, directory)
+        for segment in segments:
+            print(f"{segment.path}: ids {segment.first_id}-{segment.last_id}, "
+                  f"{segment.row_count} rows, {segment.size_bytes / 1e6:.1f} MB")
+        print(f"Archived {sum(s.row_count for s in segments)} rows into {len(segments)} segments")
+    if args.vacuum:
+        with engine.connect() as conn:
+            conn.execute(text("VACUUM"))
+    engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,260 @@
+"""
+Offline audit of raw NDJSON event logs against the taxonomy.
+
+Loads a taxonomy snapshot from the SQLite file once, then fans the logs out
+over a process pool. Plain files are split into byte ranges aligned to line
+boundaries; gzip files cannot be seeked, so each one is a single task. Workers
+stream their range line by line and return only violation counters, so memory
+stays bounded by the number of tasks in flight, not by the size of the logs.
+
+Each line is one tracked-event payload, as accepted by POST /api/validate:
+    {"event": "Purchase Completed", "properties": {"order_id": "A1"}}
+
+Usage:
+    python audit_logs.py --db event_taxonomy.db logs/2024-06-*.ndjson.gz
+    python audit_logs.py --db event_taxonomy.db --workers 8 --json events.ndjson > report.json
+"""
+import argparse
+import gzip
+import json
+import os
+import sqlite3
+import time
+from collections import Counter
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from pathlib import Path
+
+from validation import TAXONOMY_RULES_SQL, TaxonomyValidator
+
+DEFAULT_CHUNK_SIZE = 64 * 1024 * 1024
+
+_validator = None
+
+
+def load_snapshot(db_path):
+    """Read the taxonomy rules and version from a SQLite file (read-only).
+
+    Returns:
+        (rows, version) where rows are TaxonomyValidator input tuples
+    """
+    conn = sqlite3.connect(f"file:{Path(db_path).resolve()}?mode=ro", uri=True)
+    try:
+        rows = conn.execute(TAXONOMY_RULES_SQL).fetchall()
+        version = conn.execute("SELECT MAX(id) FROM changelog").fetchone()[0] or 0
+    finally:
+        conn.close()
+    return rows, version
+
+
+def plan_tasks(paths, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Split the input files into (path, start, end) tasks.
+
+    Gzip files become one task each with start/end of None.
+    """
+    tasks = []
+    for path in paths:
+        path = str(path)
+        if path.endswith(".gz"):
+            tasks.append((path, None, None))
+            continue
+        size = os.path.getsize(path)
+        for start in range(0, max(size, 1), chunk_size):
+            tasks.append((path, start, min(start + chunk_size, size)))
+    return tasks
+
+
+def _iter_range(path, start, end):
+    """Yield the lines that start inside [start, end) of a plain file."""
+    with open(path, "rb") as f:
+        if start:
+            # Skip the line straddling the boundary; the previous range owns it
+            f.seek(start - 1)
+            position = start - 1 + len(f.readline())
+        else:
+            position = 0
+        while position < end:
+            line = f.readline()
+            if not line:
+                break
+            position += len(line)
+            yield line
+
+
+def iter_task(path, start, end):
+    """Yield the raw lines of one task from plan_tasks."""
+    if start is None:
+        with gzip.open(path, "rb") as f:
+            yield from f
+    else:
+        yield from _iter_range(path, start, end)
+
+
+def run_tasks(func, tasks, merge, workers=None, initializer=None, initargs=()):
+    """Run func over tasks in a process pool, passing each result to merge as it completes.
+
+    At most 2 * workers tasks are in flight, so results never pile up in memory.
+    """
+    workers = workers or os.cpu_count() or 1
+    with ProcessPoolExecutor(max_workers=workers, initializer=initializer, initargs=initargs) as pool:
+        pending = set()
+        for task in tasks:
+            pending.add(pool.submit(func, task))
+            if len(pending) >= workers * 2:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    merge(future.result())
+        for future in pending:
+            merge(future.result())
+
+
+def _init_worker(rows, version):
+    global _validator
+    _validator = TaxonomyValidator(rows, version)
+
+
+def audit_task(task):
+    """Validate one task's lines. Runs in a worker process.
+
+    Returns:
+        Partial report: line counts, per-event payload/invalid counters and
+        (event, property, violation type) counts
+    """
+    validate = _validator.validate
+    loads = json.loads
+    lines = malformed = 0
+    payloads = Counter()
+    invalid = Counter()
+    violations = Counter()
+
+    for line in iter_task(*task):
+        if not line.strip():
+            continue
+        lines += 1
+        try:
+            payload = loads(line)
+        except ValueError:
+            malformed += 1
+            continue
+        found = validate(payload)
+        event = payload.get("event") if type(payload) is dict else None
+        if type(event) is not str:
+            event = None
+        payloads[event] += 1
+        if found:
+            invalid[event] += 1
+            for violation in found:
+                violations[(event, violation.get("property"), violation["type"])] += 1
+
+    return {
+        "lines": lines,
+        "malformed": malformed,
+        "payloads": payloads,
+        "invalid": invalid,
+        "violations": violations,
+    }
+
+
+def merge_results(total, part):
+    """Add a partial report into the running total (in place)."""
+    total["lines"] += part["lines"]
+    total["malformed"] += part["malformed"]
+    total["payloads"].update(part["payloads"])
+    total["invalid"].update(part["invalid"])
+    total["violations"].update(part["violations"])
+    return total
+
+
+def _build_report(total, version, files, elapsed):
+    events = {}
+    for event, count in total["payloads"].items():
+        events[event] = {"payloads": count, "invalid": total["invalid"][event], "violations": {}}
+    properties = []
+    for (event, prop, kind), count in total["violations"].most_common():
+        by_type = events[event]["violations"]
+        by_type[kind] = by_type.get(kind, 0) + count
+        if prop is not None:
+            properties.append({"event": event, "property": prop, "type": kind, "count": count})
+
+    checked = sum(total["payloads"].values())
+    invalid = sum(total["invalid"].values())
+    return {
+        "taxonomy_version": version,
+        "files": files,
+        "lines": total["lines"],
+        "malformed": total["malformed"],
+        "valid": checked - invalid,
+        "invalid": invalid,
+        "elapsed": round(elapsed, 3),
+        "lines_per_second": round(total["lines"] / elapsed) if elapsed else None,
+        "events": events,
+        "properties": properties,
+    }
+
+
+def audit_logs(db_path, paths, workers=None, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Audit NDJSON log files against the taxonomy in a SQLite file.
+
+    Args:
+        db_path: Taxonomy database to snapshot
+        paths: Plain or .gz NDJSON files
+        workers: Process count (default: CPU count)
+        chunk_size: Byte range per task for plain files
+
+    Returns:
+        Report dict with totals, per-event counts (key None for payloads
+        without an event name) and per-property violation counts
+    """
+    rows, version = load_snapshot(db_path)
+    tasks = plan_tasks(paths, chunk_size)
+    total = {"lines": 0, "malformed": 0, "payloads": Counter(), "invalid": Counter(), "violations": Counter()}
+
+    started = time.perf_counter()
+    run_tasks(audit_task, tasks, lambda part: merge_results(total, part), workers=workers,
+              initializer=_init_worker, initargs=(rows, version))
+
+    return _build_report(total, version, len(paths), time.perf_counter() - started)
+
+
+def format_report(report, limit=20):
+    """Render a report as a plain-text summary."""
+    lines = [
+        f"Taxonomy version {report['taxonomy_version']}, {report['files']} file(s), "
+        f"{report['lines']} lines in {report['elapsed']}s ({report['lines_per_second']} lines/s)",
+        f"valid {report['valid']}  invalid {report['invalid']}  malformed {report['malformed']}",
+        "",
+        "Events with violations:",
+    ]
+    offenders = sorted(
+        ((name, stats) for name, stats in report["events"].items() if stats["invalid"]),
+        key=lambda item: item[1]["invalid"], reverse=True,
+    )
+    for name, stats in offenders[:limit]:
+        kinds = ", ".join(f"{kind}={count}" for kind, count in sorted(stats["violations"].items()))
+        lines.append(f"  {name or '<no event>'}: {stats['invalid']}/{stats['payloads']} invalid ({kinds})")
+    lines += ["", "Top property violations:"]
+    for item in report["properties"][:limit]:
+        lines.append(f"  {item['event']}.{item['property']} {item['type']}: {item['count']}")
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Audit NDJSON event logs against the taxonomy")
+    parser.add_argument("paths", nargs="+", help="Plain or .gz NDJSON files")
+    parser.add_argument("--db", default="event_taxonomy.db", help="Taxonomy SQLite file")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: CPU count)")
+    parser.add_argument("--chunk-mb", type=int, default=DEFAULT_CHUNK_SIZE // (1024 * 1024),
+                        help="Byte range per task for plain files")
+    parser.add_argument("--limit", type=int, default=20, help="Rows per section in the text summary")
+    parser.add_argument("--json", action="store_true", help="Print the full report as JSON")
+    args = parser.parse_args()
+
+    report = audit_logs(args.db, args.paths, workers=args.workers, chunk_size=args.chunk_mb * 1024 * 1024)
+    if args.json:
+        report["events"] = {name or "": stats for name, stats in report["events"].items()}
+        print(json.dumps(report, indent=2))
+    else:
+        print(format_report(report, args.limit))
+
+
+if __name__ == "__main__":
+    main()
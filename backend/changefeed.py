@@ -0,0 +1,206 @@
+"""
+Live change feed: changelog entries pushed to Server-Sent Events clients.
+
+Changelog rows added in a session are collected on flush and published to the
+in-process broadcaster only after the transaction commits, so subscribers never
+see a change that was rolled back. Each subscriber has a bounded buffer; when a
+slow client overflows it, the buffer is dropped and the stream catches up from
+the changelog table instead, so memory stays bounded and nothing is lost.
+
+The broadcaster only sees commits made in this process. Entries written by other
+workers or processes (CLIs, a second uvicorn worker) are picked up by reading the
+changelog table whenever a stream has been idle for POLL_SECONDS. A broadcast entry
+is sent as is only when its id directly follows the last one sent: commits are
+published from their own threads and can arrive out of order, so any gap (and any
+filtered stream, whose ids are never contiguous) is read from the table instead.
+Every read uses its own short-lived session, so a long-lived stream holds no connection.
+
+Clients resume with the standard Last-Event-ID header (or ?last_event_id=),
+which is the changelog id of the last entry they received.
+"""
+import asyncio
+import json
+import threading
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from archive import changelog_rows
+from database import Changelog
+
+SUBSCRIBER_BUFFER = 1000
+BACKFILL_BATCH = 500
+KEEPALIVE_SECONDS = 15.0
+POLL_SECONDS = 2.0
+
+
+def entry_payload(entry) -> dict:
+    """JSON-ready form of a changelog row (same fields as ChangelogResponse)."""
+    return {
+        "id": entry.id,
+        "entity_type": entry.entity_type,
+        "entity_id": entry.entity_id,
+        "action": entry.action,
+        "old_value": entry.old_value,
+        "new_value": entry.new_value,
+        "changed_by": entry.changed_by,
+        "changed_at": entry.changed_at.isoformat() if entry.changed_at else None,
+    }
+
+
+class Subscriber:
+    """One stream's bounded buffer, filled from any thread, drained on its event loop."""
+
+    def __init__(self, loop, maxsize: int):
+        self.loop = loop
+        self.queue = asyncio.Queue(maxsize=maxsize)
+        self.overflowed = False
+
+    def _deliver(self, payload):
+        if self.overflowed:
+            return
+        try:
+            self.queue.put_nowait(payload)
+        except asyncio.QueueFull:
+            # Drop the buffer; the stream will catch up from the changelog table
+            self.overflowed = True
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(None)  # Wake the consumer
+
+    def publish(self, payload):
+        self.loop.call_soon_threadsafe(self._deliver, payload)
+
+
+class ChangeBroadcaster:
+    """Fans committed changelog entries out to every subscriber."""
+
+    def __init__(self):
+        self._subscribers = set()
+        self._lock = threading.Lock()
+
+    def subscribe(self, maxsize: int = None) -> Subscriber:
+        subscriber = Subscriber(asyncio.get_running_loop(), maxsize or SUBSCRIBER_BUFFER)
+        with self._lock:
+            self._subscribers.add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber):
+        with self._lock:
+            self._subscribers.discard(subscriber)
+
+    def publish(self, payloads):
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for subscriber in subscribers:
+            for payload in payloads:
+                try:
+                    subscriber.publish(payload)
+                except RuntimeError:
+                    # Event loop closed under a stream that never unsubscribed
+                    self.unsubscribe(subscriber)
+                    break
+
+    @property
+    def subscriber_count(self) -> int:
+        return len(self._subscribers)
+
+
+broadcaster = ChangeBroadcaster()
+
+_PENDING_KEY = "changefeed_pending"
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_changelog(session, flush_context):
+    # Payloads are built here: ids are assigned, and no SQL may be emitted after commit
+    payloads = [entry_payload(obj) for obj in session.new if isinstance(obj, Changelog)]
+    if payloads:
+        session.info.setdefault(_PENDING_KEY, []).extend(payloads)
+
+
+@event.listens_for(Session, "after_commit")
+def _publish_committed(session):
+    payloads = session.info.pop(_PENDING_KEY, None)
+    if payloads and broadcaster.subscriber_count:
+        broadcaster.publish(sorted(payloads, key=lambda payload: payload["id"]))
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_rolled_back(session):
+    session.info.pop(_PENDING_KEY, None)
+
+
+def format_sse(payload: dict) -> str:
+    """One SSE message: id, event name and JSON data."""
+    return f"id: {payload['id']}\nevent: change\ndata: {json.dumps(payload, separators=(',', ':'))}\n\n"
+
+
+def fetch_since(db: Session, last_id: int, entity_type: str = None, limit: int = BACKFILL_BATCH) -> list:
+    """Committed changelog entries after last_id, oldest first."""
+    return [entry_payload(entry) for entry in changelog_rows(db, last_id, entity_type=entity_type or None, limit=limit)]
+
+
+def _fetch(session_factory, last_id: int, entity_type: str = None) -> list:
+    with session_factory() as db:
+        return fetch_since(db, last_id, entity_type)
+
+
+async def change_stream(session_factory, last_id: int, is_disconnected, entity_type: str = None,
+                        keepalive: float = KEEPALIVE_SECONDS, poll: float = POLL_SECONDS, run_sync=None):
+    """Yield SSE messages: the backlog after last_id, then live entries as they commit.
+
+    Args:
+        session_factory: Returns a new Session (a context manager) for each read of the table
+        last_id: Changelog id the client already has
+        is_disconnected: Async callable returning True once the client went away
+        entity_type: Only stream entries of this entity type
+        keepalive: Seconds between keep-alive comments while idle
+        poll: Seconds without a broadcast after which the table is read for other processes' entries
+        run_sync: Runs a blocking function off the event loop (default: asyncio.to_thread)
+    """
+    run_sync = run_sync or asyncio.to_thread
+    # Subscribe before reading the backlog so nothing committed in between is missed
+    subscriber = broadcaster.subscribe()
+    try:
+        yield "retry: 3000\n\n"
+        idle = 0.0
+        while True:
+            # Catch up from the table (initial backlog, buffer overflow, poll or a gap in the ids)
+            subscriber.overflowed = False
+            while True:
+                batch = await run_sync(_fetch, session_factory, last_id, entity_type)
+                for payload in batch:
+                    last_id = payload["id"]
+                    yield format_sse(payload)
+                if batch:
+                    idle = 0.0
+                if len(batch) < BACKFILL_BATCH:
+                    break
+            if idle >= keepalive:
+                idle = 0.0
+                yield ": keepalive\n\n"
+
+            while not subscriber.overflowed:
+                try:
+                    payload = await asyncio.wait_for(subscriber.queue.get(), timeout=poll)
+                except asyncio.TimeoutError:
+                    if await is_disconnected():
+                        return
+                    # Commits from other processes never reach this process's broadcaster
+                    idle += poll
+                    break
+                if payload is None or payload["id"] <= last_id:
+                    continue
+                if entity_type and payload["entity_type"] != entity_type:
+                    continue
+                if entity_type or payload["id"] != last_id + 1:
+                    # Commits are published from their own threads and may arrive out of order,
+                    # and entries from other processes never arrive here: read the gap from the
+                    # table. Filtered ids are never contiguous, so those always take this path.
+                    break
+                idle = 0.0
+                last_id = payload["id"]
+                yield format_sse(payload)
+    finally:
+        broadcaster.unsubscribe(subscriber)
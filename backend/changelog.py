@@ -0,0 +1,230 @@
+"""
+Changelog encoding and reconstruction.
+
+Changelog rows store deltas rather than full snapshots:
+
+- event create: the initial fields and a compact entry per property
+- event update: only the fields that changed (the event name is always kept for display)
+- property added / removed: the single property involved
+- event patch: the changed fields, and the links removed or modified (as they
+  were) in old_value and the links added or modified (as they are) in new_value
+- event delete: just the event name
+- property create: name and data type
+- property rename: the old and new name
+- property merge: the target's name and data type and the merged source
+  properties; the links it moved are not listed (see property_merge)
+
+Full before/after snapshots are rebuilt on demand by replaying an entity's
+history from its create entry. Rows written before the delta encoding (full
+snapshots) replay the same way, since a snapshot is just a delta of every field.
+"""
+import heapq
+
+from sqlalchemy.orm import Session
+
+from archive import changelog_rows
+
+EVENT_FIELDS = ("name", "description", "category")
+PROPERTY_FIELDS = ("name", "data_type", "description")
+MERGE_ACTION = "properties_merged"
+PATCH_ACTION = "event_patched"
+
+
+def property_entry(event_property, prop) -> dict:
+    """Compact changelog description of one event-property association.
+
+    Defaults (not required, no example) are omitted to keep rows small.
+    """
+    entry = {
+        "id": event_property.id,
+        "property_id": prop.id,
+        "name": prop.name,
+        "type": event_property.property_type,
+        "data_type": prop.data_type,
+    }
+    if event_property.is_required:
+        entry["required"] = True
+    if event_property.example_value is not None:
+        entry["example"] = event_property.example_value
+    return entry
+
+
+def merge_entry(target, sources) -> dict:
+    """new_value of the changelog entry for merging `sources` into `target` (before they are deleted)."""
+    return {
+        "action": MERGE_ACTION,
+        "name": target.name,
+        "data_type": target.data_type,
+        "properties": [{"property_id": prop.id, "name": prop.name, "data_type": prop.data_type} for prop in sources],
+    }
+
+
+def merged_property_ids(new_value) -> list:
+    """Ids of the properties merged away by a property changelog entry (empty for other entries)."""
+    if not new_value or new_value.get("action") != MERGE_ACTION:
+        return []
+    return [prop["property_id"] for prop in new_value.get("properties") or []]
+
+
+def diff_fields(old: dict, new: dict):
+    """Split two field dicts into (old_delta, new_delta) holding only the changed keys."""
+    changed = [key for key in new if old.get(key) != new[key]]
+    return {key: old.get(key) for key in changed}, {key: new[key] for key in changed}
+
+
+def _same_property(a: dict, b: dict) -> bool:
+    if "id" in a and "id" in b:
+        return a["id"] == b["id"]
+    return a.get("name") == b.get("name") and a.get("type") == b.get("type")
+
+
+def apply_entry(state, entity_type: str, action: str, old_value, new_value):
+    """Return the entity state after one changelog entry (the input is not modified).
+
+    Event state is {"name", "description", "category", "properties": [...]};
+    property state is {"name", "data_type", ...}; a deleted entity is None.
+    """
+    old_value = old_value or {}
+    new_value = new_value or {}
+
+    if action == "delete":
+        return None
+
+    if action == "create":
+        if entity_type == "event":
+            state = {field: new_value.get(field) for field in EVENT_FIELDS}
+            state["properties"] = list(new_value.get("properties") or [])
+            return state
+        return {field: new_value.get(field) for field in PROPERTY_FIELDS if field in new_value}
+
+    state = dict(state or {})
+    if entity_type == "event":
+        properties = list(state.get("properties") or [])
+        if new_value.get("action") == "property_added":
+            properties.append(new_value["property"])
+        elif old_value.get("action") == "property_removed":
+            removed = old_value["property"]
+            properties = [p for p in properties if not _same_property(p, removed)]
+        elif new_value.get("action") == PATCH_ACTION:
+            properties = _patch_properties(properties, old_value.get("properties") or [],
+                                           new_value.get("properties") or [])
+            state.update({field: new_value[field] for field in EVENT_FIELDS if field in new_value})
+        else:
+            state.update({field: new_value[field] for field in EVENT_FIELDS if field in new_value})
+        state["properties"] = properties
+    else:
+        state.update({field: new_value[field] for field in PROPERTY_FIELDS if field in new_value})
+    return state
+
+
+def _patch_properties(properties: list, before: list, after: list) -> list:
+    """Links after a patch: modified links keep their place, added ones go last."""
+    modified = {prop["id"]: prop for prop in after if "id" in prop and any(_same_property(prop, old) for old in before)}
+    patched = []
+    for prop in properties:
+        if not any(_same_property(prop, old) for old in before):
+            patched.append(prop)
+        elif prop.get("id") in modified:
+            patched.append(modified[prop["id"]])
+    patched.extend(prop for prop in after if prop.get("id") not in modified)
+    return patched
+
+
+def apply_property_change(state, property_id: int, old_value, new_value):
+    """Event state after a property rename or merge entry; the same object if the event is unaffected.
+
+    A merge collapses the event's links to the target and its sources into one per
+    property type, like property_merge.merge_properties does with the rows.
+    """
+    old_value = old_value or {}
+    new_value = new_value or {}
+    properties = (state or {}).get("properties") or []
+
+    sources = set(merged_property_ids(new_value))
+    if sources:
+        if not any(prop.get("property_id") in sources for prop in properties):
+            return state
+        group = sources | {property_id}
+        survivors = {}
+        for prop in sorted((p for p in properties if p.get("property_id") in group),
+                           key=lambda p: (p.get("property_id") != property_id, p.get("id", 0))):
+            survivor = survivors.get(prop.get("type"))
+            if survivor is None:
+                survivors[prop.get("type")] = dict(prop, property_id=property_id, name=new_value["name"],
+                                                   data_type=new_value.get("data_type", prop.get("data_type")))
+                continue
+            if prop.get("required"):
+                survivor["required"] = True
+            if "example" not in survivor and prop.get("example") is not None:
+                survivor["example"] = prop["example"]
+        merged, placed = [], set()  # Each survivor takes the place of the first link of its type
+        for prop in properties:
+            if prop.get("property_id") not in group:
+                merged.append(prop)
+            elif prop.get("type") not in placed:
+                placed.add(prop.get("type"))
+                merged.append(survivors[prop.get("type")])
+        return dict(state, properties=merged)
+
+    new_name = new_value.get("name")
+    if new_value.get("action") or not new_name or old_value.get("name") == new_name:
+        return state
+    if not any(_renamed(prop, property_id, old_value) for prop in properties):
+        return state
+    return dict(state, properties=[dict(prop, name=new_name) if _renamed(prop, property_id, old_value) else prop
+                                   for prop in properties])
+
+
+def _renamed(prop: dict, property_id: int, old_value: dict) -> bool:
+    if "property_id" in prop:
+        return prop["property_id"] == property_id
+    return prop.get("name") == old_value.get("name")
+
+
+def entity_history(db: Session, entities, up_to_id: int):
+    """Changelog rows (ordered by id, archived ones included) of the given (entity_type, entity_id) pairs."""
+    return changelog_rows(db, up_to_id=up_to_id, entities=list(entities))
+
+
+def reconstruct(db: Session, entries) -> dict:
+    """Rebuild full before/after snapshots for changelog entries.
+
+    Each affected entity's history is fetched once and replayed up to the latest
+    requested entry. Property renames and merges are applied to event snapshots
+    as they happen, like history.py does.
+
+    Returns:
+        Mapping of entry id -> (old snapshot, new snapshot)
+    """
+    entries = list(entries)
+    if not entries:
+        return {}
+    wanted = {entry.id for entry in entries}
+    entities = {(entry.entity_type, entry.entity_id) for entry in entries}
+    up_to_id = max(wanted)
+    history = entity_history(db, entities, up_to_id)
+    if any(entity_type == "event" for entity_type, _ in entities):
+        # Renames and merges change the links of events they were not logged against
+        history = heapq.merge(history, changelog_rows(db, up_to_id=up_to_id, entity_type="property"),
+                              key=lambda row: row.id)
+
+    states = {}
+    snapshots = {}
+    last_id = None
+    for row in history:
+        if row.id == last_id:  # Property rows of requested properties come from both reads
+            continue
+        last_id = row.id
+        key = (row.entity_type, row.entity_id)
+        if row.entity_type == "property" and row.action == "update":
+            for other, state in list(states.items()):
+                if other[0] == "event" and state is not None:
+                    states[other] = apply_property_change(state, row.entity_id, row.old_value, row.new_value)
+        if key not in entities:
+            continue
+        before = states.get(key)
+        after = apply_entry(before, row.entity_type, row.action, row.old_value, row.new_value)
+        states[key] = after
+        if row.id in wanted:
+            snapshots[row.id] = (before, after)
+    return snapshots
@@ -0,0 +1,78 @@
+"""
+Property recommendations from co-occurrence counts.
+
+property_cooccurrence is a sparse property-by-property matrix: for every pair of
+properties linked to a common event, the number of such events, with the
+diagonal holding each property's event count. SQLite triggers on
+event_properties keep it exact through every link insert, delete and update
+(see database.init_db), so recommending reads a few matrix rows instead of
+self-joining event_properties.
+
+Companions c of the properties S being added are ranked by the mean over s in S
+of P(c | s) = count(s, c) / count(s, s): how often events with s also have c.
+"""
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from database import Property, PropertyCooccurrence, cooccurrence_backfill, unit_of_work
+
+DEFAULT_TOP_K = 10
+
+MATRIX_ROWS_SQL = """
+    SELECT property_a, property_b, count FROM property_cooccurrence WHERE property_a IN ({ids})
+    UNION ALL
+    SELECT property_a, property_b, count FROM property_cooccurrence WHERE property_b IN ({ids}) AND property_a != property_b
+"""
+
+
+def rebuild_cooccurrence(db: Session) -> int:
+    """Recompute the matrix from event_properties.
+
+    Returns:
+        Number of nonzero entries
+    """
+    with unit_of_work(db):
+        db.query(PropertyCooccurrence).delete()
+        db.execute(text(cooccurrence_backfill()))
+    return db.query(PropertyCooccurrence).count()
+
+
+def companion_scores(db: Session, property_ids) -> dict:
+    """{property id: mean P(property | s) over s in property_ids} for properties not in property_ids."""
+    selected = set(property_ids)
+    if not selected:
+        return {}
+    ids = ", ".join(str(int(property_id)) for property_id in sorted(selected))
+    rows = db.execute(text(MATRIX_ROWS_SQL.format(ids=ids))).all()
+
+    usage = {a: count for a, b, count in rows if a == b}
+    scores = {}
+    for a, b, count in rows:
+        for given, other in ((a, b), (b, a)):
+            if given in selected and other not in selected and usage.get(given):
+                scores[other] = scores.get(other, 0.0) + count / usage[given]
+    return {other: score / len(selected) for other, score in scores.items()}
+
+
+def recommend(db: Session, names, top_k: int = DEFAULT_TOP_K) -> dict:
+    """Top-k companion properties for properties given by name.
+
+    Returns:
+        {"with": known names, "unknown": names not in the registry,
+         "recommendations": [{"name", "data_type", "score"}, ...]}
+    """
+    names = list(dict.fromkeys(names))
+    known = dict(db.query(Property.name, Property.id).filter(Property.name.in_(names)).all()) if names else {}
+    scores = companion_scores(db, known.values())
+    # Ties go to the older property
+    ranked = sorted(scores, key=lambda prop_id: (-round(scores[prop_id], 3), prop_id))[:top_k]
+    properties = {prop.id: prop for prop in db.query(Property).filter(Property.id.in_(ranked))} if ranked else {}
+    return {
+        "with": [name for name in names if name in known],
+        "unknown": [name for name in names if name not in known],
+        "recommendations": [
+            {"name": properties[prop_id].name, "data_type": properties[prop_id].data_type,
+             "score": round(scores[prop_id], 3)}
+            for prop_id in ranked if prop_id in properties
+        ],
+    }
@@ -1,16 +1,22 @@
-from sqlalchemy import create_engine, Column, Integer, String, Text, Boolean, DateTime, ForeignKey, JSON, event, text, UniqueConstraint
+from sqlalchemy import create_engine, Column, Integer, String, Text, Boolean, DateTime, ForeignKey, JSON, LargeBinary, event, text, UniqueConstraint, Index
 from sqlalchemy.orm import sessionmaker, relationship, declarative_base
 from sqlalchemy.engine import Engine
 from datetime import datetime, UTC
 from pathlib import Path
+from contextlib import contextmanager
+import json
+import os
 
 # Get the backend directory (where this file is located)
 BACKEND_DIR = Path(__file__).parent
-DB_PATH = BACKEND_DIR / "event_taxonomy.db"
+# TAXONOMY_DB_PATH lets a second instance (e.g. a replication follower) run from the same checkout
+DB_PATH = Path(os.environ.get("TAXONOMY_DB_PATH") or BACKEND_DIR / "event_taxonomy.db")
 SQLALCHEMY_DATABASE_URL = f"sqlite:///{DB_PATH}"
 
 engine = create_engine(
-    SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
+    SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False},
+    # Compact separators keep changelog JSON small
+    json_serializer=lambda obj: json.dumps(obj, separators=(",", ":"))
 )
 
 # Configure SQLite for better concurrency and performance
@@ -37,9 +43,17 @@ class Property(Base):
     data_type = Column(String, nullable=False)  # Float, Int, String, List, JSON
     description = Column(Text)
     created_at = Column(DateTime, default=lambda: datetime.now(UTC))
+    updated_at = Column(DateTime, default=lambda: datetime.now(UTC), onupdate=lambda: datetime.now(UTC), index=True)
     created_by = Column(String)
+    sync_version = Column(Integer, index=True)  # SyncSequence value of the last write (see sync.py)
 
     event_properties = relationship("EventProperty", back_populates="property")
+    sketch = relationship("PropertyStats", uselist=False, cascade="all, delete-orphan")
+
+    @property
+    def stats(self):
+        """Value statistics summary, or None until sketches have been collected."""
+        return self.sketch.summary if self.sketch is not None else None
 
 
 class Event(Base):
@@ -50,8 +64,9 @@ class Event(Base):
     description = Column(Text)
     category = Column(String, index=True)
     created_at = Column(DateTime, default=lambda: datetime.now(UTC))
-    updated_at = Column(DateTime, default=lambda: datetime.now(UTC), onupdate=lambda: datetime.now(UTC))
+    updated_at = Column(DateTime, default=lambda: datetime.now(UTC), onupdate=lambda: datetime.now(UTC), index=True)
     created_by = Column(String)
+    sync_version = Column(Integer, index=True)  # SyncSequence value of the last write (see sync.py)
 
     event_properties = relationship("EventProperty", back_populates="event", cascade="all, delete-orphan")
 
@@ -73,6 +88,15 @@ class EventProperty(Base):
     property = relationship("Property", back_populates="event_properties")
 
 
+class PropertyStats(Base):
+    __tablename__ = "property_stats"
+
+    property_id = Column(Integer, ForeignKey("properties.id", ondelete="CASCADE"), primary_key=True)
+    sketch = Column(LargeBinary, nullable=False)  # Serialized sketches.PropertySketch
+    summary = Column(JSON)  # Precomputed stats served with the property
+    updated_at = Column(DateTime, default=lambda: datetime.now(UTC))
+
+
 class Changelog(Base):
     __tablename__ = "changelog"
 
@@ -83,7 +107,227 @@ class Changelog(Base):
     old_value = Column(JSON)
     new_value = Column(JSON)
     changed_by = Column(String)
-    changed_at = Column(DateTime, default=lambda: datetime.now(UTC))
+    changed_at = Column(DateTime, default=lambda: datetime.now(UTC), index=True)
+
+
+class ChangelogTerm(Base):
+    """Names and kinds of change extracted from a changelog row's JSON, for indexed filtering.
+
+    kind is 'event' or 'property' (names mentioned by the entry), 'action' (the row
+    action and any subtype such as property_added) or 'user' (changed_by). Rows are
+    written by SQLite triggers (see init_db) and kept when changelog rows are archived.
+    """
+    __tablename__ = "changelog_terms"
+    __table_args__ = (
+        UniqueConstraint("changelog_id", "kind", "value", name="uq_changelog_term"),
+        Index("ix_changelog_terms_lookup", "kind", "value", "changed_at"),
+    )
+
+    id = Column(Integer, primary_key=True)
+    changelog_id = Column(Integer, nullable=False)
+    kind = Column(String, nullable=False)
+    value = Column(String, nullable=False)
+    changed_at = Column(DateTime)
+
+
+class ChangelogRollup(Base):
+    """Changelog entry counts per hour / day bucket, user, entity type and action.
+
+    Maintained by a SQLite trigger on changelog inserts (see init_db); changed_by is ''
+    when unknown so that it can be part of the key. Subtypes such as property_added
+    are counted as their own action rather than as update.
+    """
+    __tablename__ = "changelog_rollups"
+
+    granularity = Column(String, primary_key=True)  # 'hour', 'day'
+    bucket = Column(DateTime, primary_key=True)  # Start of the hour / day (UTC)
+    changed_by = Column(String, primary_key=True)
+    entity_type = Column(String, primary_key=True)
+    action = Column(String, primary_key=True)
+    count = Column(Integer, nullable=False, default=0)
+
+
+class PropertyCooccurrence(Base):
+    """Number of events linking both properties, for each pair with property_a <= property_b.
+
+    The diagonal (property_a == property_b) counts the events using the property.
+    Maintained by SQLite triggers on event_properties (see init_db); a property
+    linked twice to one event (as different property types) counts once.
+    """
+    __tablename__ = "property_cooccurrence"
+    __table_args__ = (
+        Index("ix_property_cooccurrence_b", "property_b"),
+    )
+
+    property_a = Column(Integer, primary_key=True)
+    property_b = Column(Integer, primary_key=True)
+    count = Column(Integer, nullable=False, default=0)
+
+
+class ChangelogCheckpoint(Base):
+    """A point in the changelog at which event states are stored in event_checkpoints."""
+    __tablename__ = "changelog_checkpoints"
+
+    id = Column(Integer, primary_key=True)
+    changelog_id = Column(Integer, nullable=False, unique=True, index=True)  # Last entry included
+    events = Column(Integer, nullable=False, default=0)  # Events existing at that point
+    created_at = Column(DateTime, default=lambda: datetime.now(UTC))
+
+
+class EventCheckpoint(Base):
+    """State of one event at a checkpoint, stored only when it changed since the previous one.
+
+    The state of an event at checkpoint C is its row with the highest changelog_id <= C;
+    a NULL state means the event had been deleted.
+    """
+    __tablename__ = "event_checkpoints"
+    __table_args__ = (
+        Index("ix_event_checkpoints_event", "event_id", "changelog_id"),
+    )
+
+    changelog_id = Column(Integer, primary_key=True)
+    event_id = Column(Integer, primary_key=True)
+    state = Column(LargeBinary, nullable=True)  # zlib-compressed JSON state
+
+
+class ChangelogSegment(Base):
+    __tablename__ = "changelog_segments"
+
+    id = Column(Integer, primary_key=True)
+    path = Column(String, nullable=False)  # Segment file; its index is the same path with .idx
+    first_id = Column(Integer, nullable=False)
+    last_id = Column(Integer, nullable=False, unique=True, index=True)
+    first_changed_at = Column(DateTime)
+    last_changed_at = Column(DateTime)
+    row_count = Column(Integer, nullable=False)
+    size_bytes = Column(Integer, nullable=False)
+    created_at = Column(DateTime, default=lambda: datetime.now(UTC))
+
+
+class Tombstone(Base):
+    __tablename__ = "tombstones"
+
+    id = Column(Integer, primary_key=True)
+    entity_type = Column(String, nullable=False)  # 'event', 'property'
+    entity_id = Column(Integer, nullable=False)
+    name = Column(String)
+    deleted_at = Column(DateTime, default=lambda: datetime.now(UTC), index=True)
+    sync_version = Column(Integer, index=True)
+
+
+class SyncSequence(Base):
+    """Single-row counter behind /api/sync versions (see sync.py).
+
+    value is bumped inside each writing transaction, so versions follow commit
+    order; pruned is the highest version of a tombstone dropped by retention.
+    """
+    __tablename__ = "sync_sequence"
+
+    id = Column(Integer, primary_key=True)
+    value = Column(Integer, nullable=False, default=0)
+    pruned = Column(Integer, nullable=False, default=0)
+
+
+# (kind, value, extra FROM clause) per changelog term; {row} is the changelog row alias
+CHANGELOG_TERM_SOURCES = [
+    ("'user'", "{row}.changed_by", ""),
+    ("'action'", "{row}.action", ""),
+    ("'action'", "json_extract({row}.new_value, '$.action')", ""),
+    ("'action'", "json_extract({row}.old_value, '$.action')", ""),
+    ("{row}.entity_type", "json_extract({row}.new_value, '$.name')", ""),
+    ("{row}.entity_type", "json_extract({row}.old_value, '$.name')", ""),
+    ("'property'", "json_extract({row}.new_value, '$.property.name')", ""),
+    ("'property'", "json_extract({row}.old_value, '$.property.name')", ""),
+    ("'property'", "json_extract(p.value, '$.name')", ", json_each({row}.new_value, '$.properties') AS p"),
+    ("'property'", "json_extract(p.value, '$.name')", ", json_each({row}.old_value, '$.properties') AS p"),
+]
+
+
+def _changelog_term_inserts(row: str, source: str, where: str = "") -> list:
+    """INSERT statements adding the terms of the changelog rows aliased `row` in `source`."""
+    statements = []
+    for kind, value, extra in CHANGELOG_TERM_SOURCES:
+        kind, value, extra = kind.format(row=row), value.format(row=row), extra.format(row=row)
+        statements.append(
+            f"INSERT OR IGNORE INTO changelog_terms (changelog_id, kind, value, changed_at) "
+            f"SELECT {row}.id, {kind}, {value}, {row}.changed_at FROM {source}{extra} "
+            f"WHERE {kind} IN ('user', 'action', 'event', 'property') AND {value} IS NOT NULL{where}"
+        )
+    return statements
+
+
+# Bucket start per rollup granularity, in the format SQLAlchemy stores DateTime values
+ROLLUP_BUCKETS = {"hour": "%Y-%m-%d %H:00:00.000000", "day": "%Y-%m-%d 00:00:00.000000"}
+ROLLUP_ACTION_SQL = "COALESCE(json_extract({row}.new_value, '$.action'), json_extract({row}.old_value, '$.action'), {row}.action)"
+
+
+def _changelog_rollup_statements(row: str) -> list:
+    """Upserts adding one count per granularity for the changelog row `new` (in a trigger)."""
+    return [
+        f"INSERT INTO changelog_rollups (granularity, bucket, changed_by, entity_type, action, count) "
+        f"VALUES ('{granularity}', strftime('{pattern}', {row}.changed_at), COALESCE({row}.changed_by, ''), "
+        f"{row}.entity_type, {ROLLUP_ACTION_SQL.format(row=row)}, 1) "
+        f"ON CONFLICT (granularity, bucket, changed_by, entity_type, action) DO UPDATE SET count = count + 1"
+        for granularity, pattern in ROLLUP_BUCKETS.items()
+    ]
+
+
+def changelog_rollup_backfill() -> list:
+    """INSERT ... SELECT statements building the rollups of every row in the changelog table."""
+    return [
+        f"INSERT INTO changelog_rollups (granularity, bucket, changed_by, entity_type, action, count) "
+        f"SELECT '{granularity}', strftime('{pattern}', c.changed_at) AS b, COALESCE(c.changed_by, '') AS u, "
+        f"c.entity_type, {ROLLUP_ACTION_SQL.format(row='c')} AS a, COUNT(*) FROM changelog AS c "
+        f"WHERE c.changed_at IS NOT NULL GROUP BY b, u, c.entity_type, a "
+        f"ON CONFLICT (granularity, bucket, changed_by, entity_type, action) DO UPDATE SET count = count + excluded.count"
+        for granularity, pattern in ROLLUP_BUCKETS.items()
+    ]
+
+
+def _cooccurrence_statements(row: str, change: str) -> list:
+    """Statements adding (change '+') or removing ('-') the pairs of link `row` (new/old, in a trigger).
+
+    Links other than `row` itself decide whether its property was already on / is
+    still on the event, so the same statements serve inserts, deletes and updates.
+    """
+    elsewhere = (f"SELECT 1 FROM event_properties WHERE event_id = {row}.event_id "
+                 f"AND property_id = {row}.property_id AND id != {row}.id")
+    pairs = (f"SELECT min({row}.property_id, o.property_id) AS a, max({row}.property_id, o.property_id) AS b "
+             f"FROM (SELECT property_id FROM event_properties WHERE event_id = {row}.event_id AND id != {row}.id "
+             f"UNION SELECT {row}.property_id) AS o")
+    if change == "+":
+        return [
+            f"INSERT INTO property_cooccurrence (property_a, property_b, count) "
+            f"SELECT a, b, 1 FROM ({pairs}) WHERE NOT EXISTS ({elsewhere}) "
+            f"ON CONFLICT (property_a, property_b) DO UPDATE SET count = count + 1"
+        ]
+    return [
+        f"UPDATE property_cooccurrence SET count = count - 1 "
+        f"WHERE NOT EXISTS ({elsewhere}) AND (property_a, property_b) IN (SELECT a, b FROM ({pairs}))",
+        f"DELETE FROM property_cooccurrence WHERE (property_a, property_b) IN (SELECT a, b FROM ({pairs})) "
+        f"AND count <= 0",
+    ]
+
+
+COOCCURRENCE_TRIGGERS = {
+    "property_cooccurrence_insert": ("AFTER INSERT ON event_properties", _cooccurrence_statements("new", "+")),
+    "property_cooccurrence_delete": ("AFTER DELETE ON event_properties", _cooccurrence_statements("old", "-")),
+    "property_cooccurrence_update": (
+        "AFTER UPDATE OF event_id, property_id ON event_properties",
+        _cooccurrence_statements("old", "-") + _cooccurrence_statements("new", "+"),
+    ),
+}
+
+
+def cooccurrence_backfill() -> str:
+    """INSERT ... SELECT counting every pair in event_properties."""
+    links = "(SELECT DISTINCT event_id, property_id FROM event_properties)"
+    return (
+        f"INSERT INTO property_cooccurrence (property_a, property_b, count) "
+        f"SELECT x.property_id, y.property_id, COUNT(*) FROM {links} AS x "
+        f"JOIN {links} AS y ON y.event_id = x.event_id AND y.property_id >= x.property_id "
+        f"GROUP BY x.property_id, y.property_id"
+    )
 
 
 def get_db():
@@ -94,11 +338,93 @@ def get_db():
         db.close()
 
 
-def init_db():
-    Base.metadata.create_all(bind=engine)
-    
+def init_db(bind=None):
+    """Create tables, the events_fts index and its sync triggers.
+
+    Args:
+        bind: Engine to initialize (defaults to the application engine)
+    """
+    bind = bind if bind is not None else engine
+
+    # Checkpoints used to be whole-taxonomy snapshots; they are derived data, so just start over
+    with bind.connect() as conn:
+        columns = {row[1] for row in conn.execute(text("PRAGMA table_info(changelog_checkpoints)"))}
+        if "snapshot" in columns:
+            conn.execute(text("DROP TABLE changelog_checkpoints"))
+            conn.commit()
+
+    Base.metadata.create_all(bind=bind)
+
+    # Indexes added after the first release are not created by create_all on existing tables
+    with bind.connect() as conn:
+        conn.execute(text("CREATE INDEX IF NOT EXISTS ix_changelog_changed_at ON changelog (changed_at)"))
+        conn.execute(text("CREATE INDEX IF NOT EXISTS ix_events_updated_at ON events (updated_at)"))
+        # Nor are columns: properties.updated_at (for /api/sync) starts out as created_at
+        columns = {row[1] for row in conn.execute(text("PRAGMA table_info(properties)"))}
+        if "updated_at" not in columns:
+            conn.execute(text("ALTER TABLE properties ADD COLUMN updated_at DATETIME"))
+        conn.execute(text("UPDATE properties SET updated_at = created_at WHERE updated_at IS NULL"))
+        conn.execute(text("CREATE INDEX IF NOT EXISTS ix_properties_updated_at ON properties (updated_at)"))
+        # Sync versions replaced the updated_at marks; rows written before them count as version 0
+        for table in ("events", "properties", "tombstones"):
+            columns = {row[1] for row in conn.execute(text(f"PRAGMA table_info({table})"))}
+            if "sync_version" not in columns:
+                conn.execute(text(f"ALTER TABLE {table} ADD COLUMN sync_version INTEGER"))
+            conn.execute(text(f"CREATE INDEX IF NOT EXISTS ix_{table}_sync_version ON {table} (sync_version)"))
+        conn.execute(text("INSERT OR IGNORE INTO sync_sequence (id, value, pruned) VALUES (1, 0, 0)"))
+        conn.commit()
+
+    # Keep changelog_terms in step with changelog inserts, and backfill rows written before it existed
+    with bind.connect() as conn:
+        installed = conn.execute(
+            text("SELECT sql FROM sqlite_master WHERE type='trigger' AND name='changelog_terms_insert'")
+        ).scalar()
+        body = ";\n".join(_changelog_term_inserts("new", "(SELECT 1)"))
+        sql = f"CREATE TRIGGER changelog_terms_insert AFTER INSERT ON changelog BEGIN\n{body};\nEND"
+        if installed != sql:
+            conn.execute(text("DROP TRIGGER IF EXISTS changelog_terms_insert"))
+            conn.execute(text(sql))
+        if installed is not None and installed != sql:
+            # CHANGELOG_TERM_SOURCES changed: re-index the live rows (archived rows keep their terms)
+            conn.execute(text("DELETE FROM changelog_terms WHERE changelog_id IN (SELECT id FROM changelog)"))
+            last = 0
+        else:
+            last = conn.execute(text("SELECT COALESCE(MAX(changelog_id), 0) FROM changelog_terms")).scalar()
+        for statement in _changelog_term_inserts("c", "changelog AS c", " AND c.id > :last"):
+            conn.execute(text(statement), {"last": last})
+        conn.commit()
+
+    # Same for changelog_rollups; existing rows are counted once, when the trigger is installed
+    with bind.connect() as conn:
+        exists = conn.execute(
+            text("SELECT name FROM sqlite_master WHERE type='trigger' AND name='changelog_rollups_insert'")
+        ).fetchone()
+        if not exists:
+            body = ";\n".join(_changelog_rollup_statements("new"))
+            conn.execute(text(f"CREATE TRIGGER changelog_rollups_insert AFTER INSERT ON changelog "
+                              f"WHEN new.changed_at IS NOT NULL BEGIN\n{body};\nEND"))
+            for statement in changelog_rollup_backfill():
+                conn.execute(text(statement))
+        conn.commit()
+
+    # property_cooccurrence follows event_properties the same way
+    with bind.connect() as conn:
+        existing = dict(conn.execute(
+            text("SELECT name, sql FROM sqlite_master WHERE type='trigger' AND name LIKE 'property_cooccurrence_%'")
+        ).all())
+        for name, (timing, statements) in COOCCURRENCE_TRIGGERS.items():
+            body = ";\n".join(statements)
+            sql = f"CREATE TRIGGER {name} {timing} BEGIN\n{body};\nEND"
+            if existing.get(name) != sql:  # Missing, or installed by an older version
+                conn.execute(text(f"DROP TRIGGER IF EXISTS {name}"))
+                conn.execute(text(sql))
+        if not existing:
+            conn.execute(text("DELETE FROM property_cooccurrence"))
+            conn.execute(text(cooccurrence_backfill()))
+        conn.commit()
+
     # Create FTS5 virtual table for full-text search on events
-    with engine.connect() as conn:
+    with bind.connect() as conn:
         # Check if FTS5 table exists
         result = conn.execute(
             text("SELECT name FROM sqlite_master WHERE type='table' AND name='events_fts'")
@@ -151,3 +477,19 @@ def init_db():
 
             conn.commit()
 
+
+
+@contextmanager
+def unit_of_work(db):
+    """Apply everything done inside the block in a single transaction.
+
+    Commits once on success; on any exception (including HTTPException raised
+    for validation errors) rolls back and re-raises, so a data change is never
+    committed without its changelog entry.
+    """
+    try:
+        yield db
+        db.commit()
+    except BaseException:
+        db.rollback()
+        raise
@@ -0,0 +1,243 @@
+"""
+Near-duplicate event detection with MinHash and locality-sensitive hashing.
+
+Each event is reduced to the set of registry property ids it links to, and that
+set to a MinHash signature of NUM_PERM 32-bit minima; the fraction of positions
+where two signatures agree estimates the Jaccard similarity of the two sets.
+Signatures are cut into BANDS bands of ROWS values and every band is a bucket
+key, so events sharing any band become candidates without comparing every pair.
+With 18 x 7 a pair at Jaccard 0.7 is found with probability ~0.8, at 0.8 ~0.99,
+while pairs that only share a popular property (Jaccard ~0.3) almost never
+collide; shorter bands made buckets of thousands of such events on a 100k-event
+taxonomy. Identical signatures are indexed once, so a property set shared by
+hundreds of events costs one bucket entry per band.
+
+The index lives in memory per engine and follows the taxonomy version: a read
+replays the changelog entries written since the index was built and re-signs
+only the events they touch.
+"""
+import random
+import threading
+from array import array
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from database import Event
+from sketches import hash64
+from validation import VersionedIndexCache, changed_event_ids, rows_in, taxonomy_version
+
+BANDS = 18
+ROWS = 7
+NUM_PERM = BANDS * ROWS
+MIN_PROPERTIES = 2  # Sharing a single property says nothing about duplication
+SEED = 1
+
+_PRIME = (1 << 61) - 1
+_random = random.Random(SEED)
+_PERMUTATIONS = [(_random.randrange(1, _PRIME), _random.randrange(0, _PRIME)) for _ in range(NUM_PERM)]
+
+EVENT_PROPERTY_IDS_SQL = "SELECT event_id, property_id FROM event_properties"
+
+
+class DuplicateIndex:
+    """MinHash signatures and LSH buckets for the property sets of all events.
+
+    catch_up changes the index in place while readers may be using it, so both hold `lock`.
+    """
+
+    def __init__(self, version: int = 0):
+        self.version = version
+        self.lock = threading.RLock()
+        self.signatures = {}  # event id -> signature bytes
+        self.groups = {}  # signature bytes -> set of event ids
+        self._bands = [{} for _ in range(BANDS)]  # band bytes -> signature bytes, or a set of them
+        self._hashes = {}  # property id -> per-permutation hash array
+        self._clusters = {}  # threshold -> cached clusters for this version
+
+    def _property_hashes(self, property_id: int) -> array:
+        hashes = self._hashes.get(property_id)
+        if hashes is None:
+            x = hash64(str(property_id))
+            hashes = array("I", (((a * x + b) % _PRIME) & 0xFFFFFFFF for a, b in _PERMUTATIONS))
+            self._hashes[property_id] = hashes
+        return hashes
+
+    def signature(self, property_ids) -> bytes:
+        vectors = [self._property_hashes(pid) for pid in property_ids]
+        if len(vectors) == 1:
+            return vectors[0].tobytes()
+        return array("I", map(min, *vectors)).tobytes()
+
+    def _band_keys(self, signature: bytes):
+        width = ROWS * 4
+        return ((band, signature[band * width:(band + 1) * width]) for band in range(BANDS))
+
+    def set(self, event_id: int, property_ids):
+        """Index an event's property set (events with fewer than MIN_PROPERTIES are dropped)."""
+        self.discard(event_id)
+        self._clusters = {}
+        property_ids = set(property_ids)
+        if len(property_ids) < MIN_PROPERTIES:
+            return
+        signature = self.signature(property_ids)
+        self.signatures[event_id] = signature
+        members = self.groups.get(signature)
+        if members is not None:
+            members.add(event_id)
+            return
+        self.groups[signature] = {event_id}
+        for band, key in self._band_keys(signature):
+            bucket = self._bands[band].get(key)
+            if bucket is None:
+                self._bands[band][key] = signature
+            elif isinstance(bucket, set):
+                bucket.add(signature)
+            else:
+                self._bands[band][key] = {bucket, signature}
+
+    def discard(self, event_id: int):
+        signature = self.signatures.pop(event_id, None)
+        if signature is None:
+            return
+        self._clusters = {}
+        members = self.groups[signature]
+        members.discard(event_id)
+        if members:
+            return
+        del self.groups[signature]
+        for band, key in self._band_keys(signature):
+            bucket = self._bands[band][key]
+            if isinstance(bucket, set):
+                bucket.discard(signature)
+                if len(bucket) == 1:
+                    self._bands[band][key] = bucket.pop()
+            else:
+                del self._bands[band][key]
+
+    def _candidates(self, signature: bytes) -> set:
+        found = set()
+        for band, key in self._band_keys(signature):
+            bucket = self._bands[band].get(key)
+            if isinstance(bucket, set):
+                found |= bucket
+            elif bucket is not None:
+                found.add(bucket)
+        return found
+
+    def similar(self, event_id: int, threshold: float = 0.8) -> list:
+        """[(event id, estimated Jaccard)] for events resembling event_id, most similar first."""
+        with self.lock:
+            signature = self.signatures.get(event_id)
+            if signature is None:
+                return []
+            result = []
+            for other in self._candidates(signature):
+                score = estimate(signature, other)
+                if score >= threshold:
+                    result.extend((member, score) for member in self.groups[other] if member != event_id)
+            return sorted(result, key=lambda item: (-item[1], item[0]))
+
+    def clusters(self, threshold: float = 0.8) -> list:
+        """Groups of events resembling the group's oldest event, largest groups first.
+
+        Oldest events anchor groups in turn and claim the unclaimed candidates that
+        reach the threshold against them. Unlike connected components this never
+        chains {A, B} to {A, B, C} to {A, C} into one group.
+
+        Returns:
+            [[(event id, estimated Jaccard to the group's first event)]]
+        """
+        with self.lock:
+            cached = self._clusters.get(threshold)
+            if cached is not None:
+                return cached
+
+            claimed = set()
+            result = []
+            for signature in sorted(self.groups, key=lambda sig: min(self.groups[sig])):
+                if signature in claimed:
+                    continue
+                claimed.add(signature)
+                members = [(event_id, 1.0) for event_id in self.groups[signature]]
+                for other in self._candidates(signature):
+                    if other in claimed:
+                        continue
+                    score = estimate(signature, other)
+                    if score >= threshold:
+                        claimed.add(other)
+                        members.extend((event_id, score) for event_id in self.groups[other])
+                if len(members) > 1:
+                    result.append(sorted(members))
+            result.sort(key=lambda cluster: (-len(cluster), cluster[0][0]))
+            self._clusters[threshold] = result
+            return result
+
+    def load(self, rows):
+        """Index (event_id, property_id) rows, replacing the entries of the events they cover."""
+        property_sets = {}
+        for event_id, property_id in rows:
+            property_sets.setdefault(event_id, set()).add(property_id)
+        for event_id, property_ids in property_sets.items():
+            self.set(event_id, property_ids)
+
+
+def _word_masks() -> list:
+    masks = []
+    for width in (16, 8, 4, 2, 1):
+        word = (1 << width) - 1
+        masks.append((width, int.from_bytes(word.to_bytes(4, "little") * NUM_PERM, "little")))
+    return masks
+
+
+_WORD_MASKS = _word_masks()
+
+
+def estimate(a: bytes, b: bytes) -> float:
+    """Estimated Jaccard similarity of the sets behind two MinHash signatures.
+
+    Counts the equal 32-bit minima with big-integer operations instead of a Python
+    loop: after XOR, each differing word is folded down to its lowest bit (masking
+    so that no bits cross into the word below) and those bits are counted.
+    """
+    folded = int.from_bytes(a, "little") ^ int.from_bytes(b, "little")
+    for shift, mask in _WORD_MASKS:
+        folded = (folded | (folded >> shift)) & mask
+    return round((NUM_PERM - folded.bit_count()) / NUM_PERM, 3)
+
+
+def build_index(db: Session) -> DuplicateIndex:
+    index = DuplicateIndex(taxonomy_version(db))
+    index.load(db.execute(text(EVENT_PROPERTY_IDS_SQL)))
+    return index
+
+
+def updates(db: Session, index: DuplicateIndex, entries):
+    """Re-sign the events changed by `entries` (see VersionedIndexCache)."""
+    if any(entry.entity_type == "property" and entry.action == "delete" for entry in entries):
+        return None  # Links went with the property; the changelog does not list the events
+    changed = changed_event_ids(db, entries)
+    rows = rows_in(db, EVENT_PROPERTY_IDS_SQL, "event_id", changed)
+
+    def update():
+        for event_id in changed:
+            index.discard(event_id)
+        index.load(rows)
+    return update
+
+
+index_cache = VersionedIndexCache(build_index, updates)
+
+
+def get_duplicate_index(db: Session) -> DuplicateIndex:
+    """Return the duplicate index for the current taxonomy version, updating it if needed."""
+    return index_cache.get(db)
+
+
+def event_names(db: Session, event_ids) -> dict:
+    event_ids = list(event_ids)
+    names = {}
+    for start in range(0, len(event_ids), 500):
+        chunk = event_ids[start:start + 500]
+        names.update(db.query(Event.id, Event.name).filter(Event.id.in_(chunk)).all())
+    return names
@@ -0,0 +1,391 @@
+"""
+Synthetic taxonomy generator for benchmarks and profiling.
+
+Writes events, properties, event-property links and changelog history straight
+into a SQLite file with bulk inserts (no running server needed), then builds the
+events_fts index in a single pass. Output is fully deterministic for a given seed.
+
+Usage:
+    python generate_taxonomy.py --output bench.db --events 100000 --seed 42
+"""
+import argparse
+import itertools
+import json
+import random
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from sqlalchemy import create_engine
+
+from database import Base, init_db
+
+# Fixed epoch so that generated timestamps do not depend on the wall clock
+BASE_TIME = datetime(2024, 1, 1)
+HISTORY_SPAN = timedelta(days=730)
+
+DEFAULT_CATEGORIES = [
+    "Engagement", "Navigation", "Transaction", "User", "Onboarding",
+    "Search", "Content", "Notifications", "Settings", "Growth",
+]
+
+DEFAULT_CREATORS = [
+    "admin@example.com", "pm@example.com", "analyst@example.com",
+    "growth@example.com", "mobile@example.com", "web@example.com",
+]
+
+OBJECTS = [
+    "Screen", "Page", "Button", "Product", "Cart", "Checkout", "Purchase", "Order",
+    "Subscription", "Trial", "Account", "Profile", "Session", "Search", "Filter",
+    "Notification", "Email", "Video", "Article", "Comment", "Share", "Invite",
+    "Payment", "Coupon", "Wishlist", "Review", "Message", "File", "Report", "Form",
+]
+
+ACTIONS = [
+    "Viewed", "Clicked", "Started", "Completed", "Failed", "Opened", "Closed",
+    "Created", "Updated", "Deleted", "Shared", "Submitted", "Dismissed", "Added",
+    "Removed", "Selected", "Expanded", "Played", "Paused", "Downloaded",
+]
+
+NOUNS = [
+    "user", "session", "order", "product", "screen", "page", "button", "cart",
+    "item", "content", "campaign", "device", "app", "search", "payment", "coupon",
+    "video", "article", "plan", "account", "message", "experiment", "referrer",
+    "platform", "locale", "region", "store", "category", "brand", "subscription",
+]
+
+# Property name suffix -> (data type, example value factory)
+SUFFIXES = [
+    ("id", "String", lambda rng: f"id_{rng.randint(1000, 99999)}"),
+    ("name", "String", lambda rng: rng.choice(["home", "signup", "checkout", "profile"])),
+    ("type", "String", lambda rng: rng.choice(["primary", "secondary", "default"])),
+    ("count", "Int", lambda rng: str(rng.randint(0, 500))),
+    ("index", "Int", lambda rng: str(rng.randint(0, 50))),
+    ("total", "Float", lambda rng: f"{rng.uniform(1, 500):.2f}"),
+    ("duration", "Float", lambda rng: f"{rng.uniform(0, 120):.1f}"),
+    ("enabled", "Boolean", lambda rng: rng.choice(["true", "false"])),
+    ("tags", "List", lambda rng: '["a", "b"]'),
+    ("metadata", "JSON", lambda rng: '{"key": "value"}'),
+]
+
+PROPERTY_TYPES = ["event", "user", "super"]
+PROPERTY_TYPE_CUM_WEIGHTS = [80, 95, 100]
+
+EXTRA_ACTIONS = ["update", "property_added", "property_removed"]
+EXTRA_ACTION_WEIGHTS = [50, 30, 20]
+
+
+def _format_dt(value: datetime) -> str:
+    """Format a datetime the way SQLAlchemy stores DateTime columns in SQLite."""
+    return value.isoformat(" ", "microseconds")
+
+
+def _property_definitions(count: int, rng: random.Random) -> list:
+    """Build `count` unique property definitions, most frequent names first."""
+    combos = [(noun, suffix) for suffix in SUFFIXES for noun in NOUNS]
+    rng.shuffle(combos)
+    # Keep the classic identifiers at the head of the Zipf distribution
+    head = [("user", SUFFIXES[0]), ("session", SUFFIXES[0]), ("platform", SUFFIXES[1])]
+    combos = head + [c for c in combos if c not in head]
+
+    definitions = []
+    for index in range(count):
+        noun, (suffix, data_type, example) = combos[index % len(combos)]
+        generation = index // len(combos)
+        name = f"{noun}_{suffix}" if generation == 0 else f"{noun}_{suffix}_{generation + 1}"
+        definitions.append({
+            "name": name,
+            "data_type": data_type,
+            "description": f"The {suffix} of the {noun}",
+            "example": example(rng),
+        })
+    return definitions
+
+
+def _zipf_cum_weights(count: int, exponent: float) -> list:
+    """Cumulative Zipf weights for ranks 1..count (rank 1 is the most reused)."""
+    return list(itertools.accumulate(1.0 / (rank ** exponent) for rank in range(1, count + 1)))
+
+
+def _pick_properties(rng, population, cum_weights, count) -> list:
+    """Draw `count` distinct property indexes following the Zipf weights."""
+    picked = {}
+    attempts = 0
+    while len(picked) < count and attempts < 4:
+        for index in rng.choices(population, cum_weights=cum_weights, k=count - len(picked)):
+            picked.setdefault(index, None)
+        attempts += 1
+    return list(picked)
+
+
+def generate_taxonomy(
+    output: Path,
+    events: int = 10000,
+    properties: int = 2000,
+    min_properties: int = 2,
+    max_properties: int = 12,
+    zipf_exponent: float = 1.1,
+    categories: list = None,
+    creators: list = None,
+    history_depth: int = 2,
+    required_ratio: float = 0.3,
+    seed: int = 0,
+    overwrite: bool = False,
+) -> dict:
+    """Generate a synthetic taxonomy into a fresh SQLite database.
+
+    Args:
+        output: Path of the SQLite file to create
+        events: Number of events to generate
+        properties: Size of the property registry
+        min_properties: Minimum number of properties per event
+        max_properties: Maximum number of properties per event
+        zipf_exponent: Skew of property reuse (higher means a few properties dominate)
+        categories: Category names to draw from
+        creators: Creator emails to draw from
+        history_depth: Average number of changelog entries per event after its creation
+        required_ratio: Probability that an event property is required
+        seed: Random seed; identical arguments always produce identical databases
+        overwrite: Replace `output` if it already exists
+
+    Returns:
+        Row counts per table and the elapsed time in seconds
+    """
+    started = time.perf_counter()
+    output = Path(output)
+    if output.exists():
+        if not overwrite:
+            raise FileExistsError(f"{output} already exists (pass overwrite=True to replace it)")
+        for suffix in ("", "-wal", "-shm"):
+            Path(f"{output}{suffix}").unlink(missing_ok=True)
+
+    rng = random.Random(seed)
+    categories = categories or DEFAULT_CATEGORIES
+    creators = creators or DEFAULT_CREATORS
+    max_properties = max(min_properties, min(max_properties, properties))
+    min_properties = min(min_properties, max_properties)
+
+    prop_defs = _property_definitions(properties, rng)
+    population = range(properties)
+    cum_weights = _zipf_cum_weights(properties, zipf_exponent)
+    prop_created = [None] * properties
+
+    event_rows = []
+    link_rows = []
+    changelog_rows = []
+    step = HISTORY_SPAN / max(events, 1)
+    link_id = 0
+    seen_names = set()
+
+    def prop_entry(link, index, property_type, required):
+        # Same compact shape as changelog.property_entry
+        definition = prop_defs[index]
+        entry = {
+            "id": link,
+            "property_id": index + 1,
+            "name": definition["name"],
+            "type": property_type,
+            "data_type": definition["data_type"],
+        }
+        if required:
+            entry["required"] = True
+        entry["example"] = definition["example"]
+        return entry
+
+    for event_id in range(1, events + 1):
+        created_at = BASE_TIME + step * (event_id - 1)
+        name = f"{rng.choice(OBJECTS)} {rng.choice(ACTIONS)}"
+        if name in seen_names:
+            name = f"{name} {event_id}"
+        seen_names.add(name)
+        category = rng.choice(categories)
+        creator = rng.choice(creators)
+
+        # Final property set of the event
+        picked = _pick_properties(rng, population, cum_weights,
+                                  rng.randint(min_properties, max_properties))
+        types = rng.choices(PROPERTY_TYPES, cum_weights=PROPERTY_TYPE_CUM_WEIGHTS, k=len(picked))
+        final = [(index, property_type, rng.random() < required_ratio)
+                 for index, property_type in zip(picked, types)]
+
+        # History: plan follow-up edits so that replaying the changelog ends in `final`
+        actions = rng.choices(EXTRA_ACTIONS, weights=EXTRA_ACTION_WEIGHTS,
+                              k=rng.randint(0, 2 * history_depth))
+        final_indexes = {index for index, *_ in final}
+        late_added = []
+        removed = []
+        for action in actions:
+            if action == "property_added" and len(late_added) < len(final) - 1:
+                late_added.append(final[len(late_added)])
+            elif action == "property_removed":
+                index = rng.choices(population, cum_weights=cum_weights)[0]
+                if index not in final_indexes:
+                    final_indexes.add(index)
+                    removed.append((index, "event", False))
+        updates = sum(1 for action in actions if action == "update")
+        initial = removed + final[len(late_added):]
+
+        description = f"User {name.lower()} in the {category.lower()} flow"
+        descriptions = [f"{description} (draft {n + 1})" for n in range(updates)] + [description]
+
+        # Timestamps for every entry of this event, strictly after creation
+        times = sorted(created_at + timedelta(seconds=rng.uniform(1, 86400 * 30))
+                       for _ in range(len(late_added) + len(removed) + updates))
+        updated_at = times[-1] if times else created_at
+
+        link_ids = {}
+        for index, *_ in initial + late_added:
+            link_id += 1
+            link_ids[index] = link_id
+            if prop_created[index] is None:
+                prop_created[index] = (created_at, creator)
+
+        event_rows.append((event_id, name, description, category,
+                           _format_dt(created_at), _format_dt(updated_at), creator))
+        for index, property_type, required in final:
+            link_rows.append((link_ids[index], event_id, index + 1, property_type, required,
+                              prop_defs[index]["example"]))
+
+        changelog_rows.append((created_at, "event", event_id, "create", None, {
+            "name": name,
+            "description": descriptions[0],
+            "category": category,
+            "properties": [prop_entry(link_ids[p[0]], *p) for p in initial],
+        }, creator))
+
+        timeline = (
+            [("update", None)] * updates
+            + [("property_added", p) for p in late_added]
+            + [("property_removed", p) for p in removed]
+        )
+        rng.shuffle(timeline)
+        version = 0
+        for changed_at, (action, prop) in zip(times, timeline):
+            editor = rng.choice(creators)
+            if action == "update":
+                # Field-level delta, with the name kept for display
+                old = {"description": descriptions[version]}
+                version += 1
+                new = {"description": descriptions[version], "name": name}
+                changelog_rows.append((changed_at, "event", event_id, "update", old, new, editor))
+            elif action == "property_added":
+                changelog_rows.append((changed_at, "event", event_id, "update", None, {
+                    "action": "property_added", "name": name,
+                    "property": prop_entry(link_ids[prop[0]], *prop)
+                }, editor))
+            else:
+                changelog_rows.append((changed_at, "event", event_id, "update", {
+                    "action": "property_removed", "name": name,
+                    "property": prop_entry(link_ids[prop[0]], *prop)
+                }, None, editor))
+
+    # Registry properties never attached to an event were created standalone
+    property_rows = []
+    for index, definition in enumerate(prop_defs):
+        if prop_created[index] is None:
+            created_at = BASE_TIME + HISTORY_SPAN * rng.random()
+            creator = rng.choice(creators)
+            prop_created[index] = (created_at, creator)
+            changelog_rows.append((created_at, "property", index + 1, "create", None, {
+                "name": definition["name"], "data_type": definition["data_type"]
+            }, creator))
+        created_at, creator = prop_created[index]
+        property_rows.append((index + 1, definition["name"], definition["data_type"],
+                              definition["description"], _format_dt(created_at), creator))
+
+    changelog_rows.sort(key=lambda row: row[0])
+
+    encoder = json.JSONEncoder(separators=(",", ":"))
+
+    def encode(value):
+        return None if value is None else encoder.encode(value)
+
+    engine = create_engine(f"sqlite:///{output}")
+    Base.metadata.create_all(bind=engine)
+    # Secondary indexes are rebuilt once after the load instead of per row
+    indexes = [index for table in Base.metadata.sorted_tables for index in table.indexes]
+    for index in indexes:
+        index.drop(bind=engine)
+
+    raw = engine.raw_connection()
+    try:
+        cursor = raw.cursor()
+        # The file is being created from scratch, so crash safety is irrelevant during the load
+        cursor.execute("PRAGMA journal_mode=OFF")
+        cursor.execute("PRAGMA synchronous=OFF")
+        cursor.execute("PRAGMA cache_size=-262144")
+        cursor.executemany(
+            "INSERT INTO properties (id, name, data_type, description, created_at, created_by) "
+            "VALUES (?, ?, ?, ?, ?, ?)", property_rows)
+        cursor.executemany(
+            "INSERT INTO events (id, name, description, category, created_at, updated_at, created_by) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)", event_rows)
+        cursor.executemany(
+            "INSERT INTO event_properties (id, event_id, property_id, property_type, is_required, example_value) "
+            "VALUES (?, ?, ?, ?, ?, ?)", link_rows)
+        cursor.executemany(
+            "INSERT INTO changelog (entity_type, entity_id, action, old_value, new_value, changed_by, changed_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            ((entity_type, entity_id, action, encode(old), encode(new), changed_by, _format_dt(changed_at))
+             for changed_at, entity_type, entity_id, action, old, new, changed_by in changelog_rows))
+        raw.commit()
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.close()
+    finally:
+        raw.close()
+
+    for index in indexes:
+        index.create(bind=engine)
+
+    # Installs the sync triggers only now, after the load, so that events_fts, changelog_terms,
+    # changelog_rollups and property_cooccurrence are each built by one INSERT ... SELECT
+    init_db(engine)
+    engine.dispose()
+
+    return {
+        "events": len(event_rows),
+        "properties": len(property_rows),
+        "event_properties": len(link_rows),
+        "changelog": len(changelog_rows),
+        "seconds": round(time.perf_counter() - started, 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a synthetic event taxonomy database")
+    parser.add_argument("--output", type=Path, required=True, help="SQLite file to create")
+    parser.add_argument("--events", type=int, default=10000)
+    parser.add_argument("--properties", type=int, default=2000)
+    parser.add_argument("--min-properties", type=int, default=2)
+    parser.add_argument("--max-properties", type=int, default=12)
+    parser.add_argument("--zipf", type=float, default=1.1, help="Zipf exponent for property reuse")
+    parser.add_argument("--categories", type=lambda s: s.split(","), default=None,
+                        help="Comma-separated category names")
+    parser.add_argument("--creators", type=lambda s: s.split(","), default=None,
+                        help="Comma-separated creator emails")
+    parser.add_argument("--history-depth", type=int, default=2,
+                        help="Average changelog entries per event after creation")
+    parser.add_argument("--required-ratio", type=float, default=0.3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--overwrite", action="store_true")
+    args = parser.parse_args()
+
+    counts = generate_taxonomy(
+        args.output,
+        events=args.events,
+        properties=args.properties,
+        min_properties=args.min_properties,
+        max_properties=args.max_properties,
+        zipf_exponent=args.zipf,
+        categories=args.categories,
+        creators=args.creators,
+        history_depth=args.history_depth,
+        required_ratio=args.required_ratio,
+        seed=args.seed,
+        overwrite=args.overwrite,
+    )
+    print(f"Generated {args.output}: " + ", ".join(f"{k}={v}" for k, v in counts.items()))
+
+
+if __name__ == "__main__":
+    main()
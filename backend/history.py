@@ -0,0 +1,281 @@
+"""
+Point-in-time reconstruction of events from the changelog.
+
+The state of every event at changelog entry N is rebuilt from the nearest
+checkpoint at or before N plus a replay of only the entries after it, so the
+cost is bounded by the checkpoint spacing rather than the length of the history.
+
+A checkpoint stores the state of each event that changed since the previous
+checkpoint (one row per event, see database.EventCheckpoint), so storage grows
+with the history rather than with history times taxonomy size, and one event is
+looked up with a single indexed read. Checkpoints are written off the request
+path by CheckpointWriter, a background thread that adds one once at least
+CHECKPOINT_MIN_ENTRIES entries have been written since the last. The most
+recently decoded full checkpoints are cached in memory per database.
+
+Event states are changelog.apply_entry states plus created_at / updated_at /
+created_by taken from the entries themselves; property renames and merges are
+applied to the events showing the property. Property descriptions are not
+versioned, so reconstructed properties carry their current description.
+"""
+import heapq
+import json
+import logging
+import threading
+import weakref
+import zlib
+from collections import OrderedDict
+from datetime import datetime, UTC
+
+from sqlalchemy import func, insert, text
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from archive import changelog_rows, last_id_at
+from changelog import apply_entry, apply_property_change
+from database import Changelog, ChangelogCheckpoint, EventCheckpoint, Property
+
+CHECKPOINT_MIN_ENTRIES = 1000  # Entries since the last checkpoint before another is written
+CHECKPOINT_POLL_SECONDS = 60
+CACHED_SNAPSHOTS = 4
+
+LATEST_STATES_SQL = """
+    SELECT event_id, state, MAX(changelog_id) FROM event_checkpoints
+    WHERE changelog_id <= :checkpoint GROUP BY event_id
+"""
+
+logger = logging.getLogger(__name__)
+
+# Engine -> OrderedDict(checkpoint changelog_id -> decoded states), LRU order
+_snapshots = weakref.WeakKeyDictionary()
+_snapshots_lock = threading.Lock()
+
+
+def parse_as_of(value: str) -> datetime:
+    """Parse an ISO timestamp into the naive UTC form stored in the changelog."""
+    parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(UTC).replace(tzinfo=None)
+    return parsed
+
+
+def _encode(state: dict) -> bytes:
+    return zlib.compress(json.dumps(state, separators=(",", ":")).encode())
+
+
+def _decode(blob: bytes) -> dict:
+    return json.loads(zlib.decompress(blob))
+
+
+def _apply(states: dict, row):
+    """Apply one changelog row to the {event_id: state} map (in place).
+
+    Property rows only matter when they rename or merge properties shown by events.
+    """
+    entry_id, entity_type, entity_id, action, old_value, new_value, changed_by, changed_at = row
+    changed_at = changed_at.isoformat()
+    if entity_type == "property":
+        if action == "update":
+            for event_id, state in list(states.items()):
+                changed = apply_property_change(state, entity_id, old_value, new_value)
+                if changed is not state:
+                    states[event_id] = dict(changed, updated_at=changed_at)
+        return
+
+    event_id = entity_id
+    state = apply_entry(states.get(event_id), "event", action, old_value, new_value)
+    if state is None:
+        states.pop(event_id, None)
+        return
+    if action == "create":
+        state["created_at"] = changed_at
+        state["created_by"] = changed_by
+    state["updated_at"] = changed_at
+    states[event_id] = state
+
+
+def version_at(db: Session, as_of: datetime) -> int:
+    """Id of the last changelog entry at or before as_of (0 if none)."""
+    return last_id_at(db, as_of)
+
+
+def _checkpoint_before(db: Session, version: int) -> int:
+    """changelog_id of the latest checkpoint at or before version (0 if none)."""
+    return db.query(func.max(ChangelogCheckpoint.changelog_id)).filter(
+        ChangelogCheckpoint.changelog_id <= version
+    ).scalar() or 0
+
+
+def _cached(db: Session, checkpoint_id: int):
+    with _snapshots_lock:
+        cache = _snapshots.get(db.get_bind())
+        states = cache.get(checkpoint_id) if cache is not None else None
+        if states is not None:
+            cache.move_to_end(checkpoint_id)
+        return states
+
+
+def _cache(db: Session, checkpoint_id: int, states: dict):
+    with _snapshots_lock:
+        cache = _snapshots.setdefault(db.get_bind(), OrderedDict())
+        cache[checkpoint_id] = states
+        while len(cache) > CACHED_SNAPSHOTS:
+            cache.popitem(last=False)
+
+
+def _states_at_checkpoint(db: Session, checkpoint_id: int) -> dict:
+    """{event_id: state} at a checkpoint; the result is shared, so copy it before changing it."""
+    if not checkpoint_id:
+        return {}
+    states = _cached(db, checkpoint_id)
+    if states is None:
+        # SQLite takes the bare columns from the row holding MAX(changelog_id)
+        rows = db.execute(text(LATEST_STATES_SQL), {"checkpoint": checkpoint_id})
+        states = {event_id: _decode(blob) for event_id, blob, _ in rows if blob is not None}
+        _cache(db, checkpoint_id, states)
+    return states
+
+
+def events_at(db: Session, version: int) -> dict:
+    """States of all events that existed after changelog entry `version`.
+
+    Returns:
+        {event_id: state}
+    """
+    start = _checkpoint_before(db, version)
+    # apply_entry never mutates states, so a shallow copy keeps the cached checkpoint intact
+    states = dict(_states_at_checkpoint(db, start))
+    for row in changelog_rows(db, after_id=start, up_to_id=version):
+        _apply(states, row)
+    return states
+
+
+def event_at(db: Session, event_id: int, version: int):
+    """State of one event after changelog entry `version` (None if it did not exist)."""
+    start = _checkpoint_before(db, version)
+    states = {}
+    if start:
+        cached = _cached(db, start)
+        if cached is not None:
+            state = cached.get(event_id)
+        else:
+            blob = db.query(EventCheckpoint.state).filter(
+                EventCheckpoint.event_id == event_id, EventCheckpoint.changelog_id <= start
+            ).order_by(EventCheckpoint.changelog_id.desc()).limit(1).scalar()
+            state = _decode(blob) if blob is not None else None
+        if state is not None:
+            states[event_id] = state
+
+    rows = heapq.merge(
+        changelog_rows(db, after_id=start, up_to_id=version, entity_type="event", entity_id=event_id),
+        changelog_rows(db, after_id=start, up_to_id=version, entity_type="property"),
+        key=lambda row: row[0],
+    )
+    for row in rows:
+        _apply(states, row)
+    return states.get(event_id)
+
+
+def write_checkpoint(db: Session, min_entries: int = None):
+    """Store a checkpoint at the current version if enough entries were written since the last one.
+
+    Only events whose state changed since the last checkpoint get a row (deleted
+    ones a NULL state).
+
+    Returns:
+        The new checkpoint's changelog_id, or None if none was written
+    """
+    min_entries = CHECKPOINT_MIN_ENTRIES if min_entries is None else min_entries
+    version = db.query(func.max(Changelog.id)).scalar() or 0
+    start = _checkpoint_before(db, version)
+    if not version or version - start < min_entries:
+        return None
+
+    before = _states_at_checkpoint(db, start)
+    states = dict(before)
+    for row in changelog_rows(db, after_id=start, up_to_id=version):
+        _apply(states, row)
+
+    # Replaying puts a new object in place of every event it changes
+    rows = [{"changelog_id": version, "event_id": event_id, "state": _encode(state)}
+            for event_id, state in states.items() if before.get(event_id) is not state]
+    rows.extend({"changelog_id": version, "event_id": event_id, "state": None}
+                for event_id in before.keys() - states.keys())
+    db.add(ChangelogCheckpoint(changelog_id=version, events=len(states)))
+    try:
+        db.flush()
+        if rows:
+            db.execute(insert(EventCheckpoint), rows)
+        db.commit()
+    except IntegrityError:
+        # Another process stored the same checkpoint first
+        db.rollback()
+        return None
+    _cache(db, version, states)
+    return version
+
+
+class CheckpointWriter:
+    """Writes checkpoints on a background thread (see write_checkpoint)."""
+
+    def __init__(self, session_factory, poll_interval: float = CHECKPOINT_POLL_SECONDS):
+        self.session_factory = session_factory
+        self.poll_interval = poll_interval
+        self._stop = threading.Event()
+        self._thread = None
+
+    def run(self):
+        while not self._stop.is_set():
+            try:
+                with self.session_factory() as db:
+                    write_checkpoint(db)
+            except Exception as exc:  # Keep running; as_of reads only get slower without checkpoints
+                logger.warning("Writing a changelog checkpoint failed: %s", exc)
+            self._stop.wait(self.poll_interval)
+
+    def start(self):
+        self._thread = threading.Thread(target=self.run, name="checkpoint-writer", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+
+def event_response(db: Session, event_id: int, state: dict, descriptions: dict = None) -> dict:
+    """Format a reconstructed state like the EventResponse dicts of the API."""
+    if descriptions is None:
+        descriptions = property_descriptions(db, [state])
+    return {
+        "id": event_id,
+        "name": state.get("name"),
+        "description": state.get("description"),
+        "category": state.get("category"),
+        "created_by": state.get("created_by"),
+        "created_at": state.get("created_at"),
+        "updated_at": state.get("updated_at"),
+        "properties": [
+            {
+                "id": prop.get("id", 0),
+                "property_id": prop.get("property_id", 0),
+                "property_name": prop["name"],
+                "property_type": prop.get("type", "event"),
+                "data_type": prop.get("data_type", ""),
+                "description": descriptions.get(prop.get("property_id")),
+                "is_required": prop.get("required", False),
+                "example_value": prop.get("example"),
+            }
+            for prop in state.get("properties") or []
+        ],
+    }
+
+
+def property_descriptions(db: Session, states) -> dict:
+    """Current descriptions of the properties referenced by the given states."""
+    ids = {prop.get("property_id") for state in states for prop in state.get("properties") or []}
+    ids.discard(None)
+    if not ids:
+        return {}
+    return dict(db.query(Property.id, Property.description).filter(Property.id.in_(ids)).all())
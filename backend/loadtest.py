@@ -0,0 +1,416 @@
+"""
+Concurrent mixed-workload load generator for the API.
+
+Drives the FastAPI app with many concurrent async clients, either in-process
+through httpx's ASGI transport or against a running server, replaying a weighted
+mix of reads and writes. For every step of a concurrency ramp it reports
+throughput, latency percentiles and error/lock rates, so the saturation point
+(thread pool, SQLite write lock or serialization) shows up as a knee in the curve.
+
+Usage:
+    python loadtest.py --db bench.db --concurrency 1,4,16,64 --duration 10
+    python loadtest.py --url http://localhost:8000 --concurrency 8,32 --duration 30
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+from collections import defaultdict
+
+import httpx
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+DEFAULT_MIX = {
+    "list_events": 25,
+    "get_event": 15,
+    "search": 15,
+    "suggest": 15,
+    "changelog": 10,
+    "create_event": 5,
+    "update_event": 6,
+    "add_property": 4,
+    "remove_property": 3,
+    "import_json": 2,
+}
+
+READ_OPERATIONS = {"list_events", "get_event", "search", "suggest", "changelog"}
+
+SEARCH_TERMS = ["view", "click", "purchase", "user", "order", "screen", "session", "cart"]
+PROPERTY_PREFIXES = ["user", "session", "order", "product", "screen", "cart", "item", "page"]
+PROPERTY_SUFFIXES = ["id", "name", "type", "count", "total"]
+
+
+class LoadState:
+    """Event ids known to the workers, shared across one run."""
+
+    def __init__(self, event_ids):
+        self.event_ids = list(event_ids)
+        self.counter = 0
+
+    def pick_event(self, rng):
+        return rng.choice(self.event_ids) if self.event_ids else None
+
+    def unique_name(self, prefix, rng):
+        self.counter += 1
+        return f"{prefix} {self.counter}-{rng.getrandbits(32):08x}"
+
+
+def _property_payloads(rng, state, count):
+    """Property definitions with distinct names (duplicates would violate uq_event_property_type)."""
+    names = {
+        f"{rng.choice(PROPERTY_PREFIXES)}_{rng.choice(PROPERTY_SUFFIXES)}_{rng.randint(0, 49)}"
+        for _ in range(count)
+    }
+    return [{
+        "property_name": name,
+        "property_type": "event",
+        "data_type": "String",
+        "is_required": rng.random() < 0.3,
+        "example_value": "load",
+    } for name in sorted(names)]
+
+
+async def _list_events(client, state, rng):
+    params = {"limit": 50, "skip": rng.randint(0, 200)}
+    if rng.random() < 0.3:
+        params["q"] = rng.choice(SEARCH_TERMS)
+    return await client.get("/api/events", params=params)
+
+
+async def _get_event(client, state, rng):
+    return await client.get(f"/api/events/{state.pick_event(rng) or 1}")
+
+
+async def _search(client, state, rng):
+    return await client.get("/api/search", params={"q": rng.choice(SEARCH_TERMS)})
+
+
+async def _suggest(client, state, rng):
+    return await client.get("/api/properties/suggest", params={
+        "q": f"{rng.choice(PROPERTY_PREFIXES)}{rng.choice(PROPERTY_SUFFIXES)}"
+    })
+
+
+async def _changelog(client, state, rng):
+    return await client.get("/api/changelog", params={"limit": 50})
+
+
+async def _create_event(client, state, rng):
+    response = await client.post("/api/events", json={
+        "name": state.unique_name("Load Event", rng),
+        "description": "Created by the load generator",
+        "category": "Load",
+        "created_by": "loadtest",
+        "properties": _property_payloads(rng, state, rng.randint(1, 4)),
+    })
+    if response.status_code == 200:
+        state.event_ids.append(response.json()["id"])
+    return response
+
+
+async def _update_event(client, state, rng):
+    return await client.put(
+        f"/api/events/{state.pick_event(rng) or 1}",
+        params={"changed_by": "loadtest"},
+        json={"description": f"Edited by the load generator ({rng.random():.6f})"},
+    )
+
+
+async def _add_property(client, state, rng):
+    return await client.post(
+        f"/api/events/{state.pick_event(rng) or 1}/properties",
+        params={"changed_by": "loadtest"},
+        json=_property_payloads(rng, state, 1)[0],
+    )
+
+
+async def _remove_property(client, state, rng):
+    event_id = state.pick_event(rng) or 1
+    response = await client.get(f"/api/events/{event_id}")
+    if response.status_code != 200 or not response.json()["properties"]:
+        return response
+    event_property = rng.choice(response.json()["properties"])
+    return await client.delete(
+        f"/api/events/{event_id}/properties/{event_property['id']}",
+        params={"changed_by": "loadtest"},
+    )
+
+
+async def _import_json(client, state, rng):
+    events = [{
+        "name": state.unique_name("Imported Event", rng),
+        "category": "Load",
+        "properties": _property_payloads(rng, state, 2),
+    } for _ in range(5)]
+    return await client.post("/api/import/json", files={
+        "file": ("events.json", json.dumps(events).encode(), "application/json")
+    })
+
+
+OPERATIONS = {
+    "list_events": _list_events,
+    "get_event": _get_event,
+    "search": _search,
+    "suggest": _suggest,
+    "changelog": _changelog,
+    "create_event": _create_event,
+    "update_event": _update_event,
+    "add_property": _add_property,
+    "remove_property": _remove_property,
+    "import_json": _import_json,
+}
+
+
+def _percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, round(fraction * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def _is_lock_error(text):
+    return "database is locked" in text or "database table is locked" in text
+
+
+def _summarize(latencies, errors, locks, elapsed):
+    """Build the report row for one set of latencies (seconds)."""
+    latencies = sorted(latencies)
+    total = len(latencies)
+    return {
+        "requests": total,
+        "throughput": round(total / elapsed, 1) if elapsed else 0.0,
+        "p50_ms": round(_percentile(latencies, 0.50) * 1000, 2),
+        "p90_ms": round(_percentile(latencies, 0.90) * 1000, 2),
+        "p99_ms": round(_percentile(latencies, 0.99) * 1000, 2),
+        "max_ms": round(latencies[-1] * 1000, 2) if latencies else 0.0,
+        "error_rate": round(errors / total, 4) if total else 0.0,
+        "lock_rate": round(locks / total, 4) if total else 0.0,
+    }
+
+
+async def _run_level(client, state, concurrency, mix, duration, requests, seed):
+    """Run `concurrency` workers until the duration or request budget is spent."""
+    names = list(mix)
+    weights = [mix[name] for name in names]
+    latencies = defaultdict(list)
+    errors = defaultdict(int)
+    locks = defaultdict(int)
+    remaining = [requests] if requests else None
+    deadline = time.perf_counter() + duration if duration else None
+
+    async def worker(worker_id):
+        rng = random.Random(seed * 1000003 + worker_id)
+        while True:
+            if deadline is not None and time.perf_counter() >= deadline:
+                return
+            if remaining is not None:
+                if remaining[0] <= 0:
+                    return
+                remaining[0] -= 1
+
+            name = rng.choices(names, weights=weights)[0]
+            started = time.perf_counter()
+            try:
+                response = await OPERATIONS[name](client, state, rng)
+                # The API answers lock timeouts with 503, but look at every error body
+                locked = response.status_code >= 400 and _is_lock_error(response.text)
+                failed = response.status_code >= 500 or locked
+            except Exception as exc:  # In-process app errors surface as exceptions
+                failed = True
+                locked = _is_lock_error(str(exc))
+            latencies[name].append(time.perf_counter() - started)
+            if failed:
+                errors[name] += 1
+            if locked:
+                locks[name] += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker(i) for i in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    everything = [value for values in latencies.values() for value in values]
+    level = {"concurrency": concurrency, "seconds": round(elapsed, 3)}
+    level.update(_summarize(everything, sum(errors.values()), sum(locks.values()), elapsed))
+    level["operations"] = {
+        name: _summarize(values, errors[name], locks[name], elapsed)
+        for name, values in sorted(latencies.items())
+    }
+    reads = [v for name in READ_OPERATIONS for v in latencies.get(name, [])]
+    writes = [v for name in latencies if name not in READ_OPERATIONS for v in latencies[name]]
+    level["reads"] = _summarize(
+        reads,
+        sum(errors[name] for name in READ_OPERATIONS),
+        sum(locks[name] for name in READ_OPERATIONS),
+        elapsed,
+    )
+    level["writes"] = _summarize(
+        writes,
+        sum(count for name, count in errors.items() if name not in READ_OPERATIONS),
+        sum(count for name, count in locks.items() if name not in READ_OPERATIONS),
+        elapsed,
+    )
+    return level
+
+
+def _find_saturation(levels, gain=1.1):
+    """Return the first concurrency whose throughput gained less than `gain` over the previous step."""
+    for previous, current in zip(levels, levels[1:]):
+        if current["throughput"] < previous["throughput"] * gain:
+            return previous["concurrency"]
+    return None
+
+
+async def run_load(client, levels, mix=None, duration=None, requests=None, seed=0, threads=None):
+    """Run a concurrency ramp against an httpx.AsyncClient.
+
+    Args:
+        client: AsyncClient pointed at the app (ASGI transport or real server)
+        levels: Concurrency levels to step through, in order
+        mix: Operation name -> relative weight (defaults to DEFAULT_MIX)
+        duration: Seconds to run each level
+        requests: Alternatively, a fixed number of requests per level
+        seed: Seed for the per-worker random generators
+        threads: Size of the worker thread pool for sync endpoints (in-process only)
+
+    Returns:
+        Report with one entry per level and the detected saturation point
+    """
+    mix = {name: weight for name, weight in (mix or DEFAULT_MIX).items() if weight > 0}
+    unknown = set(mix) - set(OPERATIONS)
+    if unknown:
+        raise ValueError(f"Unknown operations in mix: {', '.join(sorted(unknown))}")
+    if not duration and not requests:
+        raise ValueError("Either duration or requests must be set")
+
+    if threads:
+        import anyio.to_thread
+        anyio.to_thread.current_default_thread_limiter().total_tokens = threads
+
+    response = await client.get("/api/events", params={"limit": 500})
+    response.raise_for_status()
+    state = LoadState(event["id"] for event in response.json())
+
+    results = []
+    for concurrency in levels:
+        results.append(await _run_level(client, state, concurrency, mix, duration, requests, seed))
+
+    return {
+        "mix": mix,
+        "levels": results,
+        "saturation_concurrency": _find_saturation(results),
+    }
+
+
+def inprocess_client(db_path, raise_app_exceptions=True):
+    """Create an AsyncClient that calls `api.app` in-process against a SQLite file.
+
+    Returns:
+        (client, close) where `close()` restores the app's database dependency
+    """
+    from api import app
+    from database import get_db, init_db
+
+    engine = create_engine(f"sqlite:///{db_path}", connect_args={"check_same_thread": False})
+    init_db(engine)
+    SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+    def override_get_db():
+        db = SessionLocal()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    previous = app.dependency_overrides.get(get_db)
+    app.dependency_overrides[get_db] = override_get_db
+    transport = httpx.ASGITransport(app=app, raise_app_exceptions=raise_app_exceptions)
+    client = httpx.AsyncClient(transport=transport, base_url="http://loadtest")
+
+    async def close():
+        await client.aclose()
+        if previous is None:
+            app.dependency_overrides.pop(get_db, None)
+        else:
+            app.dependency_overrides[get_db] = previous
+        engine.dispose()
+
+    return client, close
+
+
+def format_report(report):
+    """Render the saturation curve as a plain-text table."""
+    lines = [
+        f"{'conc':>5} {'req/s':>9} {'p50 ms':>9} {'p90 ms':>9} {'p99 ms':>9} "
+        f"{'errors':>8} {'locks':>8} {'write p99':>10}"
+    ]
+    for level in report["levels"]:
+        lines.append(
+            f"{level['concurrency']:>5} {level['throughput']:>9.1f} {level['p50_ms']:>9.2f} "
+            f"{level['p90_ms']:>9.2f} {level['p99_ms']:>9.2f} {level['error_rate']:>8.2%} "
+            f"{level['lock_rate']:>8.2%} {level['writes']['p99_ms']:>10.2f}"
+        )
+    if report["saturation_concurrency"] is not None:
+        lines.append(f"Throughput stops scaling beyond concurrency {report['saturation_concurrency']}")
+    return "\n".join(lines)
+
+
+def _parse_mix(value):
+    mix = {}
+    for item in value.split(","):
+        name, _, weight = item.partition("=")
+        mix[name.strip()] = float(weight or 1)
+    return mix
+
+
+async def _main(args):
+    if args.url:
+        client = httpx.AsyncClient(base_url=args.url, timeout=args.timeout)
+        close = client.aclose
+    else:
+        client, close = inprocess_client(args.db)
+    try:
+        report = await run_load(
+            client,
+            levels=args.concurrency,
+            mix=args.mix,
+            duration=args.duration,
+            requests=args.requests,
+            seed=args.seed,
+            threads=None if args.url else args.threads,
+        )
+    finally:
+        await close()
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print(format_report(report))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mixed-workload load generator for the taxonomy API")
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument("--db", help="SQLite file to drive in-process through the ASGI transport")
+    target.add_argument("--url", help="Base URL of a running server, e.g. http://localhost:8000")
+    parser.add_argument("--concurrency", type=lambda s: [int(x) for x in s.split(",")],
+                        default=[1, 4, 16, 64], help="Comma-separated concurrency ramp")
+    parser.add_argument("--duration", type=float, default=None, help="Seconds per level")
+    parser.add_argument("--requests", type=int, default=None, help="Requests per level")
+    parser.add_argument("--mix", type=_parse_mix, default=None,
+                        help="Weights, e.g. list_events=50,create_event=5 (default: built-in mix)")
+    parser.add_argument("--threads", type=int, default=None, help="Worker thread pool size (in-process)")
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", action="store_true", help="Print the full report as JSON")
+    args = parser.parse_args()
+    if not args.duration and not args.requests:
+        args.duration = 10.0
+
+    asyncio.run(_main(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,5 @@
-from pydantic import BaseModel, ConfigDict
-from typing import Optional, List
+from pydantic import BaseModel, ConfigDict, Field
+from typing import Annotated, Optional, List, Dict, Any, Literal, Union
 from datetime import datetime
 
 
@@ -14,9 +14,51 @@ class PropertyCreate(PropertyBase):
     pass
 
 
+class ValueCount(BaseModel):
+    value: str
+    count: int
+
+
+class NumericStats(BaseModel):
+    count: int
+    min: float
+    max: float
+    mean: float
+    p50: float
+    p90: float
+    p99: float
+
+
+class PropertyStats(BaseModel):
+    observations: int
+    nulls: int
+    distinct_estimate: int
+    top_values: List[ValueCount] = []
+    numeric: Optional[NumericStats] = None
+
+
+class PropertyMerge(BaseModel):
+    target: str  # Name of the property that stays
+    sources: List[str] = Field(..., min_length=1)  # Names of the properties merged into it
+    force: bool = False  # Merge even if the sources' data types differ from the target's
+
+
+class PropertyRename(BaseModel):
+    name: str
+
+
+class PropertyUsage(BaseModel):
+    events: int  # Events linking the property
+    required: int  # Events where it is required
+    by_type: Dict[str, int] = {}  # Events per property_type
+
+
 class PropertyResponse(PropertyBase):
     id: int
     created_at: datetime
+    updated_at: Optional[datetime] = None
+    stats: Optional[PropertyStats] = None
+    usage: Optional[PropertyUsage] = None
 
     model_config = ConfigDict(from_attributes=True)
 
@@ -63,6 +105,36 @@ class EventUpdate(BaseModel):
     category: Optional[str] = None
 
 
+class SetEventFields(EventUpdate):
+    op: Literal["set"]
+
+
+class AddEventProperty(EventPropertyCreate):
+    op: Literal["add_property"]
+
+
+class RemoveEventProperty(BaseModel):
+    op: Literal["remove_property"]
+    event_property_id: int
+
+
+class UpdateEventProperty(BaseModel):
+    op: Literal["update_property"]
+    event_property_id: int
+    is_required: Optional[bool] = None
+    example_value: Optional[str] = None  # Only applied when given, so null clears it
+
+
+EventOperation = Annotated[
+    Union[SetEventFields, AddEventProperty, RemoveEventProperty, UpdateEventProperty],
+    Field(discriminator="op"),
+]
+
+
+class EventPatch(BaseModel):
+    operations: List[EventOperation] = Field(..., min_length=1)  # Applied in order, all or nothing
+
+
 class EventResponse(EventBase):
     id: int
     created_at: datetime
@@ -85,7 +157,58 @@ class ChangelogResponse(BaseModel):
     model_config = ConfigDict(from_attributes=True)
 
 
+class TombstoneResponse(BaseModel):
+    entity_type: str
+    entity_id: int
+    name: Optional[str] = None
+    deleted_at: datetime
+
+    model_config = ConfigDict(from_attributes=True)
+
+
+class SyncResponse(BaseModel):
+    version: int
+    full: bool
+    events: List[EventResponse]
+    properties: List[PropertyResponse]
+    deleted: List[TombstoneResponse]
+
+
 class PropertySuggestion(BaseModel):
     name: str
     data_type: str
     similarity: float
+
+
+class SuggestionBatch(BaseModel):
+    queries: List[str] = Field(..., max_length=10000)
+    threshold: float = Field(default=0.6, ge=0.0, le=1.0)
+    top_k: int = Field(default=5, ge=1, le=50)
+    mode: Literal["exact", "ngram"] = "exact"
+
+
+class ValidationBatch(BaseModel):
+    payloads: List[Dict[str, Any]]
+
+
+class Violation(BaseModel):
+    type: str
+    property: Optional[str] = None
+    event: Optional[str] = None
+    expected: Optional[str] = None
+    actual: Optional[str] = None
+    message: Optional[str] = None
+
+
+class PayloadViolations(BaseModel):
+    index: int
+    event: Optional[Any] = None
+    violations: List[Violation]
+
+
+class ValidationReport(BaseModel):
+    taxonomy_version: int
+    total: int
+    valid: int
+    invalid: int
+    results: List[PayloadViolations]
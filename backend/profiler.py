@@ -0,0 +1,247 @@
+"""
+Low-overhead statistical sampling profiler.
+
+A background thread periodically snapshots the Python stacks of the other
+threads (via sys._current_frames) and counts identical stacks. Nothing is
+instrumented, so the cost is proportional to the sampling rate rather than to
+the amount of work being profiled. Results export as collapsed stacks (for
+flamegraph.pl / speedscope import) or as speedscope JSON.
+"""
+import json
+import os
+import secrets
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Optional
+from urllib.parse import parse_qs
+
+ADMIN_TOKEN_ENV = "TAXONOMY_ADMIN_TOKEN"
+
+# Starlette runs sync endpoints and dependencies on anyio's worker threads
+WORKER_THREAD_PREFIX = "AnyIO worker thread"
+
+# Innermost frames of threads that are parked waiting for work
+IDLE_FRAMES = {
+    ("threading.py", "wait"),
+    ("selectors.py", "select"),
+    ("_asyncio.py", "run"),
+    ("queue.py", "get"),
+}
+
+
+def admin_token():
+    """Return the configured admin token, or None when admin endpoints are disabled."""
+    return os.environ.get(ADMIN_TOKEN_ENV) or None
+
+
+def _frame_key(frame):
+    code = frame.f_code
+    return (code.co_qualname, code.co_filename, code.co_firstlineno)
+
+
+def _is_idle(stack):
+    if not stack:
+        return True
+    name, filename, _ = stack[-1]
+    return (os.path.basename(filename), name.rsplit(".", 1)[-1]) in IDLE_FRAMES
+
+
+class SamplingProfiler:
+    """Sample the stacks of running threads at a fixed interval.
+
+    Args:
+        interval: Seconds between samples
+        workers_only: Only sample request worker threads (and the event loop thread)
+        include_idle: Keep samples of threads that are waiting for work
+    """
+
+    def __init__(self, interval: float = 0.005, workers_only: bool = True, include_idle: bool = False):
+        self.interval = interval
+        self.workers_only = workers_only
+        self.include_idle = include_idle
+        self.samples = Counter()  # (thread name, stack tuple) -> count
+        self.sample_count = 0
+        self.started_at = None
+        self.duration = 0.0
+        self._stop = threading.Event()
+        self._thread = None
+        self._loop_thread_id = None
+
+    def start(self):
+        self.started_at = time.perf_counter()
+        self._loop_thread_id = threading.get_ident()
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.duration = time.perf_counter() - self.started_at
+        return self
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def _wanted_threads(self):
+        own = threading.get_ident()
+        names = {}
+        for thread in threading.enumerate():
+            if thread.ident == own:
+                continue
+            if self.workers_only and not (thread.name.startswith(WORKER_THREAD_PREFIX)
+                                          or thread.ident == self._loop_thread_id):
+                continue
+            names[thread.ident] = thread.name
+        return names
+
+    def _run(self):
+        threads = self._wanted_threads()
+        last_refresh = time.perf_counter()
+        while not self._stop.wait(self.interval):
+            now = time.perf_counter()
+            if now - last_refresh > 0.5:
+                # Thread pools grow lazily; pick up new workers periodically
+                threads = self._wanted_threads()
+                last_refresh = now
+            self.sample_count += 1
+            for thread_id, frame in sys._current_frames().items():
+                name = threads.get(thread_id)
+                if name is None:
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(_frame_key(frame))
+                    frame = frame.f_back
+                stack.reverse()
+                if not self.include_idle and _is_idle(stack):
+                    continue
+                self.samples[(name, tuple(stack))] += 1
+
+    def collapsed(self) -> str:
+        """Render samples as collapsed stacks: `thread;outer;...;inner count` per line."""
+        lines = []
+        for (thread, stack), count in self.samples.most_common():
+            frames = ";".join(
+                f"{name} ({os.path.basename(filename)}:{line})" for name, filename, line in stack
+            )
+            lines.append(f"{thread};{frames} {count}")
+        return "\n".join(lines) + ("\n" if lines else "")
+
+    def speedscope(self, name: str = "Event Taxonomy Tracker profile") -> dict:
+        """Render samples as a speedscope document with one sampled profile per thread."""
+        frame_index = {}
+        frames = []
+        per_thread = {}
+        interval_ms = self.interval * 1000
+
+        for (thread, stack), count in self.samples.items():
+            indexes = []
+            for key in stack:
+                if key not in frame_index:
+                    frame_index[key] = len(frames)
+                    frames.append({"name": key[0], "file": key[1], "line": key[2]})
+                indexes.append(frame_index[key])
+            profile = per_thread.setdefault(thread, {"samples": [], "weights": []})
+            profile["samples"].append(indexes)
+            profile["weights"].append(count * interval_ms)
+
+        profiles = [{
+            "type": "sampled",
+            "name": thread,
+            "unit": "milliseconds",
+            "startValue": 0,
+            "endValue": sum(data["weights"]),
+            "samples": data["samples"],
+            "weights": data["weights"],
+        } for thread, data in sorted(per_thread.items())]
+
+        return {
+            "$schema": "https://www.speedscope.app/file-format-schema.json",
+            "name": name,
+            "activeProfileIndex": 0,
+            "exporter": "event-taxonomy-tracker",
+            "shared": {"frames": frames},
+            "profiles": profiles,
+        }
+
+
+def render(profiler: SamplingProfiler, fmt: str = "collapsed"):
+    """Serialize a finished profile.
+
+    Returns:
+        Tuple of (body bytes, media type)
+    """
+    if fmt == "speedscope":
+        return json.dumps(profiler.speedscope()).encode(), "application/json"
+    return profiler.collapsed().encode(), "text/plain; charset=utf-8"
+
+
+def is_admin(supplied: Optional[str]) -> bool:
+    token = admin_token()
+    return token is not None and supplied is not None and secrets.compare_digest(supplied, token)
+
+
+class RequestProfilerMiddleware:
+    """ASGI middleware that profiles a single request when it carries `?profile=1`.
+
+    The request runs normally while the sampler records every request thread; its
+    response body is discarded and replaced by the profile (`profile_format=
+    speedscope|collapsed`), with the original status in `X-Profiled-Status`.
+    Requires the admin token in `X-Admin-Token`. Other requests pass straight
+    through without any overhead beyond a query-string check.
+    """
+
+    def __init__(self, app, interval: float = 0.001):
+        self.app = app
+        self.interval = interval
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or b"profile=1" not in scope.get("query_string", b""):
+            await self.app(scope, receive, send)
+            return
+        params = parse_qs(scope["query_string"].decode())
+        if params.get("profile") != ["1"]:
+            await self.app(scope, receive, send)
+            return
+
+        headers = {key.decode().lower(): value.decode() for key, value in scope.get("headers", [])}
+        if not is_admin(headers.get("x-admin-token")):
+            await self._send(send, 403, json.dumps(
+                {"detail": "Request profiling requires the admin token"}).encode(), "application/json")
+            return
+
+        status = {"code": 500}
+
+        async def capture(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+
+        profiler = SamplingProfiler(interval=self.interval).start()
+        try:
+            await self.app(scope, receive, capture)
+        finally:
+            profiler.stop()
+
+        fmt = params.get("profile_format", ["speedscope"])[0]
+        body, media_type = render(profiler, fmt)
+        await self._send(send, 200, body, media_type, [(b"x-profiled-status", str(status["code"]).encode())])
+
+    @staticmethod
+    async def _send(send, status, body, media_type, extra_headers=()):
+        await send({
+            "type": "http.response.start",
+            "status": status,
+            "headers": [
+                (b"content-type", media_type.encode()),
+                (b"content-length", str(len(body)).encode()),
+                *extra_headers,
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
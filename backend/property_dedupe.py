@@ -0,0 +1,280 @@
+"""
+Registry-wide report of near-duplicate property names.
+
+Comparing every pair of names with SequenceMatcher is quadratic, so the report
+generates candidates first and scores only those:
+
+1. Normalization: names are lowercased and stripped of separators, so userId,
+   user_id, user-ID and userid share the key "userid" and are grouped directly.
+2. Trigram blocking: distinct keys are compared only when their trigram sets
+   reach BLOCK_JACCARD. Prefix filtering (each key is indexed under its rarest
+   trigrams only) finds every such pair without ever listing the pairs that
+   merely share a common trigram like "id$". On realistic names 0.3 keeps ~98%
+   of the pairs SequenceMatcher rates 0.85 or more.
+3. Scoring: SequenceMatcher ratios of the candidate keys. For large registries
+   blocking and scoring are split by key range over a process pool
+   (audit_logs.run_tasks).
+
+The most used name anchors a cluster of the names scoring at least the threshold
+against it (pairs give the normalized keys); a cluster whose properties have
+different data types is flagged as a conflict. Reports are
+cached per engine and threshold until the taxonomy version changes.
+
+Usage:
+    python property_dedupe.py --db event_taxonomy.db --threshold 0.85 --workers 8
+"""
+import argparse
+import json
+import math
+import re
+import threading
+import weakref
+from bisect import bisect_left
+from collections import Counter
+from difflib import SequenceMatcher
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import Session
+
+from audit_logs import run_tasks
+from validation import taxonomy_version
+
+DEFAULT_THRESHOLD = 0.85
+BLOCK_JACCARD = 0.3
+PARALLEL_MIN_KEYS = 5000  # Below this, a process pool costs more than it saves
+TASK_KEYS = 2000
+
+PROPERTY_ROWS_SQL = """
+    SELECT p.id, p.name, p.data_type, COUNT(ep.id)
+    FROM properties p
+    LEFT JOIN event_properties ep ON ep.property_id = p.id
+    GROUP BY p.id
+    ORDER BY p.id
+"""
+
+_SEPARATORS = re.compile(r"[^a-z0-9]")
+
+
+def normalize_name(name: str) -> str:
+    """Comparison key for a property name: lowercase letters and digits only."""
+    return _SEPARATORS.sub("", name.lower())
+
+
+def trigrams(key: str) -> set:
+    padded = f"^{key}$"
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class TrigramBlocks:
+    """Prefix-filtered trigram index over normalized keys.
+
+    AllPairs-style prefix filtering: with trigrams ordered rarest first, two sets
+    with Jaccard similarity >= t must share one of the first len - ceil(t * len) + 1
+    trigrams of each, and the smaller set must hold at least t times as many
+    trigrams as the larger. Keys are ranked by trigram count and each key is only
+    probed against lower-ranked keys, so those need an overlap of 2t / (1 + t) of
+    their own trigrams and are indexed under a correspondingly shorter prefix.
+    """
+
+    def __init__(self, keys, threshold: float = BLOCK_JACCARD):
+        self.threshold = threshold
+        grams = {key: frozenset(trigrams(key)) for key in keys}
+        self.keys = sorted(grams, key=lambda key: (len(grams[key]), key))
+        self.grams = [grams[key] for key in self.keys]
+        self.sizes = [len(gram_set) for gram_set in self.grams]
+        frequency = Counter(gram for gram_set in self.grams for gram in gram_set)
+        # Keys are only probed against smaller ones, which need an overlap of 2t / (1 + t)
+        index_overlap = 2 * threshold / (1 + threshold)
+        self.prefixes = []
+        self.postings = {}
+        for rank, gram_set in enumerate(self.grams):
+            ordered = sorted(gram_set, key=lambda gram: (frequency[gram], gram))
+            self.prefixes.append(ordered[:len(ordered) - math.ceil(threshold * len(ordered)) + 1])
+            for gram in ordered[:len(ordered) - math.ceil(index_overlap * len(ordered)) + 1]:
+                self.postings.setdefault(gram, []).append(rank)
+
+    def candidates(self, rank: int) -> list:
+        """Lower-ranked keys whose trigram Jaccard with keys[rank] reaches the threshold."""
+        gram_set = self.grams[rank]
+        size = len(gram_set)
+        lowest = bisect_left(self.sizes, self.threshold * size)  # Length filter
+        seen = set()
+        for gram in self.prefixes[rank]:
+            ranks = self.postings.get(gram, ())
+            seen.update(ranks[bisect_left(ranks, lowest):bisect_left(ranks, rank)])
+        found = []
+        for other in sorted(seen):
+            other_set = self.grams[other]
+            shared = len(gram_set & other_set)
+            if shared >= self.threshold * (size + len(other_set) - shared):
+                found.append(self.keys[other])
+        return found
+
+
+def match_keys(blocks: TrigramBlocks, start: int, end: int, threshold: float):
+    """Candidates and SequenceMatcher matches for the keys ranked start..end-1.
+
+    Returns:
+        (number of candidate pairs, [(key_a, key_b, ratio)] reaching the threshold)
+    """
+    count = 0
+    matches = []
+    for rank in range(start, min(end, len(blocks.keys))):
+        key = blocks.keys[rank]
+        for other in blocks.candidates(rank):
+            count += 1
+            matcher = SequenceMatcher(None, other, key)
+            if matcher.real_quick_ratio() < threshold or matcher.quick_ratio() < threshold:
+                continue
+            ratio = matcher.ratio()
+            if ratio >= threshold:
+                matches.append((other, key, round(ratio, 3)))
+    return count, matches
+
+
+_blocks = None
+
+
+def _init_worker(keys, block_threshold):
+    global _blocks
+    _blocks = TrigramBlocks(keys, block_threshold)
+
+
+def match_task(task):
+    """Block and score one range of ranks. Runs in a worker process."""
+    start, end, threshold = task
+    return match_keys(_blocks, start, end, threshold)
+
+
+def find_matches(keys, threshold: float, workers: int = None, block_threshold: float = BLOCK_JACCARD):
+    """(candidate pair count, matches) over all keys, in a process pool for large registries.
+
+    Every worker builds the (cheap) trigram index itself and probes its own range
+    of keys, so both candidate generation and scoring run in parallel.
+    """
+    if len(keys) < PARALLEL_MIN_KEYS or workers == 1:
+        return match_keys(TrigramBlocks(keys, block_threshold), 0, len(keys), threshold)
+    total = [0, []]
+
+    def merge(part):
+        total[0] += part[0]
+        total[1].extend(part[1])
+
+    tasks = [(start, start + TASK_KEYS, threshold) for start in range(0, len(keys), TASK_KEYS)]
+    run_tasks(match_task, tasks, merge, workers=workers, initializer=_init_worker,
+              initargs=(list(keys), block_threshold))
+    return total[0], total[1]
+
+
+def dedupe_report(rows, threshold: float = DEFAULT_THRESHOLD, workers: int = None, version: int = None) -> dict:
+    """Cluster near-duplicate property names.
+
+    Args:
+        rows: (id, name, data_type, event_count) per registry property
+        threshold: Minimum SequenceMatcher ratio between normalized names
+        workers: Scoring processes (default: CPU count; 1 scores in-process)
+        version: Taxonomy version the rows were read at
+    """
+    properties = {}  # key -> property dicts sharing that normalized name
+    for property_id, name, data_type, event_count in rows:
+        key = normalize_name(name)
+        if key:
+            properties.setdefault(key, []).append(
+                {"id": property_id, "name": name, "data_type": data_type, "event_count": event_count}
+            )
+
+    candidate_count, matches = find_matches(list(properties), threshold, workers)
+
+    # Most used key first: each unclaimed key anchors a cluster and claims its unclaimed
+    # matches, so user_id, user_ids and users never chain into unrelated names
+    neighbours = {}
+    for a, b, score in matches:
+        neighbours.setdefault(a, []).append((b, score))
+        neighbours.setdefault(b, []).append((a, score))
+    usage = {key: sum(prop["event_count"] for prop in members) for key, members in properties.items()}
+    claimed = set()
+    clusters = []
+    for key in sorted(set(neighbours) | {k for k, members in properties.items() if len(members) > 1},
+                      key=lambda k: (-usage[k], k)):
+        if key in claimed:
+            continue
+        claimed.add(key)
+        cluster = {"keys": [key], "pairs": []}
+        for other, score in sorted(neighbours.get(key, ()), key=lambda item: (-item[1], item[0])):
+            if other not in claimed:
+                claimed.add(other)
+                cluster["keys"].append(other)
+                cluster["pairs"].append({"a": key, "b": other, "score": score})
+        if len(cluster["keys"]) > 1 or len(properties[key]) > 1:
+            clusters.append(cluster)
+
+    result = []
+    for cluster in clusters:
+        members = sorted((prop for key in cluster["keys"] for prop in properties[key]),
+                         key=lambda prop: (-prop["event_count"], prop["name"]))
+        data_types = sorted({prop["data_type"] for prop in members})
+        result.append({
+            "conflict": len(data_types) > 1,
+            "data_types": data_types,
+            "properties": members,
+            "pairs": cluster["pairs"],
+        })
+    result.sort(key=lambda cluster: (not cluster["conflict"], -len(cluster["properties"]),
+                                     cluster["properties"][0]["name"]))
+    return {
+        "version": version,
+        "threshold": threshold,
+        "properties_scanned": sum(len(members) for members in properties.values()),
+        "candidate_pairs": candidate_count,
+        "conflicts": sum(cluster["conflict"] for cluster in result),
+        "clusters": result,
+    }
+
+
+# Engine -> {threshold: report} for one taxonomy version
+_reports = weakref.WeakKeyDictionary()
+_report_lock = threading.Lock()
+
+
+def get_dedupe_report(db: Session, threshold: float = DEFAULT_THRESHOLD, workers: int = None) -> dict:
+    """Return the dedupe report for the current taxonomy version, computing it if needed."""
+    bind = db.get_bind()
+    version = taxonomy_version(db)
+    with _report_lock:
+        cached = _reports.get(bind)
+        if cached is None or cached[0] != version:
+            cached = (version, {})
+            _reports[bind] = cached
+        report = cached[1].get(threshold)
+        if report is None:
+            report = dedupe_report(db.execute(text(PROPERTY_ROWS_SQL)).all(), threshold, workers, version)
+            cached[1][threshold] = report
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Report near-duplicate property names")
+    parser.add_argument("--db", required=True, help="SQLite database file")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD, help="Minimum name similarity")
+    parser.add_argument("--workers", type=int, default=None, help="Scoring processes (default: CPU count)")
+    parser.add_argument("--json", action="store_true", help="Print the full report as JSON")
+    args = parser.parse_args()
+
+    engine = create_engine(f"sqlite:///{args.db}")
+    with Session(engine) as db:
+        report = dedupe_report(db.execute(text(PROPERTY_ROWS_SQL)).all(), args.threshold, args.workers,
+                               taxonomy_version(db))
+    engine.dispose()
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+    print(f"{report['properties_scanned']} properties, {report['candidate_pairs']} candidate pairs, "
+          f"{len(report['clusters'])} clusters ({report['conflicts']} with conflicting data types)")
+    for cluster in report["clusters"]:
+        flag = "CONFLICT " if cluster["conflict"] else ""
+        names = ", ".join(f"{prop['name']} ({prop['data_type']})" for prop in cluster["properties"])
+        print(f"  {flag}{names}")
+
+
+if __name__ == "__main__":
+    main()
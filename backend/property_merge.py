@@ -0,0 +1,114 @@
+"""
+Set-based property merge and rename.
+
+merge_properties folds source properties into a target with a few statements
+over event_properties instead of removing and re-adding links event by event:
+
+1. Links that would collide on uq_event_property_type once repointed (same
+   event and property type) are collapsed into one survivor per group: the
+   target's own link if there is one, else the oldest source link. The survivor
+   becomes required if any link in its group was, and keeps its example value or
+   takes the first one available.
+2. The other links of those groups are deleted and the remaining source links
+   are repointed to the target.
+3. The sources' value sketches are merged into the target's stats, so they
+   cover the values seen under every merged name.
+4. The sources are deleted (with tombstones for delta sync) and the affected
+   events are touched.
+
+The caller writes a single changelog entry (see changelog.merge_entry). Followers
+replay that entry through the same function, which is deterministic because they
+keep the leader's link ids.
+"""
+from datetime import datetime, UTC
+from functools import reduce
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from database import Event, EventProperty, Property, PropertyStats
+from sketches import PropertySketch, merge_stats
+from sync import add_tombstone, touch
+
+# Links of the merged properties numbered within each (event, property type), survivor first
+RANKED_LINKS = """
+    SELECT id, event_id, property_type,
+           ROW_NUMBER() OVER (PARTITION BY event_id, property_type ORDER BY property_id != :target, id) AS rank
+    FROM event_properties WHERE property_id IN ({ids})
+"""
+
+FOLD_INTO_SURVIVORS = """
+    WITH ranked AS ({ranked})
+    UPDATE event_properties SET
+        is_required = (
+            SELECT MAX(x.is_required) FROM event_properties AS x
+            WHERE x.event_id = event_properties.event_id AND x.property_type = event_properties.property_type
+              AND x.property_id IN ({ids})
+        ),
+        example_value = COALESCE(example_value, (
+            SELECT x.example_value FROM event_properties AS x
+            WHERE x.event_id = event_properties.event_id AND x.property_type = event_properties.property_type
+              AND x.property_id IN ({ids}) AND x.example_value IS NOT NULL
+            ORDER BY x.property_id != :target, x.id LIMIT 1
+        ))
+    WHERE id IN (
+        SELECT id FROM ranked WHERE rank = 1
+          AND (event_id, property_type) IN (SELECT event_id, property_type FROM ranked WHERE rank = 2)
+    )
+"""
+
+# No WITH prefix here: sqlite3 reports rowcount -1 for statements starting with one
+DELETE_COLLISIONS = "DELETE FROM event_properties WHERE id IN (SELECT id FROM ({ranked}) WHERE rank > 1)"
+
+REPOINT_LINKS = "UPDATE event_properties SET property_id = :target WHERE property_id IN ({sources})"
+
+
+def _id_list(ids) -> str:
+    return ", ".join(str(int(key)) for key in ids)
+
+
+def merge_properties(db: Session, target: Property, sources: list) -> dict:
+    """Repoint every link of `sources` to `target`, fold their value stats into it and delete them.
+
+    Note: This does NOT commit - call it inside a unit_of_work.
+
+    Returns:
+        {"events": events whose links changed, "links_repointed": n, "links_merged": n}
+    """
+    source_ids = [prop.id for prop in sources]
+    ids, source_list = _id_list([target.id] + source_ids), _id_list(source_ids)
+    ranked = RANKED_LINKS.format(ids=ids)
+    params = {"target": target.id}
+
+    # Every event linking a source changes, including those whose only source link collides
+    affected = db.query(EventProperty.event_id).filter(EventProperty.property_id.in_(source_ids)).distinct()
+    events = db.query(Event).filter(Event.id.in_(affected.scalar_subquery())).update(
+        {Event.updated_at: datetime.now(UTC)}, synchronize_session=False)
+
+    db.execute(text(FOLD_INTO_SURVIVORS.format(ranked=ranked, ids=ids)), params)
+    merged = db.execute(text(DELETE_COLLISIONS.format(ranked=ranked)), params).rowcount
+    repointed = db.execute(text(REPOINT_LINKS.format(sources=source_list)), params).rowcount
+
+    source_stats = db.query(PropertyStats).filter(PropertyStats.property_id.in_(source_ids))
+    sketches = [PropertySketch.from_bytes(row.sketch) for row in source_stats.order_by(PropertyStats.property_id)]
+    if sketches:
+        merge_stats(target, reduce(PropertySketch.merge, sketches))
+    source_stats.delete(synchronize_session=False)
+    for prop in sources:
+        add_tombstone(db, "property", prop.id, prop.name)
+    db.query(Property).filter(Property.id.in_(source_ids)).delete(synchronize_session=False)
+    touch(target)
+    db.flush()
+    db.expire_all()  # Loaded links and sources are stale after the bulk statements
+    return {"events": events, "links_repointed": repointed, "links_merged": merged}
+
+
+def rename_property(db: Session, prop: Property, name: str):
+    """Rename a property and touch the events showing it.
+
+    Note: This does NOT commit - call it inside a unit_of_work.
+    """
+    prop.name = name
+    linked = db.query(EventProperty.event_id).filter(EventProperty.property_id == prop.id).distinct()
+    db.query(Event).filter(Event.id.in_(linked.scalar_subquery())).update(
+        {Event.updated_at: datetime.now(UTC)}, synchronize_session=False)
@@ -0,0 +1,369 @@
+"""
+Changelog replication to read-only follower instances.
+
+The leader serves its changelog as an ordered feed (GET /api/replication/feed):
+entries after a given id, oldest first, together with the registry records of
+the properties they reference (descriptions are not in the changelog). Changelog
+ids are assigned densely by SQLite and archived rows are still served from their
+segments, so a follower can insist on a gap-free sequence.
+
+A follower applies each entry to its own events / properties / event_properties
+tables, keeping the leader's ids, and copies the changelog row itself. Both
+happen in one transaction per batch, and the follower's position is simply its
+highest changelog id, so a batch is applied exactly once even if the follower
+crashes or the same batch is fetched twice. Because the changelog is copied,
+history, diff, sync and the change stream all work on the follower too.
+
+Run a follower API by pointing TAXONOMY_LEADER_URL at the leader (writes are
+rejected with 403), or replicate into a file without serving:
+    TAXONOMY_DB_PATH=follower.db TAXONOMY_LEADER_URL=http://localhost:8000 uvicorn api:app --port 8001
+    python replication.py --leader http://localhost:8000 --db follower.db --once
+"""
+import argparse
+import json
+import logging
+import threading
+import time
+from datetime import datetime, UTC
+
+import httpx
+from sqlalchemy import create_engine, exists
+from sqlalchemy.orm import Session, sessionmaker
+
+from archive import changelog_rows
+from changefeed import entry_payload
+from changelog import EVENT_FIELDS, PATCH_ACTION, PROPERTY_FIELDS, merged_property_ids
+from database import Changelog, Event, EventProperty, Property, init_db, unit_of_work
+from property_merge import merge_properties, rename_property
+from sync import add_tombstone, touch
+from validation import taxonomy_version
+
+LEADER_URL_ENV = "TAXONOMY_LEADER_URL"
+FEED_BATCH = 1000
+POLL_SECONDS = 1.0
+
+logger = logging.getLogger(__name__)
+
+
+class ReplicationError(Exception):
+    """The feed cannot be applied (gap in the sequence or diverged follower state)."""
+
+
+def _referenced_property_ids(entry) -> set:
+    if entry.entity_type == "property":
+        return {entry.entity_id}
+    ids = set()
+    for value in (entry.old_value, entry.new_value):
+        value = value or {}
+        entries = list(value.get("properties") or [])
+        if isinstance(value.get("property"), dict):
+            entries.append(value["property"])
+        ids.update(p["property_id"] for p in entries if "property_id" in p)
+    return ids
+
+
+def feed(db: Session, after: int, limit: int = FEED_BATCH) -> dict:
+    """Changelog entries after `after` (oldest first) and the properties they reference."""
+    entries = changelog_rows(db, after, limit=limit)
+    property_ids = set().union(*(_referenced_property_ids(entry) for entry in entries))
+    properties = db.query(Property).filter(Property.id.in_(property_ids)).all() if property_ids else []
+    return {
+        "leader_version": taxonomy_version(db),
+        "entries": [entry_payload(entry) for entry in entries],
+        "properties": [
+            {
+                "id": prop.id,
+                "name": prop.name,
+                "data_type": prop.data_type,
+                "description": prop.description,
+                "created_by": prop.created_by,
+                "created_at": prop.created_at.isoformat() if prop.created_at else None,
+            }
+            for prop in properties
+        ],
+    }
+
+
+def _ensure_property(db: Session, entry: dict, registry: dict) -> Property:
+    """The follower's property for a changelog property entry, created from the leader's record if missing."""
+    prop = db.get(Property, entry["property_id"]) if "property_id" in entry else None
+    if prop is None:
+        prop = db.query(Property).filter(Property.name == entry["name"]).first()
+    if prop is None:
+        record = registry.get(entry.get("property_id"), {})
+        prop = Property(
+            id=entry.get("property_id"),
+            name=entry["name"],
+            data_type=entry.get("data_type") or record.get("data_type"),
+            description=record.get("description"),
+            created_by=record.get("created_by"),
+        )
+        if record.get("created_at"):
+            prop.created_at = datetime.fromisoformat(record["created_at"])
+        db.add(prop)
+        db.flush()
+    return prop
+
+
+def _link(db: Session, event_id: int, entry: dict, registry: dict):
+    if "id" in entry and db.get(EventProperty, entry["id"]) is not None:
+        return
+    prop = _ensure_property(db, entry, registry)
+    db.add(EventProperty(
+        id=entry.get("id"),
+        event_id=event_id,
+        property_id=prop.id,
+        property_type=entry["type"],
+        is_required=entry.get("required", False),
+        example_value=entry.get("example"),
+    ))
+
+
+def _unlink(db: Session, event_id: int, entry: dict):
+    query = db.query(EventProperty).filter(EventProperty.event_id == event_id)
+    if "id" in entry:
+        query = query.filter(EventProperty.id == entry["id"])
+    else:
+        query = query.join(Property).filter(Property.name == entry["name"],
+                                            EventProperty.property_type == entry["type"])
+    for link in query.all():
+        db.delete(link)
+
+
+def _delete_event(db: Session, event: Event):
+    # Same cleanup as delete_event on the leader: drop properties left without any event
+    property_ids = [link.property_id for link in event.event_properties]
+    db.delete(event)
+    db.flush()
+    orphaned = db.query(Property).filter(
+        Property.id.in_(property_ids),
+        ~exists().where(EventProperty.property_id == Property.id)
+    ).all() if property_ids else []
+    for prop in orphaned:
+        db.delete(prop)
+        add_tombstone(db, "property", prop.id, prop.name)
+    add_tombstone(db, "event", event.id, event.name)
+
+
+def _apply_event(db: Session, entry: dict, registry: dict):
+    event_id, action = entry["entity_id"], entry["action"]
+    old_value, new_value = entry["old_value"] or {}, entry["new_value"] or {}
+    event = db.get(Event, event_id)
+
+    if action == "delete":
+        if event is not None:
+            _delete_event(db, event)
+        return
+
+    if action == "create":
+        if event is None:
+            event = Event(id=event_id, created_by=entry["changed_by"],
+                          created_at=datetime.fromisoformat(entry["changed_at"]))
+            db.add(event)
+        for field in EVENT_FIELDS:
+            setattr(event, field, new_value.get(field))
+        db.flush()
+        for prop in new_value.get("properties") or []:
+            _link(db, event_id, prop, registry)
+        return
+
+    if event is None:
+        raise ReplicationError(f"Changelog entry {entry['id']} updates event {event_id}, which the follower does not have")
+    if new_value.get("action") == "property_added":
+        _link(db, event_id, new_value["property"], registry)
+    elif old_value.get("action") == "property_removed":
+        _unlink(db, event_id, old_value["property"])
+    elif new_value.get("action") == PATCH_ACTION:
+        # Modified links are dropped and re-created with their new values under the same ids
+        for prop in old_value.get("properties") or []:
+            _unlink(db, event_id, prop)
+        db.flush()
+        for prop in new_value.get("properties") or []:
+            _link(db, event_id, prop, registry)
+        for field in EVENT_FIELDS:
+            if field in new_value:
+                setattr(event, field, new_value[field])
+    else:
+        for field in EVENT_FIELDS:
+            if field in new_value:
+                setattr(event, field, new_value[field])
+    touch(event)
+
+
+def _apply_property(db: Session, entry: dict, registry: dict):
+    prop = db.get(Property, entry["entity_id"])
+    new_value = entry["new_value"] or {}
+    if entry["action"] == "delete":
+        if prop is not None:
+            db.delete(prop)
+            add_tombstone(db, "property", prop.id, prop.name)
+        return
+    merged = merged_property_ids(new_value)
+    if merged:
+        if prop is None:
+            raise ReplicationError(f"Changelog entry {entry['id']} merges into property {entry['entity_id']}, "
+                                   f"which the follower does not have")
+        sources = db.query(Property).filter(Property.id.in_(merged)).order_by(Property.id).all()
+        merge_properties(db, prop, sources)
+        return
+    if prop is None:
+        prop = _ensure_property(db, dict(new_value, property_id=entry["entity_id"]), registry)
+    for field in PROPERTY_FIELDS:
+        if field in new_value:
+            if field == "name" and entry["action"] == "update" and new_value["name"] != prop.name:
+                rename_property(db, prop, new_value["name"])
+            else:
+                setattr(prop, field, new_value[field])
+    if entry["action"] == "create" and prop.created_by is None:
+        prop.created_by = entry["changed_by"]
+
+
+def apply_batch(db: Session, batch: dict) -> int:
+    """Apply a feed batch in one transaction.
+
+    Returns:
+        The follower's taxonomy version (highest applied changelog id) afterwards
+
+    Raises:
+        ReplicationError: The batch does not continue the follower's sequence, or an
+            entry refers to state the follower does not have
+    """
+    version = taxonomy_version(db)
+    registry = {record["id"]: record for record in batch.get("properties") or []}
+    with unit_of_work(db):
+        for entry in batch["entries"]:
+            if entry["id"] <= version:
+                continue  # Already applied (e.g. a retried fetch)
+            if entry["id"] != version + 1:
+                raise ReplicationError(f"Gap in changelog feed: expected entry {version + 1}, got {entry['id']}")
+            if entry["entity_type"] == "event":
+                _apply_event(db, entry, registry)
+            elif entry["entity_type"] == "property":
+                _apply_property(db, entry, registry)
+            db.add(Changelog(
+                id=entry["id"],
+                entity_type=entry["entity_type"],
+                entity_id=entry["entity_id"],
+                action=entry["action"],
+                old_value=entry["old_value"],
+                new_value=entry["new_value"],
+                changed_by=entry["changed_by"],
+                changed_at=datetime.fromisoformat(entry["changed_at"]),
+            ))
+            db.flush()
+            version = entry["id"]
+    return version
+
+
+def http_fetch(leader_url: str, timeout: float = 30.0):
+    """Feed fetcher for a leader reachable over HTTP: fetch(after, limit) -> batch."""
+    client = httpx.Client(base_url=leader_url.rstrip("/"), timeout=timeout)
+
+    def fetch(after: int, limit: int) -> dict:
+        response = client.get("/api/replication/feed", params={"after": after, "limit": limit})
+        response.raise_for_status()
+        return response.json()
+
+    return fetch
+
+
+class Follower:
+    """Tails a leader's changelog feed into a local database on a background thread."""
+
+    def __init__(self, session_factory, fetch, leader: str = None,
+                 poll_interval: float = POLL_SECONDS, batch_size: int = FEED_BATCH):
+        self.session_factory = session_factory
+        self.fetch = fetch
+        self.leader = leader
+        self.poll_interval = poll_interval
+        self.batch_size = batch_size
+        self.applied_version = None
+        self.leader_version = None
+        self.last_poll_at = None
+        self.last_error = None
+        self._caught_up_at = None
+        self._started = time.monotonic()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def sync_once(self) -> int:
+        """Fetch and apply one batch; returns the number of entries received."""
+        with self.session_factory() as db:
+            batch = self.fetch(taxonomy_version(db), self.batch_size)
+            self.applied_version = apply_batch(db, batch)
+        self.leader_version = batch["leader_version"]
+        self.last_poll_at = datetime.now(UTC)
+        if self.applied_version >= self.leader_version:
+            self._caught_up_at = time.monotonic()
+        return len(batch["entries"])
+
+    def catch_up(self):
+        """Apply batches until the follower has everything the leader had when asked."""
+        while self.sync_once() >= self.batch_size:
+            pass
+
+    def run(self):
+        while not self._stop.is_set():
+            received = 0
+            try:
+                received = self.sync_once()
+                self.last_error = None
+            except Exception as exc:  # Keep following; the error is reported in status()
+                logger.warning("Replication from %s failed: %s", self.leader, exc)
+                self.last_error = str(exc)
+            if received < self.batch_size:
+                self._stop.wait(self.poll_interval)
+
+    def start(self):
+        self._thread = threading.Thread(target=self.run, name="replication-follower", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def status(self) -> dict:
+        lag_entries = None
+        if self.applied_version is not None and self.leader_version is not None:
+            lag_entries = max(0, self.leader_version - self.applied_version)
+        # Seconds since the follower last had everything the leader had
+        lag_seconds = 0.0 if lag_entries == 0 else round(time.monotonic() - (self._caught_up_at or self._started), 3)
+        return {
+            "role": "follower",
+            "leader": self.leader,
+            "applied_version": self.applied_version,
+            "leader_version": self.leader_version,
+            "lag_entries": lag_entries,
+            "lag_seconds": lag_seconds,
+            "last_poll_at": self.last_poll_at.isoformat() if self.last_poll_at else None,
+            "last_error": self.last_error,
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replicate a leader's taxonomy into a local SQLite file")
+    parser.add_argument("--leader", required=True, help="Leader base URL, e.g. http://localhost:8000")
+    parser.add_argument("--db", required=True, help="Follower SQLite file")
+    parser.add_argument("--once", action="store_true", help="Catch up once and exit")
+    parser.add_argument("--interval", type=float, default=POLL_SECONDS, help="Seconds between polls when idle")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    engine = create_engine(f"sqlite:///{args.db}")
+    init_db(engine)
+    follower = Follower(sessionmaker(bind=engine), http_fetch(args.leader), leader=args.leader,
+                        poll_interval=args.interval)
+    if args.once:
+        follower.catch_up()
+        print(json.dumps(follower.status(), indent=2))
+        return
+    try:
+        follower.run()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+"""
+Changelog activity rollups for governance dashboards.
+
+changelog_rollups holds entry counts per hour and per day bucket, keyed by
+changed_by, entity_type and action. A SQLite trigger adds every new changelog
+row as it is inserted, so the counts are always current and a range query reads
+a few hundred rollup rows instead of grouping the whole changelog.
+
+init_db counts the rows already in the table when it installs the trigger.
+rebuild_rollups recomputes everything from scratch, including archived segments:
+    python rollups.py --db event_taxonomy.db
+"""
+import argparse
+from collections import Counter
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine, func, text
+from sqlalchemy.orm import Session
+
+from archive import read_archived
+from database import ChangelogRollup, ROLLUP_BUCKETS, changelog_rollup_backfill, init_db, unit_of_work
+
+DIMENSIONS = ("changed_by", "entity_type", "action")
+
+
+def rollup_action(row) -> str:
+    """Action a changelog row is counted under (subtypes such as property_added win)."""
+    for value in (row.new_value, row.old_value):
+        if isinstance(value, dict) and value.get("action"):
+            return value["action"]
+    return row.action
+
+
+def bucket_start(moment: datetime, granularity: str) -> datetime:
+    if granularity == "day":
+        return moment.replace(hour=0, minute=0, second=0, microsecond=0)
+    return moment.replace(minute=0, second=0, microsecond=0)
+
+
+def rebuild_rollups(db: Session) -> int:
+    """Recompute all rollups from the changelog table and the archived segments.
+
+    Returns:
+        Number of rollup rows
+    """
+    with unit_of_work(db):
+        db.query(ChangelogRollup).delete()
+        for statement in changelog_rollup_backfill():
+            db.execute(text(statement))
+
+        counts = Counter()
+        for row in read_archived(db):
+            if row.changed_at is None:
+                continue
+            action = rollup_action(row)
+            for granularity in ROLLUP_BUCKETS:
+                counts[(granularity, bucket_start(row.changed_at, granularity),
+                        row.changed_by or "", row.entity_type, action)] += 1
+        if counts:
+            db.execute(text(
+                "INSERT INTO changelog_rollups (granularity, bucket, changed_by, entity_type, action, count) "
+                "VALUES (:granularity, :bucket, :changed_by, :entity_type, :action, :count) "
+                "ON CONFLICT (granularity, bucket, changed_by, entity_type, action) "
+                "DO UPDATE SET count = count + excluded.count"
+            ), [
+                {"granularity": granularity, "bucket": bucket.isoformat(" ", "microseconds"),
+                 "changed_by": changed_by, "entity_type": entity_type, "action": action, "count": count}
+                for (granularity, bucket, changed_by, entity_type, action), count in counts.items()
+            ])
+    return db.query(func.count()).select_from(ChangelogRollup).scalar()
+
+
+def changelog_stats(db: Session, granularity: str = "day", since: datetime = None, until: datetime = None,
+                    group_by=DIMENSIONS, filters: dict = None) -> dict:
+    """Changelog entry counts per bucket, grouped by a subset of DIMENSIONS.
+
+    Args:
+        granularity: 'hour' or 'day'
+        since: Include the bucket containing this time and later ones
+        until: Include buckets starting at or before this time
+        group_by: Dimensions to keep in the result (others are summed over)
+        filters: {dimension: value} equality filters ('' or None matches unknown users)
+    """
+    columns = [getattr(ChangelogRollup, dimension) for dimension in group_by]
+    query = db.query(ChangelogRollup.bucket, *columns, func.sum(ChangelogRollup.count)).filter(
+        ChangelogRollup.granularity == granularity)
+    if since is not None:
+        query = query.filter(ChangelogRollup.bucket >= bucket_start(since, granularity))
+    if until is not None:
+        query = query.filter(ChangelogRollup.bucket <= until)
+    for dimension, value in (filters or {}).items():
+        query = query.filter(getattr(ChangelogRollup, dimension) == (value or ""))
+    rows = query.group_by(ChangelogRollup.bucket, *columns).order_by(ChangelogRollup.bucket, *columns).all()
+
+    buckets = []
+    for bucket, *values, count in rows:
+        entry = {"bucket": bucket.isoformat()}
+        for dimension, value in zip(group_by, values):
+            entry[dimension] = (value or None) if dimension == "changed_by" else value
+        entry["count"] = count
+        buckets.append(entry)
+    return {
+        "granularity": granularity,
+        "group_by": list(group_by),
+        "total": sum(entry["count"] for entry in buckets),
+        "buckets": buckets,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rebuild changelog activity rollups")
+    parser.add_argument("--db", required=True, help="SQLite database file")
+    parser.add_argument("--days", type=int, default=7, help="Print daily totals for this many days")
+    args = parser.parse_args()
+
+    engine = create_engine(f"sqlite:///{args.db}")
+    init_db(engine)
+    with Session(engine) as db:
+        print(f"Rebuilt {rebuild_rollups(db)} rollup rows")
+        since = datetime.now() - timedelta(days=args.days)
+        for entry in changelog_stats(db, "day", since=since, group_by=())["buckets"]:
+            print(f"{entry['bucket'][:10]}  {entry['count']}")
+    engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,263 @@
+"""
+Observed-schema discovery from sample NDJSON event logs.
+
+Streams event logs (plain or gzip, same input as audit_logs.py) and infers, per
+event name, which properties apps actually send, with the JSON types seen and
+how often each property is present. The result is an ObservedSchema: plain
+counters that merge by addition, so parallel workers, separate files and
+previous runs (--state) combine without rescanning anything.
+
+The observed schema is then diffed against the registry:
+
+- undocumented properties / events: sent but not defined on the event
+- type conflicts: observed types the registry's data_type does not accept,
+  which create_event would reject as a property type conflict
+- never-seen required properties: required on an observed event but absent
+  from every sample
+
+Usage:
+    python schema_inference.py --db event_taxonomy.db samples/*.ndjson.gz
+    python schema_inference.py --db event_taxonomy.db --state observed.json --json today.ndjson
+"""
+import argparse
+import json
+import sqlite3
+from pathlib import Path
+
+from audit_logs import DEFAULT_CHUNK_SIZE, iter_task, plan_tasks, run_tasks
+from validation import JSON_TYPE_NAMES, TAXONOMY_RULES_SQL, TYPE_RULES
+
+# JSON type name -> Python type, for checking observations against TYPE_RULES
+PYTHON_TYPES = {name: python_type for python_type, name in JSON_TYPE_NAMES.items()}
+
+
+def infer_data_type(types) -> str:
+    """Registry data_type for a set of observed JSON type names (None if mixed)."""
+    types = set(types) - {"null"}
+    if not types:
+        return None
+    if types == {"integer"}:
+        return "Int"
+    if types <= {"integer", "number"}:
+        return "Float"
+    if len(types) > 1:
+        return None
+    return {"string": "String", "boolean": "Boolean", "array": "List", "object": "JSON"}[types.pop()]
+
+
+class ObservedSchema:
+    """Per-event property observations.
+
+    events maps event name -> {"count": payloads seen,
+    "properties": {property name -> {JSON type name -> count}}}.
+    """
+
+    def __init__(self, events=None, lines: int = 0, malformed: int = 0):
+        self.events = events if events is not None else {}
+        self.lines = lines
+        self.malformed = malformed
+
+    def observe(self, payload):
+        """Record one decoded payload."""
+        if type(payload) is not dict or type(payload.get("event")) is not str:
+            self.malformed += 1
+            return
+        observed = self.events.get(payload["event"])
+        if observed is None:
+            observed = self.events[payload["event"]] = {"count": 0, "properties": {}}
+        observed["count"] += 1
+        properties = payload.get("properties")
+        if type(properties) is not dict:
+            return
+        seen = observed["properties"]
+        for key, value in properties.items():
+            type_name = JSON_TYPE_NAMES.get(type(value), "string")
+            types = seen.get(key)
+            if types is None:
+                seen[key] = {type_name: 1}
+            else:
+                types[type_name] = types.get(type_name, 0) + 1
+
+    def observe_lines(self, lines):
+        """Decode and record raw NDJSON lines."""
+        loads = json.loads
+        for line in lines:
+            if not line.strip():
+                continue
+            self.lines += 1
+            try:
+                payload = loads(line)
+            except ValueError:
+                self.malformed += 1
+                continue
+            self.observe(payload)
+        return self
+
+    def merge(self, other: "ObservedSchema") -> "ObservedSchema":
+        """Add another schema's counts into this one (in place)."""
+        self.lines += other.lines
+        self.malformed += other.malformed
+        for name, theirs in other.events.items():
+            ours = self.events.get(name)
+            if ours is None:
+                self.events[name] = {"count": theirs["count"],
+                                     "properties": {k: dict(v) for k, v in theirs["properties"].items()}}
+                continue
+            ours["count"] += theirs["count"]
+            for key, types in theirs["properties"].items():
+                mine = ours["properties"].setdefault(key, {})
+                for type_name, count in types.items():
+                    mine[type_name] = mine.get(type_name, 0) + count
+        return self
+
+    def presence(self, event: str, prop: str) -> float:
+        """Fraction of the event's payloads that carried a non-null value for prop."""
+        observed = self.events[event]
+        types = observed["properties"].get(prop, {})
+        return (sum(types.values()) - types.get("null", 0)) / observed["count"]
+
+    def to_dict(self) -> dict:
+        return {"lines": self.lines, "malformed": self.malformed, "events": self.events}
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "ObservedSchema":
+        return cls(data.get("events", {}), data.get("lines", 0), data.get("malformed", 0))
+
+
+def infer_task(task) -> ObservedSchema:
+    """Observe one task's lines. Runs in a worker process."""
+    return ObservedSchema().observe_lines(iter_task(*task))
+
+
+def infer_schema(paths, workers=None, chunk_size=DEFAULT_CHUNK_SIZE, schema: ObservedSchema = None):
+    """Infer the observed schema of NDJSON log files, merging into schema if given."""
+    schema = schema or ObservedSchema()
+    run_tasks(infer_task, plan_tasks(paths, chunk_size), schema.merge, workers=workers)
+    return schema
+
+
+def load_registry(db_path):
+    """Read (event rules, property data types) from a taxonomy SQLite file (read-only).
+
+    Returns:
+        ({event name: {property name: is_required}}, {property name: data_type})
+    """
+    conn = sqlite3.connect(f"file:{Path(db_path).resolve()}?mode=ro", uri=True)
+    try:
+        events = {}
+        for event_name, prop_name, _data_type, _property_type, is_required in conn.execute(TAXONOMY_RULES_SQL):
+            props = events.setdefault(event_name, {})
+            if prop_name is not None:
+                props[prop_name] = bool(is_required) or props.get(prop_name, False)
+        data_types = dict(conn.execute("SELECT name, data_type FROM properties"))
+    finally:
+        conn.close()
+    return events, data_types
+
+
+def _accepts(data_type: str, types) -> bool:
+    accepted = TYPE_RULES.get(data_type)
+    if accepted is None:
+        return True
+    return all(PYTHON_TYPES[t] in accepted for t in types if t != "null")
+
+
+def diff_schema(schema: ObservedSchema, registry_events: dict, data_types: dict) -> dict:
+    """Compare observations with the registry.
+
+    Args:
+        schema: Observed schema
+        registry_events: {event name: {property name: is_required}}
+        data_types: {property name: registry data_type}
+    """
+    undocumented_events = []
+    undocumented = []
+    conflicts = []
+    never_seen = []
+
+    for event_name in sorted(schema.events):
+        observed = schema.events[event_name]
+        defined = registry_events.get(event_name)
+        if defined is None:
+            undocumented_events.append({"event": event_name, "count": observed["count"]})
+            defined = {}
+
+        for prop, types in sorted(observed["properties"].items()):
+            entry = {
+                "event": event_name,
+                "property": prop,
+                "observed_types": dict(sorted(types.items())),
+                "presence": round(schema.presence(event_name, prop), 4),
+            }
+            registered = data_types.get(prop)
+            if prop not in defined:
+                undocumented.append(dict(entry, inferred_type=infer_data_type(types), registry_type=registered))
+            if registered is not None and not _accepts(registered, types):
+                conflicts.append(dict(entry, registry_type=registered, inferred_type=infer_data_type(types)))
+
+        for prop, required in sorted(defined.items()):
+            if required and schema.presence(event_name, prop) == 0:
+                never_seen.append({"event": event_name, "property": prop})
+
+    return {
+        "lines": schema.lines,
+        "malformed": schema.malformed,
+        "events_observed": len(schema.events),
+        "undocumented_events": undocumented_events,
+        "undocumented_properties": undocumented,
+        "type_conflicts": conflicts,
+        "never_seen_required": never_seen,
+    }
+
+
+def format_diff(report, limit=20) -> str:
+    """Render a schema diff as a plain-text summary."""
+    lines = [
+        f"{report['lines']} lines, {report['malformed']} malformed, {report['events_observed']} events observed",
+        "",
+        f"Undocumented events ({len(report['undocumented_events'])}):",
+    ]
+    lines += [f"  {e['event']} ({e['count']})" for e in report["undocumented_events"][:limit]]
+    lines += ["", f"Undocumented properties ({len(report['undocumented_properties'])}):"]
+    for p in report["undocumented_properties"][:limit]:
+        lines.append(f"  {p['event']}.{p['property']} {p['inferred_type'] or 'mixed'} "
+                     f"presence {p['presence']:.0%}")
+    lines += ["", f"Type conflicts ({len(report['type_conflicts'])}):"]
+    for p in report["type_conflicts"][:limit]:
+        observed = ", ".join(f"{t}={c}" for t, c in p["observed_types"].items())
+        lines.append(f"  {p['event']}.{p['property']} registry {p['registry_type']}, observed {observed}")
+    lines += ["", f"Required but never seen ({len(report['never_seen_required'])}):"]
+    lines += [f"  {p['event']}.{p['property']}" for p in report["never_seen_required"][:limit]]
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Infer event schemas from NDJSON logs and diff them against the taxonomy")
+    parser.add_argument("paths", nargs="*", help="Plain or .gz NDJSON files")
+    parser.add_argument("--db", default="event_taxonomy.db", help="Taxonomy SQLite file")
+    parser.add_argument("--state", type=Path, default=None,
+                        help="Observed-schema JSON file to resume from and update")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: CPU count)")
+    parser.add_argument("--chunk-mb", type=int, default=DEFAULT_CHUNK_SIZE // (1024 * 1024),
+                        help="Byte range per task for plain files")
+    parser.add_argument("--limit", type=int, default=20, help="Rows per section in the text summary")
+    parser.add_argument("--json", action="store_true", help="Print the full diff as JSON")
+    args = parser.parse_args()
+
+    schema = None
+    if args.state and args.state.exists():
+        schema = ObservedSchema.from_dict(json.loads(args.state.read_text()))
+    schema = infer_schema(args.paths, workers=args.workers,
+                          chunk_size=args.chunk_mb * 1024 * 1024, schema=schema)
+    if args.state:
+        args.state.write_text(json.dumps(schema.to_dict()))
+
+    report = diff_schema(schema, *load_registry(args.db))
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print(format_diff(report, args.limit))
+
+
+if __name__ == "__main__":
+    main()
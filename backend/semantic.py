@@ -0,0 +1,257 @@
+"""
+Local TF-IDF index for ranked event and property search.
+
+FTS5 (GET /api/search) only finds events containing the query phrase. Here each
+event is a bag of words from its name, description and category plus the names
+and descriptions of its properties; words are split on case and separators
+("purchaseCompleted" -> purchase, completed) and lightly stemmed, so "purchases",
+"purchased" and "purchasing" meet. Queries are ranked by cosine similarity.
+
+Vectors are weighted the SMART "lnc.ltc" way: documents get log term
+frequencies only, queries log tf times idf. Document vectors therefore never
+depend on the rest of the corpus, so a write re-vectorises just the documents it
+touches, and the idf is applied at query time from live document frequencies.
+
+The matrix is stored sparse, by column: for every term, compact arrays of
+document slots and weights. Scoring a query is one sparse matrix-vector product
+that walks the postings of its terms. Re-indexing a document moves it to a new
+slot and marks the old one dead; postings are compacted once dead slots pile up.
+
+Everything is computed locally, no model or network calls. The index lives in
+memory per engine and follows the taxonomy version like the duplicate index.
+"""
+import heapq
+import math
+import re
+import threading
+from array import array
+from collections import Counter
+from functools import lru_cache
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from changelog import merged_property_ids
+from validation import VersionedIndexCache, rows_in, taxonomy_version
+
+NAME_WEIGHT = 2  # Words in a name count as this many occurrences
+COMPACT_MIN_DEAD = 1000
+
+STOPWORDS = frozenset(
+    "a an and are as at be by for from has have in is it of on or that the this to was when where which with".split()
+)
+
+EVENTS_SQL = "SELECT id, name, description, category FROM events"
+PROPERTIES_SQL = "SELECT id, name, description FROM properties"
+EVENT_PROPERTY_IDS_SQL = "SELECT event_id, property_id FROM event_properties"
+
+_CAMEL = re.compile(r"([a-z0-9])([A-Z])")
+_WORD = re.compile(r"[a-z0-9]+")
+
+
+@lru_cache(maxsize=1 << 16)
+def stem(word: str) -> str:
+    """Strip plural and tense endings: purchases, purchased, purchasing -> purchas."""
+    if len(word) <= 3:
+        return word
+    if word.endswith("ies") and len(word) > 4:
+        word = word[:-3] + "y"
+    elif word.endswith("s") and not word.endswith("ss"):
+        word = word[:-1]
+    if word.endswith("ing") and len(word) > 5:
+        word = word[:-3]
+    elif word.endswith("ed") and len(word) > 4:
+        word = word[:-2]
+    if word.endswith("e") and len(word) > 4:
+        word = word[:-1]
+    return word
+
+
+def terms(*texts) -> Counter:
+    """Stemmed word counts of some text fields (None is skipped)."""
+    counts = Counter()
+    for value in texts:
+        if value:
+            for word in _WORD.findall(_CAMEL.sub(r"\1 \2", value).lower()):
+                if word not in STOPWORDS:
+                    counts[stem(word)] += 1
+    return counts
+
+
+class VectorIndex:
+    """Sparse, length-normalised log-tf vectors of documents, stored by term."""
+
+    def __init__(self):
+        self.slots = {}  # document id -> slot
+        self.documents = array("q")  # slot -> document id, -1 once dead
+        self.slot_terms = []  # slot -> term ids, to update document frequencies
+        self.term_ids = {}
+        self.postings = []  # term id -> (slots array, weights array)
+        self.df = array("I")  # term id -> live documents containing it
+        self.dead = 0
+
+    def __len__(self) -> int:
+        return len(self.slots)
+
+    def set(self, document_id: int, counts: Counter):
+        self.discard(document_id)
+        slot = len(self.documents)
+        self.slots[document_id] = slot
+        self.documents.append(document_id)
+        weights = {term: 1 + math.log(count) for term, count in counts.items()}
+        norm = math.sqrt(sum(weight * weight for weight in weights.values())) or 1.0
+        term_ids = array("I")
+        for term, weight in weights.items():
+            term_id = self.term_ids.get(term)
+            if term_id is None:
+                term_id = self.term_ids[term] = len(self.postings)
+                self.postings.append((array("I"), array("f")))
+                self.df.append(0)
+            slots, term_weights = self.postings[term_id]
+            slots.append(slot)
+            term_weights.append(weight / norm)
+            self.df[term_id] += 1
+            term_ids.append(term_id)
+        self.slot_terms.append(term_ids)
+
+    def discard(self, document_id: int):
+        slot = self.slots.pop(document_id, None)
+        if slot is None:
+            return
+        self.documents[slot] = -1
+        for term_id in self.slot_terms[slot]:
+            self.df[term_id] -= 1
+        self.slot_terms[slot] = None
+        self.dead += 1
+        if self.dead >= COMPACT_MIN_DEAD and self.dead > len(self.slots):
+            self.compact()
+
+    def compact(self):
+        """Drop the postings of dead slots."""
+        documents = self.documents
+        for term_id, (slots, weights) in enumerate(self.postings):
+            keep = [i for i, slot in enumerate(slots) if documents[slot] >= 0]
+            if len(keep) < len(slots):
+                self.postings[term_id] = (array("I", [slots[i] for i in keep]), array("f", [weights[i] for i in keep]))
+        self.dead = 0
+
+    def search(self, counts: Counter, limit: int = 50) -> list:
+        """(document id, cosine similarity) of the best matches for query term counts, best first."""
+        total = len(self.slots)
+        query = {}
+        for term, count in counts.items():
+            term_id = self.term_ids.get(term)
+            if term_id is not None and self.df[term_id]:
+                query[term_id] = (1 + math.log(count)) * math.log(1 + total / self.df[term_id])
+        if not query:
+            return []
+        norm = math.sqrt(sum(weight * weight for weight in query.values()))
+
+        documents = self.documents
+        scores = [0.0] * len(documents)
+        for term_id, query_weight in query.items():
+            slots, weights = self.postings[term_id]
+            query_weight /= norm
+            for slot, weight in zip(slots, weights):
+                scores[slot] += query_weight * weight
+        best = heapq.nlargest(limit, (slot for slot in range(len(scores)) if scores[slot] and documents[slot] >= 0),
+                              key=lambda slot: (scores[slot], -documents[slot]))
+        return [(documents[slot], round(scores[slot], 3)) for slot in best]
+
+
+class SearchIndex:
+    """Vector indexes of events (with their properties' text) and of properties.
+
+    catch_up changes the index in place while readers may be using it, so both hold `lock`.
+    """
+
+    def __init__(self, version: int = 0):
+        self.version = version
+        self.lock = threading.RLock()
+        self.events = VectorIndex()
+        self.properties = VectorIndex()
+        self._property_terms = {}  # property id -> Counter, summed into event vectors
+
+    def set_property(self, property_id: int, name: str, description: str):
+        counts = terms(name, description)
+        self._property_terms[property_id] = counts
+        self.properties.set(property_id, counts + terms(name))
+
+    def discard_property(self, property_id: int):
+        self._property_terms.pop(property_id, None)
+        self.properties.discard(property_id)
+
+    def set_event(self, event_id: int, name: str, description: str, category: str, property_ids):
+        counts = terms(description, category)
+        for term, count in terms(name).items():
+            counts[term] += NAME_WEIGHT * count
+        for property_id in property_ids:
+            counts.update(self._property_terms.get(property_id, ()))
+        self.events.set(event_id, counts)
+
+    def load_events(self, events, links):
+        """Index (id, name, description, category) rows given (event_id, property_id) link rows."""
+        property_ids = {}
+        for event_id, property_id in links:
+            property_ids.setdefault(event_id, []).append(property_id)
+        for event_id, name, description, category in events:
+            self.set_event(event_id, name, description, category, property_ids.get(event_id, ()))
+
+    def search(self, query: str, limit: int = 50) -> dict:
+        counts = terms(query)
+        with self.lock:
+            return {"events": self.events.search(counts, limit), "properties": self.properties.search(counts, limit)}
+
+
+def _linked_property_ids(new_value) -> set:
+    """Ids of the properties linked by an event changelog entry (create, property_added, patch)."""
+    new_value = new_value or {}
+    links = list(new_value.get("properties") or [])
+    if new_value.get("property"):
+        links.append(new_value["property"])
+    return {link["property_id"] for link in links if "property_id" in link}
+
+
+def build_index(db: Session) -> SearchIndex:
+    index = SearchIndex(taxonomy_version(db))
+    for property_id, name, description in db.execute(text(PROPERTIES_SQL)):
+        index.set_property(property_id, name, description)
+    index.load_events(db.execute(text(EVENTS_SQL)).all(), db.execute(text(EVENT_PROPERTY_IDS_SQL)).all())
+    return index
+
+
+def updates(db: Session, index: SearchIndex, entries):
+    """Re-vectorise the documents changed by `entries` (see VersionedIndexCache)."""
+    properties = {entry.entity_id for entry in entries if entry.entity_type == "property"}
+    for entry in entries:
+        properties.update(merged_property_ids(entry.new_value))  # Deleted, so only discarded below
+        if entry.entity_type == "event":
+            # Adding a link can create its property without a property entry of its own
+            properties.update(property_id for property_id in _linked_property_ids(entry.new_value)
+                              if property_id not in index._property_terms)
+    events = {entry.entity_id for entry in entries if entry.entity_type == "event"}
+
+    property_rows = rows_in(db, PROPERTIES_SQL, "id", properties)
+    # Events embed their properties' text, so renamed, re-described or merged properties re-index them
+    updated = [entry.entity_id for entry in entries if entry.entity_type == "property" and entry.action == "update"]
+    events.update(event_id for event_id, _ in rows_in(db, EVENT_PROPERTY_IDS_SQL, "property_id", updated))
+    event_rows = rows_in(db, EVENTS_SQL, "id", events)
+    link_rows = rows_in(db, EVENT_PROPERTY_IDS_SQL, "event_id", events)
+
+    def update():
+        for property_id in properties:
+            index.discard_property(property_id)
+        for property_id, name, description in property_rows:
+            index.set_property(property_id, name, description)
+        for event_id in events:
+            index.events.discard(event_id)
+        index.load_events(event_rows, link_rows)
+    return update
+
+
+index_cache = VersionedIndexCache(build_index, updates)
+
+
+def get_search_index(db: Session) -> SearchIndex:
+    """Return the search index for the current taxonomy version, updating it if needed."""
+    return index_cache.get(db)
@@ -0,0 +1,415 @@
+"""
+Mergeable value sketches for property statistics.
+
+Each registry property gets a PropertySketch built from sample event streams:
+
+- HyperLogLog for the number of distinct values
+- Count-min sketch plus a top-k candidate list for the most frequent values
+- Log-bucketed quantile sketch (DDSketch-style, 1% relative error) for Int/Float values
+
+All three merge without the original data (register max, counter sums, bucket
+sums), so sketches built by parallel workers, from different files or in earlier
+runs combine exactly as if the values had been streamed through one sketch.
+Sketches are stored zlib-compressed in the property_stats table next to a
+precomputed summary that the API serves with each property.
+
+Usage:
+    python sketches.py --db event_taxonomy.db samples/*.ndjson.gz
+"""
+import argparse
+import json
+import math
+import struct
+import zlib
+from array import array
+from datetime import datetime, UTC
+from hashlib import blake2b
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+from audit_logs import DEFAULT_CHUNK_SIZE, iter_task, plan_tasks, run_tasks
+from database import init_db, Property, PropertyStats
+
+MAX_VALUE_LENGTH = 200
+
+
+def hash64(value: str) -> int:
+    """Stable 64-bit hash (Python's hash() differs between worker processes)."""
+    return int.from_bytes(blake2b(value.encode(), digest_size=8).digest(), "little")
+
+
+class HyperLogLog:
+    """Distinct-count estimator with 2**precision one-byte registers."""
+
+    def __init__(self, precision: int = 12, registers: bytes = None):
+        self.precision = precision
+        self.registers = bytearray(registers) if registers else bytearray(1 << precision)
+
+    def add_hash(self, h: int):
+        index = h >> (64 - self.precision)
+        rest = h & ((1 << (64 - self.precision)) - 1)
+        rank = 64 - self.precision - rest.bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def merge(self, other: "HyperLogLog"):
+        self.registers = bytearray(map(max, self.registers, other.registers))
+        return self
+
+    def count(self) -> int:
+        m = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / sum(2.0 ** -r for r in self.registers)
+        zeros = self.registers.count(0)
+        if estimate <= 2.5 * m and zeros:
+            # Small-range correction: linear counting
+            estimate = m * math.log(m / zeros)
+        return round(estimate)
+
+
+class FrequentValues:
+    """Count-min sketch with a top-k candidate list.
+
+    Candidates are kept by their count-min estimate; on merge the union of both
+    candidate lists is re-estimated against the merged counters.
+    """
+
+    def __init__(self, width: int = 1024, depth: int = 4, k: int = 20):
+        self.width = width
+        self.depth = depth
+        self.k = k
+        self.counters = array("I", bytes(4 * width * depth))
+        self.candidates = {}
+        self._floor = 0
+
+    def _cells(self, h: int):
+        low, high = h & 0xFFFFFFFF, h >> 32
+        width = self.width
+        return [row * width + (low + row * high) % width for row in range(self.depth)]
+
+    def estimate_hash(self, h: int) -> int:
+        counters = self.counters
+        return min(counters[cell] for cell in self._cells(h))
+
+    def add(self, value: str, h: int):
+        counters = self.counters
+        estimate = None
+        for cell in self._cells(h):
+            count = counters[cell] + 1
+            counters[cell] = count
+            if estimate is None or count < estimate:
+                estimate = count
+
+        candidates = self.candidates
+        if value in candidates:
+            candidates[value] = estimate
+        elif len(candidates) < self.k:
+            candidates[value] = estimate
+            if len(candidates) == self.k:
+                self._floor = min(candidates.values())
+        elif estimate > self._floor:
+            # _floor is a lower bound (candidates only grow), so check the real minimum
+            lowest = min(candidates, key=candidates.get)
+            if estimate > candidates[lowest]:
+                del candidates[lowest]
+                candidates[value] = estimate
+            self._floor = min(candidates.values())
+
+    def merge(self, other: "FrequentValues"):
+        self.counters = array("I", map(int.__add__, self.counters, other.counters))
+        merged = {value: self.estimate_hash(hash64(value))
+                  for value in set(self.candidates) | set(other.candidates)}
+        self.candidates = dict(sorted(merged.items(), key=lambda item: -item[1])[:self.k])
+        self._floor = min(self.candidates.values()) if len(self.candidates) >= self.k else 0
+        return self
+
+    def top(self, n: int = 10):
+        return sorted(self.candidates.items(), key=lambda item: (-item[1], item[0]))[:n]
+
+
+class QuantileSketch:
+    """Relative-error quantile sketch over log-spaced buckets (DDSketch)."""
+
+    def __init__(self, relative_accuracy: float = 0.01, max_buckets: int = 2048):
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self.log_gamma = math.log(self.gamma)
+        self.max_buckets = max_buckets
+        self.positive = {}
+        self.negative = {}
+        self.zeros = 0
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+
+    def add(self, value: float):
+        self.count += 1
+        self.total += value
+        if self.min is None or value < self.min:
+            self.min = value
+        if self.max is None or value > self.max:
+            self.max = value
+        if value == 0:
+            self.zeros += 1
+            return
+        buckets = self.positive if value > 0 else self.negative
+        key = math.ceil(math.log(abs(value)) / self.log_gamma)
+        buckets[key] = buckets.get(key, 0) + 1
+        if len(buckets) > self.max_buckets:
+            self._collapse(buckets)
+
+    def _collapse(self, buckets):
+        # Fold the lowest-magnitude buckets together to bound memory
+        keys = sorted(buckets)
+        overflow = keys[:len(keys) - self.max_buckets + 1]
+        target = overflow[-1]
+        buckets[target] = sum(buckets.pop(key) for key in overflow[:-1]) + buckets[target]
+
+    def merge(self, other: "QuantileSketch"):
+        for mine, theirs in ((self.positive, other.positive), (self.negative, other.negative)):
+            for key, count in theirs.items():
+                mine[key] = mine.get(key, 0) + count
+            if len(mine) > self.max_buckets:
+                self._collapse(mine)
+        self.zeros += other.zeros
+        self.count += other.count
+        self.total += other.total
+        if other.min is not None:
+            self.min = other.min if self.min is None else min(self.min, other.min)
+            self.max = other.max if self.max is None else max(self.max, other.max)
+        return self
+
+    def _value(self, key: int) -> float:
+        return 2 * self.gamma ** key / (self.gamma + 1)
+
+    def quantile(self, q: float):
+        if not self.count:
+            return None
+        rank = q * (self.count - 1)
+        seen = 0
+        for key in sorted(self.negative, reverse=True):
+            seen += self.negative[key]
+            if seen > rank:
+                return max(-self._value(key), self.min)
+        seen += self.zeros
+        if seen > rank:
+            return 0.0
+        for key in sorted(self.positive):
+            seen += self.positive[key]
+            if seen > rank:
+                return min(self._value(key), self.max)
+        return self.max
+
+    def to_dict(self) -> dict:
+        return {
+            "positive": self.positive, "negative": self.negative, "zeros": self.zeros,
+            "count": self.count, "total": self.total, "min": self.min, "max": self.max,
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "QuantileSketch":
+        sketch = cls()
+        sketch.positive = {int(k): v for k, v in data["positive"].items()}
+        sketch.negative = {int(k): v for k, v in data["negative"].items()}
+        for field in ("zeros", "count", "total", "min", "max"):
+            setattr(sketch, field, data[field])
+        return sketch
+
+
+def _value_key(value) -> str:
+    if type(value) is str:
+        text = value
+    else:
+        text = json.dumps(value, sort_keys=True, separators=(",", ":"))
+    return text[:MAX_VALUE_LENGTH]
+
+
+class PropertySketch:
+    """All sketches for one property."""
+
+    def __init__(self):
+        self.observations = 0
+        self.nulls = 0
+        self.distinct = HyperLogLog()
+        self.frequent = FrequentValues()
+        self.numeric = QuantileSketch()
+
+    def add(self, value):
+        self.observations += 1
+        if value is None:
+            self.nulls += 1
+            return
+        key = _value_key(value)
+        h = hash64(key)
+        self.distinct.add_hash(h)
+        self.frequent.add(key, h)
+        # json.loads accepts NaN and Infinity, which have no quantile bucket
+        if type(value) is int or (type(value) is float and math.isfinite(value)):
+            self.numeric.add(value)
+
+    def merge(self, other: "PropertySketch") -> "PropertySketch":
+        self.observations += other.observations
+        self.nulls += other.nulls
+        self.distinct.merge(other.distinct)
+        self.frequent.merge(other.frequent)
+        self.numeric.merge(other.numeric)
+        return self
+
+    def summary(self, top: int = 10) -> dict:
+        """Statistics served with PropertyResponse."""
+        numeric = self.numeric
+        return {
+            "observations": self.observations,
+            "nulls": self.nulls,
+            "distinct_estimate": self.distinct.count(),
+            "top_values": [{"value": value, "count": count} for value, count in self.frequent.top(top)],
+            "numeric": {
+                "count": numeric.count,
+                "min": numeric.min,
+                "max": numeric.max,
+                "mean": numeric.total / numeric.count,
+                "p50": numeric.quantile(0.5),
+                "p90": numeric.quantile(0.9),
+                "p99": numeric.quantile(0.99),
+            } if numeric.count else None,
+        }
+
+    def to_bytes(self) -> bytes:
+        """Compact serialization: JSON header + HLL registers + count-min counters, zlib-compressed."""
+        header = json.dumps({
+            "observations": self.observations,
+            "nulls": self.nulls,
+            "precision": self.distinct.precision,
+            "width": self.frequent.width,
+            "depth": self.frequent.depth,
+            "k": self.frequent.k,
+            "candidates": self.frequent.candidates,
+            "numeric": self.numeric.to_dict(),
+        }, separators=(",", ":")).encode()
+        registers = bytes(self.distinct.registers)
+        counters = self.frequent.counters.tobytes()
+        return zlib.compress(struct.pack("<III", len(header), len(registers), len(counters))
+                             + header + registers + counters)
+
+    @classmethod
+    def from_bytes(cls, blob: bytes) -> "PropertySketch":
+        data = zlib.decompress(blob)
+        header_len, registers_len, counters_len = struct.unpack_from("<III", data)
+        offset = 12
+        header = json.loads(data[offset:offset + header_len])
+        offset += header_len
+        registers = data[offset:offset + registers_len]
+        offset += registers_len
+
+        sketch = cls()
+        sketch.observations = header["observations"]
+        sketch.nulls = header["nulls"]
+        sketch.distinct = HyperLogLog(header["precision"], registers)
+        sketch.frequent = FrequentValues(header["width"], header["depth"], header["k"])
+        sketch.frequent.counters = array("I")
+        sketch.frequent.counters.frombytes(data[offset:offset + counters_len])
+        sketch.frequent.candidates = header["candidates"]
+        if len(sketch.frequent.candidates) >= sketch.frequent.k:
+            sketch.frequent._floor = min(sketch.frequent.candidates.values())
+        sketch.numeric = QuantileSketch.from_dict(header["numeric"])
+        return sketch
+
+
+def merge_sketches(total: dict, part: dict) -> dict:
+    """Merge {property name: PropertySketch} maps (in place)."""
+    for name, sketch in part.items():
+        if name in total:
+            total[name].merge(sketch)
+        else:
+            total[name] = sketch
+    return total
+
+
+def sketch_lines(lines) -> dict:
+    """Build per-property sketches from raw NDJSON lines."""
+    sketches = {}
+    loads = json.loads
+    for line in lines:
+        if not line.strip():
+            continue
+        try:
+            payload = loads(line)
+        except ValueError:
+            continue
+        properties = payload.get("properties") if type(payload) is dict else None
+        if type(properties) is not dict:
+            continue
+        for key, value in properties.items():
+            sketch = sketches.get(key)
+            if sketch is None:
+                sketch = sketches[key] = PropertySketch()
+            sketch.add(value)
+    return sketches
+
+
+def sketch_task(task) -> dict:
+    """Sketch one task's lines. Runs in a worker process."""
+    return sketch_lines(iter_task(*task))
+
+
+def collect_sketches(paths, workers=None, chunk_size=DEFAULT_CHUNK_SIZE) -> dict:
+    """Sketch every property seen in NDJSON log files, merging worker results."""
+    total = {}
+    run_tasks(sketch_task, plan_tasks(paths, chunk_size), lambda part: merge_sketches(total, part),
+              workers=workers)
+    return total
+
+
+def merge_stats(prop: Property, sketch: PropertySketch):
+    """Merge a sketch into the stored stats of one property.
+
+    Note: This does NOT commit.
+    """
+    stored = prop.sketch
+    if stored is None:
+        stored = prop.sketch = PropertyStats(property_id=prop.id)
+    else:
+        sketch = PropertySketch.from_bytes(stored.sketch).merge(sketch)
+    stored.sketch = sketch.to_bytes()
+    stored.summary = sketch.summary()
+    stored.updated_at = datetime.now(UTC)
+
+
+def store_sketches(db: Session, sketches: dict) -> int:
+    """Merge sketches into the stored stats of registry properties (by name).
+
+    Properties missing from the registry are skipped.
+
+    Returns:
+        Number of properties updated
+    """
+    if not sketches:
+        return 0
+    properties = db.query(Property).filter(Property.name.in_(list(sketches))).all()
+    for prop in properties:
+        merge_stats(prop, sketches[prop.name])
+    db.commit()
+    return len(properties)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Collect per-property value sketches from NDJSON logs")
+    parser.add_argument("paths", nargs="+", help="Plain or .gz NDJSON files")
+    parser.add_argument("--db", default="event_taxonomy.db", help="Taxonomy SQLite file to update")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: CPU count)")
+    parser.add_argument("--chunk-mb", type=int, default=DEFAULT_CHUNK_SIZE // (1024 * 1024),
+                        help="Byte range per task for plain files")
+    args = parser.parse_args()
+
+    sketches = collect_sketches(args.paths, workers=args.workers, chunk_size=args.chunk_mb * 1024 * 1024)
+    engine = create_engine(f"sqlite:///{args.db}")
+    init_db(engine)
+    with Session(engine) as db:
+        updated = store_sketches(db, sketches)
+    print(f"Sketched {len(sketches)} properties, updated stats for {updated} registry properties")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,232 @@
+"""
+Batched fuzzy scoring for property name suggestions.
+
+utils.find_similar_properties runs a SequenceMatcher against every registry name
+for each query. PropertyNameIndex keeps the names in bit-sliced form instead: for
+every token (a character or bigram together with its occurrence number, so
+multisets compare exactly) one big integer holds a bit per registry name. Adding
+a query's token masks into bit-plane counters (a carry-save adder over Python
+ints) yields the multiset overlap with all names at once, and comparing the
+counters against the per-length minimum overlap selects the names above the
+threshold, all with a handful of integer operations on N-bit words.
+
+- mode="ngram": names are scored by the Dice coefficient of their bigram
+  multisets, straight from the counters.
+- mode="exact": the character overlap gives SequenceMatcher.quick_ratio, an upper
+  bound of ratio(), for every name. Only names whose bound clears the threshold
+  are re-scored with SequenceMatcher, best bound first, stopping once no bound
+  can reach the current top k, so results match find_similar_properties exactly.
+
+The NumPy-style matrix the idea comes from is replaced by big integers, which
+need no extra dependency.
+"""
+import heapq
+import math
+import re
+import threading
+import weakref
+from collections import Counter
+from difflib import SequenceMatcher
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+
+MODES = ("exact", "ngram")
+PROPERTY_NAMES_SQL = "SELECT name, data_type FROM properties ORDER BY id"
+# Highest sync version stamped on a property or a property tombstone: it only grows, and only when
+# a property is added, changed or deleted (event edits leave it alone)
+PROPERTY_VERSION_SQL = """
+    SELECT MAX(COALESCE((SELECT MAX(sync_version) FROM properties), 0),
+               COALESCE((SELECT MAX(sync_version) FROM tombstones WHERE entity_type = 'property'), 0))
+"""
+
+_NONZERO = re.compile(rb"[^\x00]")
+
+
+def char_tokens(name: str) -> list:
+    """Characters numbered by occurrence: 'aab' -> [('a', 1), ('a', 2), ('b', 1)]."""
+    seen = Counter()
+    tokens = []
+    for char in name:
+        seen[char] += 1
+        tokens.append((char, seen[char]))
+    return tokens
+
+
+def bigram_tokens(name: str) -> list:
+    return char_tokens([name[i:i + 2] for i in range(len(name) - 1)] or [name])
+
+
+class BitSlicedIndex:
+    """Token multisets of N names as one N-bit mask per token and per multiset size."""
+
+    def __init__(self, token_lists):
+        self.size = len(token_lists)
+        self.nbytes = max(1, (self.size + 7) // 8)
+        postings = {}
+        lengths = {}
+        for position, tokens in enumerate(token_lists):
+            for token in tokens:
+                postings.setdefault(token, []).append(position)
+            lengths.setdefault(len(tokens), []).append(position)
+        self.masks = {token: self._mask(positions) for token, positions in postings.items()}
+        self.lengths = {length: self._mask(positions) for length, positions in lengths.items()}
+        self.all = (1 << self.size) - 1
+
+    def _mask(self, positions) -> int:
+        bits = bytearray(self.nbytes)
+        for position in positions:
+            bits[position >> 3] |= 1 << (position & 7)
+        return int.from_bytes(bits, "little")
+
+    def overlap(self, tokens) -> list:
+        """Bit planes of every name's overlap count with `tokens` (plane b holds bit b)."""
+        planes = []
+        for token in tokens:
+            carry = self.masks.get(token, 0)
+            for bit, plane in enumerate(planes):
+                if not carry:
+                    break
+                planes[bit], carry = plane ^ carry, plane & carry
+            if carry:
+                planes.append(carry)
+        return planes
+
+    def at_least(self, planes, minimum: int) -> int:
+        """Mask of the names whose count in `planes` is >= minimum."""
+        if minimum <= 0:
+            return self.all
+        if minimum >= 1 << len(planes):
+            return 0
+        greater, equal = 0, self.all
+        for bit in range(len(planes) - 1, -1, -1):
+            if minimum >> bit & 1:
+                equal &= planes[bit]
+            else:
+                greater |= equal & planes[bit]
+                equal &= ~planes[bit]
+        return greater | equal
+
+    def above(self, planes, query_length: int, threshold: float) -> int:
+        """Mask of the names with 2 * overlap / (query_length + length) > threshold."""
+        selected = 0
+        for length, mask in self.lengths.items():
+            total = query_length + length
+            minimum = math.floor(threshold * total / 2) + 1
+            while minimum > 0 and 2 * (minimum - 1) / total > threshold:
+                minimum -= 1
+            selected |= mask & self.at_least(planes, minimum)
+        return selected
+
+    def positions(self, mask: int) -> list:
+        data = mask.to_bytes(self.nbytes, "little")
+        return [match.start() * 8 + bit
+                for match in _NONZERO.finditer(data)
+                for bit in range(8) if data[match.start()] >> bit & 1]
+
+    def counts(self, planes, positions) -> list:
+        planes = [plane.to_bytes(self.nbytes, "little") for plane in planes]
+        return [sum((plane[p >> 3] >> (p & 7) & 1) << bit for bit, plane in enumerate(planes)) for p in positions]
+
+
+class PropertyNameIndex:
+    """Registry names with batched fuzzy scoring (see module docstring)."""
+
+    def __init__(self, properties, version: int = 0):
+        self.version = version
+        self.properties = list(properties)  # (name, data_type) in registry order
+        self.names = [name.lower() for name, _ in self.properties]
+        self._chars = [char_tokens(name) for name in self.names]
+        self._lengths = [len(tokens) for tokens in self._chars]
+        self.chars = BitSlicedIndex(self._chars)
+        self._bigrams = None
+
+    @property
+    def bigrams(self) -> BitSlicedIndex:
+        if self._bigrams is None:
+            self._bigram_lengths = [len(bigram_tokens(name)) for name in self.names]
+            self._bigrams = BitSlicedIndex([bigram_tokens(name) for name in self.names])
+        return self._bigrams
+
+    def _suggestion(self, position: int, similarity: float) -> dict:
+        name, data_type = self.properties[position]
+        return {"name": name, "data_type": data_type, "similarity": similarity}
+
+    def suggest(self, query: str, threshold: float = 0.6, top_k: int = 5, mode: str = "exact") -> list:
+        """Registry names similar to query, like utils.find_similar_properties.
+
+        Args:
+            query: Property name to match
+            threshold: Similarities must be strictly greater than this
+            top_k: Maximum number of suggestions
+            mode: 'exact' (SequenceMatcher ratios) or 'ngram' (bigram Dice)
+        """
+        query = query.lower()
+        if mode == "ngram":
+            return self._suggest_ngram(query, threshold, top_k)
+        tokens = char_tokens(query)
+        planes = self.chars.overlap(tokens)
+        positions = self.chars.positions(self.chars.above(planes, len(tokens), threshold))
+        bounds = [2.0 * count / (len(tokens) + self._lengths[p]) if len(tokens) + self._lengths[p] else 1.0
+                  for p, count in zip(positions, self.chars.counts(planes, positions))]
+
+        best = []  # Min-heap of (similarity, -position): the root is the current k-th suggestion
+        for bound, position in sorted(zip(bounds, positions), key=lambda item: (-item[0], item[1])):
+            if len(best) >= top_k and round(bound, 3) < best[0][0]:
+                break  # No remaining name can reach the current top k
+            name = self.names[position]
+            if name == query:
+                continue
+            ratio = SequenceMatcher(None, query, name).ratio()
+            if ratio > threshold:
+                entry = (round(ratio, 3), -position)
+                if len(best) < top_k:
+                    heapq.heappush(best, entry)
+                elif entry > best[0]:
+                    heapq.heapreplace(best, entry)
+        return [self._suggestion(-position, similarity) for similarity, position in sorted(best, reverse=True)]
+
+    def _suggest_ngram(self, query: str, threshold: float, top_k: int) -> list:
+        index = self.bigrams
+        tokens = bigram_tokens(query)
+        planes = index.overlap(tokens)
+        positions = index.positions(index.above(planes, len(tokens), threshold))
+        scored = []
+        for position, count in zip(positions, index.counts(planes, positions)):
+            if self.names[position] != query:
+                scored.append((-round(2.0 * count / (len(tokens) + self._bigram_lengths[position]), 3), position))
+        return [self._suggestion(position, -similarity) for similarity, position in sorted(scored)[:top_k]]
+
+    def suggest_many(self, queries, threshold: float = 0.6, top_k: int = 5, mode: str = "exact") -> list:
+        """suggest() for a batch of queries (e.g. one per import row), scoring each distinct name once."""
+        results = {}
+        for query in queries:
+            key = query.lower()
+            if key not in results:
+                results[key] = self.suggest(query, threshold, top_k, mode)
+        return [results[query.lower()] for query in queries]
+
+
+# Engine -> name index, so separate databases never share one
+_indexes = weakref.WeakKeyDictionary()
+_index_lock = threading.Lock()
+
+
+def get_name_index(db: Session) -> PropertyNameIndex:
+    """Return the name index for the current properties, rebuilding it only when they changed.
+
+    A cached index at or past the properties version this session reads is returned as is.
+    """
+    bind = db.get_bind()
+    version = db.execute(text(PROPERTY_VERSION_SQL)).scalar()
+    index = _indexes.get(bind)
+    if index is not None and index.version >= version:
+        return index
+
+    with _index_lock:
+        index = _indexes.get(bind)
+        if index is None or index.version < version:
+            index = PropertyNameIndex(db.execute(text(PROPERTY_NAMES_SQL)).all(), version)
+            _indexes[bind] = index
+    return index
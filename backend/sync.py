@@ -0,0 +1,131 @@
+"""
+Delta sync for clients that cache the taxonomy locally.
+
+A sync version is a value of the sync_sequence counter. Every flush that writes
+an event, property or tombstone bumps the counter and stamps those rows with the
+new value (sync_version, indexed). The bump is an UPDATE, so it runs under
+SQLite's write lock, which is held until commit: versions are handed out in
+commit order, and no row can commit with a version at or below one a reader has
+already seen. GET /api/sync?since=<version> returns the events and properties
+stamped after that version plus tombstones for the ones deleted since, and the
+new version to send next time.
+
+Tombstones are kept for TOMBSTONE_RETENTION_DAYS (env var, default 30). Pruning
+records the highest version it dropped; a client whose version is below that
+(or that is not a version of this database) may have missed deletions, so it
+gets a full snapshot instead (full=true) and should replace its cache.
+"""
+import os
+from datetime import datetime, timedelta, UTC
+
+from sqlalchemy import event, func, text
+from sqlalchemy.orm import Session, selectinload
+
+from database import Event, EventProperty, Property, SyncSequence, Tombstone
+
+TOMBSTONE_RETENTION_ENV = "TOMBSTONE_RETENTION_DAYS"
+DEFAULT_RETENTION_DAYS = 30
+
+SYNCED_MODELS = (Event, Property, Tombstone)
+
+
+def retention() -> timedelta:
+    """How long tombstones are kept (and so how stale a delta sync may be)."""
+    return timedelta(days=float(os.environ.get(TOMBSTONE_RETENTION_ENV) or DEFAULT_RETENTION_DAYS))
+
+
+def _utcnow() -> datetime:
+    return datetime.now(UTC).replace(tzinfo=None)
+
+
+@event.listens_for(Session, "before_flush")
+def _stamp_sync_version(session, flush_context, instances):
+    changed = [obj for obj in session.new if isinstance(obj, SYNCED_MODELS)]
+    changed += [obj for obj in session.dirty if isinstance(obj, SYNCED_MODELS) and session.is_modified(obj)]
+    if not changed:
+        return
+    # Takes the write lock (if this transaction does not hold it yet) before the version is drawn
+    version = session.connection().execute(
+        text("UPDATE sync_sequence SET value = value + 1 WHERE id = 1 RETURNING value")
+    ).scalar()
+    for obj in changed:
+        obj.sync_version = version
+
+
+def add_tombstone(db: Session, entity_type: str, entity_id: int, name: str = None):
+    """Record a deletion for delta sync and drop tombstones past the retention window.
+
+    Note: This does NOT commit - call it inside the unit_of_work that deletes the entity.
+    """
+    db.add(Tombstone(entity_type=entity_type, entity_id=entity_id, name=name))
+    expired = db.query(Tombstone).filter(Tombstone.deleted_at < _utcnow() - retention())
+    dropped = expired.with_entities(func.max(Tombstone.sync_version)).scalar()
+    if dropped is not None:
+        db.query(SyncSequence).filter(SyncSequence.id == 1, SyncSequence.pruned < dropped).update(
+            {SyncSequence.pruned: dropped}, synchronize_session=False)
+    expired.delete(synchronize_session=False)
+
+
+def touch(entity):
+    """Mark an event or property as changed when only its associations were edited."""
+    entity.updated_at = datetime.now(UTC)
+
+
+def serialize_event(event: Event) -> dict:
+    """EventResponse-shaped dict for an event loaded with its properties."""
+    return {
+        "id": event.id,
+        "name": event.name,
+        "description": event.description,
+        "category": event.category,
+        "created_by": event.created_by,
+        "created_at": event.created_at,
+        "updated_at": event.updated_at,
+        "properties": [
+            {
+                "id": ep.id,
+                "property_id": ep.property_id,
+                "property_name": ep.property.name,
+                "property_type": ep.property_type,
+                "data_type": ep.property.data_type,
+                "description": ep.property.description,
+                "is_required": ep.is_required,
+                "example_value": ep.example_value,
+            }
+            for ep in event.event_properties
+        ],
+    }
+
+
+def current_version(db: Session) -> int:
+    """Version of the latest committed write to events, properties or tombstones (0 when empty)."""
+    return db.query(SyncSequence.value).filter(SyncSequence.id == 1).scalar() or 0
+
+
+def changes_since(db: Session, since: int = 0) -> dict:
+    """Events, properties and tombstones changed after version `since`.
+
+    Returns:
+        {"version", "full", "events", "properties", "deleted"}; with full=true the
+        events and properties are the whole taxonomy and the client should replace its cache.
+    """
+    # Read the version first: anything committed after this read shows up again next time
+    version, pruned = db.query(SyncSequence.value, SyncSequence.pruned).filter(SyncSequence.id == 1).one()
+    full = since <= 0 or since < pruned or since > version
+
+    events = db.query(Event).options(selectinload(Event.event_properties).joinedload(EventProperty.property))
+    properties = db.query(Property).options(selectinload(Property.sketch))
+    deleted = []
+    if not full:
+        events = events.filter(Event.sync_version > since)
+        properties = properties.filter(Property.sync_version > since)
+        deleted = db.query(Tombstone).filter(Tombstone.sync_version > since).order_by(Tombstone.sync_version).all()
+
+    events = [serialize_event(event) for event in events.order_by(Event.id).all()]
+    properties = properties.order_by(Property.id).all()
+
+    # Ids can be reused after a delete; a live row supersedes an older tombstone
+    live = {"event": {e["id"] for e in events}, "property": {p.id for p in properties}}
+    deleted = [t for t in deleted if t.entity_id not in live[t.entity_type]]
+
+    return {"version": version, "full": full, "events": events, "properties": properties, "deleted": deleted}
@@ -0,0 +1,262 @@
+"""
+Structured diff between two taxonomies.
+
+Each side is loaded into canonical records (events: name, description,
+category and sorted properties; properties: name, data type, description) and
+hashed into a Merkle tree: leaves are (key, record hash) pairs grouped into
+buckets by the hash of their key, and every inner node hashes its 16
+children. Diffing walks both trees from the root and only descends into
+nodes whose hashes differ, so identical regions are skipped without looking at
+their entities.
+
+Sides are either two SQLite files (events keyed by name, duplicates numbered
+by id order) or two as_of points in one database (events keyed by id, so
+renames show up as changes).
+
+Usage:
+    python taxonomy_diff.py staging.db production.db
+    python taxonomy_diff.py staging.db production.db --json > diff.json
+"""
+import argparse
+import json
+import sqlite3
+from hashlib import blake2b
+from pathlib import Path
+
+TREE_DEPTH = 3  # 16**3 = 4096 leaf buckets
+
+EVENT_ROWS_SQL = "SELECT id, name, description, category FROM events ORDER BY id"
+
+EVENT_PROPERTY_ROWS_SQL = """
+    SELECT ep.event_id, p.name, ep.property_type, p.data_type, ep.is_required, ep.example_value
+    FROM event_properties ep
+    JOIN properties p ON p.id = ep.property_id
+"""
+
+PROPERTY_ROWS_SQL = "SELECT name, data_type, description FROM properties"
+
+
+def _digest(data: bytes) -> str:
+    return blake2b(data, digest_size=16).hexdigest()
+
+
+def _record_hash(record) -> str:
+    # Records are built with a fixed key order, so plain dumps is canonical
+    return _digest(json.dumps(list(record.values()), separators=(",", ":")).encode())
+
+
+def event_record(name, description, category, properties) -> dict:
+    """Canonical event record; properties are [name, type, data_type, required, example] lists."""
+    return {
+        "name": name,
+        "description": description,
+        "category": category,
+        "properties": sorted(properties, key=lambda p: (p[0], p[1])),
+    }
+
+
+def load_rows(event_rows, event_property_rows, property_rows, key_by_id: bool = False) -> dict:
+    """Build a taxonomy from EVENT_ROWS_SQL, EVENT_PROPERTY_ROWS_SQL and PROPERTY_ROWS_SQL rows.
+
+    Returns:
+        {"events": {key: record}, "properties": {name: record}}
+    """
+    properties_by_event = {}
+    for event_id, prop, prop_type, data_type, required, example in event_property_rows:
+        entry = [prop, prop_type, data_type, bool(required), example]
+        entries = properties_by_event.get(event_id)
+        if entries is None:
+            properties_by_event[event_id] = [entry]
+        else:
+            entries.append(entry)
+
+    events = {}
+    seen = {}
+    for event_id, name, description, category in event_rows:
+        if key_by_id:
+            key = str(event_id)
+        else:
+            seen[name] = seen.get(name, 0) + 1
+            key = name if seen[name] == 1 else f"{name}#{seen[name]}"
+        events[key] = event_record(name, description, category, properties_by_event.get(event_id, []))
+
+    properties = {
+        name: {"name": name, "data_type": data_type, "description": description}
+        for name, data_type, description in property_rows
+    }
+    return {"events": events, "properties": properties}
+
+
+def load_sqlite(path) -> dict:
+    """Load the taxonomy in a SQLite file (read-only), events keyed by name."""
+    conn = sqlite3.connect(f"file:{Path(path).resolve()}?mode=ro", uri=True)
+    try:
+        return load_rows(conn.execute(EVENT_ROWS_SQL), conn.execute(EVENT_PROPERTY_ROWS_SQL),
+                         conn.execute(PROPERTY_ROWS_SQL))
+    finally:
+        conn.close()
+
+
+def load_states(states: dict) -> dict:
+    """Build a taxonomy from history.events_at states, events keyed by id.
+
+    Property descriptions are not versioned, so property records hold name and data type.
+    """
+    events = {}
+    properties = {}
+    for event_id, state in states.items():
+        entries = []
+        for prop in state.get("properties") or []:
+            entries.append([prop["name"], prop.get("type"), prop.get("data_type"),
+                            bool(prop.get("required")), prop.get("example")])
+            properties[prop["name"]] = {"name": prop["name"], "data_type": prop.get("data_type")}
+        events[str(event_id)] = event_record(state.get("name"), state.get("description"),
+                                             state.get("category"), entries)
+    return {"events": events, "properties": properties}
+
+
+class MerkleTree:
+    """Hash tree over {key: record}, bucketed by key hash with fan-out 16."""
+
+    def __init__(self, records: dict, depth: int = TREE_DEPTH):
+        self.depth = depth
+        self.records = records
+        self.buckets = {}
+        for key, record in records.items():
+            prefix = _digest(key.encode())[:depth]
+            self.buckets.setdefault(prefix, {})[key] = _record_hash(record)
+
+        # nodes[prefix] = hash for every prefix length 0..depth
+        self.nodes = {}
+        level = {
+            prefix: _digest("".join(f"{k}\0{h}\0" for k, h in sorted(leaves.items())).encode())
+            for prefix, leaves in self.buckets.items()
+        }
+        self.nodes.update(level)
+        for length in range(depth - 1, -1, -1):
+            parents = {}
+            for prefix in sorted(level):
+                parents.setdefault(prefix[:length], []).append(f"{prefix}:{level[prefix]}")
+            level = {prefix: _digest(",".join(children).encode()) for prefix, children in parents.items()}
+            self.nodes.update(level)
+
+    @property
+    def root(self) -> str:
+        return self.nodes.get("", _digest(b""))
+
+    def children(self, prefix: str):
+        return [prefix + digit for digit in "0123456789abcdef" if prefix + digit in self.nodes]
+
+
+def diff_trees(left: MerkleTree, right: MerkleTree):
+    """Keys added, removed and changed from left to right, visiting only differing subtrees.
+
+    Returns:
+        (added, removed, changed, buckets compared)
+    """
+    added, removed, changed = [], [], []
+    compared = 0
+    stack = [""]
+    while stack:
+        prefix = stack.pop()
+        if left.nodes.get(prefix) == right.nodes.get(prefix):
+            continue
+        if len(prefix) < left.depth:
+            stack.extend(set(left.children(prefix)) | set(right.children(prefix)))
+            continue
+        compared += 1
+        before = left.buckets.get(prefix, {})
+        after = right.buckets.get(prefix, {})
+        for key, digest in after.items():
+            if key not in before:
+                added.append(key)
+            elif before[key] != digest:
+                changed.append(key)
+        removed.extend(key for key in before if key not in after)
+    return sorted(added), sorted(removed), sorted(changed), compared
+
+
+def _event_change(key, before, after) -> dict:
+    fields = [field for field in ("name", "description", "category") if before[field] != after[field]]
+    old_props = {(p[0], p[1]): p for p in before["properties"]}
+    new_props = {(p[0], p[1]): p for p in after["properties"]}
+
+    def describe(p):
+        return {"name": p[0], "type": p[1], "data_type": p[2], "required": p[3], "example": p[4]}
+
+    return {
+        "key": key,
+        "name": after["name"],
+        "fields": {field: {"before": before[field], "after": after[field]} for field in fields},
+        "properties_added": [describe(new_props[k]) for k in sorted(new_props.keys() - old_props.keys())],
+        "properties_removed": [describe(old_props[k]) for k in sorted(old_props.keys() - new_props.keys())],
+        "properties_changed": [
+            {"before": describe(old_props[k]), "after": describe(new_props[k])}
+            for k in sorted(old_props.keys() & new_props.keys()) if old_props[k] != new_props[k]
+        ],
+    }
+
+
+def diff_taxonomies(left: dict, right: dict) -> dict:
+    """Structured diff from taxonomy `left` to taxonomy `right` (see load_rows)."""
+    result = {"summary": {}}
+    for kind in ("events", "properties"):
+        before, after = left[kind], right[kind]
+        added, removed, changed, compared = diff_trees(MerkleTree(before), MerkleTree(after))
+        if kind == "events":
+            changes = [_event_change(key, before[key], after[key]) for key in changed]
+        else:
+            changes = [{"key": key, "before": before[key], "after": after[key]} for key in changed]
+        result[kind] = {
+            "added": [dict(after[key], key=key) for key in added],
+            "removed": [dict(before[key], key=key) for key in removed],
+            "changed": changes,
+        }
+        result["summary"][kind] = {
+            "added": len(added), "removed": len(removed), "changed": len(changed),
+            "buckets_compared": compared,
+        }
+    return result
+
+
+def format_diff(diff: dict, limit: int = 50) -> str:
+    """Render a diff as a plain-text summary."""
+    lines = []
+    for kind in ("events", "properties"):
+        counts = diff["summary"][kind]
+        lines.append(f"{kind}: +{counts['added']} -{counts['removed']} ~{counts['changed']}")
+        for record in diff[kind]["added"][:limit]:
+            lines.append(f"  + {record['name']}")
+        for record in diff[kind]["removed"][:limit]:
+            lines.append(f"  - {record['name']}")
+        for change in diff[kind]["changed"][:limit]:
+            name = change.get("name") or change["after"]["name"]
+            details = []
+            if kind == "events":
+                details += list(change["fields"])
+                details += [f"+{p['name']}" for p in change["properties_added"]]
+                details += [f"-{p['name']}" for p in change["properties_removed"]]
+                details += [f"~{p['after']['name']}" for p in change["properties_changed"]]
+            else:
+                details += [f for f in ("data_type", "description") if change["before"].get(f) != change["after"].get(f)]
+            lines.append(f"  ~ {name}: {', '.join(details)}")
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Diff two taxonomy SQLite files")
+    parser.add_argument("left", help="Base taxonomy, e.g. production.db")
+    parser.add_argument("right", help="Compared taxonomy, e.g. staging.db")
+    parser.add_argument("--limit", type=int, default=50, help="Entries per section in the text summary")
+    parser.add_argument("--json", action="store_true", help="Print the full diff as JSON")
+    args = parser.parse_args()
+
+    diff = diff_taxonomies(load_sqlite(args.left), load_sqlite(args.right))
+    if args.json:
+        print(json.dumps(diff, indent=2))
+    else:
+        print(format_diff(diff, args.limit))
+
+
+if __name__ == "__main__":
+    main()
@@ -9,7 +9,7 @@ from sqlalchemy.pool import StaticPool
 # Add backend directory to path
 backend_dir = Path(__file__).parent.parent
 sys.path.insert(0, str(backend_dir))
-from database import Base, get_db # noqa: E402
+from database import Base, get_db, init_db # noqa: E402
 from api import app # noqa: E402
 
 
@@ -27,48 +27,8 @@ def test_db():
 
     TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
-    # Create tables
-    Base.metadata.create_all(bind=engine)
-
-    # Create FTS5 table for search tests
-    from sqlalchemy import text
-    with engine.connect() as conn:
-        # Create FTS5 virtual table
-        conn.execute(text("""
-            CREATE VIRTUAL TABLE IF NOT EXISTS events_fts USING fts5(
-                name,
-                description,
-                category,
-                content='events',
-                content_rowid='id'
-            )
-        """))
-
-        # Create triggers to keep FTS5 in sync
-        conn.execute(text("""
-            CREATE TRIGGER IF NOT EXISTS events_fts_insert AFTER INSERT ON events BEGIN
-                INSERT INTO events_fts(rowid, name, description, category)
-                VALUES (new.id, new.name, COALESCE(new.description, ''), COALESCE(new.category, ''));
-            END
-        """))
-
-        conn.execute(text("""
-            CREATE TRIGGER IF NOT EXISTS events_fts_update AFTER UPDATE ON events BEGIN
-                INSERT INTO events_fts(events_fts, rowid, name, description, category)
-                VALUES ('delete', old.id, old.name, old.description, old.category);
-                INSERT INTO events_fts(rowid, name, description, category)
-                VALUES (new.id, new.name, COALESCE(new.description, ''), COALESCE(new.category, ''));
-            END
-        """))
-
-        conn.execute(text("""
-            CREATE TRIGGER IF NOT EXISTS events_fts_delete AFTER DELETE ON events BEGIN
-                INSERT INTO events_fts(events_fts, rowid, name, description, category)
-                VALUES ('delete', old.id, old.name, old.description, old.category);
-            END
-        """))
-
-        conn.commit()
+    # Create tables, the FTS5 index and the sync triggers (same setup as the app)
+    init_db(engine)
 
     db = TestingSessionLocal()
     try:
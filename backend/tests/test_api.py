@@ -1,4 +1,11 @@
+import sqlite3
+
+import pytest
 from fastapi import status
+from sqlalchemy import event
+from sqlalchemy.exc import OperationalError
+
+from database import Event, Property
 
 
 class TestEventEndpoints:
@@ -279,6 +286,27 @@ class TestBulkOperations:
         assert response.status_code == status.HTTP_200_OK
         assert "text/csv" in response.headers["content-type"]
 
+    def test_locked_database_is_a_503(self, client, monkeypatch):
+        """Test that a lock timeout fails the import with a distinct status instead of a row error."""
+        def locked(*args):
+            raise OperationalError("INSERT", {}, sqlite3.OperationalError("database is locked"))
+
+        monkeypatch.setattr("api._import_event", locked)
+        for path, name, payload in [("/api/import/json", "e.json", '[{"name": "Imported"}]'),
+                                    ("/api/import/csv", "e.csv", "event_name\nImported\n")]:
+            response = client.post(path, files={"file": (name, payload)})
+            assert response.status_code == status.HTTP_503_SERVICE_UNAVAILABLE
+            assert response.json() == {"detail": "database is locked"}
+
+    def test_other_database_errors_are_not_lock_errors(self, client, monkeypatch):
+        """Test that other operational errors still surface as server errors."""
+        def broken(*args):
+            raise OperationalError("INSERT", {}, sqlite3.OperationalError("disk I/O error"))
+
+        monkeypatch.setattr("api._import_event", broken)
+        with pytest.raises(OperationalError):
+            client.post("/api/import/json", files={"file": ("e.json", '[{"name": "Imported"}]')})
+
 
 class TestRootEndpoint:
     """Test root endpoint."""
@@ -290,3 +318,68 @@ class TestRootEndpoint:
         data = response.json()
         assert "message" in data
         assert "version" in data
+
+
+class TestUnitOfWork:
+    """Test that each mutation commits its data change and changelog entry together."""
+
+    @pytest.fixture
+    def commits(self, test_db):
+        """Count commits issued on the test session."""
+        counter = {"commits": 0}
+
+        def on_commit(session):
+            counter["commits"] += 1
+
+        event.listen(test_db, "after_commit", on_commit)
+        yield counter
+        event.remove(test_db, "after_commit", on_commit)
+
+    def test_mutations_commit_once(self, client, commits, sample_event_data, sample_property_data):
+        """Test that every mutation endpoint issues exactly one commit."""
+        event_id = client.post("/api/events", json=sample_event_data).json()["id"]
+        assert commits["commits"] == 1
+
+        client.put(f"/api/events/{event_id}?changed_by=pytest", json={"name": "Renamed"})
+        assert commits["commits"] == 2
+
+        response = client.post(f"/api/events/{event_id}/properties?changed_by=pytest", json={
+            "property_name": "extra", "property_type": "event", "data_type": "Int"
+        })
+        assert response.status_code == status.HTTP_200_OK
+        assert commits["commits"] == 3
+
+        ep_id = client.get(f"/api/events/{event_id}").json()["properties"][0]["id"]
+        client.delete(f"/api/events/{event_id}/properties/{ep_id}?changed_by=pytest")
+        assert commits["commits"] == 4
+
+        client.post("/api/properties", json=sample_property_data)
+        assert commits["commits"] == 5
+
+        response = client.delete(f"/api/events/{event_id}?changed_by=pytest")
+        assert response.json()["orphaned_properties_cleaned"] == 1
+        assert commits["commits"] == 6
+
+    def test_failed_create_leaves_nothing_behind(self, client, test_db, sample_event_data):
+        """Test that a rejected create rolls back the event and any new properties."""
+        client.post("/api/properties", json={"name": "amount", "data_type": "Float"})
+        sample_event_data["properties"].append({
+            "property_name": "amount", "property_type": "event", "data_type": "String"
+        })
+        response = client.post("/api/events", json=sample_event_data)
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+        assert test_db.query(Event).count() == 0
+        assert test_db.query(Property).filter(Property.name == "test_property").count() == 0
+        assert all(entry["entity_type"] == "property" for entry in client.get("/api/changelog").json())
+
+    def test_import_logs_each_event(self, client):
+        """Test that imported events get their changelog entry."""
+        payload = '[{"name": "Imported", "properties": [{"property_name": "p", "property_type": "event", "data_type": "String"}]}]'
+        response = client.post("/api/import/json", files={"file": ("e.json", payload, "application/json")})
+        assert response.json()["imported"] == 1
+
+        entry = client.get("/api/changelog").json()[0]
+        assert entry["action"] == "create"
+        assert entry["changed_by"] == "bulk_import"
+        assert entry["new_value"]["properties"][0]["name"] == "p"
@@ -0,0 +1,126 @@
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import pytest
+from fastapi import status
+from sqlalchemy import create_engine, func
+from sqlalchemy.orm import Session
+
+import archive
+import history
+from archive import archive_changelog, changelog_rows, last_id_at, latest_changelog, search_changelog
+from changelog import entity_history
+from database import Changelog, ChangelogSegment
+from generate_taxonomy import generate_taxonomy
+
+FAR_FUTURE = datetime(2100, 1, 1)
+
+
+@pytest.fixture
+def generated(tmp_path):
+    """Session on a generated taxonomy with a few thousand changelog rows."""
+    path = tmp_path / "t.db"
+    generate_taxonomy(path, events=300, properties=60, history_depth=4, seed=11)
+    engine = create_engine(f"sqlite:///{path}")
+    with Session(engine) as db:
+        yield db
+    engine.dispose()
+
+
+def _read_everything(db):
+    """What every changelog reader returns, for comparing before and after archival."""
+    version = db.query(func.max(Changelog.id)).scalar()
+    times = [row.changed_at for row in changelog_rows(db)[::97]]
+    return {
+        "rows": [tuple(row) for row in changelog_rows(db)],
+        "after": [row.id for row in changelog_rows(db, after_id=500, limit=20)],
+        "latest": [tuple(row) for row in latest_changelog(db, limit=30)],
+        "entity": [tuple(row) for row in latest_changelog(db, "event", 7, limit=500)],
+        "history": [row.id for row in entity_history(db, {("event", 3), ("event", 250)}, version)],
+        "versions": [last_id_at(db, moment) for moment in times],
+        "search": [row.id for row in search_changelog(db, {"action": "property_added"}, limit=40)],
+        "window": [row.id for row in latest_changelog(db, since=times[2], until=times[4], limit=500)],
+        "states": [history.events_at(db, v) for v in (version // 3, version)],
+    }
+
+
+class TestArchive:
+    """Test moving changelog rows into segments and reading them back."""
+
+    def test_reads_unchanged_after_archival(self, generated, tmp_path, monkeypatch):
+        """Test that every reader returns the same rows across table and segments."""
+        monkeypatch.setattr(archive, "BLOCK_ROWS", 64)
+        before = _read_everything(generated)
+        total = generated.query(Changelog).count()
+
+        segments = archive_changelog(generated, FAR_FUTURE, tmp_path / "segments", segment_rows=1000)
+
+        assert len(segments) > 1
+        assert generated.query(Changelog).count() == 1  # The newest row always stays
+        assert sum(segment.row_count for segment in segments) == total - 1
+        assert all(Path(segment.path).exists() for segment in segments)
+        assert _read_everything(generated) == before
+
+    def test_cutoff_archives_only_older_prefix(self, generated, tmp_path):
+        """Test that rows at or after the cutoff stay in the table."""
+        rows = changelog_rows(generated)
+        cutoff = rows[len(rows) // 2].changed_at
+        archive_changelog(generated, cutoff, tmp_path)
+
+        remaining = generated.query(func.min(Changelog.changed_at)).scalar()
+        assert remaining >= cutoff
+        archived = generated.query(func.max(ChangelogSegment.last_id)).scalar()
+        assert archived < generated.query(func.min(Changelog.id)).scalar()
+        assert archive_changelog(generated, cutoff, tmp_path) == []  # Nothing left to archive
+
+    def test_entity_reads_open_only_indexed_blocks(self, generated, tmp_path, monkeypatch):
+        """Test that a per-entity query decompresses only the blocks holding that entity."""
+        monkeypatch.setattr(archive, "BLOCK_ROWS", 64)
+        archive_changelog(generated, FAR_FUTURE, tmp_path)
+        archive._load_block.cache_clear()
+
+        rows = changelog_rows(generated, entity_type="event", entity_id=42)
+        assert rows and all(row.entity_id == 42 for row in rows)
+        assert archive._load_block.cache_info().misses <= len(rows)
+
+
+    def test_entity_id_without_type_reads_indexed_blocks(self, generated, tmp_path, monkeypatch):
+        """Test that latest_changelog by entity_id alone reads only the blocks holding that id."""
+        monkeypatch.setattr(archive, "BLOCK_ROWS", 64)
+        expected = [tuple(row) for row in latest_changelog(generated, entity_id=42, limit=500)]
+        archive_changelog(generated, FAR_FUTURE, tmp_path)
+        archive._load_block.cache_clear()
+
+        rows = latest_changelog(generated, entity_id=42, limit=500)
+        assert [tuple(row) for row in rows] == expected
+        assert archive._load_block.cache_info().misses <= len(rows)
+
+    def test_segment_paths_are_absolute(self, generated, tmp_path, monkeypatch):
+        """Test that a relative archive directory is stored resolved, so reads work from any directory."""
+        monkeypatch.chdir(tmp_path)
+        archive_changelog(generated, FAR_FUTURE, Path("segments"))
+        paths = [Path(path) for path, in generated.query(ChangelogSegment.path)]
+        assert paths and all(path.is_absolute() and path.parent == tmp_path / "segments" for path in paths)
+
+        archive._load_index.cache_clear()
+        archive._load_block.cache_clear()
+        monkeypatch.chdir("/")
+        assert len(changelog_rows(generated)) == generated.query(func.sum(ChangelogSegment.row_count)).scalar() + 1
+
+
+class TestChangelogEndpoint:
+    """Test the API across archived rows."""
+
+    def test_changelog_continues_into_segments(self, client, test_db, tmp_path, sample_event_data):
+        """Test that entity history and snapshots include archived entries."""
+        event_id = client.post("/api/events", json=sample_event_data).json()["id"]
+        for i in range(3):
+            client.put(f"/api/events/{event_id}", json={"description": f"v{i}"})
+        archive_changelog(test_db, datetime.now() + timedelta(days=1), tmp_path)
+
+        response = client.get(f"/api/changelog?entity_type=event&entity_id={event_id}&reconstruct=true")
+        assert response.status_code == status.HTTP_200_OK
+        entries = response.json()
+        assert [entry["action"] for entry in entries] == ["update", "update", "update", "create"]
+        assert entries[0]["new_value"]["description"] == "v2"
+        assert entries[0]["old_value"]["description"] == "v1"
@@ -0,0 +1,108 @@
+import gzip
+import json
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+from audit_logs import audit_logs, plan_tasks, _iter_range
+from database import init_db, Event, Property, EventProperty
+
+
+def _write_taxonomy(tmp_path):
+    path = tmp_path / "taxonomy.db"
+    engine = create_engine(f"sqlite:///{path}")
+    init_db(engine)
+    with Session(engine) as db:
+        event = Event(name="Purchase")
+        order_id = Property(name="order_id", data_type="String")
+        total = Property(name="total", data_type="Float")
+        db.add_all([event, order_id, total])
+        db.flush()
+        db.add_all([
+            EventProperty(event_id=event.id, property_id=order_id.id, property_type="event", is_required=True),
+            EventProperty(event_id=event.id, property_id=total.id, property_type="event", is_required=False),
+        ])
+        db.commit()
+    engine.dispose()
+    return path
+
+
+def _payloads():
+    valid = {"event": "Purchase", "properties": {"order_id": "A1", "total": 2.5}}
+    missing = {"event": "Purchase", "properties": {"total": 1}}
+    mismatch = {"event": "Purchase", "properties": {"order_id": "A2", "total": "9"}}
+    unknown = {"event": "Refund", "properties": {}}
+    return [valid, missing, valid, mismatch, unknown, valid]
+
+
+def _write_logs(tmp_path):
+    lines = [json.dumps(p) for p in _payloads()] + ["{broken", ""]
+    plain = tmp_path / "a.ndjson"
+    plain.write_text("\n".join(lines) + "\n")
+    packed = tmp_path / "b.ndjson.gz"
+    with gzip.open(packed, "wt") as f:
+        f.write("\n".join(lines) + "\n")
+    return [plain, packed]
+
+
+class TestChunking:
+    """Test splitting plain files into line-aligned byte ranges."""
+
+    def test_ranges_cover_every_line_once(self, tmp_path):
+        """Test that tiny chunks still yield each line exactly once."""
+        path = tmp_path / "lines.ndjson"
+        expected = [f"line-{i}-{'x' * i}\n".encode() for i in range(30)]
+        path.write_bytes(b"".join(expected))
+
+        for chunk_size in (1, 7, 64, 10_000):
+            seen = []
+            for _, start, end in plan_tasks([path], chunk_size):
+                seen.extend(_iter_range(str(path), start, end))
+            assert seen == expected
+
+    def test_gzip_files_are_single_tasks(self, tmp_path):
+        """Test that compressed files are not split."""
+        paths = _write_logs(tmp_path)
+        tasks = plan_tasks(paths, chunk_size=16)
+        assert [t for t in tasks if t[0].endswith(".gz")] == [(str(paths[1]), None, None)]
+        assert len(tasks) > 2
+
+
+class TestAuditLogs:
+    """Test the multi-process audit report."""
+
+    def test_report_counts(self, tmp_path):
+        """Test totals and per-event / per-property violation counts."""
+        db_path = _write_taxonomy(tmp_path)
+        report = audit_logs(db_path, _write_logs(tmp_path), workers=2, chunk_size=50)
+
+        assert report["lines"] == 14
+        assert report["malformed"] == 2
+        assert report["valid"] == 6
+        assert report["invalid"] == 6
+        assert report["events"]["Purchase"] == {
+            "payloads": 10,
+            "invalid": 4,
+            "violations": {"missing_required": 2, "type_mismatch": 2},
+        }
+        assert report["events"]["Refund"]["violations"] == {"unknown_event": 2}
+        assert {"event": "Purchase", "property": "total", "type": "type_mismatch", "count": 2} in report["properties"]
+
+    def test_chunk_size_does_not_change_report(self, tmp_path):
+        """Test that splitting granularity has no effect on the result."""
+        db_path = _write_taxonomy(tmp_path)
+        paths = _write_logs(tmp_path)
+        coarse = audit_logs(db_path, paths, workers=1)
+        fine = audit_logs(db_path, paths, workers=2, chunk_size=10)
+        for key in ("lines", "malformed", "valid", "invalid", "events", "properties"):
+            assert coarse[key] == fine[key]
+
+    def test_unhashable_event_names(self, tmp_path):
+        """Test that payloads with list or object event names count as invalid instead of aborting the audit."""
+        db_path = _write_taxonomy(tmp_path)
+        path = tmp_path / "odd.ndjson"
+        path.write_text("\n".join(json.dumps(p) for p in _payloads()[:1] + [{"event": ["x"]}, {"event": {}}]) + "\n")
+        report = audit_logs(db_path, [path], workers=1)
+        assert report["lines"] == 3
+        assert report["valid"] == 1
+        assert report["invalid"] == 2
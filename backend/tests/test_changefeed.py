@@ -0,0 +1,187 @@
+import asyncio
+import json
+
+from fastapi import status
+from sqlalchemy import text
+from sqlalchemy.orm import sessionmaker
+
+import changefeed
+from changefeed import broadcaster, change_stream
+from database import Changelog, unit_of_work
+
+
+def _log(db, entity_id, action="update"):
+    with unit_of_work(db):
+        db.add(Changelog(entity_type="event", entity_id=entity_id, action=action, new_value={"name": "E"}))
+
+
+def _sessions(db):
+    """Session factory on the test database, like the endpoint builds from its request session."""
+    return sessionmaker(bind=db.get_bind())
+
+
+async def _never_disconnected():
+    return False
+
+
+def _parse(message):
+    fields = dict(line.split(": ", 1) for line in message.strip().splitlines())
+    return int(fields["id"]), json.loads(fields["data"])
+
+
+async def _take(stream, count):
+    """Collect the next `count` change messages, skipping retry/keepalive lines."""
+    messages = []
+    while len(messages) < count:
+        message = await asyncio.wait_for(anext(stream), timeout=5)
+        if message.startswith("id:"):
+            messages.append(_parse(message))
+    return messages
+
+
+class TestBroadcaster:
+    """Test publishing committed changelog entries."""
+
+    def test_publishes_after_commit_only(self, test_db):
+        """Test that committed entries reach subscribers and rolled back ones do not."""
+        async def scenario():
+            subscriber = broadcaster.subscribe()
+            try:
+                await asyncio.to_thread(_log, test_db, 1)
+
+                def rolled_back():
+                    try:
+                        with unit_of_work(test_db):
+                            test_db.add(Changelog(entity_type="event", entity_id=2, action="update"))
+                            test_db.flush()
+                            raise RuntimeError("abort")
+                    except RuntimeError:
+                        pass
+                await asyncio.to_thread(rolled_back)
+                await asyncio.to_thread(_log, test_db, 3)
+
+                first = await asyncio.wait_for(subscriber.queue.get(), timeout=5)
+                second = await asyncio.wait_for(subscriber.queue.get(), timeout=5)
+                return first, second, subscriber.queue.empty()
+            finally:
+                broadcaster.unsubscribe(subscriber)
+
+        first, second, drained = asyncio.run(scenario())
+        assert (first["entity_id"], second["entity_id"]) == (1, 3)
+        assert drained
+
+    def test_overflow_flags_subscriber(self):
+        """Test that a full buffer is dropped instead of growing."""
+        async def scenario():
+            subscriber = broadcaster.subscribe(maxsize=2)
+            broadcaster.unsubscribe(subscriber)
+            for i in range(5):
+                subscriber._deliver({"id": i})
+            return subscriber
+        subscriber = asyncio.run(scenario())
+        assert subscriber.overflowed
+        assert subscriber.queue.qsize() == 1
+
+
+class TestChangeStream:
+    """Test the SSE generator."""
+
+    def test_backlog_then_live(self, test_db):
+        """Test resuming from a cursor and then receiving live entries."""
+        _log(test_db, 1, "create")
+        _log(test_db, 2, "create")
+
+        async def scenario():
+            stream = change_stream(_sessions(test_db), 1, _never_disconnected)
+            backlog = await _take(stream, 1)
+            await asyncio.to_thread(_log, test_db, 3)
+            live = await _take(stream, 1)
+            await stream.aclose()
+            return backlog, live
+
+        backlog, live = asyncio.run(scenario())
+        assert backlog[0][0] == 2
+        assert live[0][1]["entity_id"] == 3
+        assert broadcaster.subscriber_count == 0
+
+    def test_overflow_catches_up_from_table(self, test_db, monkeypatch):
+        """Test that a slow client still gets every entry after its buffer overflows."""
+        monkeypatch.setattr(changefeed, "SUBSCRIBER_BUFFER", 2)
+        reads = []
+
+        def counting_fetch(*args):
+            reads.append(args[1])
+            return changefeed._fetch(*args)
+
+        async def scenario():
+            stream = change_stream(_sessions(test_db), 0, _never_disconnected,
+                                   run_sync=lambda fn, *args: asyncio.to_thread(counting_fetch, *args))
+            await asyncio.to_thread(_log, test_db, 1)
+            received = await _take(stream, 1)  # the stream is now reading live entries
+            for entity_id in range(2, 9):
+                await asyncio.to_thread(_log, test_db, entity_id)
+            received += await _take(stream, 7)
+            await stream.aclose()
+            return received
+
+        received = asyncio.run(scenario())
+        assert [data["entity_id"] for _, data in received] == list(range(1, 9))
+        assert [entry_id for entry_id, _ in received] == sorted(entry_id for entry_id, _ in received)
+        assert len(reads) > 1  # caught up from the table after the overflow
+
+    def test_polls_entries_from_other_processes(self, test_db):
+        """Test that entries committed without this process's broadcaster are streamed while idle."""
+        async def scenario():
+            stream = change_stream(_sessions(test_db), 0, _never_disconnected, poll=0.05)
+            await asyncio.to_thread(_log, test_db, 1)
+            await _take(stream, 1)  # The stream is now waiting for live entries
+            # Raw SQL bypasses the ORM hooks, as a commit in another process would
+            test_db.execute(text("INSERT INTO changelog (entity_type, entity_id, action, changed_at) "
+                                 "VALUES ('event', 5, 'create', CURRENT_TIMESTAMP)"))
+            test_db.commit()
+            received = await _take(stream, 1)
+            await stream.aclose()
+            return received
+
+        assert asyncio.run(scenario())[0][1]["entity_id"] == 5
+
+    def test_out_of_order_broadcasts_fill_the_gap(self, test_db):
+        """Test that a live entry arriving ahead of an earlier id makes the stream read the gap from the table."""
+        async def scenario():
+            stream = change_stream(_sessions(test_db), 0, _never_disconnected, poll=60)
+            await asyncio.to_thread(_log, test_db, 1)
+            received = await _take(stream, 1)  # The stream is now waiting for live entries
+            for entity_id in (2, 3):
+                test_db.execute(text("INSERT INTO changelog (entity_type, entity_id, action, changed_at) "
+                                     f"VALUES ('event', {entity_id}, 'create', CURRENT_TIMESTAMP)"))
+            test_db.commit()
+            # Entry 3's broadcast arrives first; entry 2's is still on another thread
+            broadcaster.publish(changefeed.fetch_since(test_db, 2))
+            received += await _take(stream, 2)
+            await stream.aclose()
+            return received
+
+        assert [data["entity_id"] for _, data in asyncio.run(scenario())] == [1, 2, 3]
+
+    def test_entity_type_filter(self, test_db):
+        """Test that only the requested entity type is streamed."""
+        with unit_of_work(test_db):
+            test_db.add(Changelog(entity_type="property", entity_id=9, action="create"))
+        _log(test_db, 1)
+
+        async def scenario():
+            stream = change_stream(_sessions(test_db), 0, _never_disconnected, entity_type="event")
+            received = await _take(stream, 1)
+            await stream.aclose()
+            return received
+
+        assert asyncio.run(scenario())[0][1]["entity_type"] == "event"
+
+
+class TestStreamEndpoint:
+    """Test request validation of /api/changes/stream."""
+
+    def test_rejects_bad_last_event_id(self, client):
+        """Test that a non-numeric Last-Event-ID is rejected."""
+        response = client.get("/api/changes/stream", headers={"Last-Event-ID": "abc"})
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
@@ -0,0 +1,223 @@
+import json
+import sqlite3
+
+from fastapi import status
+from sqlalchemy import create_engine, text
+
+import database
+from changelog import apply_entry, diff_fields
+from database import init_db
+from generate_taxonomy import generate_taxonomy
+
+
+class TestChangelogEncoding:
+    """Test delta encoding and replay helpers."""
+
+    def test_diff_fields_keeps_only_changes(self):
+        """Test that unchanged fields are dropped from both sides."""
+        old, new = diff_fields(
+            {"name": "A", "description": "x", "category": "C"},
+            {"name": "A", "description": "y", "category": "C"},
+        )
+        assert old == {"description": "x"}
+        assert new == {"description": "y"}
+
+    def test_replay_event_history(self):
+        """Test replaying create, update, add and remove entries."""
+        prop_a = {"id": 1, "property_id": 1, "name": "a", "type": "event", "data_type": "String"}
+        prop_b = {"id": 2, "property_id": 2, "name": "b", "type": "user", "data_type": "Int"}
+        state = apply_entry(None, "event", "create", None,
+                            {"name": "E", "description": "d", "category": "C", "properties": [prop_a]})
+        state = apply_entry(state, "event", "update", {"description": "d"},
+                            {"description": "d2", "name": "E"})
+        state = apply_entry(state, "event", "update", None,
+                            {"action": "property_added", "name": "E", "property": prop_b})
+        after_add = state
+        state = apply_entry(state, "event", "update",
+                            {"action": "property_removed", "name": "E", "property": prop_a}, None)
+
+        assert state == {"name": "E", "description": "d2", "category": "C", "properties": [prop_b]}
+        assert after_add["properties"] == [prop_a, prop_b]
+        assert apply_entry(state, "event", "delete", {"name": "E"}, None) is None
+
+    def test_replay_legacy_snapshots(self):
+        """Test that pre-delta rows (full snapshots without ids) still replay."""
+        legacy_prop = {"name": "a", "type": "event", "data_type": "String", "required": True, "example": None}
+        state = apply_entry(None, "event", "create", None,
+                            {"name": "E", "description": None, "category": None, "properties": [legacy_prop]})
+        state = apply_entry(state, "event", "update",
+                            {"name": "E", "description": None, "category": None},
+                            {"name": "E2", "description": None, "category": None})
+        state = apply_entry(state, "event", "update",
+                            {"action": "property_removed", "name": "E2", "property": legacy_prop}, None)
+        assert state == {"name": "E2", "description": None, "category": None, "properties": []}
+
+    def test_generated_history_replays_to_current_state(self, tmp_path):
+        """Test that the synthetic generator writes replay-consistent history."""
+        path = tmp_path / "t.db"
+        generate_taxonomy(path, events=100, properties=40, history_depth=4, seed=5)
+        conn = sqlite3.connect(path)
+        states = {}
+        for entity_type, entity_id, action, old, new in conn.execute(
+                "SELECT entity_type, entity_id, action, old_value, new_value FROM changelog ORDER BY id"):
+            key = (entity_type, entity_id)
+            states[key] = apply_entry(states.get(key), entity_type, action,
+                                      json.loads(old) if old else None, json.loads(new) if new else None)
+
+        for event_id, name, description in conn.execute("SELECT id, name, description FROM events"):
+            state = states[("event", event_id)]
+            assert state["name"] == name
+            assert state["description"] == description
+            current = {row[0] for row in conn.execute(
+                "SELECT id FROM event_properties WHERE event_id = ?", (event_id,))}
+            assert {p["id"] for p in state["properties"]} == current
+        conn.close()
+
+
+class TestChangelogStorage:
+    """Test what the endpoints write to the changelog."""
+
+    def test_update_stores_only_changed_fields(self, client, sample_event_data):
+        """Test that an update entry holds the delta plus the event name."""
+        event_id = client.post("/api/events", json=sample_event_data).json()["id"]
+        client.put(f"/api/events/{event_id}?changed_by=pytest", json={"description": "New"})
+
+        entry = client.get("/api/changelog").json()[0]
+        assert entry["action"] == "update"
+        assert entry["old_value"] == {"description": "A test event"}
+        assert entry["new_value"] == {"description": "New", "name": "Test Event"}
+
+    def test_delete_stores_name_only(self, client, sample_event_data):
+        """Test that a delete entry no longer copies the whole event."""
+        event_id = client.post("/api/events", json=sample_event_data).json()["id"]
+        client.delete(f"/api/events/{event_id}?changed_by=pytest")
+
+        entry = client.get("/api/changelog").json()[0]
+        assert entry["action"] == "delete"
+        assert entry["old_value"] == {"name": "Test Event"}
+
+    def test_create_stores_compact_properties(self, client, sample_event_data):
+        """Test that create entries reference association and property ids."""
+        created = client.post("/api/events", json=sample_event_data).json()
+        entry = client.get("/api/changelog").json()[0]
+        prop = entry["new_value"]["properties"][0]
+        assert prop["id"] == created["properties"][0]["id"]
+        assert prop["property_id"] == created["properties"][0]["property_id"]
+        assert prop["required"] is True
+
+    def test_reconstruct_full_snapshots(self, client, sample_event_data):
+        """Test that reconstruct=true returns full before/after snapshots."""
+        event_id = client.post("/api/events", json=sample_event_data).json()["id"]
+        client.put(f"/api/events/{event_id}?changed_by=pytest", json={"category": "Other"})
+        client.post(f"/api/events/{event_id}/properties?changed_by=pytest", json={
+            "property_name": "extra", "property_type": "event", "data_type": "Int"
+        })
+        client.delete(f"/api/events/{event_id}?changed_by=pytest")
+
+        response = client.get(f"/api/changelog?entity_type=event&entity_id={event_id}&reconstruct=true")
+        assert response.status_code == status.HTTP_200_OK
+        delete, add, update, create = response.json()
+
+        assert update["old_value"]["category"] == "Testing"
+        assert update["new_value"]["category"] == "Other"
+        assert update["new_value"]["description"] == "A test event"
+        assert [p["name"] for p in add["new_value"]["properties"]] == ["test_property", "extra"]
+        assert delete["old_value"]["category"] == "Other"
+        assert len(delete["old_value"]["properties"]) == 2
+        assert delete["new_value"] is None
+        assert create["old_value"] is None
+
+    def test_reconstruct_applies_property_renames_and_merges(self, client, sample_event_data):
+        """Test that snapshots show the property names in effect at each entry."""
+        created = client.post("/api/events", json=sample_event_data).json()
+        event_id = created["id"]
+        client.post(f"/api/properties/{created['properties'][0]['property_id']}/rename", json={"name": "renamed"})
+        client.put(f"/api/events/{event_id}", json={"category": "Other"})
+        client.post(f"/api/events/{event_id}/properties", json={
+            "property_name": "extra", "property_type": "event", "data_type": "String"
+        })
+        client.post("/api/properties/merge", json={"target": "renamed", "sources": ["extra"]})
+        client.delete(f"/api/events/{event_id}")
+
+        entries = client.get(f"/api/changelog?entity_type=event&entity_id={event_id}&reconstruct=true").json()
+        delete, add, update, create = entries
+        assert [p["name"] for p in create["new_value"]["properties"]] == ["test_property"]
+        assert [p["name"] for p in update["old_value"]["properties"]] == ["renamed"]
+        assert [p["name"] for p in add["new_value"]["properties"]] == ["renamed", "extra"]
+        assert [p["name"] for p in delete["old_value"]["properties"]] == ["renamed"]
+
+
+class TestChangelogFilters:
+    """Test get_changelog filters backed by the changelog_terms index."""
+
+    def test_filter_by_property_event_and_user(self, client, sample_event_data):
+        """Test filtering on names found inside the JSON values."""
+        event_id = client.post("/api/events", json=sample_event_data).json()["id"]
+        client.post("/api/events", json={"name": "Unrelated"})
+        client.post(f"/api/events/{event_id}/properties?changed_by=alice", json={
+            "property_name": "user_id", "property_type": "user", "data_type": "String"
+        })
+        client.put(f"/api/events/{event_id}?changed_by=bob", json={"name": "Renamed"})
+
+        touched = client.get("/api/changelog?property_name=test_property").json()
+        assert [(e["action"], e["entity_id"]) for e in touched] == [("create", event_id)]
+        by_user = client.get("/api/changelog?property_name=user_id&changed_by=alice").json()
+        assert [e["new_value"]["action"] for e in by_user] == ["property_added"]
+        assert client.get("/api/changelog?property_name=user_id&changed_by=bob").json() == []
+
+        # Both the old and the new name of a renamed event match
+        assert len(client.get("/api/changelog?event_name=Test Event").json()) == 3
+        assert len(client.get("/api/changelog?event_name=Renamed").json()) == 1
+        assert len(client.get("/api/changelog?action=property_added").json()) == 1
+        assert len(client.get("/api/changelog?action=update").json()) == 2
+
+    def test_time_range(self, client, sample_event_data):
+        """Test since/until with and without term filters."""
+        client.post("/api/events", json=sample_event_data)
+        assert client.get("/api/changelog?since=2100-01-01T00:00:00Z").json() == []
+        assert len(client.get("/api/changelog?until=2100-01-01T00:00:00Z").json()) == 1
+        assert client.get("/api/changelog?event_name=Test Event&until=2000-01-01T00:00:00Z").json() == []
+        response = client.get("/api/changelog?since=soon")
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+    def test_backfill_and_index_use(self, tmp_path):
+        """Test that init_db indexes existing rows and lookups use the index."""
+        path = tmp_path / "t.db"
+        generate_taxonomy(path, events=100, properties=30, history_depth=3, seed=4)
+        conn = sqlite3.connect(path)
+        name = conn.execute(
+            "SELECT json_extract(new_value, '$.property.name') FROM changelog "
+            "WHERE json_extract(new_value, '$.action') = 'property_added' LIMIT 1"
+        ).fetchone()[0]
+        expected = {row[0] for row in conn.execute(
+            "SELECT DISTINCT c.id FROM changelog c LEFT JOIN json_each(c.new_value, '$.properties') p "
+            "WHERE json_extract(c.new_value, '$.property.name') = ? "
+            "OR json_extract(c.old_value, '$.property.name') = ? OR json_extract(p.value, '$.name') = ?",
+            (name, name, name))}
+        found = {row[0] for row in conn.execute(
+            "SELECT changelog_id FROM changelog_terms WHERE kind = 'property' AND value = ?", (name,))}
+        plan = " ".join(row[3] for row in conn.execute(
+            "EXPLAIN QUERY PLAN SELECT changelog_id FROM changelog_terms WHERE kind = 'property' AND value = ? "
+            "AND changed_at >= '2000-01-01' ORDER BY changed_at DESC", (name,)))
+        conn.close()
+
+        assert found == expected
+        assert "USING INDEX ix_changelog_terms_lookup" in plan or "USING COVERING INDEX" in plan
+
+    def test_changed_sources_reindex(self, tmp_path, monkeypatch):
+        """Test that init_db replaces a trigger built from older term sources and re-indexes the rows."""
+        engine = create_engine(f"sqlite:///{tmp_path / 't.db'}")
+        monkeypatch.setattr(database, "CHANGELOG_TERM_SOURCES", database.CHANGELOG_TERM_SOURCES[:1])
+        init_db(engine)
+        with engine.begin() as conn:
+            conn.execute(text("INSERT INTO changelog (entity_type, entity_id, action, changed_by, changed_at) "
+                              "VALUES ('event', 1, 'delete', 'alice', '2024-01-01 00:00:00.000000')"))
+        monkeypatch.undo()
+        init_db(engine)
+        with engine.begin() as conn:
+            conn.execute(text("INSERT INTO changelog (entity_type, entity_id, action, changed_by, changed_at) "
+                              "VALUES ('event', 2, 'create', 'bob', '2024-01-02 00:00:00.000000')"))
+            terms = conn.execute(text("SELECT changelog_id, kind, value FROM changelog_terms "
+                                      "ORDER BY changelog_id, kind")).all()
+        engine.dispose()
+        assert terms == [(1, "action", "delete"), (1, "user", "alice"), (2, "action", "create"), (2, "user", "bob")]
@@ -0,0 +1,108 @@
+import random
+
+from fastapi import status
+from sqlalchemy import text
+
+from cooccurrence import companion_scores, rebuild_cooccurrence, recommend
+from database import Event, EventProperty, Property, PropertyCooccurrence
+
+
+def _matrix(db):
+    return sorted(db.query(PropertyCooccurrence.property_a, PropertyCooccurrence.property_b,
+                           PropertyCooccurrence.count).all())
+
+
+def _expected(db):
+    """Pair counts computed directly from the links."""
+    events = {}
+    for event_id, property_id in db.query(EventProperty.event_id, EventProperty.property_id):
+        events.setdefault(event_id, set()).add(property_id)
+    counts = {}
+    for property_ids in events.values():
+        for a in property_ids:
+            for b in property_ids:
+                if a <= b:
+                    counts[(a, b)] = counts.get((a, b), 0) + 1
+    return sorted((a, b, count) for (a, b), count in counts.items())
+
+
+class TestTriggers:
+    """Test that the matrix follows event_properties."""
+
+    def test_random_link_changes(self, test_db):
+        """Test inserts, deletes, re-pointing updates and duplicate links against a recount."""
+        rng = random.Random(5)
+        test_db.add_all([Property(id=i, name=f"p{i}", data_type="String") for i in range(1, 9)])
+        test_db.add_all([Event(id=i, name=f"Event {i}") for i in range(1, 7)])
+        test_db.commit()
+
+        for step in range(300):
+            link_ids = [row[0] for row in test_db.execute(text("SELECT id FROM event_properties"))]
+            choice = rng.random()
+            if choice < 0.5 or not link_ids:
+                test_db.execute(text(
+                    "INSERT OR IGNORE INTO event_properties (event_id, property_id, property_type, is_required) "
+                    "VALUES (:e, :p, :t, 0)"
+                ), {"e": rng.randint(1, 6), "p": rng.randint(1, 8), "t": rng.choice(["event", "user"])})
+            elif choice < 0.8:
+                test_db.execute(text("DELETE FROM event_properties WHERE id = :id"), {"id": rng.choice(link_ids)})
+            else:
+                test_db.execute(text(
+                    "UPDATE OR IGNORE event_properties SET event_id = :e, property_id = :p WHERE id = :id"
+                ), {"e": rng.randint(1, 6), "p": rng.randint(1, 8), "id": rng.choice(link_ids)})
+            if step % 25 == 0:
+                assert _matrix(test_db) == _expected(test_db)
+        test_db.commit()
+
+        assert _matrix(test_db) == _expected(test_db)
+        before = _matrix(test_db)
+        assert rebuild_cooccurrence(test_db) == len(before)
+        assert _matrix(test_db) == before
+
+
+class TestRecommend:
+    """Test companion scoring."""
+
+    def test_conditional_probabilities(self, client, test_db):
+        """Test that companions are ranked by mean P(companion | given)."""
+        events = [
+            ["order_id", "order_total", "currency"],
+            ["order_id", "order_total", "currency", "coupon"],
+            ["order_id", "order_total"],
+            ["order_id", "coupon"],
+            ["page_url", "currency"],
+        ]
+        for index, names in enumerate(events):
+            client.post("/api/events", json={
+                "name": f"Event {index}",
+                "properties": [{"property_name": name, "property_type": "event", "data_type": "String"}
+                               for name in names],
+            })
+
+        result = recommend(test_db, ["order_id", "nope", "order_id"], top_k=2)
+        assert result["with"] == ["order_id"] and result["unknown"] == ["nope"]
+        # order_total 3/4, then currency 2/4 and coupon 2/4 tie: the older property wins
+        assert [(r["name"], r["score"]) for r in result["recommendations"]] == [("order_total", 0.75), ("currency", 0.5)]
+
+        ids = dict(test_db.query(Property.name, Property.id))
+        scores = companion_scores(test_db, [ids["order_id"], ids["currency"]])
+        assert round(scores[ids["order_total"]], 3) == round((3 / 4 + 2 / 3) / 2, 3)
+        assert round(scores[ids["page_url"]], 3) == round((0 + 1 / 3) / 2, 3)
+
+    def test_endpoint_follows_removals(self, client):
+        """Test GET /api/properties/recommend after a property is removed from an event."""
+        event = client.post("/api/events", json={
+            "name": "Order Completed",
+            "properties": [{"property_name": name, "property_type": "event", "data_type": "String"}
+                           for name in ["order_id", "currency"]],
+        }).json()
+
+        response = client.get("/api/properties/recommend", params={"with": "order_id, unknown_prop"})
+        assert response.status_code == status.HTTP_200_OK
+        body = response.json()
+        assert body["unknown"] == ["unknown_prop"]
+        assert [r["name"] for r in body["recommendations"]] == ["currency"]
+
+        link = next(prop for prop in event["properties"] if prop["property_name"] == "currency")
+        client.delete(f"/api/events/{event['id']}/properties/{link['id']}")
+        assert client.get("/api/properties/recommend", params={"with": "order_id"}).json()["recommendations"] == []
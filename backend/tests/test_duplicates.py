@@ -0,0 +1,104 @@
+import random
+import threading
+
+from fastapi import status
+
+from duplicates import DuplicateIndex, build_index, estimate, get_duplicate_index, index_cache
+from validation import taxonomy_version
+
+SHARED = [f"prop_{i}" for i in range(9)]
+
+
+def _event(name, properties):
+    return {
+        "name": name,
+        "category": "Screens",
+        "created_by": "alice@example.com",
+        "properties": [
+            {"property_name": prop, "property_type": "event", "data_type": "String", "description": prop}
+            for prop in properties
+        ]
+    }
+
+
+class TestDuplicateIndex:
+    """Test MinHash signatures and LSH buckets."""
+
+    def test_estimates_track_exact_jaccard(self):
+        """Test that signature agreement approximates the Jaccard similarity of the sets."""
+        rng = random.Random(7)
+        index = DuplicateIndex()
+        for _ in range(50):
+            a = set(rng.sample(range(200), 20))
+            b = set(rng.sample(sorted(a), rng.randint(5, 20))) | set(rng.sample(range(200, 400), rng.randint(0, 15)))
+            exact = len(a & b) / len(a | b)
+            assert abs(estimate(index.signature(a), index.signature(b)) - exact) < 0.2
+
+    def test_clusters_near_duplicates_only(self):
+        """Test that near-identical sets cluster and sets sharing a few properties do not."""
+        index = DuplicateIndex()
+        index.set(1, range(10))
+        index.set(2, range(11))  # Jaccard 10/11 with event 1
+        index.set(3, range(10))  # Identical to event 1
+        index.set(4, [0, 1, 50, 51, 52, 53])
+        index.set(5, [7])  # Too few properties to be indexed
+
+        clusters = index.clusters(0.8)
+        assert [[event_id for event_id, _ in cluster] for cluster in clusters] == [[1, 2, 3]]
+        assert dict(clusters[0])[3] == 1.0
+        assert [event_id for event_id, _ in index.similar(2)] == [1, 3]
+
+        index.discard(1)
+        index.discard(3)
+        assert index.clusters(0.8) == []
+        assert index.similar(2) == []
+
+
+class TestIncrementalUpdates:
+    """Test that the index follows taxonomy writes."""
+
+    def test_index_follows_event_writes(self, client, test_db):
+        """Test that creates, property changes and deletes re-sign only what changed."""
+        first = client.post("/api/events", json=_event("Screen Viewed", SHARED)).json()["id"]
+        second = client.post("/api/events", json=_event("Page Viewed", SHARED[:8] + ["url"])).json()["id"]
+        client.post("/api/events", json=_event("Purchase", ["order_id", "amount", "currency"]))
+
+        response = client.get("/api/events/duplicates?threshold=0.6")
+        assert response.status_code == status.HTTP_200_OK
+        clusters = response.json()["clusters"]
+        assert [[event["name"] for event in cluster["events"]] for cluster in clusters] == [["Screen Viewed", "Page Viewed"]]
+        assert clusters[0]["events"][0]["jaccard"] == 1.0
+
+        client.post(f"/api/events/{second}/properties", json={
+            "property_name": SHARED[8], "property_type": "event", "data_type": "String", "description": "x"
+        })
+        links = client.get(f"/api/events/{second}").json()["properties"]
+        url_link = next(link["id"] for link in links if link["property_name"] == "url")
+        client.delete(f"/api/events/{second}/properties/{url_link}")
+        similar = client.get(f"/api/events/{first}/similar").json()
+        assert similar == [{"id": second, "name": "Page Viewed", "jaccard": 1.0}]
+
+        client.delete(f"/api/events/{second}")
+        assert client.get(f"/api/events/{first}/similar").json() == []
+        assert client.get("/api/events/duplicates").json()["clusters"] == []
+
+        index = get_duplicate_index(test_db)
+        assert index.signatures == build_index(test_db).signatures
+
+    def test_catch_up_waits_for_readers(self, client, test_db):
+        """Test that catch_up does not change the index while a reader holds its lock."""
+        first = client.post("/api/events", json=_event("Screen Viewed", SHARED)).json()["id"]
+        index = get_duplicate_index(test_db)
+        second = client.post("/api/events", json=_event("Page Viewed", SHARED)).json()["id"]
+
+        with index.lock:
+            worker = threading.Thread(target=index_cache.catch_up, args=(test_db, index, taxonomy_version(test_db)))
+            worker.start()
+            worker.join(0.2)
+            assert worker.is_alive() and index.similar(first) == []
+        worker.join()
+        assert index.similar(first) == [(second, 1.0)]
+
+    def test_unknown_event(self, client):
+        """Test 404 for similarity of an event that does not exist."""
+        assert client.get("/api/events/999/similar").status_code == status.HTTP_404_NOT_FOUND
@@ -0,0 +1,160 @@
+import pytest
+from fastapi import status
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from database import Changelog, Property, init_db
+from history import event_at
+from replication import Follower
+from rollups import rollup_action
+from validation import taxonomy_version
+
+
+def _link(name, property_type="event", data_type="String", is_required=False, example_value=None):
+    return {"property_name": name, "property_type": property_type, "data_type": data_type,
+            "is_required": is_required, "example_value": example_value}
+
+
+def _links(client, event_id):
+    """(property name, type, required, example) of an event's current links, in link id order."""
+    properties = sorted(client.get(f"/api/events/{event_id}").json()["properties"], key=lambda p: p["id"])
+    return [(p["property_name"], p["property_type"], p["is_required"], p["example_value"]) for p in properties]
+
+
+def _replayed(db, event_id, version=None):
+    """The same tuples from the event state rebuilt out of the changelog."""
+    state = event_at(db, event_id, version or taxonomy_version(db))
+    return [(p["name"], p["type"], p.get("required", False), p.get("example"))
+            for p in sorted(state["properties"], key=lambda p: p["id"])]
+
+
+@pytest.fixture
+def event(client):
+    """An event with three properties, returned as the API shows it."""
+    return client.post("/api/events", json={"name": "Checkout Started", "category": "Commerce", "properties": [
+        _link("cart_id", is_required=True), _link("coupon", example_value="SPRING"), _link("user_id", "user")]}).json()
+
+
+def _link_id(event, name):
+    return next(p["id"] for p in event["properties"] if p["property_name"] == name)
+
+
+class TestPatchEvent:
+    """Test PATCH /api/events/{id}."""
+
+    def test_mixed_batch(self, client, test_db, event):
+        """Test that fields, added, removed and modified links land together under one changelog entry."""
+        before = test_db.query(Changelog).count()
+        response = client.patch(f"/api/events/{event['id']}?changed_by=alice", json={"operations": [
+            {"op": "set", "name": "Checkout Begun", "description": "Cart submitted"},
+            {"op": "remove_property", "event_property_id": _link_id(event, "user_id")},
+            {"op": "update_property", "event_property_id": _link_id(event, "coupon"),
+             "is_required": True, "example_value": None},
+            {"op": "add_property", **_link("cart_total", data_type="Number", example_value="19.99")},
+            {"op": "add_property", **_link("user_id", "super")},
+        ]})
+        assert response.status_code == status.HTTP_200_OK
+        assert response.json()["name"] == "Checkout Begun"
+        assert _links(client, event["id"]) == [
+            ("cart_id", "event", True, None), ("coupon", "event", True, None),
+            ("cart_total", "event", False, "19.99"), ("user_id", "super", False, None)]
+
+        entries = test_db.query(Changelog).order_by(Changelog.id).all()[before:]
+        assert len(entries) == 1
+        entry = entries[0]
+        assert entry.changed_by == "alice" and rollup_action(entry) == "event_patched"
+        assert entry.old_value["name"] == "Checkout Started" and entry.new_value["description"] == "Cart submitted"
+        assert "category" not in entry.new_value
+        assert [(p["name"], p["type"]) for p in entry.old_value["properties"]] == [("coupon", "event"), ("user_id", "user")]
+        assert [(p["name"], p["type"]) for p in entry.new_value["properties"]] == [
+            ("coupon", "event"), ("cart_total", "event"), ("user_id", "super")]
+        assert test_db.query(Property.data_type).filter(Property.name == "cart_total").scalar() == "Number"
+
+    def test_remove_and_readd(self, client, test_db, event):
+        """Test that a link can be removed and added back with other values in the same batch."""
+        response = client.patch(f"/api/events/{event['id']}", json={"operations": [
+            {"op": "remove_property", "event_property_id": _link_id(event, "coupon")},
+            {"op": "add_property", **_link("coupon", is_required=True)},
+        ]})
+        assert response.status_code == status.HTTP_200_OK
+        assert _links(client, event["id"])[-1] == ("coupon", "event", True, None)
+
+    def test_fields_only_and_no_op(self, client, test_db, event):
+        """Test that field-only batches log a plain update and unchanged batches log nothing."""
+        before = test_db.query(Changelog).count()
+        client.patch(f"/api/events/{event['id']}", json={"operations": [{"op": "set", "category": "Sales"}]})
+        entry = test_db.query(Changelog).order_by(Changelog.id.desc()).first()
+        assert entry.new_value == {"category": "Sales", "name": "Checkout Started"}
+
+        response = client.patch(f"/api/events/{event['id']}", json={"operations": [
+            {"op": "set", "category": "Sales"},
+            {"op": "update_property", "event_property_id": _link_id(event, "cart_id"), "is_required": True},
+        ]})
+        assert response.status_code == status.HTTP_200_OK
+        assert test_db.query(Changelog).count() == before + 1
+
+    @pytest.mark.parametrize("operation, code", [
+        ({"op": "add_property", **_link("cart_id", data_type="Number")}, status.HTTP_400_BAD_REQUEST),
+        ({"op": "add_property", **_link("cart_id")}, status.HTTP_400_BAD_REQUEST),
+        ({"op": "remove_property", "event_property_id": 999999}, status.HTTP_404_NOT_FOUND),
+        ({"op": "rename", "name": "x"}, 422),
+    ])
+    def test_failing_operation_rolls_back(self, client, test_db, event, operation, code):
+        """Test that one bad operation leaves the event, the registry and the changelog untouched."""
+        before = test_db.query(Changelog).count()
+        links = _links(client, event["id"])
+        response = client.patch(f"/api/events/{event['id']}", json={"operations": [
+            {"op": "set", "name": "Renamed"},
+            {"op": "remove_property", "event_property_id": _link_id(event, "coupon")},
+            {"op": "add_property", **_link("brand_new")},
+            operation,
+        ]})
+        assert response.status_code == code
+        assert client.get(f"/api/events/{event['id']}").json()["name"] == "Checkout Started"
+        assert _links(client, event["id"]) == links
+        assert test_db.query(Property).filter(Property.name == "brand_new").count() == 0
+        assert test_db.query(Changelog).count() == before
+
+    def test_unknown_event(self, client):
+        """Test that patching a missing event returns 404."""
+        response = client.patch("/api/events/999999", json={"operations": [{"op": "set", "name": "x"}]})
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+
+
+class TestPatchHistory:
+    """Test that patch entries replay through history and replication."""
+
+    def _patch(self, client, event):
+        client.patch(f"/api/events/{event['id']}", json={"operations": [
+            {"op": "update_property", "event_property_id": _link_id(event, "cart_id"), "example_value": "c-1"},
+            {"op": "remove_property", "event_property_id": _link_id(event, "coupon")},
+            {"op": "add_property", **_link("coupon", "user")},
+            {"op": "set", "category": "Sales"},
+        ]})
+
+    def test_replay_matches_live_event(self, client, test_db, event):
+        """Test that the event rebuilt from the changelog matches it before and after the patch."""
+        version = taxonomy_version(test_db)
+        original = _links(client, event["id"])
+        self._patch(client, event)
+        assert _replayed(test_db, event["id"]) == _links(client, event["id"])
+        assert _replayed(test_db, event["id"], version) == original
+        assert event_at(test_db, event["id"], taxonomy_version(test_db))["category"] == "Sales"
+
+    def test_follower_matches_leader(self, client, test_db, event):
+        """Test that a follower applies the patch to the same links and fields."""
+        self._patch(client, event)
+        engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+        init_db(engine)
+        follower_db = sessionmaker(bind=engine)()
+        try:
+            Follower(lambda: follower_db, lambda after, limit: client.get(
+                f"/api/replication/feed?after={after}&limit={limit}").json(), leader="test").catch_up()
+            query = ("SELECT ep.id, ep.event_id, p.name, ep.property_type, ep.is_required, ep.example_value "
+                     "FROM event_properties ep JOIN properties p ON p.id = ep.property_id ORDER BY ep.id")
+            assert follower_db.execute(text(query)).all() == test_db.execute(text(query)).all()
+            assert follower_db.execute(text("SELECT name, category FROM events")).all() == [("Checkout Started", "Sales")]
+        finally:
+            follower_db.close()
+            engine.dispose()
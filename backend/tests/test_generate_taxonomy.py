@@ -0,0 +1,84 @@
+import hashlib
+import sqlite3
+
+import pytest
+
+from generate_taxonomy import generate_taxonomy
+
+
+def _dump(path):
+    """Hash every row of the generated tables for determinism checks."""
+    conn = sqlite3.connect(path)
+    digest = hashlib.sha256()
+    for table in ("events", "properties", "event_properties", "changelog"):
+        for row in conn.execute(f"SELECT * FROM {table} ORDER BY id"):
+            digest.update(repr(row).encode())
+    conn.close()
+    return digest.hexdigest()
+
+
+class TestGenerateTaxonomy:
+    """Test the synthetic taxonomy generator."""
+
+    def test_row_counts(self, tmp_path):
+        """Test that the requested number of events and properties is generated."""
+        counts = generate_taxonomy(tmp_path / "t.db", events=200, properties=50, seed=1)
+        assert counts["events"] == 200
+        assert counts["properties"] == 50
+        assert counts["event_properties"] >= 200 * 2
+        assert counts["changelog"] >= 200
+
+        conn = sqlite3.connect(tmp_path / "t.db")
+        assert conn.execute("SELECT COUNT(*) FROM events").fetchone()[0] == 200
+        assert conn.execute("SELECT COUNT(*) FROM event_properties").fetchone()[0] == counts["event_properties"]
+        conn.close()
+
+    def test_deterministic_by_seed(self, tmp_path):
+        """Test that the same seed produces identical databases."""
+        generate_taxonomy(tmp_path / "a.db", events=100, properties=40, seed=7)
+        generate_taxonomy(tmp_path / "b.db", events=100, properties=40, seed=7)
+        generate_taxonomy(tmp_path / "c.db", events=100, properties=40, seed=8)
+        assert _dump(tmp_path / "a.db") == _dump(tmp_path / "b.db")
+        assert _dump(tmp_path / "a.db") != _dump(tmp_path / "c.db")
+
+    def test_fts_index_populated(self, tmp_path):
+        """Test that events_fts matches the events table and stays in sync."""
+        generate_taxonomy(tmp_path / "t.db", events=150, properties=30, seed=2)
+        conn = sqlite3.connect(tmp_path / "t.db")
+        name = conn.execute("SELECT name FROM events WHERE id = 1").fetchone()[0]
+        word = name.split()[0]
+        fts_ids = {row[0] for row in conn.execute(
+            "SELECT rowid FROM events_fts WHERE events_fts MATCH ?", (f'"{word}"',))}
+        like_ids = {row[0] for row in conn.execute(
+            "SELECT id FROM events WHERE name LIKE ?", (f"%{word}%",))}
+        assert 1 in fts_ids
+        assert like_ids <= fts_ids
+
+        # Triggers are installed, so later inserts are indexed too
+        conn.execute("INSERT INTO events (name) VALUES ('Zebra Spotted')")
+        conn.commit()
+        assert conn.execute("SELECT COUNT(*) FROM events_fts WHERE events_fts MATCH 'zebra'").fetchone()[0] == 1
+        conn.close()
+
+    def test_zipf_property_reuse(self, tmp_path):
+        """Test that a few head properties are reused far more than the tail."""
+        generate_taxonomy(tmp_path / "t.db", events=500, properties=200, zipf_exponent=1.2, seed=3)
+        conn = sqlite3.connect(tmp_path / "t.db")
+        usage = [row[0] for row in conn.execute(
+            "SELECT COUNT(*) FROM event_properties GROUP BY property_id ORDER BY COUNT(*) DESC")]
+        conn.close()
+        assert usage[0] > 10 * usage[len(usage) // 2]
+
+    def test_changelog_history_depth(self, tmp_path):
+        """Test that history depth controls the number of follow-up entries."""
+        shallow = generate_taxonomy(tmp_path / "a.db", events=200, properties=50, history_depth=0, seed=4)
+        deep = generate_taxonomy(tmp_path / "b.db", events=200, properties=50, history_depth=5, seed=4)
+        assert deep["changelog"] > shallow["changelog"] + 200
+
+    def test_refuses_to_overwrite(self, tmp_path):
+        """Test that an existing file is only replaced when asked to."""
+        generate_taxonomy(tmp_path / "t.db", events=10, properties=10)
+        with pytest.raises(FileExistsError):
+            generate_taxonomy(tmp_path / "t.db", events=10, properties=10)
+        counts = generate_taxonomy(tmp_path / "t.db", events=20, properties=10, overwrite=True)
+        assert counts["events"] == 20
@@ -0,0 +1,125 @@
+from fastapi import status
+from sqlalchemy import create_engine, func, text
+from sqlalchemy.orm import Session
+
+import history
+from database import Changelog, ChangelogCheckpoint, EventCheckpoint
+from generate_taxonomy import generate_taxonomy
+
+
+def _changed_at(client, entity_id):
+    """Timestamp of the latest changelog entry for an event."""
+    return client.get(f"/api/changelog?entity_type=event&entity_id={entity_id}").json()[0]["changed_at"]
+
+
+class TestAsOf:
+    """Test as_of on the event endpoints."""
+
+    def test_get_event_as_of(self, client, sample_event_data):
+        """Test that an event is returned as it was after each change."""
+        event_id = client.post("/api/events", json=sample_event_data).json()["id"]
+        created = _changed_at(client, event_id)
+        client.put(f"/api/events/{event_id}", json={"description": "Changed"})
+        client.post(f"/api/events/{event_id}/properties", json={
+            "property_name": "extra", "property_type": "user", "data_type": "Int", "is_required": True
+        })
+        added = _changed_at(client, event_id)
+
+        then = client.get(f"/api/events/{event_id}?as_of={created}").json()
+        assert then["description"] == "A test event"
+        assert [p["property_name"] for p in then["properties"]] == ["test_property"]
+        assert then["properties"][0]["description"] == "A test property"
+
+        later = client.get(f"/api/events/{event_id}?as_of={added}").json()
+        assert later["description"] == "Changed"
+        assert later["properties"][1]["property_type"] == "user"
+        assert later["properties"][1]["is_required"] is True
+
+    def test_deleted_and_future_events(self, client, sample_event_data):
+        """Test that events only exist between their create and delete entries."""
+        event_id = client.post("/api/events", json=sample_event_data).json()["id"]
+        created = _changed_at(client, event_id)
+        client.delete(f"/api/events/{event_id}")
+
+        response = client.get(f"/api/events/{event_id}?as_of=2000-01-01T00:00:00Z")
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+        assert client.get(f"/api/events/{event_id}?as_of={created}").status_code == status.HTTP_200_OK
+        assert client.get(f"/api/events?as_of={created}").json()[0]["id"] == event_id
+        assert client.get("/api/events?as_of=2100-01-01T00:00:00Z").json() == []
+
+    def test_list_filters_and_search(self, client, sample_event_data):
+        """Test that filters and search apply to the reconstructed events."""
+        client.post("/api/events", json=sample_event_data)
+        other_id = client.post("/api/events", json={"name": "Other", "category": "Misc"}).json()["id"]
+        as_of = _changed_at(client, other_id)
+
+        assert [e["name"] for e in client.get(f"/api/events?as_of={as_of}&category=Misc").json()] == ["Other"]
+        assert [e["name"] for e in client.get(f"/api/events?as_of={as_of}&q=test_property").json()] == ["Test Event"]
+        assert len(client.get(f"/api/events?as_of={as_of}&limit=1").json()) == 1
+
+    def test_invalid_as_of(self, client):
+        """Test that a malformed timestamp is rejected."""
+        response = client.get("/api/events?as_of=yesterday")
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+
+class TestCheckpoints:
+    """Test checkpoint creation and replay from checkpoints."""
+
+    def test_reads_do_not_write_checkpoints(self, client, test_db, sample_event_data, monkeypatch):
+        """Test that as_of reads never store checkpoints, however long the replay."""
+        monkeypatch.setattr(history, "CHECKPOINT_MIN_ENTRIES", 1)
+        event_id = client.post("/api/events", json=sample_event_data).json()["id"]
+        for i in range(3):
+            client.put(f"/api/events/{event_id}", json={"description": f"v{i}"})
+        client.get("/api/events?as_of=2100-01-01T00:00:00Z")
+        client.get(f"/api/events/{event_id}?as_of=2100-01-01T00:00:00Z")
+        assert test_db.query(ChangelogCheckpoint).count() == 0
+
+    def test_checkpoints_store_changed_events(self, client, test_db, sample_event_data, monkeypatch):
+        """Test that a checkpoint stores only events changed since the previous one, and reads start from it."""
+        monkeypatch.setattr(history, "CHECKPOINT_MIN_ENTRIES", 2)
+        first_id = client.post("/api/events", json=sample_event_data).json()["id"]
+        second_id = client.post("/api/events", json={"name": "Other"}).json()["id"]
+        first = history.write_checkpoint(test_db)
+        assert first is not None and history.write_checkpoint(test_db) is None  # Too few new entries
+
+        for i in range(2):
+            client.put(f"/api/events/{first_id}", json={"description": f"v{i}"})
+        client.delete(f"/api/events/{second_id}")
+        second = history.write_checkpoint(test_db)
+        rows = test_db.query(EventCheckpoint.changelog_id, EventCheckpoint.event_id, EventCheckpoint.state).all()
+        assert sorted((c, e, s is None) for c, e, s in rows) == [
+            (first, first_id, False), (first, second_id, False), (second, first_id, False), (second, second_id, True)]
+        assert test_db.query(ChangelogCheckpoint.events).filter_by(changelog_id=second).scalar() == 1
+
+        history._snapshots.clear()  # Read the checkpoint rows rather than the cached states
+        live = client.get("/api/events").json()
+        replayed = client.get("/api/events?as_of=2100-01-01T00:00:00Z").json()
+        assert replayed[0]["description"] == live[0]["description"] == "v1"
+        assert replayed[0]["properties"] == live[0]["properties"]
+        history._snapshots.clear()
+        assert history.event_at(test_db, first_id, second)["description"] == "v1"
+        assert history.event_at(test_db, second_id, second) is None
+        assert history.event_at(test_db, second_id, first)["name"] == "Other"
+
+    def test_generated_history_matches_live_state(self, tmp_path, monkeypatch):
+        """Test checkpointed replay of a generated history against the tables."""
+        path = tmp_path / "t.db"
+        generate_taxonomy(path, events=120, properties=40, history_depth=3, seed=3)
+        engine = create_engine(f"sqlite:///{path}")
+        with Session(engine) as db:
+            version = db.query(func.max(Changelog.id)).scalar()
+            replayed = history.events_at(db, version)
+            middle = version // 2
+            before = history.events_at(db, middle)
+            assert history.write_checkpoint(db, min_entries=1) == version
+            history._snapshots.clear()
+            again = history.events_at(db, version)
+            assert history.events_at(db, middle) == before
+            assert all(history.event_at(db, event_id, version) == state for event_id, state in list(replayed.items())[:20])
+            live = dict(db.execute(text("SELECT id, name FROM events")).all())
+        engine.dispose()
+
+        assert {event_id: state["name"] for event_id, state in replayed.items()} == live
+        assert again == replayed
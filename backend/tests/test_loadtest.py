@@ -0,0 +1,83 @@
+import asyncio
+import random
+
+import httpx
+import pytest
+
+from generate_taxonomy import generate_taxonomy
+from loadtest import DEFAULT_MIX, LoadState, format_report, inprocess_client, run_load, _percentile
+
+
+@pytest.fixture
+def bench_db(tmp_path):
+    """A small synthetic taxonomy on disk."""
+    path = tmp_path / "bench.db"
+    generate_taxonomy(path, events=50, properties=30, seed=1)
+    return path
+
+
+def _run(db_path, **kwargs):
+    async def go():
+        client, close = inprocess_client(db_path)
+        try:
+            return await run_load(client, **kwargs)
+        finally:
+            await close()
+    return asyncio.run(go())
+
+
+class TestLoadGenerator:
+    """Test the mixed-workload load generator."""
+
+    def test_percentile(self):
+        """Test nearest-rank percentiles."""
+        values = [float(i) for i in range(1, 101)]
+        assert _percentile(values, 0.5) == 50.0
+        assert _percentile(values, 0.99) == 99.0
+        assert _percentile([], 0.5) == 0.0
+
+    def test_ramp_report(self, bench_db):
+        """Test a small in-process ramp covering every operation."""
+        report = _run(bench_db, levels=[1, 4], requests=60, seed=3)
+        assert [level["concurrency"] for level in report["levels"]] == [1, 4]
+        for level in report["levels"]:
+            assert level["requests"] == 60
+            assert level["error_rate"] == 0.0
+            assert level["p50_ms"] <= level["p99_ms"] <= level["max_ms"]
+            assert set(level["operations"]) <= set(DEFAULT_MIX)
+        assert "conc" in format_report(report)
+
+    def test_custom_mix(self, bench_db):
+        """Test that only operations in the mix are replayed."""
+        report = _run(bench_db, levels=[2], requests=20, mix={"get_event": 1, "create_event": 1})
+        assert set(report["levels"][0]["operations"]) <= {"get_event", "create_event"}
+
+    def test_unknown_operation_rejected(self, bench_db):
+        """Test that a typo in the mix fails fast."""
+        with pytest.raises(ValueError):
+            _run(bench_db, levels=[1], requests=1, mix={"drop_tables": 1})
+
+    def test_lock_errors_counted_for_any_status(self):
+        """Test that lock errors are counted on reads and writes, whatever status carries them."""
+        def handler(request):
+            if request.url.params.get("limit") == "500":
+                return httpx.Response(200, json=[{"id": 1}])
+            if request.method == "GET":
+                return httpx.Response(503, json={"detail": "database is locked"})
+            return httpx.Response(400, json={"detail": "(sqlite3.OperationalError) database is locked"})
+
+        async def go():
+            async with httpx.AsyncClient(transport=httpx.MockTransport(handler), base_url="http://t") as client:
+                return await run_load(client, levels=[2], requests=20, mix={"get_event": 1, "create_event": 1})
+        level = asyncio.run(go())["levels"][0]
+        assert level["lock_rate"] == level["error_rate"] == 1.0
+        assert level["reads"]["lock_rate"] == 1.0
+        assert level["writes"]["lock_rate"] == 1.0
+
+    def test_unique_names_follow_the_seed(self):
+        """Test that generated names come from the seeded generator, not the global one."""
+        names = []
+        for global_seed in (1, 2):
+            random.seed(global_seed)
+            names.append(LoadState([]).unique_name("Load Event", random.Random(7)))
+        assert names[0] == names[1]
@@ -0,0 +1,111 @@
+import threading
+import time
+
+from fastapi import status
+
+from profiler import ADMIN_TOKEN_ENV, SamplingProfiler
+
+
+def _busy_loop(stop):
+    while not stop.is_set():
+        sum(range(1000))
+
+
+def _profile_busy_thread():
+    stop = threading.Event()
+    worker = threading.Thread(target=_busy_loop, args=(stop,), name="busy-thread")
+    worker.start()
+    try:
+        with SamplingProfiler(interval=0.001, workers_only=False) as profiler:
+            time.sleep(0.2)
+    finally:
+        stop.set()
+        worker.join()
+    return profiler
+
+
+class TestSamplingProfiler:
+    """Test the statistical sampler."""
+
+    def test_samples_busy_thread(self):
+        """Test that a busy thread's function shows up in the samples."""
+        profiler = _profile_busy_thread()
+        assert profiler.sample_count > 0
+        assert any(thread == "busy-thread" and any(f[0] == "_busy_loop" for f in stack)
+                   for thread, stack in profiler.samples)
+
+    def test_collapsed_format(self):
+        """Test collapsed stack lines are `thread;frames count`."""
+        output = _profile_busy_thread().collapsed()
+        line = next(line for line in output.splitlines() if line.startswith("busy-thread;"))
+        stack, count = line.rsplit(" ", 1)
+        assert int(count) > 0
+        assert "_busy_loop (test_profiler.py:" in stack
+
+    def test_speedscope_format(self):
+        """Test speedscope documents reference shared frames."""
+        document = _profile_busy_thread().speedscope()
+        assert document["$schema"].startswith("https://www.speedscope.app")
+        frames = document["shared"]["frames"]
+        profile = next(p for p in document["profiles"] if p["name"] == "busy-thread")
+        assert profile["type"] == "sampled"
+        assert len(profile["samples"]) == len(profile["weights"])
+        assert all(0 <= index < len(frames) for sample in profile["samples"] for index in sample)
+
+    def test_workers_only_skips_other_threads(self):
+        """Test that non-worker threads are ignored by default."""
+        stop = threading.Event()
+        worker = threading.Thread(target=_busy_loop, args=(stop,), name="busy-thread")
+        worker.start()
+        try:
+            with SamplingProfiler(interval=0.001) as profiler:
+                time.sleep(0.1)
+        finally:
+            stop.set()
+            worker.join()
+        assert all(thread != "busy-thread" for thread, _ in profiler.samples)
+
+
+class TestProfileEndpoints:
+    """Test the admin profiling endpoints."""
+
+    def test_profile_requires_token(self, client, monkeypatch):
+        """Test that profiling is disabled without a configured token."""
+        monkeypatch.delenv(ADMIN_TOKEN_ENV, raising=False)
+        response = client.get("/api/admin/profile?seconds=0.1")
+        assert response.status_code == status.HTTP_403_FORBIDDEN
+
+    def test_profile_rejects_wrong_token(self, client, monkeypatch):
+        """Test that a wrong token is rejected."""
+        monkeypatch.setenv(ADMIN_TOKEN_ENV, "secret")
+        response = client.get("/api/admin/profile?seconds=0.1", headers={"X-Admin-Token": "nope"})
+        assert response.status_code == status.HTTP_403_FORBIDDEN
+
+    def test_profile_workers(self, client, monkeypatch):
+        """Test sampling the workers for a short window."""
+        monkeypatch.setenv(ADMIN_TOKEN_ENV, "secret")
+        response = client.get(
+            "/api/admin/profile?seconds=0.1&format=speedscope",
+            headers={"X-Admin-Token": "secret"},
+        )
+        assert response.status_code == status.HTTP_200_OK
+        assert "profiles" in response.json()
+
+    def test_profile_single_request(self, client, monkeypatch, sample_event_data):
+        """Test that ?profile=1 returns the profile of that request instead of its body."""
+        monkeypatch.setenv(ADMIN_TOKEN_ENV, "secret")
+        client.post("/api/events", json=sample_event_data)
+        response = client.get("/api/events?profile=1", headers={"X-Admin-Token": "secret"})
+        assert response.status_code == status.HTTP_200_OK
+        assert response.headers["x-profiled-status"] == "200"
+        assert "profiles" in response.json()
+
+        response = client.get("/api/events?profile=1&profile_format=collapsed",
+                              headers={"X-Admin-Token": "secret"})
+        assert response.headers["content-type"].startswith("text/plain")
+
+    def test_profile_single_request_requires_token(self, client, monkeypatch):
+        """Test that per-request profiling needs the admin token."""
+        monkeypatch.setenv(ADMIN_TOKEN_ENV, "secret")
+        response = client.get("/api/events?profile=1")
+        assert response.status_code == status.HTTP_403_FORBIDDEN
@@ -0,0 +1,103 @@
+import random
+from difflib import SequenceMatcher
+
+from fastapi import status
+
+import property_dedupe
+from property_dedupe import TrigramBlocks, dedupe_report, find_matches, normalize_name, trigrams
+
+
+def _names(count, seed=3):
+    """Snake-case names built from a small vocabulary, some with a dropped letter."""
+    rng = random.Random(seed)
+    words = sorted({"".join(rng.choice("abcdeilmnoprstu") for _ in range(rng.randint(3, 7))) for _ in range(60)})
+    names = set()
+    while len(names) < count:
+        parts = rng.sample(words, rng.randint(1, 3))
+        if rng.random() < 0.2:
+            last = list(parts[-1])
+            del last[rng.randrange(len(last))]
+            parts[-1] = "".join(last)
+        names.add("_".join(parts))
+    return sorted(names)
+
+
+def _jaccard(a, b):
+    a, b = trigrams(a), trigrams(b)
+    return len(a & b) / len(a | b)
+
+
+class TestBlocking:
+    """Test candidate generation and scoring."""
+
+    def test_normalization(self):
+        """Test that case and separator variants share a key."""
+        assert {normalize_name(name) for name in ["userId", "user_id", "user-ID", "userid", "User ID"]} == {"userid"}
+
+    def test_prefix_filter_finds_every_blocked_pair(self):
+        """Test that blocking returns exactly the pairs at or above the trigram Jaccard threshold."""
+        keys = sorted({normalize_name(name) for name in _names(400)})
+        blocks = TrigramBlocks(keys)
+        found = {tuple(sorted((other, blocks.keys[rank])))
+                 for rank in range(len(keys)) for other in blocks.candidates(rank)}
+        expected = {(a, b) for i, a in enumerate(keys) for b in keys[i + 1:] if _jaccard(a, b) >= 0.3}
+        assert found == expected
+
+        count, matches = find_matches(keys, 0.85, workers=1)
+        assert count == len(expected)
+        assert all(SequenceMatcher(None, a, b).ratio() >= 0.85 for a, b, _ in matches)
+
+    def test_parallel_matches_serial(self, monkeypatch):
+        """Test that splitting the key ranges over processes gives the same matches."""
+        keys = sorted({normalize_name(name) for name in _names(300)})
+        serial = find_matches(keys, 0.8, workers=1)
+        monkeypatch.setattr(property_dedupe, "PARALLEL_MIN_KEYS", 10)
+        monkeypatch.setattr(property_dedupe, "TASK_KEYS", 64)
+        count, matches = find_matches(keys, 0.8, workers=2)
+        assert count == serial[0]
+        assert sorted(matches) == sorted(serial[1])
+
+
+class TestReport:
+    """Test clustering and conflict flags."""
+
+    def test_clusters_and_conflicts(self):
+        """Test that variants cluster around the most used name and type conflicts come first."""
+        rows = [
+            (1, "user_id", "String", 40),
+            (2, "userId", "Int", 3),
+            (3, "user-ID", "String", 1),
+            (4, "order_total", "Float", 5),
+            (5, "order_totals", "Float", 2),
+            (6, "currency", "String", 9),
+        ]
+        report = dedupe_report(rows, threshold=0.85, workers=1)
+
+        assert report["properties_scanned"] == 6
+        assert report["conflicts"] == 1
+        first, second = report["clusters"]
+        assert first["conflict"] and first["data_types"] == ["Int", "String"]
+        assert [prop["name"] for prop in first["properties"]] == ["user_id", "userId", "user-ID"]
+        assert not second["conflict"]
+        assert [prop["name"] for prop in second["properties"]] == ["order_total", "order_totals"]
+        assert second["pairs"] == [{"a": "ordertotal", "b": "ordertotals", "score": 0.952}]
+
+
+class TestDuplicatePropertiesEndpoint:
+    """Test GET /api/properties/duplicates."""
+
+    def test_report_follows_taxonomy_version(self, client):
+        """Test that the cached report is replaced after a registry change."""
+        for name, data_type in [("session_id", "String"), ("sessionId", "String")]:
+            client.post("/api/properties", json={"name": name, "data_type": data_type})
+
+        response = client.get("/api/properties/duplicates")
+        assert response.status_code == status.HTTP_200_OK
+        report = response.json()
+        assert report["conflicts"] == 0
+        assert client.get("/api/properties/duplicates").json() == report
+
+        client.post("/api/properties", json={"name": "SESSION_ID", "data_type": "Int"})
+        report = client.get("/api/properties/duplicates").json()
+        assert report["conflicts"] == 1
+        assert {prop["name"] for prop in report["clusters"][0]["properties"]} == {"session_id", "sessionId", "SESSION_ID"}
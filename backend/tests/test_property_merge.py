@@ -0,0 +1,161 @@
+import pytest
+from fastapi import status
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from database import Changelog, Property, PropertyCooccurrence, PropertyStats, Tombstone, init_db
+from history import event_at, events_at
+from replication import Follower
+from sketches import PropertySketch, store_sketches
+from usage import get_usage_index
+from validation import taxonomy_version
+
+
+def _link(name, property_type="event", is_required=False, example_value=None):
+    return {"property_name": name, "property_type": property_type, "data_type": "String",
+            "is_required": is_required, "example_value": example_value}
+
+
+def _links(client, event_id):
+    """(property name, type, required, example) of an event's current links, in link id order."""
+    properties = sorted(client.get(f"/api/events/{event_id}").json()["properties"], key=lambda p: p["id"])
+    return [(p["property_name"], p["property_type"], p["is_required"], p["example_value"]) for p in properties]
+
+
+def _replayed(db, event_id):
+    """The same tuples from the event state rebuilt out of the changelog."""
+    state = event_at(db, event_id, taxonomy_version(db))
+    return [(p["name"], p["type"], p.get("required", False), p.get("example"))
+            for p in sorted(state["properties"], key=lambda p: p["id"])]
+
+
+@pytest.fixture
+def duplicates(client):
+    """Three events using user_id / userId / user-ID, with colliding links."""
+    return [
+        client.post("/api/events", json={"name": "Signed Up", "properties": [
+            _link("user_id"), _link("userId", is_required=True, example_value="42"), _link("userId", "user")]}).json()["id"],
+        client.post("/api/events", json={"name": "Logged In", "properties": [_link("userId", "super")]}).json()["id"],
+        client.post("/api/events", json={"name": "Logged Out", "properties": [
+            _link("user-ID", example_value="7"), _link("userId"), _link("plan")]}).json()["id"],
+    ]
+
+
+class TestMerge:
+    """Test POST /api/properties/merge."""
+
+    def test_collisions_and_bookkeeping(self, client, test_db, duplicates):
+        """Test repointed and collapsed links, deleted sources and a single changelog entry."""
+        signed_up, logged_in, logged_out = duplicates
+        before = test_db.query(Changelog).count()
+        get_usage_index(test_db)  # Built before the merge, so the merge is caught up incrementally
+
+        response = client.post("/api/properties/merge?changed_by=alice",
+                               json={"target": "user_id", "sources": ["userId", "user-ID"]})
+        assert response.status_code == status.HTTP_200_OK
+        assert response.json() == {"target": "user_id", "merged": ["userId", "user-ID"],
+                                   "events": 3, "links_repointed": 3, "links_merged": 2}
+
+        assert _links(client, signed_up) == [("user_id", "event", True, "42"), ("user_id", "user", False, None)]
+        assert _links(client, logged_in) == [("user_id", "super", False, None)]
+        assert _links(client, logged_out) == [("user_id", "event", False, "7"), ("plan", "event", False, None)]
+
+        assert {name for (name,) in test_db.query(Property.name)} == {"user_id", "plan"}
+        assert {name for (name,) in test_db.query(Tombstone.name)} == {"userId", "user-ID"}
+        entries = test_db.query(Changelog).order_by(Changelog.id).all()[before:]
+        assert len(entries) == 1 and entries[0].new_value["action"] == "properties_merged"
+        assert [p["name"] for p in entries[0].new_value["properties"]] == ["userId", "user-ID"]
+
+        # Derived state follows: history replay, usage index, co-occurrence counts
+        for event_id in duplicates:
+            assert _replayed(test_db, event_id) == _links(client, event_id)
+        states = events_at(test_db, taxonomy_version(test_db))
+        assert [p["name"] for p in states[logged_in]["properties"]] == ["user_id"]
+        target = test_db.query(Property.id).filter(Property.name == "user_id").scalar()
+        assert get_usage_index(test_db).summary(target) == {
+            "events": 3, "required": 1, "by_type": {"event": 2, "user": 1, "super": 1}}
+        assert test_db.query(PropertyCooccurrence.count).filter_by(property_a=target, property_b=target).scalar() == 3
+
+    def test_invalid_requests(self, client, duplicates):
+        """Test unknown names and merging a property into itself."""
+        response = client.post("/api/properties/merge", json={"target": "user_id", "sources": ["nope"]})
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+        response = client.post("/api/properties/merge", json={"target": "user_id", "sources": ["user_id"]})
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        response = client.post("/api/properties/merge", json={"target": "user_id", "sources": []})
+        assert response.status_code == 422
+
+    def test_data_type_mismatch_needs_force(self, client, test_db, duplicates):
+        """Test that sources with another data type are refused unless the merge is forced."""
+        client.post("/api/properties", json={"name": "user_num", "data_type": "Int"})
+        response = client.post("/api/properties/merge", json={"target": "user_id", "sources": ["userId", "user_num"]})
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert "user_num" in response.json()["detail"] and "userId" not in response.json()["detail"]
+        assert test_db.query(Property).filter(Property.name == "userId").count() == 1
+
+        response = client.post("/api/properties/merge",
+                               json={"target": "user_id", "sources": ["userId", "user_num"], "force": True})
+        assert response.status_code == status.HTTP_200_OK
+        assert test_db.query(Property.data_type).filter(Property.name == "user_id").scalar() == "String"
+
+    def test_stats_are_merged(self, client, test_db, duplicates):
+        """Test that the target's value sketches absorb the sources' instead of dropping them."""
+        sketches = {name: PropertySketch() for name in ["user_id", "userId", "user-ID"]}
+        for name, values in [("user_id", ["a", "b"]), ("userId", ["b", "c", None]), ("user-ID", ["c", "d"])]:
+            for value in values:
+                sketches[name].add(value)
+        expected = PropertySketch().merge(sketches["user_id"]).merge(sketches["userId"]).merge(sketches["user-ID"])
+        store_sketches(test_db, sketches)
+
+        client.post("/api/properties/merge", json={"target": "user_id", "sources": ["userId", "user-ID"]})
+        stats = {p["name"]: p["stats"] for p in client.get("/api/properties").json()}
+        assert stats["user_id"] == expected.summary()
+        assert stats["user_id"]["observations"] == 7 and stats["user_id"]["distinct_estimate"] == 4
+        assert test_db.query(PropertyStats).count() == 1
+
+
+class TestRename:
+    """Test POST /api/properties/{id}/rename."""
+
+    def test_rename(self, client, test_db, duplicates):
+        """Test that events show the new name, now and in replayed history, and clashes are refused."""
+        signed_up = duplicates[0]
+        prop_id = test_db.query(Property.id).filter(Property.name == "user-ID").scalar()
+        before = taxonomy_version(test_db)
+
+        response = client.post(f"/api/properties/{prop_id}/rename", json={"name": "account_id"})
+        assert response.status_code == status.HTTP_200_OK
+        assert response.json()["name"] == "account_id"
+        assert _links(client, duplicates[2])[0][0] == "account_id"
+        assert _replayed(test_db, duplicates[2]) == _links(client, duplicates[2])
+        assert [p["name"] for p in event_at(test_db, duplicates[2], before)["properties"]][0] == "user-ID"
+        assert _replayed(test_db, signed_up) == _links(client, signed_up)
+
+        response = client.post(f"/api/properties/{prop_id}/rename", json={"name": "plan"})
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert client.post("/api/properties/999999/rename", json={"name": "x"}).status_code == 404
+
+
+class TestReplication:
+    """Test that followers apply merges and renames."""
+
+    def test_follower_matches_leader(self, client, test_db, duplicates):
+        """Test that a follower ends up with the leader's links, properties and tombstones."""
+        prop_id = test_db.query(Property.id).filter(Property.name == "plan").scalar()
+        client.post(f"/api/properties/{prop_id}/rename", json={"name": "plan_name"})
+        client.post("/api/properties/merge", json={"target": "user_id", "sources": ["user-ID", "userId"]})
+
+        engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+        init_db(engine)
+        follower_db = sessionmaker(bind=engine)()
+        try:
+            Follower(lambda: follower_db, lambda after, limit: client.get(
+                f"/api/replication/feed?after={after}&limit={limit}").json(), leader="test").catch_up()
+            query = ("SELECT ep.id, ep.event_id, p.name, ep.property_type, ep.is_required, ep.example_value "
+                     "FROM event_properties ep JOIN properties p ON p.id = ep.property_id ORDER BY ep.id")
+            assert follower_db.execute(text(query)).all() == test_db.execute(text(query)).all()
+            assert sorted(name for (name,) in follower_db.query(Tombstone.name)) == ["user-ID", "userId"]
+        finally:
+            follower_db.close()
+            engine.dispose()
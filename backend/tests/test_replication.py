@@ -0,0 +1,124 @@
+import pytest
+from fastapi import status
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from database import Changelog, init_db
+from generate_taxonomy import generate_taxonomy
+from replication import Follower, ReplicationError, apply_batch, feed
+from taxonomy_diff import EVENT_PROPERTY_ROWS_SQL, EVENT_ROWS_SQL, PROPERTY_ROWS_SQL, load_rows
+
+
+@pytest.fixture
+def follower_db():
+    """Empty follower database with the full schema."""
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    init_db(engine)
+    db = sessionmaker(bind=engine)()
+    yield db
+    db.close()
+    engine.dispose()
+
+
+def _state(db):
+    """Events (with link ids) and properties keyed by id, for comparing two databases."""
+    taxonomy = load_rows(db.execute(text(EVENT_ROWS_SQL)), db.execute(text(EVENT_PROPERTY_ROWS_SQL)),
+                         db.execute(text(PROPERTY_ROWS_SQL)), key_by_id=True)
+    links = db.execute(text("SELECT id, event_id, property_id FROM event_properties ORDER BY id")).all()
+    properties = db.execute(text("SELECT id, name, description FROM properties ORDER BY id")).all()
+    return taxonomy, links, properties
+
+
+def _follow(client, follower_db, batch_size=1000):
+    def fetch(after, limit):
+        return client.get(f"/api/replication/feed?after={after}&limit={limit}").json()
+    follower = Follower(lambda: follower_db, fetch, leader="test", batch_size=batch_size)
+    follower.catch_up()
+    return follower
+
+
+class TestApply:
+    """Test applying the leader's feed to a follower database."""
+
+    def test_follower_matches_leader(self, client, test_db, follower_db, sample_event_data, sample_property_data):
+        """Test that every kind of change is replicated with the leader's ids."""
+        event_id = client.post("/api/events", json=sample_event_data).json()["id"]
+        other_id = client.post("/api/events", json={**sample_event_data, "name": "Other", "properties": [
+            {"property_name": "only_here", "property_type": "event", "data_type": "Int", "description": "Temp"}
+        ]}).json()["id"]
+        client.post("/api/properties", json=sample_property_data)
+        client.put(f"/api/events/{event_id}", json={"name": "Renamed", "category": "Moved"})
+        client.post(f"/api/events/{event_id}/properties", json={
+            "property_name": "plan", "property_type": "user", "data_type": "String", "description": "Plan"
+        })
+        link_id = client.get(f"/api/events/{event_id}").json()["properties"][0]["id"]
+        client.delete(f"/api/events/{event_id}/properties/{link_id}")
+        client.delete(f"/api/events/{other_id}")
+
+        follower = _follow(client, follower_db, batch_size=3)
+
+        assert _state(follower_db) == _state(test_db)
+        assert follower_db.query(Changelog).count() == test_db.query(Changelog).count()
+        assert follower.status()["lag_entries"] == 0
+
+    def test_generated_history_replicates(self, tmp_path, follower_db):
+        """Test replaying a generated history with renames and property changes."""
+        path = tmp_path / "leader.db"
+        generate_taxonomy(path, events=150, properties=40, history_depth=4, seed=5)
+        engine = create_engine(f"sqlite:///{path}")
+        leader = sessionmaker(bind=engine)()
+        try:
+            version = 0
+            while True:
+                batch = feed(leader, version, 200)
+                if not batch["entries"]:
+                    break
+                version = apply_batch(follower_db, batch)
+            leader_events, _, _ = _state(leader)
+        finally:
+            leader.close()
+            engine.dispose()
+        assert _state(follower_db)[0]["events"] == leader_events["events"]
+
+    def test_reapplied_batch_is_idempotent(self, client, follower_db, sample_event_data):
+        """Test that fetching the same entries twice does not apply them twice."""
+        client.post("/api/events", json=sample_event_data)
+        batch = client.get("/api/replication/feed?after=0").json()
+        apply_batch(follower_db, batch)
+        before = _state(follower_db)
+        assert apply_batch(follower_db, batch) == batch["entries"][-1]["id"]
+        assert _state(follower_db) == before
+
+    def test_gap_is_rejected(self, client, follower_db, sample_event_data):
+        """Test that a batch not continuing the follower's sequence is refused."""
+        client.post("/api/events", json=sample_event_data)
+        client.post("/api/events", json={"name": "Second"})
+        batch = client.get("/api/replication/feed?after=1").json()
+        with pytest.raises(ReplicationError):
+            apply_batch(follower_db, batch)
+        assert follower_db.query(Changelog).count() == 0
+
+
+class TestFollowerMode:
+    """Test the API when running as a follower."""
+
+    def test_writes_rejected_and_status_reported(self, client, follower_db, sample_event_data):
+        """Test read-only enforcement and the lag report."""
+        client.post("/api/events", json=sample_event_data)
+        follower = _follow(client, follower_db)
+        client.app.state.follower = follower
+        try:
+            response = client.post("/api/events", json={"name": "Blocked"})
+            assert response.status_code == status.HTTP_403_FORBIDDEN
+            assert client.post("/api/validate", json={"payloads": []}).status_code == status.HTTP_200_OK
+            assert client.get("/api/events").status_code == status.HTTP_200_OK
+
+            report = client.get("/api/replication/status").json()
+            assert report["role"] == "follower"
+            assert report["lag_entries"] == 0
+            assert report["applied_version"] == report["leader_version"] == 1
+        finally:
+            client.app.state.follower = None
+
+        assert client.get("/api/replication/status").json() == {"role": "leader", "version": 1}
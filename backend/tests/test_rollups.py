@@ -0,0 +1,100 @@
+from datetime import datetime
+
+import pytest
+from fastapi import status
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+from archive import archive_changelog, changelog_rows
+from database import ChangelogRollup
+from generate_taxonomy import generate_taxonomy
+from rollups import bucket_start, changelog_stats, rebuild_rollups, rollup_action
+
+FAR_FUTURE = datetime(2100, 1, 1)
+
+
+@pytest.fixture
+def generated(tmp_path):
+    """Session on a generated taxonomy whose rollups were filled by the trigger."""
+    path = tmp_path / "t.db"
+    generate_taxonomy(path, events=120, properties=30, history_depth=4, seed=3)
+    engine = create_engine(f"sqlite:///{path}")
+    with Session(engine) as db:
+        yield db
+    engine.dispose()
+
+
+def _rollups(db):
+    return sorted(db.query(ChangelogRollup.granularity, ChangelogRollup.bucket, ChangelogRollup.changed_by,
+                           ChangelogRollup.entity_type, ChangelogRollup.action, ChangelogRollup.count).all())
+
+
+def _expected(db, granularity):
+    """Counts computed directly from the changelog rows."""
+    counts = {}
+    for row in changelog_rows(db):
+        key = (bucket_start(row.changed_at, granularity), row.changed_by, row.entity_type, rollup_action(row))
+        counts[key] = counts.get(key, 0) + 1
+    return counts
+
+
+class TestRollups:
+    """Test the trigger-maintained rollups and the rebuild job."""
+
+    def test_trigger_counts_match_changelog(self, generated):
+        """Test that incrementally maintained counts equal a full recount."""
+        for granularity in ("hour", "day"):
+            stats = changelog_stats(generated, granularity)
+            counts = {(datetime.fromisoformat(entry["bucket"]), entry["changed_by"], entry["entity_type"],
+                       entry["action"]): entry["count"] for entry in stats["buckets"]}
+            assert counts == _expected(generated, granularity)
+
+    def test_rebuild_includes_archived_rows(self, generated, tmp_path):
+        """Test that rebuilding after archival reproduces the incremental rollups."""
+        before = _rollups(generated)
+        archive_changelog(generated, FAR_FUTURE, tmp_path)
+
+        rebuild_rollups(generated)
+
+        assert _rollups(generated) == before
+
+    def test_group_by_and_filters(self, generated):
+        """Test summing over dimensions and filtering on them."""
+        total = len(changelog_rows(generated))
+        overall = changelog_stats(generated, "day", group_by=())
+        assert overall["total"] == total
+        assert all(set(entry) == {"bucket", "count"} for entry in overall["buckets"])
+
+        added = changelog_stats(generated, "day", group_by=("changed_by",), filters={"action": "property_added"})
+        expected = sum(1 for row in changelog_rows(generated) if rollup_action(row) == "property_added")
+        assert added["total"] == expected > 0
+
+
+class TestStatsEndpoint:
+    """Test GET /api/changelog/stats."""
+
+    def test_counts_api_writes(self, client, sample_event_data):
+        """Test that writes through the API show up in the current bucket."""
+        event_id = client.post("/api/events", json=sample_event_data).json()["id"]
+        client.put(f"/api/events/{event_id}", json={"description": "Changed"})
+        client.post(f"/api/events/{event_id}/properties", json={
+            "property_name": "plan", "property_type": "user", "data_type": "String", "description": "Plan"
+        })
+
+        response = client.get("/api/changelog/stats?granularity=hour&group_by=entity_type,action")
+        assert response.status_code == status.HTTP_200_OK
+        data = response.json()
+        assert data["total"] == 3
+        actions = {}
+        for entry in data["buckets"]:  # The writes may straddle an hour boundary
+            actions[entry["action"]] = actions.get(entry["action"], 0) + entry["count"]
+        assert actions == {"create": 1, "update": 1, "property_added": 1}
+
+        since = data["buckets"][0]["bucket"]
+        assert client.get(f"/api/changelog/stats?granularity=day&since={since}").json()["total"] == 3
+
+    def test_invalid_parameters(self, client):
+        """Test rejection of unknown dimensions, granularities and timestamps."""
+        assert client.get("/api/changelog/stats?group_by=category").status_code == status.HTTP_400_BAD_REQUEST
+        assert client.get("/api/changelog/stats?granularity=week").status_code == 422
+        assert client.get("/api/changelog/stats?since=yesterday").status_code == status.HTTP_400_BAD_REQUEST
@@ -0,0 +1,103 @@
+import gzip
+import json
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+from database import init_db, Event, Property, EventProperty
+from schema_inference import ObservedSchema, diff_schema, infer_data_type, infer_schema, load_registry
+
+PAYLOADS = [
+    {"event": "Purchase", "properties": {"order_id": "A1", "total": 2.5, "coupon": "X"}},
+    {"event": "Purchase", "properties": {"order_id": "A2", "total": 3}},
+    {"event": "Purchase", "properties": {"order_id": 7, "total": None}},
+    {"event": "Purchase", "properties": {"order_id": "A4", "total": 1.0}},
+    {"event": "Refund", "properties": {"reason": "late"}},
+]
+
+
+class TestObservedSchema:
+    """Test observation counting and merging."""
+
+    def test_observe_counts_types_and_presence(self):
+        """Test per-property type counts and presence rates."""
+        schema = ObservedSchema()
+        for payload in PAYLOADS:
+            schema.observe(payload)
+
+        purchase = schema.events["Purchase"]
+        assert purchase["count"] == 4
+        assert purchase["properties"]["order_id"] == {"string": 3, "integer": 1}
+        assert purchase["properties"]["total"] == {"number": 2, "integer": 1, "null": 1}
+        assert schema.presence("Purchase", "total") == 0.75
+        assert schema.presence("Purchase", "coupon") == 0.25
+
+    def test_merge_equals_single_pass(self):
+        """Test that merging partial schemas matches observing everything at once."""
+        whole = ObservedSchema()
+        left, right = ObservedSchema(), ObservedSchema()
+        for i, payload in enumerate(PAYLOADS):
+            whole.observe(payload)
+            (left if i % 2 else right).observe(payload)
+
+        merged = ObservedSchema.from_dict(json.loads(json.dumps(left.to_dict()))).merge(right)
+        assert merged.events == whole.events
+
+    def test_infer_data_type(self):
+        """Test mapping observed JSON types to registry data types."""
+        assert infer_data_type({"integer": 3}) == "Int"
+        assert infer_data_type({"integer": 1, "number": 2, "null": 1}) == "Float"
+        assert infer_data_type({"string": 1}) == "String"
+        assert infer_data_type({"string": 1, "integer": 1}) is None
+
+
+class TestDiffSchema:
+    """Test diffing observations against the registry."""
+
+    def test_diff_report(self):
+        """Test undocumented, conflicting and never-seen properties."""
+        schema = ObservedSchema()
+        for payload in PAYLOADS:
+            schema.observe(payload)
+        registry_events = {"Purchase": {"order_id": True, "total": False, "user_id": True}}
+        data_types = {"order_id": "String", "total": "Float", "user_id": "Int", "coupon": "Int"}
+
+        report = diff_schema(schema, registry_events, data_types)
+
+        assert report["undocumented_events"] == [{"event": "Refund", "count": 1}]
+        undocumented = {(p["event"], p["property"]) for p in report["undocumented_properties"]}
+        assert undocumented == {("Purchase", "coupon"), ("Refund", "reason")}
+        conflicts = {(p["event"], p["property"]) for p in report["type_conflicts"]}
+        assert conflicts == {("Purchase", "order_id"), ("Purchase", "coupon")}
+        assert report["never_seen_required"] == [{"event": "Purchase", "property": "user_id"}]
+
+
+class TestInferSchema:
+    """Test the streaming pipeline over files."""
+
+    def test_parallel_files_and_registry(self, tmp_path):
+        """Test inferring from split plain and gzip files and loading the registry."""
+        lines = "\n".join(json.dumps(p) for p in PAYLOADS) + "\n"
+        (tmp_path / "a.ndjson").write_text(lines)
+        with gzip.open(tmp_path / "b.ndjson.gz", "wt") as f:
+            f.write(lines)
+
+        schema = infer_schema([tmp_path / "a.ndjson", tmp_path / "b.ndjson.gz"], workers=2, chunk_size=40)
+        assert schema.lines == 10
+        assert schema.events["Purchase"]["properties"]["order_id"] == {"string": 6, "integer": 2}
+
+        path = tmp_path / "taxonomy.db"
+        engine = create_engine(f"sqlite:///{path}")
+        init_db(engine)
+        with Session(engine) as db:
+            event = Event(name="Purchase")
+            prop = Property(name="order_id", data_type="String")
+            db.add_all([event, prop, Property(name="unused", data_type="Int")])
+            db.flush()
+            db.add(EventProperty(event_id=event.id, property_id=prop.id, property_type="event", is_required=True))
+            db.commit()
+        engine.dispose()
+
+        registry_events, data_types = load_registry(path)
+        assert registry_events == {"Purchase": {"order_id": True}}
+        assert data_types == {"order_id": "String", "unused": "Int"}
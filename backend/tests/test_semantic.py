@@ -0,0 +1,111 @@
+import threading
+
+from fastapi import status
+
+import semantic
+from semantic import SearchIndex, VectorIndex, get_search_index, index_cache, stem, terms
+from validation import taxonomy_version
+
+
+class TestTerms:
+    """Test tokenisation."""
+
+    def test_split_and_stem(self):
+        """Test that case, separators and word endings are normalised."""
+        assert terms("purchaseCompleted") == terms("Purchase completed") == terms("purchases_complete")
+        assert {stem(word) for word in ["purchase", "purchased", "purchasing", "purchases"]} == {"purchas"}
+        assert terms("The cart of the user", None) == {"cart": 1, "user": 1}
+
+
+class TestVectorIndex:
+    """Test the sparse cosine index."""
+
+    def test_ranking_and_updates(self, monkeypatch):
+        """Test that rare shared terms rank first and re-indexed documents lose their old terms."""
+        monkeypatch.setattr(semantic, "COMPACT_MIN_DEAD", 2)
+        index = VectorIndex()
+        index.set(1, terms("checkout started cart"))
+        index.set(2, terms("checkout completed payment"))
+        index.set(3, terms("video started"))
+
+        ranked = index.search(terms("payment checkout"))
+        assert [key for key, _ in ranked] == [2, 1]
+        assert 0 < ranked[0][1] <= 1
+
+        index.set(2, terms("video paused"))
+        index.set(3, terms("video ended"))
+        assert [key for key, _ in index.search(terms("payment"))] == []
+        assert [key for key, _ in index.search(terms("video"))] == [2, 3]
+        index.discard(1)
+        assert index.dead == 0  # More dead slots than live ones: compacted
+        assert len(index) == 2 and index.search(terms("checkout")) == []
+        assert [key for key, _ in index.search(terms("video paused"))] == [2, 3]
+
+
+class TestSearchIndex:
+    """Test event documents built with their properties."""
+
+    def test_property_text_finds_events(self):
+        """Test that an event is found through its properties' descriptions."""
+        index = SearchIndex()
+        index.set_property(1, "order_total", "Amount paid by the customer")
+        index.set_property(2, "video_id", "Played video")
+        index.load_events([(10, "Order Completed", None, "Commerce"), (11, "Video Played", None, "Media")],
+                          [(10, 1), (11, 2)])
+        result = index.search("customer paid amount")
+        assert [key for key, _ in result["events"]] == [10]
+        assert [key for key, _ in result["properties"]] == [1]
+
+
+class TestSemanticSearchEndpoint:
+    """Test GET /api/search?mode=semantic."""
+
+    def test_ranked_results_follow_writes(self, client, sample_event_data):
+        """Test that semantic mode ranks events by property text and sees later updates."""
+        sample_event_data["properties"][0]["description"] = "Items purchased in the order"
+        event_id = client.post("/api/events", json=sample_event_data).json()["id"]
+        client.post("/api/events", json={"name": "Video Played", "description": "A video started playing",
+                                         "category": "Media", "properties": []})
+
+        response = client.get("/api/search", params={"q": "purchasing", "mode": "semantic"})
+        assert response.status_code == status.HTTP_200_OK
+        body = response.json()
+        assert body["mode"] == "semantic"
+        assert [event["name"] for event in body["events"]] == [sample_event_data["name"]]
+        assert body["events"][0]["score"] > 0
+        assert [prop["name"] for prop in body["properties"]] == ["test_property"]
+
+        client.put(f"/api/events/{event_id}", json={"description": "Checkout finished"})
+        body = client.get("/api/search", params={"q": "checkout", "mode": "semantic"}).json()
+        assert [event["id"] for event in body["events"]] == [event_id]
+
+        response = client.get("/api/search", params={"q": "video", "mode": "fuzzy"})
+        assert response.status_code == 422
+
+    def test_implicitly_created_properties_are_indexed(self, client):
+        """Test that properties created by adding them to events are found after a catch-up."""
+        event_id = client.post("/api/events", json={"name": "checkout", "properties": []}).json()["id"]
+        assert client.get("/api/search", params={"q": "checkout", "mode": "semantic"}).json()["events"]
+
+        client.post(f"/api/events/{event_id}/properties", json={
+            "property_name": "coupon_code", "property_type": "event", "data_type": "String",
+            "description": "discount voucher"})
+        client.patch(f"/api/events/{event_id}", json={"operations": [
+            {"op": "add_property", "property_name": "gift_wrap", "property_type": "event", "data_type": "Boolean"}]})
+        for query, prop in (("voucher", "coupon_code"), ("coupon", "coupon_code"), ("wrap", "gift_wrap")):
+            body = client.get("/api/search", params={"q": query, "mode": "semantic"}).json()
+            assert [event["id"] for event in body["events"]] == [event_id]
+            assert [p["name"] for p in body["properties"]] == [prop]
+
+    def test_catch_up_waits_for_readers(self, client, test_db):
+        """Test that catch_up does not change the index while a reader holds its lock."""
+        index = get_search_index(test_db)
+        client.post("/api/events", json={"name": "Checkout Started", "properties": []})
+
+        with index.lock:
+            worker = threading.Thread(target=index_cache.catch_up, args=(test_db, index, taxonomy_version(test_db)))
+            worker.start()
+            worker.join(0.2)
+            assert worker.is_alive() and index.search("checkout")["events"] == []
+        worker.join()
+        assert len(index.search("checkout")["events"]) == 1
@@ -0,0 +1,128 @@
+import json
+import random
+
+from fastapi import status
+
+from sketches import (
+    FrequentValues, HyperLogLog, PropertySketch, QuantileSketch,
+    collect_sketches, hash64, sketch_lines, store_sketches,
+)
+
+
+class TestSketches:
+    """Test the individual sketches and their merges."""
+
+    def test_hyperloglog_estimate_and_merge(self):
+        """Test distinct counts within a few percent, merged or not."""
+        whole, left, right = HyperLogLog(), HyperLogLog(), HyperLogLog()
+        for i in range(20000):
+            h = hash64(f"user-{i % 10000}")
+            whole.add_hash(h)
+            (left if i % 2 else right).add_hash(h)
+
+        assert abs(whole.count() - 10000) < 500
+        assert left.merge(right).registers == whole.registers
+
+    def test_hyperloglog_small_cardinality(self):
+        """Test that small sets are counted almost exactly."""
+        sketch = HyperLogLog()
+        for value in ["a", "b", "c", "a"]:
+            sketch.add_hash(hash64(value))
+        assert sketch.count() == 3
+
+    def test_frequent_values_find_heavy_hitters(self):
+        """Test that the most common values survive in the top-k, across a merge."""
+        rng = random.Random(1)
+        values = ["ios"] * 500 + ["android"] * 300 + [f"rare-{i}" for i in range(1000)]
+        rng.shuffle(values)
+        left, right = FrequentValues(k=5), FrequentValues(k=5)
+        for i, value in enumerate(values):
+            (left if i % 2 else right).add(value, hash64(value))
+
+        top = dict(left.merge(right).top(2))
+        assert set(top) == {"ios", "android"}
+        assert top["ios"] >= 500
+
+    def test_quantiles_relative_error(self):
+        """Test quantile estimates within the sketch's relative accuracy."""
+        values = list(range(1, 10001))
+        left, right = QuantileSketch(), QuantileSketch()
+        for value in values:
+            (left if value % 2 else right).add(value)
+        sketch = left.merge(right)
+
+        for q in (0.5, 0.9, 0.99):
+            exact = values[int(q * (len(values) - 1))]
+            assert abs(sketch.quantile(q) - exact) <= exact * 0.011
+        assert sketch.min == 1
+        assert sketch.max == 10000
+
+    def test_property_sketch_round_trip(self):
+        """Test that serialization keeps every sketch and stays compact."""
+        sketch = PropertySketch()
+        for i in range(1000):
+            sketch.add(i % 50)
+        sketch.add(None)
+
+        restored = PropertySketch.from_bytes(sketch.to_bytes())
+        assert restored.summary() == sketch.summary()
+        assert len(sketch.to_bytes()) < 8000
+
+        summary = sketch.summary()
+        assert summary["observations"] == 1001
+        assert summary["nulls"] == 1
+        assert summary["distinct_estimate"] == 50
+        assert summary["numeric"]["min"] == 0
+
+    def test_non_finite_values_skip_quantiles(self):
+        """Test that NaN and infinities are counted as values but kept out of the numeric stats."""
+        sketches = sketch_lines(['{"properties": {"x": NaN}}', '{"properties": {"x": Infinity}}',
+                                 '{"properties": {"x": -Infinity}}', '{"properties": {"x": 2.5}}'])
+        summary = sketches["x"].summary()
+        assert summary["observations"] == 4
+        assert summary["distinct_estimate"] == 4
+        assert summary["numeric"]["count"] == 1
+        assert summary["numeric"]["min"] == summary["numeric"]["max"] == 2.5
+
+
+class TestCollectSketches:
+    """Test sketching log files in worker processes."""
+
+    def test_split_files_match_single_pass(self, tmp_path):
+        """Test that per-chunk sketches merge into the single-pass result."""
+        lines = [json.dumps({"event": "E", "properties": {"n": i % 7, "s": f"v{i % 3}"}}) for i in range(200)]
+        path = tmp_path / "sample.ndjson"
+        path.write_text("\n".join(lines) + "\n")
+
+        merged = collect_sketches([path], workers=2, chunk_size=500)
+        single = sketch_lines(line.encode() for line in lines)
+        for name in ("n", "s"):
+            assert merged[name].summary() == single[name].summary()
+
+
+class TestPropertyStats:
+    """Test collecting, storing and serving property stats."""
+
+    def test_stats_served_with_properties(self, client, test_db, sample_event_data, tmp_path):
+        """Test that stored sketches merge across runs and show up in /api/properties."""
+        client.post("/api/events", json=sample_event_data)
+        path = tmp_path / "sample.ndjson"
+        path.write_text("\n".join(
+            json.dumps({"event": "Test Event", "properties": {"test_property": value, "other": 1}})
+            for value in ["a", "b", "a", "c"]
+        ) + "\n")
+
+        assert client.get("/api/properties").json()[0]["stats"] is None
+
+        sketches = sketch_lines(path.read_bytes().splitlines())
+        assert set(sketches) == {"test_property", "other"}
+        assert store_sketches(test_db, sketches) == 1
+        store_sketches(test_db, sketch_lines(path.read_bytes().splitlines()))
+
+        response = client.get("/api/properties")
+        assert response.status_code == status.HTTP_200_OK
+        stats = response.json()[0]["stats"]
+        assert stats["observations"] == 8
+        assert stats["distinct_estimate"] == 3
+        assert stats["top_values"][0] == {"value": "a", "count": 4}
+        assert stats["numeric"] is None
@@ -0,0 +1,112 @@
+import random
+
+from fastapi import status
+
+from suggestions import BitSlicedIndex, PropertyNameIndex, char_tokens, get_name_index
+from utils import find_similar_properties
+
+
+def _registry(count, seed=9):
+    """(name, data_type) pairs with shared prefixes, suffixes and repeated letters."""
+    rng = random.Random(seed)
+    nouns = ["user", "order", "cart", "session", "page", "account", "item", "promo"]
+    suffixes = ["id", "name", "count", "total", "type", "url", "ts", "status"]
+    names = set()
+    while len(names) < count:
+        name = f"{rng.choice(nouns)}_{rng.choice(suffixes)}"
+        if rng.random() < 0.5:
+            name += f"_{rng.randint(2, 40)}"
+        names.add(name)
+    return [(name, rng.choice(["String", "Int", "Float"])) for name in sorted(names)]
+
+
+class TestBitSlicedIndex:
+    """Test the bit-parallel overlap counters."""
+
+    def test_counts_match_multiset_overlap(self):
+        """Test that counters and thresholds agree with Counter-based multiset overlaps."""
+        names = ["aab", "abba", "banana", "", "zzz", "nab"]
+        index = BitSlicedIndex([char_tokens(name) for name in names])
+        query = char_tokens("banana")
+        planes = index.overlap(query)
+
+        expected = [sum(min(name.count(c), "banana".count(c)) for c in set(name)) for name in names]
+        assert index.counts(planes, range(len(names))) == expected
+        for minimum in range(8):
+            mask = index.at_least(planes, minimum)
+            assert index.positions(mask) == [i for i, count in enumerate(expected) if count >= minimum]
+
+
+class TestPropertyNameIndex:
+    """Test suggestions against utils.find_similar_properties."""
+
+    def test_exact_mode_reproduces_sequence_matcher(self):
+        """Test that exact mode returns the same suggestions, scores and tie order."""
+        registry = _registry(300)
+        index = PropertyNameIndex(registry)
+        rng = random.Random(1)
+        queries = ["userId", "order_totl", "CART_ID", "x", "", "session_status_7"]
+        queries += [rng.choice(registry)[0][:-1] for _ in range(20)]
+        for threshold in (0.6, 0.8):
+            for query in queries:
+                assert index.suggest(query, threshold) == find_similar_properties(query, registry, threshold)
+
+    def test_ngram_mode_and_batches(self):
+        """Test bigram scoring and that a batch equals one call per query."""
+        index = PropertyNameIndex([("user_id", "String"), ("user_ids", "String"), ("order_id", "String")])
+        suggestions = index.suggest("usr_id", 0.5, mode="ngram")
+        assert [s["name"] for s in suggestions] == ["user_id", "user_ids"]
+        assert suggestions[0]["similarity"] == round(2 * 4 / (5 + 6), 3)  # _i, id, r_, us shared
+
+        queries = ["userid", "order", "USERID"]
+        assert index.suggest_many(queries) == [index.suggest(query) for query in queries]
+
+
+class TestNameIndexCache:
+    """Test when the cached name index is rebuilt."""
+
+    def test_rebuilds_only_on_property_changes(self, client, test_db, sample_event_data):
+        """Test that event edits keep the index while added, renamed and deleted properties refresh it."""
+        event_id = client.post("/api/events", json=sample_event_data).json()["id"]
+        index = get_name_index(test_db)
+        client.put(f"/api/events/{event_id}", json={"description": "Changed"})
+        client.post("/api/events", json={"name": "No Properties"})
+        assert get_name_index(test_db) is index
+
+        client.post("/api/properties", json={"name": "user_id", "data_type": "String"})
+        added = get_name_index(test_db)
+        assert added.names == ["test_property", "user_id"]
+        prop_id = client.get("/api/properties").json()[0]["id"]
+        client.post(f"/api/properties/{prop_id}/rename", json={"name": "renamed"})
+        assert sorted(get_name_index(test_db).names) == ["renamed", "user_id"]
+        client.delete(f"/api/events/{event_id}")  # Drops the now orphaned property
+        assert get_name_index(test_db).names == ["user_id"]
+
+    def test_newer_index_is_kept(self, client, test_db):
+        """Test that an index built past the version a session reads is not replaced by an older one."""
+        client.post("/api/properties", json={"name": "user_id", "data_type": "String"})
+        index = get_name_index(test_db)
+        index.version += 10  # As if another request rebuilt it after this one's read
+        assert get_name_index(test_db) is index
+
+
+class TestSuggestEndpoints:
+    """Test the suggest endpoints."""
+
+    def test_single_and_batch(self, client):
+        """Test that the batch endpoint answers every row like the single endpoint."""
+        for name in ["user_id", "userId", "order_total"]:
+            client.post("/api/properties", json={"name": name, "data_type": "String"})
+
+        single = client.get("/api/properties/suggest?q=user_ids").json()
+        assert [s["name"] for s in single["suggestions"]] == ["user_id", "userId"]
+
+        response = client.post("/api/properties/suggest/batch", json={"queries": ["user_ids", "order_totals"]})
+        assert response.status_code == status.HTTP_200_OK
+        results = response.json()["results"]
+        assert results[0] == single
+        assert [s["name"] for s in results[1]["suggestions"]] == ["order_total"]
+
+        client.post("/api/properties", json={"name": "user_idx", "data_type": "String"})
+        refreshed = client.get("/api/properties/suggest?q=user_ids").json()
+        assert "user_idx" in [s["name"] for s in refreshed["suggestions"]]
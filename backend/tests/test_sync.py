@@ -0,0 +1,108 @@
+from datetime import datetime, timedelta, UTC
+
+from fastapi import status
+
+import sync
+from database import Event, Tombstone
+
+
+class TestSync:
+    """Test GET /api/sync deltas and tombstones."""
+
+    def test_initial_sync_is_full(self, client, sample_event_data):
+        """Test that since=0 returns the whole taxonomy and a version."""
+        client.post("/api/events", json=sample_event_data)
+
+        response = client.get("/api/sync")
+        assert response.status_code == status.HTTP_200_OK
+        data = response.json()
+        assert data["full"] is True
+        assert [e["name"] for e in data["events"]] == ["Test Event"]
+        assert [p["name"] for p in data["properties"]] == ["test_property"]
+        assert data["deleted"] == []
+        assert data["version"] > 0
+
+    def test_delta_contains_only_changes(self, client, sample_event_data):
+        """Test that a sync after a version returns only what changed since."""
+        first_id = client.post("/api/events", json=sample_event_data).json()["id"]
+        second_id = client.post("/api/events", json={"name": "Untouched"}).json()["id"]
+        version = client.get("/api/sync").json()["version"]
+
+        assert client.get(f"/api/sync?since={version}").json()["events"] == []
+
+        client.put(f"/api/events/{first_id}", json={"description": "Edited"})
+        delta = client.get(f"/api/sync?since={version}").json()
+        assert delta["full"] is False
+        assert [e["id"] for e in delta["events"]] == [first_id]
+        assert delta["events"][0]["description"] == "Edited"
+        assert delta["properties"] == []
+        assert delta["version"] > version
+        assert second_id not in [e["id"] for e in delta["events"]]
+
+    def test_property_association_changes_bump_event(self, client, sample_event_data):
+        """Test that adding and removing properties shows the event as changed."""
+        event_id = client.post("/api/events", json=sample_event_data).json()["id"]
+        version = client.get("/api/sync").json()["version"]
+
+        client.post(f"/api/events/{event_id}/properties", json={
+            "property_name": "plan", "property_type": "user", "data_type": "String"
+        })
+        delta = client.get(f"/api/sync?since={version}").json()
+        assert [e["id"] for e in delta["events"]] == [event_id]
+        assert [p["name"] for p in delta["properties"]] == ["plan"]
+
+        version = delta["version"]
+        link_id = delta["events"][0]["properties"][0]["id"]
+        client.delete(f"/api/events/{event_id}/properties/{link_id}")
+        delta = client.get(f"/api/sync?since={version}").json()
+        assert [len(e["properties"]) for e in delta["events"]] == [1]
+
+    def test_deletes_become_tombstones(self, client, sample_event_data):
+        """Test that deleted events and their orphaned properties are reported."""
+        event_id = client.post("/api/events", json=sample_event_data).json()["id"]
+        version = client.get("/api/sync").json()["version"]
+        client.delete(f"/api/events/{event_id}")
+
+        delta = client.get(f"/api/sync?since={version}").json()
+        deleted = {(t["entity_type"], t["name"]) for t in delta["deleted"]}
+        assert deleted == {("event", "Test Event"), ("property", "test_property")}
+        assert delta["events"] == []
+        assert delta["version"] > version
+
+    def test_stale_version_gets_full_snapshot(self, client, test_db, sample_event_data):
+        """Test that versions older than a pruned tombstone, or unknown ones, force a full sync."""
+        first_id = client.post("/api/events", json={"name": "Short Lived"}).json()["id"]
+        client.delete(f"/api/events/{first_id}")
+        stale = client.get("/api/sync").json()["version"] - 1  # Before that tombstone
+        test_db.query(Tombstone).update({Tombstone.deleted_at: datetime.now(UTC) - timedelta(days=31)})
+        test_db.commit()
+        second_id = client.post("/api/events", json=sample_event_data).json()["id"]
+        client.delete(f"/api/events/{second_id}")
+        client.post("/api/events", json={"name": "Kept"})
+
+        data = client.get(f"/api/sync?since={stale}").json()
+        assert data["full"] is True
+        assert [e["name"] for e in data["events"]] == ["Kept"]
+        assert client.get(f"/api/sync?since={data['version'] + 1}").json()["full"] is True
+
+    def test_versions_follow_commit_order(self, client, test_db, sample_event_data):
+        """Test that each write is stamped with a version above every one handed out before it."""
+        event_id = client.post("/api/events", json=sample_event_data).json()["id"]
+        version = sync.current_version(test_db)
+        stamped = test_db.query(Event.sync_version).filter(Event.id == event_id).scalar()
+        assert 0 < stamped <= version
+
+        client.put(f"/api/events/{event_id}", json={"category": "Other"})
+        test_db.expire_all()
+        assert test_db.query(Event.sync_version).filter(Event.id == event_id).scalar() > version
+        assert sync.current_version(test_db) > version
+
+    def test_expired_tombstones_are_purged(self, client, test_db, sample_event_data, monkeypatch):
+        """Test that recording a deletion drops tombstones past the retention window."""
+        test_db.add(Tombstone(entity_type="event", entity_id=99,
+                              deleted_at=datetime.now(UTC) - timedelta(days=31)))
+        test_db.commit()
+        event_id = client.post("/api/events", json=sample_event_data).json()["id"]
+        client.delete(f"/api/events/{event_id}")
+
+        assert {t.entity_id for t in test_db.query(Tombstone).filter_by(entity_type="event")} == {event_id}
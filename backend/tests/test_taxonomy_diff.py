@@ -0,0 +1,85 @@
+import shutil
+import sqlite3
+
+from fastapi import status
+
+from generate_taxonomy import generate_taxonomy
+from taxonomy_diff import MerkleTree, diff_taxonomies, diff_trees, load_sqlite
+
+
+def _changed_at(client, entity_id):
+    return client.get(f"/api/changelog?entity_type=event&entity_id={entity_id}").json()[0]["changed_at"]
+
+
+class TestMerkleTree:
+    """Test the hash tree and its pruned comparison."""
+
+    def test_identical_trees_compare_no_buckets(self):
+        """Test that equal roots short-circuit the diff."""
+        records = {f"e{i}": {"name": f"e{i}"} for i in range(500)}
+        left, right = MerkleTree(records), MerkleTree(dict(records))
+        assert left.root == right.root
+        assert diff_trees(left, right) == ([], [], [], 0)
+
+    def test_single_change_visits_one_bucket(self):
+        """Test that only the bucket holding the change is compared."""
+        records = {f"e{i}": {"name": f"e{i}"} for i in range(500)}
+        changed = dict(records, e7={"name": "renamed"})
+        added, removed, modified, compared = diff_trees(MerkleTree(records), MerkleTree(changed))
+        assert (added, removed, modified, compared) == ([], [], ["e7"], 1)
+
+
+class TestDiffDatabases:
+    """Test diffing two SQLite files."""
+
+    def test_diff_files(self, tmp_path):
+        """Test added, removed and changed events and properties between two files."""
+        base = tmp_path / "prod.db"
+        generate_taxonomy(base, events=200, properties=50, seed=2)
+        other = tmp_path / "staging.db"
+        shutil.copy(base, other)
+
+        conn = sqlite3.connect(other)
+        first, second, third = conn.execute("SELECT id, name FROM events ORDER BY id LIMIT 3").fetchall()
+        conn.execute("UPDATE events SET description = 'changed' WHERE id = ?", (first[0],))
+        conn.execute("DELETE FROM event_properties WHERE event_id = ?", (second[0],))
+        conn.execute("DELETE FROM events WHERE id = ?", (third[0],))
+        conn.execute("INSERT INTO events (name, created_at, updated_at) VALUES ('Brand New', '2024-01-01', '2024-01-01')")
+        conn.execute("UPDATE properties SET description = 'documented' WHERE id = 1")
+        conn.commit()
+        conn.close()
+
+        diff = diff_taxonomies(load_sqlite(base), load_sqlite(other))
+
+        assert [e["name"] for e in diff["events"]["added"]] == ["Brand New"]
+        assert [e["key"] for e in diff["events"]["removed"]] == [third[1]]
+        changes = {c["key"]: c for c in diff["events"]["changed"]}
+        assert set(changes) == {first[1], second[1]}
+        assert changes[first[1]]["fields"]["description"]["after"] == "changed"
+        assert changes[second[1]]["properties_added"] == []
+        assert changes[second[1]]["properties_removed"]
+        assert diff["summary"]["properties"]["changed"] == 1
+        assert diff["summary"]["events"]["buckets_compared"] <= 4
+
+
+class TestDiffEndpoint:
+    """Test GET /api/diff between two as_of points."""
+
+    def test_diff_as_of(self, client, sample_event_data):
+        """Test diffing an earlier point against now."""
+        event_id = client.post("/api/events", json=sample_event_data).json()["id"]
+        before = _changed_at(client, event_id)
+        client.put(f"/api/events/{event_id}", json={"name": "Renamed Event"})
+        client.post("/api/events", json={"name": "Second"})
+
+        response = client.get(f"/api/diff?from={before}")
+        assert response.status_code == status.HTTP_200_OK
+        diff = response.json()
+        assert [e["name"] for e in diff["events"]["added"]] == ["Second"]
+        assert diff["events"]["changed"][0]["key"] == str(event_id)
+        assert diff["events"]["changed"][0]["fields"]["name"] == {
+            "before": "Test Event", "after": "Renamed Event"
+        }
+
+        same = client.get(f"/api/diff?from={before}&to={before}").json()
+        assert same["summary"]["events"] == {"added": 0, "removed": 0, "changed": 0, "buckets_compared": 0}
@@ -0,0 +1,109 @@
+import random
+import threading
+
+from fastapi import status
+from sqlalchemy import text
+
+from database import Event, Property
+from usage import UsageIndex, build_index, get_usage_index, index_cache
+from validation import taxonomy_version
+
+
+def _link(property_name, property_type="event", is_required=False):
+    return {"property_name": property_name, "property_type": property_type, "data_type": "String",
+            "is_required": is_required}
+
+
+class TestUsageIndex:
+    """Test the inverted index and its running totals."""
+
+    def test_totals_follow_link_changes(self, test_db):
+        """Test that incremental updates give the same index as a fresh build."""
+        rng = random.Random(2)
+        test_db.add_all([Property(id=i, name=f"p{i}", data_type="String") for i in range(1, 6)])
+        test_db.add_all([Event(id=i, name=f"Event {i}") for i in range(1, 11)])
+        test_db.commit()
+
+        index = UsageIndex()
+        for _ in range(200):
+            event_id = rng.randint(1, 10)
+            links = {(rng.randint(1, 5), rng.choice(["event", "user"])): rng.random() < 0.3
+                     for _ in range(rng.randint(0, 4))}
+            test_db.execute(text("DELETE FROM event_properties WHERE event_id = :e"), {"e": event_id})
+            for (property_id, property_type), is_required in links.items():
+                test_db.execute(text(
+                    "INSERT INTO event_properties (event_id, property_id, property_type, is_required) "
+                    "VALUES (:e, :p, :t, :r)"
+                ), {"e": event_id, "p": property_id, "t": property_type, "r": is_required})
+            index.set_event(event_id, [(p, t, r) for (p, t), r in links.items()])
+
+        fresh = build_index(test_db)
+        assert index.links == fresh.links
+        assert index.summaries == fresh.summaries
+        for property_id in range(1, 6):
+            events = fresh.links.get(property_id, {})
+            assert index.summary(property_id) == {
+                "events": len(events),
+                "required": sum(any(types.values()) for types in events.values()),
+                "by_type": {t: n for t in ("event", "user")
+                            if (n := sum(t in types for types in events.values()))},
+            }
+
+    def test_filters_and_pages(self):
+        """Test property type / required filters and paging in event id order."""
+        index = UsageIndex()
+        for event_id in range(1, 8):
+            index.set_event(event_id, [(1, "event", event_id % 2 == 0)] + ([(1, "user", True)] if event_id > 5 else []))
+        total, page = index.events(1, offset=2, limit=2)
+        assert total == 7 and [event_id for event_id, _ in page] == [3, 4]
+        total, page = index.events(1, property_type="user")
+        assert total == 2 and page == [(6, {"user": True}), (7, {"user": True})]
+        total, page = index.events(1, required=False)
+        assert [event_id for event_id, _ in page] == [1, 3, 5]
+
+
+    def test_catch_up_waits_for_readers(self, client, test_db):
+        """Test that catch_up does not change the index while a reader holds its lock."""
+        client.post("/api/events", json={"name": "A", "properties": [_link("plan")]})
+        index = get_usage_index(test_db)
+        plan = test_db.query(Property.id).filter(Property.name == "plan").scalar()
+        client.post("/api/events", json={"name": "B", "properties": [_link("plan")]})
+
+        with index.lock:
+            worker = threading.Thread(target=index_cache.catch_up, args=(test_db, index, taxonomy_version(test_db)))
+            worker.start()
+            worker.join(0.2)
+            assert worker.is_alive() and index.summary(plan)["events"] == 1
+        worker.join()
+        assert index.summary(plan)["events"] == 2
+
+
+class TestUsageEndpoints:
+    """Test usage in GET /api/properties and GET /api/properties/{id}/usage."""
+
+    def test_usage_follows_writes(self, client, test_db):
+        """Test that counts and the event list reflect link additions, removals and event deletes."""
+        first = client.post("/api/events", json={"name": "Order Completed", "properties": [
+            _link("order_id", is_required=True), _link("order_id", "user")]}).json()
+        second = client.post("/api/events", json={"name": "Order Refunded", "properties": [_link("order_id")]}).json()
+        client.post("/api/properties", json={"name": "unused", "data_type": "Int"})
+
+        listing = {prop["name"]: prop["usage"] for prop in client.get("/api/properties").json()}
+        assert listing["order_id"] == {"events": 2, "required": 1, "by_type": {"event": 2, "user": 1}}
+        assert listing["unused"] == {"events": 0, "required": 0, "by_type": {}}
+
+        property_id = test_db.query(Property.id).filter(Property.name == "order_id").scalar()
+        response = client.get(f"/api/properties/{property_id}/usage", params={"limit": 1})
+        assert response.status_code == status.HTTP_200_OK
+        body = response.json()
+        assert body["total"] == 2
+        assert body["events"] == [{"event_id": first["id"], "name": "Order Completed",
+                                   "property_types": ["event", "user"], "is_required": True}]
+
+        client.delete(f"/api/events/{first['id']}")
+        body = client.get(f"/api/properties/{property_id}/usage", params={"required": False}).json()
+        assert body["usage"] == {"events": 1, "required": 0, "by_type": {"event": 1}}
+        assert [event["event_id"] for event in body["events"]] == [second["id"]]
+        assert get_usage_index(test_db).summary(property_id)["events"] == 1
+
+        assert client.get("/api/properties/999999/usage").status_code == status.HTTP_404_NOT_FOUND
@@ -0,0 +1,191 @@
+import threading
+
+import pytest
+from fastapi import status
+
+from validation import TaxonomyValidator, VersionedIndexCache, get_validator, taxonomy_version
+
+RULES = [
+    ("Purchase", "order_id", "String", "event", True),
+    ("Purchase", "total", "Float", "event", True),
+    ("Purchase", "items", "List", "event", False),
+    ("Purchase", "user_id", "Int", "user", False),
+    ("Purchase", "is_gift", "Boolean", "event", False),
+    ("Purchase", "context", "JSON", "super", False),
+    ("Logout", None, None, None, None),
+]
+
+
+class TestTaxonomyValidator:
+    """Test the compiled validators."""
+
+    def test_valid_payload(self):
+        """Test that a payload matching the taxonomy has no violations."""
+        validator = TaxonomyValidator(RULES)
+        payload = {"event": "Purchase", "properties": {
+            "order_id": "A1", "total": 9, "items": [], "user_id": 3, "is_gift": False, "context": {}
+        }}
+        assert validator.validate(payload) == []
+        assert validator.validate({"event": "Logout"}) == []
+
+    def test_unknown_event(self):
+        """Test that events missing from the taxonomy are reported."""
+        validator = TaxonomyValidator(RULES)
+        assert validator.validate({"event": "Nope", "properties": {}}) == [
+            {"type": "unknown_event", "event": "Nope"}
+        ]
+
+    def test_missing_required(self):
+        """Test that absent and null required properties are reported."""
+        validator = TaxonomyValidator(RULES)
+        violations = validator.validate({"event": "Purchase", "properties": {"total": None}})
+        assert sorted(v["property"] for v in violations) == ["order_id", "total"]
+        assert all(v["type"] == "missing_required" for v in violations)
+
+    def test_null_required_without_type_rule(self):
+        """Test that a null required property is reported even when its data type accepts anything."""
+        validator = TaxonomyValidator([("Search", "query", "Text", "event", True)])
+        assert validator.validate({"event": "Search", "properties": {"query": None}}) == [
+            {"type": "missing_required", "property": "query"}
+        ]
+        assert validator.validate({"event": "Search", "properties": {"query": 5}}) == []
+
+    def test_type_mismatch(self):
+        """Test exact type checks (a bool is not an Int, an int is a Float)."""
+        validator = TaxonomyValidator(RULES)
+        violations = validator.validate({"event": "Purchase", "properties": {
+            "order_id": 5, "total": 1, "user_id": True
+        }})
+        assert violations == [
+            {"type": "type_mismatch", "property": "order_id", "expected": "String", "actual": "integer"},
+            {"type": "type_mismatch", "property": "user_id", "expected": "Int", "actual": "boolean"},
+        ]
+
+    def test_unknown_property(self):
+        """Test that properties not defined on the event are reported."""
+        validator = TaxonomyValidator(RULES)
+        violations = validator.validate({"event": "Purchase", "properties": {
+            "order_id": "A1", "total": 1.5, "coupon": "X"
+        }})
+        assert violations == [{"type": "unknown_property", "property": "coupon"}]
+
+    def test_invalid_payload(self):
+        """Test malformed payloads."""
+        validator = TaxonomyValidator(RULES)
+        assert validator.validate([])[0]["type"] == "invalid_payload"
+        assert validator.validate({"properties": {}})[0]["type"] == "invalid_payload"
+        assert validator.validate({"event": "Logout", "properties": []})[0]["type"] == "invalid_payload"
+
+    @pytest.mark.parametrize("name", [["Purchase"], {}, 5, None])
+    def test_non_string_event_name(self, name):
+        """Test that unhashable and non-string event names are invalid payloads rather than errors."""
+        validator = TaxonomyValidator(RULES)
+        assert validator.validate({"event": name}) == [
+            {"type": "invalid_payload", "message": "Missing 'event' name"}
+        ]
+
+    def test_same_name_events_are_merged(self):
+        """Test that events sharing a name accept the union of their properties."""
+        validator = TaxonomyValidator([
+            ("Signup", "plan", "String", "event", False),
+            ("Signup", "source", "String", "event", True),
+        ])
+        assert validator.validate({"event": "Signup", "properties": {"plan": "pro", "source": "ad"}}) == []
+        assert validator.validate({"event": "Signup", "properties": {"plan": "pro"}})[0]["type"] == "missing_required"
+
+
+class TestValidatorCache:
+    """Test recompilation on taxonomy changes."""
+
+    def test_recompiles_only_when_version_changes(self, client, test_db, sample_event_data):
+        """Test that the cached validator is reused until the changelog advances."""
+        client.post("/api/events", json=sample_event_data)
+        first = get_validator(test_db)
+        assert get_validator(test_db) is first
+
+        client.post("/api/events", json={"name": "Other Event"})
+        second = get_validator(test_db)
+        assert second is not first
+        assert second.version > first.version
+        assert "Other Event" in second.events
+
+
+class _Index:
+    def __init__(self, version):
+        self.version = version
+        self.lock = threading.RLock()
+        self.entries = []
+
+
+class TestVersionedIndexCache:
+    """Test the per-engine index cache shared by the duplicate, search and usage indexes."""
+
+    def _cache(self, builds):
+        def build(db):
+            builds.append(1)
+            return _Index(taxonomy_version(db))
+
+        def updates(db, index, entries):
+            return lambda: index.entries.extend(entry.id for entry in entries)
+        return VersionedIndexCache(build, updates)
+
+    def test_catches_up_instead_of_rebuilding(self, client, test_db, sample_event_data):
+        """Test that a stale index is updated in place from the new changelog entries."""
+        builds = []
+        cache = self._cache(builds)
+        index = cache.get(test_db)
+        client.post("/api/events", json=sample_event_data)
+        assert cache.get(test_db) is index
+        assert index.version == taxonomy_version(test_db) and index.entries == [index.version]
+        assert len(builds) == 1
+
+    def test_newer_index_is_kept(self, client, test_db, sample_event_data):
+        """Test that an index already caught up past the reader's version is returned as is."""
+        builds = []
+        cache = self._cache(builds)
+        client.post("/api/events", json=sample_event_data)
+        index = cache.get(test_db)
+        index.version += 10  # As if another request caught it up after this one read the version
+        assert cache.get(test_db) is index
+        assert len(builds) == 1
+
+
+class TestValidateEndpoint:
+    """Test POST /api/validate."""
+
+    def test_batch_report(self, client, sample_event_data):
+        """Test that only invalid payloads are listed, with their index."""
+        client.post("/api/events", json=sample_event_data)
+        response = client.post("/api/validate", json={"payloads": [
+            {"event": "Test Event", "properties": {"test_property": "x"}},
+            {"event": "Test Event", "properties": {}},
+            {"event": "Missing Event"},
+        ]})
+        assert response.status_code == status.HTTP_200_OK
+        data = response.json()
+        assert data["total"] == 3
+        assert data["valid"] == 1
+        assert data["invalid"] == 2
+        assert data["results"][0] == {
+            "index": 1,
+            "event": "Test Event",
+            "violations": [{"type": "missing_required", "property": "test_property"}],
+        }
+        assert data["results"][1]["violations"][0]["type"] == "unknown_event"
+
+    def test_sees_taxonomy_changes(self, client, sample_event_data):
+        """Test that a newly added property is accepted after the change."""
+        event_id = client.post("/api/events", json=sample_event_data).json()["id"]
+        payload = {"event": "Test Event", "properties": {"test_property": "x", "count": 2}}
+        assert client.post("/api/validate", json={"payloads": [payload]}).json()["invalid"] == 1
+
+        client.post(f"/api/events/{event_id}/properties", json={
+            "property_name": "count", "property_type": "event", "data_type": "Int"
+        })
+        assert client.post("/api/validate", json={"payloads": [payload]}).json()["invalid"] == 0
+
+    def test_unhashable_event_names(self, client):
+        """Test that list and object event names are reported instead of failing the batch."""
+        response = client.post("/api/validate", json={"payloads": [{"event": ["x"]}, {"event": {}}, {"event": 3}]})
+        assert response.status_code == status.HTTP_200_OK
+        assert [r["violations"][0]["type"] for r in response.json()["results"]] == ["invalid_payload"] * 3
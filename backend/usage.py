@@ -0,0 +1,133 @@
+"""
+Property usage: which events link each property, as which property types, and
+whether they require it.
+
+UsageIndex is an in-memory inverted index from property id to the events that
+use it, with per-property totals kept up to date as links come and go, so the
+registry listing and the impact-analysis endpoint never group event_properties
+per request. Like the duplicate index it lives per engine, is built at startup
+and follows the taxonomy version: a read replays the changelog entries written
+since and reloads the links of only the events they touch.
+"""
+import threading
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from validation import VersionedIndexCache, changed_event_ids, rows_in, taxonomy_version
+
+LINKS_SQL = "SELECT event_id, property_id, property_type, is_required FROM event_properties"
+
+
+def _empty_summary() -> dict:
+    return {"events": 0, "required": 0, "by_type": {}}
+
+
+class UsageIndex:
+    """Property id -> {event id: {property_type: is_required}}, with running totals.
+
+    catch_up changes the index in place while readers may be using it, so both
+    hold `lock`; a caller making several reads can hold it too for a consistent view.
+    """
+
+    def __init__(self, version: int = 0):
+        self.version = version
+        self.lock = threading.RLock()
+        self.links = {}  # property id -> {event id: {property_type: is_required}}
+        self.event_properties = {}  # event id -> property ids, to drop an event's links
+        self.summaries = {}  # property id -> {"events", "required", "by_type"}
+        self._sorted = {}  # property id -> event ids in id order, dropped on change
+
+    def _count(self, property_id: int, types: dict, sign: int):
+        summary = self.summaries.setdefault(property_id, _empty_summary())
+        summary["events"] += sign
+        summary["required"] += sign * any(types.values())
+        by_type = summary["by_type"]
+        for property_type in types:
+            by_type[property_type] = by_type.get(property_type, 0) + sign
+            if not by_type[property_type]:
+                del by_type[property_type]
+        if not summary["events"]:
+            del self.summaries[property_id]
+
+    def set_event(self, event_id: int, links):
+        """Replace the links of an event with (property_id, property_type, is_required) rows."""
+        self.discard_event(event_id)
+        by_property = {}
+        for property_id, property_type, is_required in links:
+            by_property.setdefault(property_id, {})[property_type] = bool(is_required)
+        for property_id, types in by_property.items():
+            self.links.setdefault(property_id, {})[event_id] = types
+            self._count(property_id, types, 1)
+            self._sorted.pop(property_id, None)
+        if by_property:
+            self.event_properties[event_id] = list(by_property)
+
+    def discard_event(self, event_id: int):
+        for property_id in self.event_properties.pop(event_id, ()):
+            events = self.links[property_id]
+            self._count(property_id, events.pop(event_id), -1)
+            self._sorted.pop(property_id, None)
+            if not events:
+                del self.links[property_id]
+
+    def load(self, rows):
+        """Index (event_id, property_id, property_type, is_required) rows, replacing the events they cover."""
+        by_event = {}
+        for event_id, property_id, property_type, is_required in rows:
+            by_event.setdefault(event_id, []).append((property_id, property_type, is_required))
+        for event_id, links in by_event.items():
+            self.set_event(event_id, links)
+
+    def summary(self, property_id: int) -> dict:
+        with self.lock:
+            summary = self.summaries.get(property_id) or _empty_summary()
+            return {"events": summary["events"], "required": summary["required"], "by_type": dict(summary["by_type"])}
+
+    def events(self, property_id: int, property_type: str = None, required: bool = None,
+               offset: int = 0, limit: int = 50) -> tuple:
+        """(total, page) of (event_id, {property_type: is_required}) for a property, in event id order."""
+        with self.lock:
+            events = self.links.get(property_id, {})
+            ordered = self._sorted.get(property_id)
+            if ordered is None:
+                ordered = self._sorted[property_id] = sorted(events)
+            if property_type is None and required is None:
+                return len(ordered), [(event_id, events[event_id]) for event_id in ordered[offset:offset + limit]]
+            matching = []
+            for event_id in ordered:
+                types = events[event_id]
+                if property_type is not None:
+                    if property_type not in types:
+                        continue
+                    types = {property_type: types[property_type]}
+                if required is not None and any(types.values()) != required:
+                    continue
+                matching.append((event_id, types))
+            return len(matching), matching[offset:offset + limit]
+
+
+def build_index(db: Session) -> UsageIndex:
+    index = UsageIndex(taxonomy_version(db))
+    index.load(db.execute(text(LINKS_SQL)))
+    return index
+
+
+def updates(db: Session, index: UsageIndex, entries):
+    """Reload the links of the events changed by `entries` (see VersionedIndexCache)."""
+    changed = changed_event_ids(db, entries)
+    rows = rows_in(db, LINKS_SQL, "event_id", changed)
+
+    def update():
+        for event_id in changed:
+            index.discard_event(event_id)
+        index.load(rows)
+    return update
+
+
+index_cache = VersionedIndexCache(build_index, updates)
+
+
+def get_usage_index(db: Session) -> UsageIndex:
+    """Return the usage index for the current taxonomy version, updating it if needed."""
+    return index_cache.get(db)
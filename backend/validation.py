@@ -0,0 +1,255 @@
+"""
+Compiled taxonomy validation for tracked-event payloads.
+
+The events / event_properties / properties tables are compiled into one
+validator per event name: a dict of property name -> accepted Python types and
+a frozenset of required properties. Validating a payload is then a dict lookup
+plus a pass over its properties, with no database access.
+
+Payload shape:
+    {"event": "Purchase Completed", "properties": {"order_id": "A1", "total": 9.5}}
+
+Compiled validators are cached per database and rebuilt only when the taxonomy
+version (the latest changelog id) changes. VersionedIndexCache does the same for
+the in-memory indexes that are caught up incrementally instead (duplicates,
+search, usage).
+"""
+import threading
+import weakref
+
+from sqlalchemy import func, text
+from sqlalchemy.orm import Session
+
+from archive import changelog_rows
+from changelog import merged_property_ids
+from database import Changelog
+
+# data_type -> accepted Python types (exact type match, so bool is not an Int)
+TYPE_RULES = {
+    "String": frozenset({str}),
+    "Int": frozenset({int}),
+    "Integer": frozenset({int}),
+    "Float": frozenset({float, int}),
+    "Number": frozenset({float, int}),
+    "Boolean": frozenset({bool}),
+    "Bool": frozenset({bool}),
+    "List": frozenset({list}),
+    "Array": frozenset({list}),
+    "JSON": frozenset({dict, list}),
+    "Object": frozenset({dict}),
+}
+
+JSON_TYPE_NAMES = {
+    str: "string", int: "integer", float: "number", bool: "boolean",
+    list: "array", dict: "object", type(None): "null",
+}
+
+# One row per event / property association (events without properties have NULL property columns)
+TAXONOMY_RULES_SQL = """
+    SELECT e.name, p.name, p.data_type, ep.property_type, ep.is_required
+    FROM events e
+    LEFT JOIN event_properties ep ON ep.event_id = e.id
+    LEFT JOIN properties p ON p.id = ep.property_id
+"""
+
+_UNKNOWN = object()
+
+
+class CompiledEvent:
+    """Validation rules for one event name."""
+
+    __slots__ = ("name", "rules", "data_types", "required")
+
+    def __init__(self, name):
+        self.name = name
+        self.rules = {}       # property name -> accepted types (None accepts anything)
+        self.data_types = {}  # property name -> declared data_type
+        self.required = set()
+
+    def add(self, prop_name, data_type, is_required):
+        self.rules[prop_name] = TYPE_RULES.get(data_type)
+        self.data_types[prop_name] = data_type
+        if is_required:
+            self.required.add(prop_name)
+
+    def freeze(self):
+        self.required = frozenset(self.required)
+
+
+class TaxonomyValidator:
+    """Validators for every event in one taxonomy version.
+
+    Events sharing a name are merged: a property is allowed if any of them
+    defines it and required if any of them requires it.
+
+    Args:
+        rows: Iterable of (event name, property name, data type, property type, is_required)
+        version: Taxonomy version the rows were read at
+    """
+
+    def __init__(self, rows, version: int = 0):
+        self.version = version
+        self.events = {}
+        for event_name, prop_name, data_type, _property_type, is_required in rows:
+            compiled = self.events.get(event_name)
+            if compiled is None:
+                compiled = self.events[event_name] = CompiledEvent(event_name)
+            if prop_name is not None:
+                compiled.add(prop_name, data_type, is_required)
+        for compiled in self.events.values():
+            compiled.freeze()
+
+    def validate(self, payload) -> list:
+        """Return the violations of one payload (an empty list means valid)."""
+        if type(payload) is not dict:
+            return [{"type": "invalid_payload", "message": "Payload must be an object"}]
+        name = payload.get("event")
+        if type(name) is not str:  # Checked first: lists and dicts cannot be looked up
+            return [{"type": "invalid_payload", "message": "Missing 'event' name"}]
+        compiled = self.events.get(name)
+        if compiled is None:
+            return [{"type": "unknown_event", "event": name}]
+
+        properties = payload.get("properties")
+        if properties is None:
+            properties = {}
+        elif type(properties) is not dict:
+            return [{"type": "invalid_payload", "message": "'properties' must be an object"}]
+
+        rules = compiled.rules
+        violations = None
+        for key, value in properties.items():
+            accepted = rules.get(key, _UNKNOWN)
+            if accepted is None or (accepted is not _UNKNOWN and type(value) in accepted):
+                continue
+            if violations is None:
+                violations = []
+            if accepted is _UNKNOWN:
+                violations.append({"type": "unknown_property", "property": key})
+            elif value is not None:
+                violations.append({
+                    "type": "type_mismatch",
+                    "property": key,
+                    "expected": compiled.data_types[key],
+                    "actual": JSON_TYPE_NAMES.get(type(value), type(value).__name__),
+                })
+
+        # Checked on its own: a null value passes the loop above when the data type has no rule
+        for key in compiled.required:
+            if properties.get(key) is None:
+                if violations is None:
+                    violations = []
+                violations.append({"type": "missing_required", "property": key})
+
+        return violations or []
+
+    def validate_batch(self, payloads) -> list:
+        """Return (index, violations) for every invalid payload."""
+        validate = self.validate
+        results = []
+        for index, payload in enumerate(payloads):
+            violations = validate(payload)
+            if violations:
+                results.append((index, violations))
+        return results
+
+
+def taxonomy_version(db: Session) -> int:
+    """Current taxonomy version: the id of the latest changelog entry."""
+    return db.query(func.max(Changelog.id)).scalar() or 0
+
+
+# Engine -> compiled validator, so separate databases never share a cache entry
+_validators = weakref.WeakKeyDictionary()
+_compile_lock = threading.Lock()
+
+
+def get_validator(db: Session) -> TaxonomyValidator:
+    """Return the compiled validator for the current taxonomy version, compiling it if needed."""
+    bind = db.get_bind()
+    version = taxonomy_version(db)
+    validator = _validators.get(bind)
+    if validator is not None and validator.version == version:
+        return validator
+
+    with _compile_lock:
+        validator = _validators.get(bind)
+        if validator is None or validator.version != version:
+            validator = TaxonomyValidator(db.execute(text(TAXONOMY_RULES_SQL)).all(), version)
+            _validators[bind] = validator
+    return validator
+
+
+REBUILD_AFTER = 5000  # Changelog entries behind after which a full rebuild is cheaper
+
+
+def rows_in(db: Session, sql: str, column: str, ids) -> list:
+    """Rows of `sql` whose `column` is one of `ids`, queried in chunks of 500."""
+    ids = sorted(ids)
+    rows = []
+    for start in range(0, len(ids), 500):
+        placeholders = ", ".join(str(int(key)) for key in ids[start:start + 500])
+        rows.extend(db.execute(text(f"{sql} WHERE {column} IN ({placeholders})")).all())
+    return rows
+
+
+def changed_event_ids(db: Session, entries) -> set:
+    """Events whose links changed in changelog `entries`, including those moved by a merge.
+
+    A merge moves links onto its target without an event entry per event, so the
+    events now linking a merge target are read from event_properties.
+    """
+    changed = {entry.entity_id for entry in entries if entry.entity_type == "event"}
+    targets = [entry.entity_id for entry in entries if merged_property_ids(entry.new_value)]
+    changed.update(event_id for event_id, in rows_in(db, "SELECT event_id FROM event_properties", "property_id", targets))
+    return changed
+
+
+class VersionedIndexCache:
+    """One in-memory index per engine, caught up with the changelog as the taxonomy version moves.
+
+    Indexes have a `version` and a `lock` that readers hold while using them.
+
+    Args:
+        build: build(db) -> new index at the current taxonomy version
+        updates: updates(db, index, entries) -> callable applying the changelog
+            entries to the index, or None when only a rebuild can; it runs the
+            queries, the callable only changes memory (under the index lock)
+    """
+
+    def __init__(self, build, updates):
+        self.build = build
+        self.updates = updates
+        self._indexes = weakref.WeakKeyDictionary()  # Engine -> index, so separate databases never share one
+        self._lock = threading.Lock()
+
+    def get(self, db: Session):
+        """Return the index at the current taxonomy version or later, updating it if needed."""
+        bind = db.get_bind()
+        version = taxonomy_version(db)
+        index = self._indexes.get(bind)
+        # Another request may have caught it up past the version read above; newer is fine
+        if index is not None and index.version >= version:
+            return index
+
+        with self._lock:
+            index = self._indexes.get(bind)
+            if index is None:
+                index = self.build(db)
+            elif index.version < version:
+                index = self.catch_up(db, index, version)
+            self._indexes[bind] = index
+        return index
+
+    def catch_up(self, db: Session, index, version: int):
+        """Bring `index` to `version` from the changelog entries written since index.version."""
+        if version - index.version > REBUILD_AFTER:
+            return self.build(db)
+        update = self.updates(db, index, changelog_rows(db, after_id=index.version, up_to_id=version))
+        if update is None:
+            return self.build(db)
+        # Readers only wait for the in-memory update, not for the queries above
+        with index.lock:
+            update()
+            index.version = version
+        return index
@@ -1,4 +1,4 @@
-import { useState, useEffect } from 'react';
+import { useState, useEffect, useRef } from 'react';
 import axios from 'axios';
 import EventList from './components/EventList';
 import EventModal from './components/EventModal';
@@ -10,6 +10,7 @@ import Header from './components/Header';
 import { ToastContainer } from './components/Toast';
 import { useToast } from './hooks/useToast';
 import { useDarkMode } from './hooks/useDarkMode';
+import { useChangeStream } from './hooks/useChangeStream';
 import { Event, Property, ChangelogEntry, FilterOptions, ActiveFilters } from './types/api';
 
 const API_BASE = 'http://localhost:8000/api';
@@ -95,6 +96,20 @@ function App() {
     return () => clearTimeout(debounce);
   }, [searchQuery, filters]);
 
+  // Live updates: prepend streamed changelog entries and refresh the lists once a burst settles
+  const refreshTimer = useRef<ReturnType<typeof setTimeout>>();
+  useChangeStream(API_BASE, (entry) => {
+    setChangelog((current) =>
+      current.some((existing) => existing.id === entry.id) ? current : [entry, ...current].slice(0, 50)
+    );
+    clearTimeout(refreshTimer.current);
+    refreshTimer.current = setTimeout(() => {
+      fetchEvents();
+      fetchProperties();
+      fetchFilterOptions();
+    }, 500);
+  });
+
   const handleCreateEvent = () => {
     setEditingEvent(null);
     setIsModalOpen(true);
@@ -44,18 +44,26 @@ export default function Changelog({ changelog }: ChangelogProps) {
       return `Removed property: ${prop.name} (${prop.type}, ${prop.data_type})`;
     }
 
+    // For batched edits (PATCH /api/events/{id})
+    if (entry.new_value?.action === 'event_patched') {
+      const before = (entry.old_value?.properties || []) as Array<{ id?: number }>;
+      const after = (entry.new_value.properties || []) as Array<{ id?: number }>;
+      const modified = after.filter(p => before.some(b => b.id === p.id)).length;
+      const counts: Array<[number, string]> = [
+        [after.length - modified, 'added'],
+        [before.length - modified, 'removed'],
+        [modified, 'modified']
+      ];
+      const parts = counts.filter(([count]) => count > 0).map(([count, verb]) => `${count} ${verb}`);
+      return parts.length ? `Properties: ${parts.join(', ')}` : null;
+    }
+
     // For event creation
     if (entry.action === 'create' && entry.entity_type === 'event' && entry.new_value?.properties) {
       const propCount = entry.new_value.properties.length;
       return `Created with ${propCount} ${propCount === 1 ? 'property' : 'properties'}`;
     }
 
-    // For event deletion
-    if (entry.action === 'delete' && entry.entity_type === 'event' && entry.old_value?.properties) {
-      const propCount = entry.old_value.properties.length;
-      return `Deleted (had ${propCount} ${propCount === 1 ? 'property' : 'properties'})`;
-    }
-
     return null;
   };
 
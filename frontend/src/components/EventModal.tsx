@@ -1,6 +1,6 @@
 import { useState, useEffect, FormEvent, MouseEvent, ChangeEvent } from 'react';
 import axios from 'axios';
-import { Event, EventPropertyCreate, PropertySuggestion } from '../types/api';
+import { Event, EventOperation, EventPropertyCreate, PropertySuggestion } from '../types/api';
 
 interface EventModalProps {
   event: Event | null;
@@ -216,68 +216,63 @@ export default function EventModal({ event, onClose, apiBase }: EventModalProps)
       };
 
       if (event) {
-        // Update event metadata only if changed
-        const metadataChanged =
+        // Send every change in one PATCH, applied by the server in a single transaction
+        const operations: EventOperation[] = [];
+        if (
           submitFormData.name !== event.name ||
           submitFormData.description !== event.description ||
-          submitFormData.category !== event.category;
-
-        if (metadataChanged) {
-          await axios.put(`${apiBase}/events/${event.id}`, {
+          submitFormData.category !== event.category
+        ) {
+          operations.push({
+            op: 'set',
             name: submitFormData.name,
             description: submitFormData.description,
             category: submitFormData.category
-          }, {
-            params: { changed_by: submitFormData.created_by }
           });
         }
 
-        // Handle property changes - diff current vs original
+        // Match properties by id, or by name and type (the JSON view re-creates them)
         const originalProps = event.properties || [];
-        const currentProps = submitProperties;
-
-        // Find properties to remove (in original but not in current)
-        const propsToRemove = originalProps.filter(
-          origProp => !currentProps.some(cp => cp.id === origProp.id)
-        );
-
-        // Find properties to add (in current but not in original)
-        const propsToAdd = currentProps.filter(
-          currProp => !originalProps.some(op => op.id === currProp.id)
-        );
-
-        // Execute all property changes in parallel for better performance
-        const deletePromises = propsToRemove.map(origProp =>
-          axios.delete(`${apiBase}/events/${event.id}/properties/${origProp.id}`, {
-            params: { changed_by: submitFormData.created_by }
-          }).catch(err => ({ error: err, type: 'delete', property: origProp.property_name }))
-        );
-
-        const addPromises = propsToAdd.map(currProp =>
-          axios.post(`${apiBase}/events/${event.id}/properties`, {
+        const remaining = [...submitProperties];
+        for (const origProp of originalProps) {
+          let index = remaining.findIndex(cp => cp.id === origProp.id);
+          if (index < 0) {
+            index = remaining.findIndex(cp =>
+              cp.property_name === origProp.property_name &&
+              cp.property_type === origProp.property_type &&
+              cp.data_type === origProp.data_type);
+          }
+          if (index < 0) {
+            operations.push({ op: 'remove_property', event_property_id: origProp.id });
+            continue;
+          }
+          const [currProp] = remaining.splice(index, 1);
+          const exampleValue = currProp.example_value || null;
+          if (currProp.is_required !== origProp.is_required || exampleValue !== (origProp.example_value || null)) {
+            operations.push({
+              op: 'update_property',
+              event_property_id: origProp.id,
+              is_required: currProp.is_required,
+              example_value: exampleValue
+            });
+          }
+        }
+        for (const currProp of remaining) {
+          operations.push({
+            op: 'add_property',
             property_name: currProp.property_name,
             property_type: currProp.property_type,
             data_type: currProp.data_type,
             is_required: currProp.is_required,
             example_value: currProp.example_value,
             description: currProp.description
-          }, {
+          });
+        }
+
+        if (operations.length > 0) {
+          await axios.patch(`${apiBase}/events/${event.id}`, { operations }, {
             params: { changed_by: submitFormData.created_by }
-          }).catch(err => ({ error: err, type: 'add', property: currProp.property_name }))
-        );
-
-        // Wait for all operations to complete
-        const results = await Promise.all([...deletePromises, ...addPromises]);
-
-        // Check for partial failures
-        const failures = results.filter(r => r && typeof r === 'object' && 'error' in r) as Array<{ error: unknown; type: string; property: string }>;
-        if (failures.length > 0) {
-          const failedOps = failures.map(f => `${f.type} '${f.property}'`).join(', ');
-          console.error('Partial failures:', failures);
-          // Still close but show warning - data was partially saved
-          setError(`Some property changes failed: ${failedOps}. Please refresh and try again.`);
-          setSaving(false);
-          return;
+          });
         }
       } else {
         // Create event
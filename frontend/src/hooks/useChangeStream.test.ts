@@ -0,0 +1,73 @@
+import { describe, it, expect, beforeEach, afterEach, vi } from 'vitest';
+import { renderHook } from '@testing-library/react';
+import { useChangeStream } from './useChangeStream';
+
+class MockEventSource {
+  static instances: MockEventSource[] = [];
+  url: string;
+  closed = false;
+  listeners: Record<string, ((message: MessageEvent<string>) => void)[]> = {};
+
+  constructor(url: string) {
+    this.url = url;
+    MockEventSource.instances.push(this);
+  }
+
+  addEventListener(type: string, listener: (message: MessageEvent<string>) => void) {
+    (this.listeners[type] ||= []).push(listener);
+  }
+
+  removeEventListener(type: string, listener: (message: MessageEvent<string>) => void) {
+    this.listeners[type] = (this.listeners[type] || []).filter((l) => l !== listener);
+  }
+
+  close() {
+    this.closed = true;
+  }
+
+  emit(type: string, data: unknown) {
+    const message = { data: JSON.stringify(data) } as MessageEvent<string>;
+    (this.listeners[type] || []).forEach((listener) => listener(message));
+  }
+}
+
+describe('useChangeStream', () => {
+  beforeEach(() => {
+    MockEventSource.instances = [];
+    vi.stubGlobal('EventSource', MockEventSource);
+  });
+
+  afterEach(() => {
+    vi.unstubAllGlobals();
+  });
+
+  it('should open the change stream for the api base', () => {
+    renderHook(() => useChangeStream('http://localhost:8000/api', () => {}));
+
+    expect(MockEventSource.instances).toHaveLength(1);
+    expect(MockEventSource.instances[0].url).toBe('http://localhost:8000/api/changes/stream');
+  });
+
+  it('should pass parsed change entries to the latest handler', () => {
+    const first = vi.fn();
+    const second = vi.fn();
+    const { rerender } = renderHook(({ handler }) => useChangeStream('/api', handler), {
+      initialProps: { handler: first },
+    });
+    rerender({ handler: second });
+
+    const entry = { id: 7, entity_type: 'event', entity_id: 1, action: 'update', changed_at: '2024-01-01T00:00:00' };
+    MockEventSource.instances[0].emit('change', entry);
+
+    expect(first).not.toHaveBeenCalled();
+    expect(second).toHaveBeenCalledWith(entry);
+    expect(MockEventSource.instances).toHaveLength(1);
+  });
+
+  it('should close the stream on unmount', () => {
+    const { unmount } = renderHook(() => useChangeStream('/api', () => {}));
+    unmount();
+
+    expect(MockEventSource.instances[0].closed).toBe(true);
+  });
+});
@@ -0,0 +1,28 @@
+import { useEffect, useRef } from 'react';
+import type { ChangelogEntry } from '../types/api';
+
+// Subscribes to the server's change feed (Server-Sent Events) for as long as the
+// component is mounted. EventSource reconnects on its own and sends Last-Event-ID,
+// so entries committed while disconnected are replayed by the server.
+export function useChangeStream(apiBase: string, onChange: (entry: ChangelogEntry) => void): void {
+  const handlerRef = useRef(onChange);
+
+  useEffect(() => {
+    handlerRef.current = onChange;
+  }, [onChange]);
+
+  useEffect(() => {
+    if (typeof EventSource === 'undefined') return;
+
+    const source = new EventSource(`${apiBase}/changes/stream`);
+    const listener = (message: MessageEvent<string>) => {
+      handlerRef.current(JSON.parse(message.data) as ChangelogEntry);
+    };
+    source.addEventListener('change', listener);
+
+    return () => {
+      source.removeEventListener('change', listener);
+      source.close();
+    };
+  }, [apiBase]);
+}
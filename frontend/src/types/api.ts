@@ -8,9 +8,33 @@ export interface PropertyBase {
   created_by?: string | null;
 }
 
+export interface ValueCount {
+  value: string;
+  count: number;
+}
+
+export interface NumericStats {
+  count: number;
+  min: number;
+  max: number;
+  mean: number;
+  p50: number;
+  p90: number;
+  p99: number;
+}
+
+export interface PropertyStats {
+  observations: number;
+  nulls: number;
+  distinct_estimate: number;
+  top_values: ValueCount[];
+  numeric: NumericStats | null;
+}
+
 export interface Property extends PropertyBase {
   id: number;
   created_at: string;
+  stats?: PropertyStats | null;
 }
 
 export type PropertyCreate = PropertyBase;
@@ -57,6 +81,13 @@ export interface EventUpdate {
   category?: string;
 }
 
+// One step of PATCH /api/events/{id}; a batch is applied in order, all or nothing
+export type EventOperation =
+  | ({ op: 'set' } & EventUpdate)
+  | ({ op: 'add_property' } & EventPropertyCreate)
+  | { op: 'remove_property'; event_property_id: number }
+  | { op: 'update_property'; event_property_id: number; is_required?: boolean; example_value?: string | null };
+
 export interface Event extends EventBase {
   id: number;
   created_at: string;